@@ -7,15 +7,29 @@ import urllib3
 import platform
 import socket
 import uuid
+import shutil
 from datetime import datetime
 import psutil
 import time
+import hashlib
+import tempfile
 import zipfile
 from pathlib import Path
-from io import BytesIO
 
 logger = logging.getLogger("orchestrator-agent")
 
+# Chunk size of streamed package downloads
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Attempts to resume an interrupted package download
+DOWNLOAD_MAX_ATTEMPTS = 3
+
+# Directory of the content-addressed package file cache, within the packages directory
+BLOB_CACHE_DIR = ".blobs"
+
+# Package files per request of download URLs, requested just before downloading them
+BLOB_URLS_BATCH_SIZE = 500
+
 class ApiClient:
     """Client for communicating with the orchestrator API"""
     
@@ -41,6 +55,10 @@ class ApiClient:
         else:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
             self.session.verify = False
+        
+        # Session for presigned object storage URLs, which must not carry the API credentials
+        self.storage_session = requests.Session()
+        self.storage_session.verify = self.session.verify
             
         # Add default headers
         self.session.headers.update({
@@ -268,24 +286,289 @@ class ApiClient:
             
             package_path = os.path.join(target_dir, f"{package_id}")
             
-            response = self.session.get(url, stream=True)
-            
-            if response.status_code == 200:
+            # Fetch only the files missing locally if the package has a manifest
+            manifest = self.get_package_manifest(package_id)
+            if manifest is not None:
+                return self._sync_package(manifest, package_path, target_dir)
+            
+            # Stream the package to a temporary file, then extract it from disk
+            with tempfile.TemporaryFile(dir=target_dir) as package_file:
+                # Download straight from object storage if a presigned URL is available
+                download_url = self.get_package_download_url(package_id)
+                downloaded = download_url is not None and self._download_to_file(
+                    download_url["url"],
+                    package_file,
+                    expected_digest=download_url.get("md5_hash"),
+                    session=self.storage_session
+                )
+                
+                if not downloaded:
+                    if download_url is not None:
+                        logger.warning("Package download from object storage failed, downloading through the API")
+                    package_file.seek(0)
+                    package_file.truncate()
+                    if not self._download_to_file(url, package_file):
+                        return None
+                
                 # Create package directory
                 os.makedirs(package_path, exist_ok=True)
                 
                 # Extract the package (assuming it's a zip)
-                with zipfile.ZipFile(BytesIO(response.content)) as zip_ref:
+                package_file.seek(0)
+                with zipfile.ZipFile(package_file) as zip_ref:
                     zip_ref.extractall(package_path)
                     
-                return package_path
+            return package_path
+                
+        except Exception as e:
+            logger.error(f"Error downloading package: {e}")
+            return None
+    
+    def get_package_download_url(self, package_id):
+        """Get a short-lived presigned URL to download a package from object storage
+        
+        Args:
+            package_id (str): The package ID
+            
+        Returns:
+            dict: The download URL with the package size and MD5 or None if not available
+        """
+        try:
+            url = f"{self.base_url}/api/v1/packages/{package_id}/download-url"
+            
+            response = self.session.get(url)
+            
+            if response.status_code == 200:
+                return response.json()
             else:
-                logger.warning(f"Failed to download package: {response.status_code} - {response.text}")
+                logger.warning(f"Failed to get package download URL: {response.status_code} - {response.text}")
                 return None
                 
         except Exception as e:
-            logger.error(f"Error downloading package: {e}")
+            logger.error(f"Error getting package download URL: {e}")
             return None
+    
+    def get_blob_download_urls(self, digests):
+        """Get short-lived presigned URLs to download package files from object storage
+        
+        Args:
+            digests (list): SHA-256 of the files
+            
+        Returns:
+            dict: Download URL by SHA-256, empty if not available
+        """
+        try:
+            url = f"{self.base_url}/api/v1/packages/blobs/urls"
+            
+            response = self.session.post(url, json={"digests": list(digests)})
+            
+            if response.status_code == 200:
+                return response.json().get("urls", {})
+            else:
+                logger.warning(f"Failed to get package file download URLs: {response.status_code} - {response.text}")
+                return {}
+                
+        except Exception as e:
+            logger.error(f"Error getting package file download URLs: {e}")
+            return {}
+    
+    def get_package_manifest(self, package_id):
+        """Get the manifest of a package: its files with their SHA-256 and size
+        
+        Args:
+            package_id (str): The package ID
+            
+        Returns:
+            dict: The package manifest or None if not available
+        """
+        try:
+            url = f"{self.base_url}/api/v1/packages/{package_id}/manifest"
+            
+            response = self.session.get(url)
+            
+            if response.status_code == 200:
+                return response.json()
+            elif response.status_code != 404:
+                logger.warning(f"Failed to get package manifest: {response.status_code} - {response.text}")
+            return None
+                
+        except Exception as e:
+            logger.error(f"Error getting package manifest: {e}")
+            return None
+    
+    def _sync_package(self, manifest, package_path, target_dir):
+        """Build a package directory from the local blob cache, downloading missing blobs
+        
+        Args:
+            manifest (dict): The package manifest
+            package_path (str): Path of the package directory
+            target_dir (str): Packages directory holding the blob cache
+            
+        Returns:
+            str: Path to the package or None if failed
+        """
+        blobs_dir = os.path.join(target_dir, BLOB_CACHE_DIR)
+        files = manifest.get("files", [])
+        
+        # Download the blobs not cached by earlier versions
+        missing = sorted({
+            entry["sha256"] for entry in files
+            if not os.path.exists(self._blob_path(blobs_dir, entry["sha256"]))
+        })
+        for start in range(0, len(missing), BLOB_URLS_BATCH_SIZE):
+            batch = missing[start:start + BLOB_URLS_BATCH_SIZE]
+            urls = self.get_blob_download_urls(batch)
+            
+            for digest in batch:
+                if not self._download_blob(digest, self._blob_path(blobs_dir, digest), urls.get(digest)):
+                    return None
+        
+        logger.info(
+            f"Synced package {manifest.get('package_id')}: downloaded {len(missing)} "
+            f"of {len(files)} files"
+        )
+        
+        # Build the new version next to the current one, then swap them
+        package_path = os.path.abspath(package_path)
+        staging_path = f"{package_path}.sync-{uuid.uuid4().hex}"
+        
+        try:
+            for entry in files:
+                file_path = os.path.normpath(os.path.join(staging_path, entry["path"]))
+                if os.path.commonpath([staging_path, file_path]) != staging_path:
+                    raise ValueError(f"Invalid package file path: {entry['path']}")
+                
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                shutil.copyfile(self._blob_path(blobs_dir, entry["sha256"]), file_path)
+            
+            os.makedirs(staging_path, exist_ok=True)
+            
+            if os.path.exists(package_path):
+                old_path = f"{package_path}.old-{uuid.uuid4().hex}"
+                os.rename(package_path, old_path)
+                os.rename(staging_path, package_path)
+                shutil.rmtree(old_path, ignore_errors=True)
+            else:
+                os.rename(staging_path, package_path)
+            
+            return package_path
+            
+        except Exception as e:
+            logger.error(f"Error building package directory: {e}")
+            shutil.rmtree(staging_path, ignore_errors=True)
+            return None
+    
+    def _blob_path(self, blobs_dir, digest):
+        """Get the path of a blob in the local blob cache"""
+        return os.path.join(blobs_dir, digest[:2], digest)
+    
+    def _download_blob(self, digest, blob_path, download_url=None):
+        """Download a package file into the local blob cache, verifying its SHA-256
+        
+        Args:
+            digest (str): SHA-256 of the file
+            blob_path (str): Path of the blob in the cache
+            download_url (str, optional): Presigned object storage URL of the file.
+                Downloaded through the API if not given or failing.
+            
+        Returns:
+            bool: True if the blob was downloaded
+        """
+        url = f"{self.base_url}/api/v1/packages/blobs/{digest}"
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        partial_path = f"{blob_path}.part"
+        
+        try:
+            with open(partial_path, "wb") as blob_file:
+                downloaded = download_url is not None and self._download_to_file(
+                    download_url,
+                    blob_file,
+                    algorithm="sha256",
+                    expected_digest=digest,
+                    session=self.storage_session
+                )
+                
+                if not downloaded:
+                    blob_file.seek(0)
+                    blob_file.truncate()
+                    downloaded = self._download_to_file(url, blob_file, algorithm="sha256", expected_digest=digest)
+            
+            if not downloaded:
+                os.remove(partial_path)
+                return False
+            
+            # Only complete blobs are visible in the cache
+            os.replace(partial_path, blob_path)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error downloading package file {digest}: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return False
+    
+    def _download_to_file(self, url, target_file, algorithm="md5", expected_digest=None, session=None):
+        """Stream a download to a file, resuming it with range requests if interrupted
+        
+        Args:
+            url (str): The URL to download
+            target_file: Binary file object to write to
+            algorithm (str, optional): Hash algorithm of the checksum
+            expected_digest (str, optional): Expected checksum. Defaults to the
+                ETag of API downloads; object storage ETags aren't checksums.
+            session (requests.Session, optional): Session to download with.
+                Defaults to the API session.
+            
+        Returns:
+            bool: True if the download completed and matches its checksum
+        """
+        api_download = session is None
+        session = session or self.session
+        digest = hashlib.new(algorithm)
+        received = 0
+        expected_size = None
+        etag = None
+        
+        for attempt in range(1, DOWNLOAD_MAX_ATTEMPTS + 1):
+            headers = {"Range": f"bytes={received}-"} if received else {}
+            
+            try:
+                with session.get(url, stream=True, headers=headers) as response:
+                    if response.status_code == 200 and received:
+                        # Range not honoured, start over
+                        target_file.seek(0)
+                        target_file.truncate()
+                        digest = hashlib.new(algorithm)
+                        received = 0
+                    elif response.status_code not in (200, 206):
+                        logger.warning(f"Failed to download package: {response.status_code} - {response.text}")
+                        return False
+                    
+                    if expected_size is None:
+                        expected_size = int(response.headers.get("Content-Length", 0)) or None
+                        etag = response.headers.get("ETag", "").strip('"') or None
+                    
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        target_file.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+                
+                if expected_size is None or received >= expected_size:
+                    break
+                
+            except requests.RequestException as e:
+                logger.warning(f"Package download interrupted after {received} bytes (attempt {attempt}): {e}")
+        else:
+            logger.error(f"Package download incomplete after {DOWNLOAD_MAX_ATTEMPTS} attempts")
+            return False
+        
+        if api_download:
+            expected_digest = expected_digest or etag
+        if expected_digest and digest.hexdigest() != expected_digest:
+            logger.error("Downloaded package does not match its checksum")
+            return False
+        
+        return True
             
     def get_asset(self, asset_id):
         """Get an asset (credential or configuration)
@@ -310,6 +593,34 @@ class ApiClient:
         except Exception as e:
             logger.error(f"Error getting asset: {e}")
             return None
+    
+    def resolve_assets(self, asset_ids=None, names=None):
+        """Get several assets (credentials or configurations) in one request
+        
+        Args:
+            asset_ids (list, optional): The asset IDs to retrieve
+            names (list, optional): The asset names to retrieve
+            
+        Returns:
+            dict: The assets and the IDs and names not found, or None if failed
+        """
+        try:
+            url = f"{self.base_url}/api/v1/assets/resolve"
+            
+            response = self.session.post(url, json={
+                "asset_ids": list(asset_ids or []),
+                "names": list(names or [])
+            })
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.warning(f"Failed to resolve assets: {response.status_code} - {response.text}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error resolving assets: {e}")
+            return None
             
     def upload_package(self, package_path, package_info):
         """Upload automation package
@@ -14,10 +14,14 @@ import json
 import time
 import uuid
 import logging
+import threading
 import traceback
+from collections.abc import MutableMapping
 from datetime import datetime
 from pathlib import Path
 
+from cryptography.fernet import Fernet
+
 try:
     import pyautogui
     SCREENSHOTS_ENABLED = True
@@ -26,6 +30,109 @@ except ImportError:
 
 logger = logging.getLogger("orchestrator-agent")
 
+# Seconds assets are kept before they are requested again
+ASSET_CACHE_TTL = 300
+
+class AssetCache(MutableMapping):
+    """Short-lived cache of assets by ID, also found by name
+    
+    Assets are kept encrypted with a key that only exists in this cache, so
+    credentials don't stay in memory as plain text, and expire after a few
+    minutes so changed values are picked up. Expired or unknown assets are
+    resolved again on access, so jobs running longer than the TTL keep
+    finding their assets.
+    """
+    
+    def __init__(self, ttl=ASSET_CACHE_TTL, resolve=None):
+        """Initialize the asset cache
+        
+        Args:
+            ttl (int, optional): Seconds an asset is kept. Defaults to ASSET_CACHE_TTL.
+            resolve (callable, optional): Called with an asset ID or name missing
+                from the cache to load it again. Defaults to None.
+        """
+        self.ttl = ttl
+        self._resolve = resolve
+        self._cipher = Fernet(Fernet.generate_key())
+        self._entries = {}  # Asset ID -> (expiry time, encrypted asset)
+        self._names = {}    # Asset name -> asset ID
+        self._lock = threading.Lock()
+    
+    def add(self, asset):
+        """Add an asset under its ID and name
+        
+        Args:
+            asset (dict): Asset data with asset_id
+        """
+        self[str(asset["asset_id"])] = asset
+    
+    def __setitem__(self, asset_id, asset):
+        token = self._cipher.encrypt(json.dumps(asset).encode())
+        with self._lock:
+            self._entries[asset_id] = (time.time() + self.ttl, token)
+            if isinstance(asset, dict) and asset.get("name"):
+                self._names[asset["name"]] = asset_id
+    
+    def __getitem__(self, key):
+        try:
+            return self._get_cached(key)
+        except KeyError:
+            if self._resolve is None:
+                raise
+        
+        self._resolve(key)
+        return self._get_cached(key)
+    
+    def __delitem__(self, key):
+        with self._lock:
+            asset_id = key if key in self._entries else self._names.get(key)
+            if asset_id not in self._entries:
+                raise KeyError(key)
+            self._remove(asset_id)
+    
+    def __contains__(self, key):
+        try:
+            self._get_cached(key)
+            return True
+        except KeyError:
+            return False
+    
+    def __iter__(self):
+        now = time.time()
+        with self._lock:
+            asset_ids = [asset_id for asset_id, (expires_at, _) in self._entries.items() if expires_at > now]
+        return iter(asset_ids)
+    
+    def __len__(self):
+        return len(list(iter(self)))
+    
+    def clear(self):
+        """Remove all assets"""
+        with self._lock:
+            self._entries.clear()
+            self._names.clear()
+    
+    def _get_cached(self, key):
+        """Get an unexpired asset by ID or name without resolving it"""
+        with self._lock:
+            asset_id = key if key in self._entries else self._names.get(key)
+            entry = self._entries.get(asset_id)
+            if entry is None:
+                raise KeyError(key)
+            
+            expires_at, token = entry
+            if expires_at <= time.time():
+                self._remove(asset_id)
+                raise KeyError(key)
+        
+        return json.loads(self._cipher.decrypt(token))
+    
+    def _remove(self, asset_id):
+        """Remove an asset and its names, the lock must be held"""
+        del self._entries[asset_id]
+        for name in [name for name, named_id in self._names.items() if named_id == asset_id]:
+            del self._names[name]
+
 class AutomationExecutionContext:
     """Context provided to automation scripts for interacting with the orchestrator"""
     
@@ -45,7 +152,8 @@ class AutomationExecutionContext:
         self.job_id = job_id
         self.package_id = package_id
         self.parameters = parameters or {}
-        self.assets = assets or {}
+        self.assets = AssetCache(resolve=self._resolve_asset)
+        self.assets.update(assets or {})
         self.working_dir = None
         self.screenshots_dir = None
         self.logs_dir = None
@@ -167,16 +275,68 @@ class AutomationExecutionContext:
         Returns:
             dict: Asset data or None if not found or error
         """
-        # Check if already loaded
-        if asset_id in self.assets:
-            return self.assets[asset_id]
+        # Request from server if not already loaded
+        self.load_assets(asset_ids=[asset_id])
+        return self.assets.get(asset_id)
+    
+    def get_asset_by_name(self, name):
+        """Get an asset (credential or configuration) by name
+        
+        Args:
+            name (str): Asset name
             
-        # Request from server
-        asset = self.api_client.get_asset(asset_id)
-        if asset:
-            self.assets[asset_id] = asset
+        Returns:
+            dict: Asset data or None if not found or error
+        """
+        # Request from server if not already loaded
+        self.load_assets(names=[name])
+        return self.assets.get(name)
+    
+    def load_assets(self, asset_ids=None, names=None):
+        """Load the assets not loaded yet in one request
+        
+        Args:
+            asset_ids (list, optional): Asset IDs
+            names (list, optional): Asset names
             
-        return asset
+        Returns:
+            list: Asset IDs and names that couldn't be loaded
+        """
+        asset_ids = [asset_id for asset_id in (asset_ids or []) if asset_id not in self.assets]
+        names = [name for name in (names or []) if name not in self.assets]
+        if not asset_ids and not names:
+            return []
+            
+        result = self.api_client.resolve_assets(asset_ids, names)
+        
+        if result is None:
+            # Server without batch resolution, load assets one at a time
+            missing = []
+            for asset_id in asset_ids:
+                asset = self.api_client.get_asset(asset_id)
+                if asset:
+                    self.assets[asset_id] = asset
+                else:
+                    missing.append(asset_id)
+            return missing + names
+            
+        for asset in result.get("assets", []):
+            self.assets.add(asset)
+            
+        return result.get("missing", [])
+    
+    def _resolve_asset(self, key):
+        """Load an asset missing from the cache, e.g. expired during a long job
+        
+        Args:
+            key (str): Asset ID or name
+        """
+        try:
+            uuid.UUID(str(key))
+        except ValueError:
+            self.load_assets(names=[key])
+        else:
+            self.load_assets(asset_ids=[key])
     
     def set_result(self, results):
         """Set the execution results
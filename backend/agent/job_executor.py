@@ -91,13 +91,10 @@ class JobExecutor:
                 if not package_dir:
                     raise Exception(f"Failed to download package {package_id}")
             
-            # Load assets
-            for asset_id in asset_ids:
-                context.log(f"Loading asset {asset_id}")
-                asset = self.api_client.get_asset(asset_id)
-                if asset:
-                    context.assets[asset_id] = asset
-                else:
+            # Load assets in one request
+            if asset_ids:
+                context.log(f"Loading {len(asset_ids)} assets")
+                for asset_id in context.load_assets(asset_ids=asset_ids):
                     context.log(f"Warning: Failed to load asset {asset_id}", "WARNING")
             
             # Store job in running jobs
@@ -230,6 +227,9 @@ class JobExecutor:
                 # Clean up job references
                 if execution_id in self.running_jobs:
                     self.running_jobs[execution_id]["status"] = status
+                
+                # Drop the job's credentials
+                context.assets.clear()
                     
                 if execution_id in self.job_threads:
                     del self.job_threads[execution_id]
@@ -10,6 +10,7 @@ from .endpoints import (
     agents_endpoint,
     assets_endpoint,
     auth_endpoint,
+    dead_letters_endpoint,
     executions_endpoint,
     jobs_endpoint,
     notifications_endpoint,
@@ -39,3 +40,4 @@ api_router.include_router(executions_endpoint.router, prefix="/job-executions",
 api_router.include_router(notifications_endpoint.router, prefix="/notifications", tags=["Notifications"])
 api_router.include_router(subscriptions_endpoint.router, prefix="/subscriptions", tags=["Subscriptions"])
 api_router.include_router(service_account_endpoint.router, prefix="/service-accounts", tags=["Service Accounts"])
+api_router.include_router(dead_letters_endpoint.router, prefix="/dead-letters", tags=["Dead Letters"])
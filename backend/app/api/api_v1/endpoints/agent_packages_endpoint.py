@@ -81,6 +81,7 @@ def agent_execute_package(
 def update_execution_status(
     execution_id: str,
     status_update: PackageStatusUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_agent: Agent = Depends(get_current_agent)
 ) -> Dict[str, Any]:
@@ -100,7 +101,8 @@ def update_execution_status(
         status=status_update.status,
         progress=status_update.progress,
         results=status_update.results,
-        error=status_update.error
+        error=status_update.error,
+        background_tasks=background_tasks
     )
     
     if not execution:
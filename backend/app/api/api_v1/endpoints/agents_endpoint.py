@@ -4,6 +4,7 @@ API endpoints for agent management.
 This module provides API endpoints for managing agents:
 - List, create, update, delete agents
 - Agent logs
+- Agent resource metrics history and percentiles
 - Agent commands
 - Auto-login configuration
 - Agent registration and heartbeat
@@ -11,7 +12,7 @@ This module provides API endpoints for managing agents:
 
 import logging
 from typing import Any, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
 from sqlalchemy.orm import Session
@@ -27,9 +28,13 @@ from app.schemas.agent import (
     AgentLogResponse,
     AgentCommandRequest,
     AgentHeartbeatRequest,
-    AgentRegistrationResponse
+    AgentRegistrationResponse,
+    AgentMetricSeriesResponse,
+    AgentMetricPercentilesResponse
 )
 from app.services.agent_manager import AgentManager
+from app.services.agent_metrics_service import AgentMetricsService, RESOLUTIONS, DEFAULT_PERCENTILES
+from app.services.quota_service import QuotaService, AGENTS
 from app.messaging.producer import get_message_producer
 from app.api.api_v1.dependencies import get_agent_from_path
 
@@ -194,8 +199,9 @@ def delete_agent(
             # Delete agent logs first
             db.query(AgentLog).filter(AgentLog.agent_id == agent.agent_id).delete()
             
-            # Delete the agent directly
+            # Delete the agent directly and free its slot
             db.delete(agent)
+            QuotaService(db).release(agent.tenant_id, AGENTS)
             db.commit()
             
             # Log successful fallback deletion
@@ -245,6 +251,112 @@ def get_agent_logs(
             detail=f"Failed to get agent logs: {str(e)}"
         )
 
+def _metrics_range(start: Optional[datetime], end: Optional[datetime]):
+    """Get the queried metrics range as naive UTC, the last hour by default"""
+    if start and start.tzinfo:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and end.tzinfo:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(hours=1)
+    
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    return start, end
+
+def _percentile_fractions(percentiles: Optional[List[float]]) -> List[float]:
+    """Validate requested percentiles, e.g. 95 or 99.9"""
+    if not percentiles:
+        return list(DEFAULT_PERCENTILES)
+    
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be between 0 and 100"
+        )
+    
+    return [percentile / 100 for percentile in percentiles]
+
+@router.get("/metrics/percentiles", response_model=AgentMetricPercentilesResponse)
+def get_fleet_metric_percentiles(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    _: bool = Depends(require_agent_read),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    percentiles: Optional[List[float]] = Query(None)
+) -> Any:
+    """
+    Get resource metric percentiles over all agents of the user's tenant.
+    """
+    start, end = _metrics_range(start, end)
+    
+    return AgentMetricsService(db).get_percentiles(
+        tenant_id=str(current_user.tenant_id),
+        start=start,
+        end=end,
+        percentiles=_percentile_fractions(percentiles)
+    )
+
+@router.get("/{agent_id}/metrics", response_model=AgentMetricSeriesResponse)
+def get_agent_metrics(
+    agent: Agent = Depends(get_agent_from_path),
+    db: Session = Depends(get_db),
+    _: bool = Depends(require_agent_read),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None
+) -> Any:
+    """
+    Get the resource metrics history of an agent.
+    
+    Without a resolution, the finest one still retained at start is used.
+    """
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid resolution. Must be one of: {', '.join(RESOLUTIONS)}"
+        )
+    
+    start, end = _metrics_range(start, end)
+    
+    resolution, buckets = AgentMetricsService(db).get_series(
+        tenant_id=str(agent.tenant_id),
+        agent_id=str(agent.agent_id),
+        start=start,
+        end=end,
+        resolution=resolution
+    )
+    
+    return {"agent_id": agent.agent_id, "resolution": resolution, "buckets": buckets}
+
+@router.get("/{agent_id}/metrics/percentiles", response_model=AgentMetricPercentilesResponse)
+def get_agent_metric_percentiles(
+    agent: Agent = Depends(get_agent_from_path),
+    db: Session = Depends(get_db),
+    _: bool = Depends(require_agent_read),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    percentiles: Optional[List[float]] = Query(None)
+) -> Any:
+    """
+    Get resource metric percentiles of an agent.
+    """
+    start, end = _metrics_range(start, end)
+    
+    return AgentMetricsService(db).get_percentiles(
+        tenant_id=str(agent.tenant_id),
+        start=start,
+        end=end,
+        percentiles=_percentile_fractions(percentiles),
+        agent_id=str(agent.agent_id)
+    )
+
 @router.post("/{agent_id}/command", response_model=AgentResponse)
 def send_agent_command(
     command: AgentCommandRequest,
@@ -359,6 +471,7 @@ def disable_agent_auto_login(
 @router.post("/register", response_model=AgentRegistrationResponse)
 def register_agent(
     agent_in: AgentCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ) -> Any:
     """
@@ -387,7 +500,8 @@ def register_agent(
     try:
         agent = agent_manager.register_agent(
             registration_data=agent_in,
-            tenant_id=agent_in.tenant_id
+            tenant_id=agent_in.tenant_id,
+            background_tasks=background_tasks
         )
         return agent
     except Exception as e:
@@ -423,7 +537,8 @@ def agent_heartbeat(
         agent_manager.update_heartbeat(
             agent_id=agent_id,
             tenant_id=str(current_agent.tenant_id),
-            heartbeat=heartbeat_data
+            heartbeat=heartbeat_data,
+            agent=current_agent
         )
         
         # Return success response with timestamp
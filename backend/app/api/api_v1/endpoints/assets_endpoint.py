@@ -11,15 +11,17 @@ from typing import Any, List, Optional, Dict
 from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
 from sqlalchemy.orm import Session
 
-from ....auth.jwt import get_current_active_user
+from ....auth.jwt import get_current_active_user, get_current_agent
 from ....auth.permissions import PermissionChecker
 from ....db.session import get_db
-from ....models import User, Asset, AssetType, AssetFolder
+from ....models import User, Agent, Asset, AssetType, AssetFolder
 from ....schemas.asset import (
     AssetCreate, 
     AssetUpdate, 
     AssetResponse,
     AssetValueResponse,
+    AssetResolveRequest,
+    AssetResolveResponse,
     AssetTypeResponse,
     AssetFolderCreate,
     AssetFolderUpdate,
@@ -389,6 +391,49 @@ def get_asset_value(
     
     return asset_with_value
 
+@router.post("/resolve", response_model=AssetResolveResponse)
+def resolve_assets(
+    resolve_in: AssetResolveRequest,
+    db: Session = Depends(get_db),
+    current_agent: Agent = Depends(get_current_agent),
+    background_tasks: BackgroundTasks = None
+) -> Any:
+    """
+    Resolve the values of several assets by ID or name, including decryption.
+    
+    This endpoint is used by agents to load the assets of a job in one
+    request when the job starts.
+    
+    Args:
+        resolve_in: Asset IDs and names
+        db: Database session
+        current_agent: Current agent
+        background_tasks: Background tasks
+        
+    Returns:
+        AssetResolveResponse: Asset values and the IDs and names not found
+    """
+    # Create asset service
+    asset_service = AssetService(db)
+    
+    # Get assets of the agent's tenant with decryption
+    assets, missing = asset_service.resolve_assets(
+        tenant_id=str(current_agent.tenant_id),
+        asset_ids=resolve_in.asset_ids,
+        names=resolve_in.names
+    )
+    
+    # Log access to sensitive assets in background
+    if background_tasks and any(asset["is_encrypted"] for asset in assets):
+        background_tasks.add_task(
+            asset_service.log_agent_asset_access,
+            assets=assets,
+            tenant_id=str(current_agent.tenant_id),
+            agent_id=str(current_agent.agent_id)
+        )
+    
+    return {"assets": assets, "missing": missing}
+
 @router.get("/types/", response_model=List[AssetTypeResponse])
 def list_asset_types(
     db: Session = Depends(get_db),
@@ -0,0 +1,134 @@
+"""
+Dead-letter endpoints for the orchestrator API.
+
+This module provides endpoints for inspecting, replaying and purging
+messages the orchestrator consumer gave up on.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from aio_pika.exceptions import ChannelNotFoundEntity
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ....auth.jwt import get_current_active_superuser
+from ....models import User
+from ....messaging.producer import get_message_producer
+from ....messaging.retry import DeadLetterManager
+from ....schemas.dead_letter import (
+    DeadLetterQueueResponse,
+    DeadLetterReplayRequest,
+    DeadLetterOperationResponse
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def dead_letter_manager(queue_name: str) -> AsyncIterator[DeadLetterManager]:
+    """
+    Open a dead-letter manager on a channel of the producer's connection.
+    
+    Args:
+        queue_name: Name of the consumed queue
+        
+    Raises:
+        HTTPException: If the queue has no dead-letter queue
+    """
+    producer = get_message_producer()
+    await producer.connect()
+    
+    try:
+        async with producer.connection.channel() as channel:
+            yield DeadLetterManager(channel)
+    except ChannelNotFoundEntity:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Queue '{queue_name}' has no dead-letter queue"
+        )
+
+@router.get("/{queue_name}", response_model=DeadLetterQueueResponse)
+async def list_dead_letters(
+    queue_name: str,
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    List the oldest dead-lettered messages of a queue.
+    
+    Only superusers can access this endpoint. The messages stay in the
+    dead-letter queue.
+    
+    Args:
+        queue_name: Name of the consumed queue
+        limit: Maximum number of messages
+        current_user: Current superuser
+        
+    Returns:
+        DeadLetterQueueResponse: Message count and messages
+    """
+    async with dead_letter_manager(queue_name) as manager:
+        message_count = await manager.count(queue_name)
+        messages = await manager.list_messages(queue_name, limit)
+    
+    return {
+        "queue_name": queue_name,
+        "message_count": message_count,
+        "messages": messages
+    }
+
+@router.post("/{queue_name}/replay", response_model=DeadLetterOperationResponse)
+async def replay_dead_letters(
+    queue_name: str,
+    replay_in: DeadLetterReplayRequest,
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Send dead-lettered messages back to their queue.
+    
+    Only superusers can access this endpoint. Replayed messages start
+    over with a full set of attempts.
+    
+    Args:
+        queue_name: Name of the consumed queue
+        replay_in: Messages to replay
+        current_user: Current superuser
+        
+    Returns:
+        DeadLetterOperationResponse: Number of replayed messages
+    """
+    async with dead_letter_manager(queue_name) as manager:
+        replayed = await manager.replay(
+            queue_name,
+            set(replay_in.message_ids) if replay_in.message_ids is not None else None,
+            replay_in.limit
+        )
+    
+    logger.info(f"User {current_user.user_id} replayed {replayed} dead-lettered messages of '{queue_name}'")
+    
+    return {"queue_name": queue_name, "message_count": replayed}
+
+@router.delete("/{queue_name}", response_model=DeadLetterOperationResponse)
+async def purge_dead_letters(
+    queue_name: str,
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Delete all dead-lettered messages of a queue.
+    
+    Only superusers can access this endpoint.
+    
+    Args:
+        queue_name: Name of the consumed queue
+        current_user: Current superuser
+        
+    Returns:
+        DeadLetterOperationResponse: Number of deleted messages
+    """
+    async with dead_letter_manager(queue_name) as manager:
+        purged = await manager.purge(queue_name)
+    
+    logger.info(f"User {current_user.user_id} purged {purged} dead-lettered messages of '{queue_name}'")
+    
+    return {"queue_name": queue_name, "message_count": purged}
@@ -194,7 +194,7 @@ async def cancel_execution(
     job_service = JobService(db)
     
     # Cancel execution
-    execution = await job_service.cancel_execution(
+    execution = job_service.cancel_execution(
         execution_id=execution_id,
         tenant_id=current_user.tenant_id
     )
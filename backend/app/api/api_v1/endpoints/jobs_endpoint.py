@@ -24,6 +24,7 @@ from ....schemas.job import (
     JobWithExecutionsResponse
 )
 from ....services.job_service import JobService
+from ....services.quota_service import QuotaExceededError
 from ..dependencies import get_tenant_from_path
 
 router = APIRouter()
@@ -272,6 +273,11 @@ def start_job(
         )
         
         return result
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -5,25 +5,30 @@ This module provides endpoints for managing automation packages, including
 uploading, downloading, and managing versions.
 """
 
+import re
 import logging
-import os
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, BackgroundTasks, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from ....auth.jwt import get_current_active_user
+from ....auth.jwt import get_current_active_user, get_current_agent
 from ....auth.permissions import PermissionChecker
 from ....db.session import get_db
-from ....models import User, Package
+from ....models import User, Agent, Package
 from ....schemas.package import (
     PackageCreate, 
     PackageUpdate, 
     PackageResponse,
     PackageVersionResponse,
-    PackageDeployRequest
+    PackageDeployRequest,
+    PackageManifestResponse,
+    PackageDownloadUrlResponse,
+    PackageBlobUrlsRequest,
+    PackageBlobUrlsResponse
 )
+from ....config import settings
 from ....services.package_service import PackageService
 from ..dependencies import get_multi_tenant_filter
 
@@ -397,9 +402,35 @@ def upload_package(
             detail=f"Error processing uploaded package: {str(e)}"
         )
 
+def _parse_byte_range(range_header: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Parse a single-range Range header.
+    
+    Args:
+        range_header: Range header value, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-512"
+        
+    Returns:
+        Optional[Tuple[int, Optional[int]]]: (first byte, last byte) range,
+            (-n, None) for the last n bytes, or None to send the whole file
+    """
+    if not range_header:
+        return None
+    
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    
+    # Multiple and malformed ranges are answered with the whole file
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    
+    if not match.group(1):
+        return (-int(match.group(2)), None)
+    
+    return (int(match.group(1)), int(match.group(2)) if match.group(2) else None)
+
 @router.get("/{package_id}/download")
 def download_package(
     package_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     _: bool = Depends(require_package_read),
@@ -408,41 +439,47 @@ def download_package(
     """
     Download a package file.
     
+    The file is streamed from object storage in chunks. A Range header
+    requests part of the file, e.g. to resume an interrupted download.
+    
     Args:
         package_id: Package ID
+        range_header: Optional Range header
         db: Database session
         current_user: Current user
         _: Permission check
         background_tasks: Background tasks
         
     Returns:
-        FileResponse: Package ZIP file
+        StreamingResponse: Package ZIP file, or the requested range of it
     """
     # Create package service
     package_service = PackageService(db)
+    byte_range = _parse_byte_range(range_header)
     
-    # Get package
-    package = package_service.get_package(
-        package_id=package_id,
-        tenant_id=str(current_user.tenant_id)
-    )
-    
-    if not package:
+    # Get package and open its file
+    try:
+        download = package_service.download_package(
+            package_id=package_id,
+            tenant_id=str(current_user.tenant_id),
+            byte_range=byte_range
+        )
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Package not found"
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=str(e)
         )
     
-    # Get package file path
-    file_path = package.storage_path
-    if not os.path.exists(file_path):
+    if not download:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Package file not found"
+            detail="Package not found"
         )
     
-    # Log download in background
-    if background_tasks:
+    package = download["package"]
+    
+    # Log download in background, once per download rather than per range
+    if background_tasks and not (byte_range and download["start"] > 0):
         background_tasks.add_task(
             package_service.log_package_activity,
             package_id=package_id,
@@ -455,11 +492,184 @@ def download_package(
             }
         )
     
-    # Return file response
-    return FileResponse(
-        path=file_path,
-        filename=f"{package.name}-{package.version}.zip",
-        media_type="application/zip"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(download["end"] - download["start"] + 1),
+        "Content-Disposition": f'attachment; filename="{package.name}-{package.version}.zip"'
+    }
+    if package.md5_hash:
+        headers["ETag"] = f'"{package.md5_hash}"'
+    
+    if byte_range:
+        headers["Content-Range"] = f"bytes {download['start']}-{download['end']}/{download['size']}"
+    
+    # Stream the file from object storage
+    return StreamingResponse(
+        download["content"],
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type="application/zip",
+        headers=headers
+    )
+
+@router.get("/{package_id}/download-url", response_model=PackageDownloadUrlResponse)
+def get_package_download_url(
+    package_id: str,
+    db: Session = Depends(get_db),
+    current_agent: Agent = Depends(get_current_agent)
+) -> Any:
+    """
+    Get a short-lived presigned URL to download a package.
+    
+    This endpoint is used by agents to download packages straight from
+    object storage, so package bytes don't pass through the API. The
+    package MD5 is returned to verify the download.
+    
+    Args:
+        package_id: Package ID
+        db: Database session
+        current_agent: Current agent
+        
+    Returns:
+        PackageDownloadUrlResponse: Download URL and package checksum
+    """
+    # Create package service
+    package_service = PackageService(db)
+    
+    try:
+        download_url = package_service.get_package_download_url(
+            package_id=package_id,
+            tenant_id=str(current_agent.tenant_id)
+        )
+    except ValueError as e:
+        logger.error(f"Error generating package download URL: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Package download URL not available"
+        )
+    
+    if not download_url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Package not found"
+        )
+    
+    return download_url
+
+@router.get("/{package_id}/manifest", response_model=PackageManifestResponse)
+def get_package_manifest(
+    package_id: str,
+    db: Session = Depends(get_db),
+    current_agent: Agent = Depends(get_current_agent)
+) -> Any:
+    """
+    Get the manifest of a package version.
+    
+    This endpoint is used by agents to sync a package: files are listed
+    with their SHA-256 and only the blobs missing locally are downloaded.
+    
+    Args:
+        package_id: Package ID
+        db: Database session
+        current_agent: Current agent
+        
+    Returns:
+        PackageManifestResponse: Package details and files
+    """
+    # Create package service
+    package_service = PackageService(db)
+    
+    # Get manifest
+    manifest = package_service.get_package_manifest(
+        package_id=package_id,
+        tenant_id=str(current_agent.tenant_id)
+    )
+    
+    if not manifest:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Package manifest not found"
+        )
+    
+    return manifest
+
+@router.post("/blobs/urls", response_model=PackageBlobUrlsResponse)
+def get_package_blob_urls(
+    urls_request: PackageBlobUrlsRequest,
+    db: Session = Depends(get_db),
+    current_agent: Agent = Depends(get_current_agent)
+) -> Any:
+    """
+    Get short-lived presigned URLs to download package files by their SHA-256.
+    
+    Args:
+        urls_request: SHA-256 of the files
+        db: Database session
+        current_agent: Current agent
+        
+    Returns:
+        PackageBlobUrlsResponse: Download URL by SHA-256
+    """
+    # Create package service
+    package_service = PackageService(db)
+    
+    try:
+        urls = package_service.get_blob_download_urls(
+            tenant_id=str(current_agent.tenant_id),
+            digests=urls_request.digests
+        )
+    except ValueError as e:
+        logger.error(f"Error generating package file download URLs: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Package file download URLs not available"
+        )
+    
+    return {
+        "urls": urls,
+        "expires_in": settings.PACKAGE_DOWNLOAD_URL_EXPIRE_SECONDS
+    }
+
+@router.get("/blobs/{digest}")
+def download_package_blob(
+    digest: str,
+    db: Session = Depends(get_db),
+    current_agent: Agent = Depends(get_current_agent)
+) -> Any:
+    """
+    Download a package file by its SHA-256.
+    
+    Args:
+        digest: SHA-256 of the file
+        db: Database session
+        current_agent: Current agent
+        
+    Returns:
+        StreamingResponse: File content
+    """
+    # Create package service
+    package_service = PackageService(db)
+    
+    # Open the blob of the agent's tenant
+    blob = package_service.download_blob(
+        tenant_id=str(current_agent.tenant_id),
+        digest=digest
+    )
+    
+    if not blob:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Package file not found"
+        )
+    
+    # Blobs never change, so they can be cached by digest
+    return StreamingResponse(
+        blob["content"],
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(blob["size"]),
+            "ETag": f'"{digest}"',
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
     )
 
 @router.get("/name/{name}/versions", response_model=List[PackageVersionResponse])
@@ -7,7 +7,7 @@ This module provides endpoints for managing job queues and queue items.
 import logging
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, File, Form, UploadFile, status
 from sqlalchemy.orm import Session
 
 from ....auth.jwt import get_current_active_user
@@ -21,7 +21,11 @@ from ....schemas.queue import (
     QueueItemCreate,
     QueueItemUpdate,
     QueueItemResponse,
-    QueueStats
+    QueueStats,
+    QueueItemIngestResponse,
+    QueueBulkOperationRequest,
+    QueueBulkFilterOperationRequest,
+    QueueBulkOperationResponse
 )
 from ....services.queue_service import QueueService
 from ..dependencies import get_tenant_from_path
@@ -62,6 +66,27 @@ def list_queues(
     
     return queues
 
+@router.get("/stats", response_model=List[QueueStats])
+def list_queue_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    _: bool = Depends(require_queue_read),
+    queue_ids: Optional[List[str]] = Query(None)
+) -> Any:
+    """
+    Get statistics for all queues (or the given queues) in one request.
+    """
+    # Create queue service
+    queue_service = QueueService(db)
+    
+    # Get stats
+    stats = queue_service.list_queue_stats(
+        tenant_id=str(current_user.tenant_id),
+        queue_ids=queue_ids
+    )
+    
+    return stats
+
 @router.post("/", response_model=QueueResponse)
 def create_queue(
     queue_in: QueueCreate,
@@ -293,6 +318,69 @@ def add_queue_item(
     
     return item
 
+@router.post("/{queue_id}/items/bulk", response_model=QueueItemIngestResponse)
+def ingest_queue_items(
+    queue_id: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Form(None, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    _: bool = Depends(require_queue_update)
+) -> Any:
+    """
+    Bulk load items into a queue from an NDJSON or CSV file.
+    
+    The format is taken from the "format" field, or else from the file's
+    content type or extension. Invalid rows are reported and skipped.
+    """
+    # Determine file format
+    if not file_format:
+        content_type = (file.content_type or "").split(";")[0].strip()
+        filename = (file.filename or "").lower()
+        
+        if content_type in ("application/x-ndjson", "application/jsonl") or filename.endswith((".ndjson", ".jsonl")):
+            file_format = "ndjson"
+        elif content_type == "text/csv" or filename.endswith(".csv"):
+            file_format = "csv"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot determine file format. Specify format as ndjson or csv"
+            )
+    
+    # Create queue service
+    queue_service = QueueService(db)
+    
+    # Check if queue exists
+    queue = queue_service.get_queue(
+        queue_id=queue_id,
+        tenant_id=str(current_user.tenant_id)
+    )
+    
+    if not queue:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Queue {queue_id} not found"
+        )
+    
+    # Load items
+    try:
+        result = queue_service.ingest_queue_items(
+            queue_id=queue_id,
+            tenant_id=str(current_user.tenant_id),
+            stream=file.file,
+            file_format=file_format,
+            background_tasks=background_tasks
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return result
+
 @router.get("/{queue_id}/items/{item_id}", response_model=QueueItemResponse)
 def get_queue_item(
     queue_id: str,
@@ -327,6 +415,7 @@ def update_queue_item(
     queue_id: str,
     item_id: str,
     item_in: QueueItemUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     _: bool = Depends(require_queue_update)
@@ -342,7 +431,8 @@ def update_queue_item(
         queue_id=queue_id,
         item_id=item_id,
         item_in=item_in,
-        tenant_id=str(current_user.tenant_id)
+        tenant_id=str(current_user.tenant_id),
+        background_tasks=background_tasks
     )
     
     if not item:
@@ -384,6 +474,7 @@ def delete_queue_item(
 def retry_queue_item(
     queue_id: str,
     item_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     _: bool = Depends(require_queue_update)
@@ -398,7 +489,8 @@ def retry_queue_item(
     item = queue_service.retry_queue_item(
         queue_id=queue_id,
         item_id=item_id,
-        tenant_id=str(current_user.tenant_id)
+        tenant_id=str(current_user.tenant_id),
+        background_tasks=background_tasks
     )
     
     if not item:
@@ -409,6 +501,75 @@ def retry_queue_item(
     
     return item
 
+@router.post("/{queue_id}/items/bulk-operation", response_model=QueueBulkOperationResponse)
+def bulk_queue_item_operation(
+    queue_id: str,
+    operation_in: QueueBulkOperationRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    _: bool = Depends(require_queue_update)
+) -> Any:
+    """
+    Cancel, retry or delete a list of queue items.
+    
+    Items the operation cannot be applied to are reported with the reason.
+    """
+    # Create queue service
+    queue_service = QueueService(db)
+    
+    try:
+        result = queue_service.bulk_operation(
+            queue_id=queue_id,
+            tenant_id=str(current_user.tenant_id),
+            item_ids=[str(item_id) for item_id in operation_in.item_ids],
+            operation=operation_in.operation,
+            background_tasks=background_tasks
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    return result
+
+@router.post("/{queue_id}/items/bulk-operation/by-filter", response_model=QueueBulkOperationResponse)
+def bulk_queue_item_operation_by_filter(
+    queue_id: str,
+    operation_in: QueueBulkFilterOperationRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+    _: bool = Depends(require_queue_update)
+) -> Any:
+    """
+    Cancel, retry or delete all queue items matching a filter.
+    
+    Items the operation cannot be applied to are counted per reason.
+    """
+    # Create queue service
+    queue_service = QueueService(db)
+    
+    try:
+        result = queue_service.bulk_operation_by_filter(
+            queue_id=queue_id,
+            tenant_id=str(current_user.tenant_id),
+            operation=operation_in.operation,
+            status=operation_in.status,
+            created_before=operation_in.created_before,
+            created_after=operation_in.created_after,
+            updated_before=operation_in.updated_before,
+            background_tasks=background_tasks
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    return result
+
 @router.post("/{queue_id}/clear", status_code=status.HTTP_204_NO_CONTENT)
 def clear_queue(
     queue_id: str,
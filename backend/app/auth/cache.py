@@ -0,0 +1,377 @@
+"""
+Authentication cache module.
+
+This module caches authenticated principals, users and agents, by the
+SHA-256 hash of their token, so an authorized request costs no database
+queries. A cached principal holds a snapshot of its row, the snapshots of a
+user's roles and the frozen set of its permissions; each request gets fresh
+instances of the snapshot merged into its own session without loading them.
+
+Entries expire after AUTH_CACHE_TTL_SECONDS, and never outlive their token.
+Flushed changes of users, roles, permissions and their assignments, and of
+agents' API keys and statuses, invalidate the affected entries of this
+process, as do bulk updates and deletes of these models. Entries are
+invalidated again when the change is committed, since requests in between
+still read the previous rows; the TTL bounds how long other processes may
+see the old state. Bulk updates of agents that invalidate the agents they
+return themselves (see invalidate_agents) leave the other agents' entries.
+"""
+
+import copy
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional, Set, Tuple, Type
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..config import settings
+from ..db.invalidation import register_session_invalidation
+from ..models.user import User, Role, Permission, UserRole, RolePermission
+from ..models.agent import Agent
+
+logger = logging.getLogger(__name__)
+
+# Role names that are granted every permission
+ADMIN_ROLE_NAMES = frozenset(["admin", "superuser"])
+
+# Agent attributes whose change invalidates the agent's entries
+AGENT_AUTH_ATTRIBUTES = ("api_key_hash", "status", "tenant_id")
+
+def token_hash(token: str) -> str:
+    """Get the cache key of a token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _snapshot(instance: Any) -> Dict[str, Any]:
+    """Get the column values of a loaded instance"""
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(type(instance)).column_attrs}
+
+def _detached(model: Type[Any], values: Dict[str, Any]) -> Any:
+    """Build a detached instance of a snapshot, as if loaded by a query"""
+    instance = model.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        # JSON values may be changed in place, so requests get their own copy
+        if isinstance(value, (dict, list)):
+            value = copy.deepcopy(value)
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    return instance
+
+@dataclass(frozen=True)
+class Principal:
+    """Cached user or agent with its precomputed permissions"""
+    kind: str
+    principal_id: str
+    values: Dict[str, Any] = field(compare=False)
+    role_values: Tuple[Dict[str, Any], ...] = ()
+    roles: FrozenSet[str] = frozenset()
+    permissions: FrozenSet[str] = frozenset()
+    loaded_at: float = 0.0
+    
+    @property
+    def is_admin(self) -> bool:
+        """Whether the principal has an admin-level role"""
+        return any(role.lower() in ADMIN_ROLE_NAMES for role in self.roles)
+    
+    def attach(self, db: Session) -> Any:
+        """
+        Get the principal's instance in a session, without loading it.
+        
+        Args:
+            db: Database session of the request
+        
+        Returns:
+            User or Agent instance
+        """
+        model = User if self.kind == "user" else Agent
+        instance = _detached(model, self.values)
+        
+        if self.kind == "user":
+            set_committed_value(instance, "roles", [_detached(Role, values) for values in self.role_values])
+        
+        return db.merge(instance, load=False)
+
+def user_principal(user: User) -> Principal:
+    """
+    Build the principal of a user with loaded roles.
+    
+    Args:
+        user: User
+    
+    Returns:
+        Principal: User principal with its role names and permissions
+    """
+    roles = list(user.roles)
+    return Principal(
+        kind="user",
+        principal_id=str(user.user_id),
+        values=_snapshot(user),
+        role_values=tuple(_snapshot(role) for role in roles),
+        roles=frozenset(role.name for role in roles),
+        permissions=frozenset(permission.name for role in roles for permission in role.permissions),
+        loaded_at=time.monotonic()
+    )
+
+def agent_principal(agent: Agent) -> Principal:
+    """
+    Build the principal of an agent.
+    
+    Args:
+        agent: Agent
+    
+    Returns:
+        Principal: Agent principal
+    """
+    return Principal(
+        kind="agent",
+        principal_id=str(agent.agent_id),
+        values=_snapshot(agent),
+        loaded_at=time.monotonic()
+    )
+
+class AuthCache:
+    """Cache of authenticated principals by token hash"""
+    
+    def __init__(self):
+        """Initialize the authentication cache"""
+        self._lock = threading.Lock()
+        
+        # Token hash to principal key and expiry (monotonic time)
+        self._tokens: "OrderedDict[str, Tuple[Tuple[str, str], float]]" = OrderedDict()
+        
+        # Principal key (kind, ID) to principal
+        self._principals: Dict[Tuple[str, str], Principal] = {}
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether principals are cached"""
+        return settings.AUTH_CACHE_TTL_SECONDS > 0
+    
+    def get(self, kind: str, token: str) -> Optional[Principal]:
+        """
+        Get the cached principal of a token.
+        
+        Args:
+            kind: "user" or "agent"
+            token: Bearer token or API key
+        
+        Returns:
+            Optional[Principal]: Principal, or None if not cached or expired
+        """
+        if not self.enabled:
+            return None
+        
+        key = token_hash(token)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._tokens.get(key)
+            principal = None
+            
+            if entry is not None:
+                principal_key, expires_at = entry
+                principal = self._principals.get(principal_key)
+                
+                if expires_at <= now or principal is None or principal.kind != kind:
+                    del self._tokens[key]
+                    principal = None
+                elif principal.loaded_at + settings.AUTH_CACHE_TTL_SECONDS <= now:
+                    del self._principals[principal_key]
+                    principal = None
+                else:
+                    self._tokens.move_to_end(key)
+            
+            if principal is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            
+            return principal
+    
+    def put(self, token: str, principal: Principal, token_expires: Optional[float] = None) -> Principal:
+        """
+        Cache the principal of a token.
+        
+        Args:
+            token: Bearer token or API key
+            principal: Authenticated principal
+            token_expires: Expiry of the token as a UNIX timestamp, if any
+        
+        Returns:
+            Principal: The cached principal
+        """
+        if not self.enabled:
+            return principal
+        
+        now = time.monotonic()
+        expires_at = now + settings.AUTH_CACHE_TTL_SECONDS
+        if token_expires is not None:
+            expires_at = min(expires_at, now + (token_expires - time.time()))
+        
+        principal_key = (principal.kind, principal.principal_id)
+        
+        with self._lock:
+            self._principals[principal_key] = principal
+            self._tokens[token_hash(token)] = (principal_key, expires_at)
+            self._tokens.move_to_end(token_hash(token))
+            
+            while len(self._tokens) > settings.AUTH_CACHE_MAX_ENTRIES:
+                self._tokens.popitem(last=False)
+        
+        return principal
+    
+    def user_principal(self, user: User) -> Principal:
+        """
+        Get the principal of a request's user, building it if not cached.
+        
+        Args:
+            user: Authenticated user
+        
+        Returns:
+            Principal: User principal
+        """
+        principal_key = ("user", str(user.user_id))
+        
+        with self._lock:
+            principal = self._principals.get(principal_key)
+        
+        if principal is not None and principal.loaded_at + settings.AUTH_CACHE_TTL_SECONDS > time.monotonic():
+            return principal
+        
+        principal = user_principal(user)
+        if self.enabled:
+            with self._lock:
+                self._principals[principal_key] = principal
+        
+        return principal
+    
+    def invalidate(self, kind: str, principal_id: Any):
+        """
+        Drop a principal, so its tokens are authenticated again.
+        
+        Args:
+            kind: "user" or "agent"
+            principal_id: User or agent ID
+        """
+        with self._lock:
+            if self._principals.pop((kind, str(principal_id)), None) is not None:
+                self.invalidations += 1
+    
+    def invalidate_all(self, kind: str):
+        """
+        Drop all principals of a kind, e.g. users after a role change.
+        
+        Args:
+            kind: "user" or "agent"
+        """
+        with self._lock:
+            for principal_key in [key for key in self._principals if key[0] == kind]:
+                del self._principals[principal_key]
+                self.invalidations += 1
+    
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._tokens.clear()
+            self._principals.clear()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get the cache's counters.
+        
+        Returns:
+            Dict[str, Any]: Cached tokens and principals, hits, misses and invalidations
+        """
+        with self._lock:
+            return {
+                "tokens": len(self._tokens),
+                "principals": len(self._principals),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+
+# Singleton instance of the authentication cache
+_auth_cache = None
+
+def get_auth_cache() -> AuthCache:
+    """
+    Get the singleton authentication cache instance.
+    
+    Returns:
+        AuthCache: Authentication cache instance
+    """
+    global _auth_cache
+    
+    if _auth_cache is None:
+        _auth_cache = AuthCache()
+    
+    return _auth_cache
+
+def _invalidate_key(key: Tuple[str, Optional[str]]):
+    """Invalidate a principal, or all of a kind with None"""
+    kind, principal_id = key
+    cache = get_auth_cache()
+    
+    if principal_id is None:
+        cache.invalidate_all(kind)
+    else:
+        cache.invalidate(kind, principal_id)
+
+def _flushed_keys(session: Session) -> Iterator[Tuple[str, Optional[str]]]:
+    """Get the principals affected by a flush"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, (Role, Permission, RolePermission)):
+            # Roles are shared, so any user may be affected
+            yield ("user", None)
+        
+        elif isinstance(instance, User):
+            yield ("user", str(instance.user_id))
+        
+        elif isinstance(instance, UserRole):
+            yield ("user", str(instance.user_id))
+        
+        elif isinstance(instance, Agent):
+            state = inspect(instance)
+            if instance in session.deleted or any(
+                state.attrs[attribute].history.has_changes() for attribute in AGENT_AUTH_ATTRIBUTES
+            ):
+                yield ("agent", str(instance.agent_id))
+
+def _bulk_keys(models: Set[type]) -> Iterator[Tuple[str, Optional[str]]]:
+    """Get the principals possibly affected by a bulk update or delete"""
+    if models & {User, Role, Permission, UserRole, RolePermission}:
+        yield ("user", None)
+    
+    if Agent in models:
+        yield ("agent", None)
+
+# Invalidation of principals by session changes, (kind, principal ID) keys
+# with None for all principals of the kind
+_invalidation = register_session_invalidation("auth", _invalidate_key, _flushed_keys, _bulk_keys)
+
+def invalidate_agents(session: Session, agent_ids: Iterable[Any]):
+    """
+    Invalidate the principals of agents changed by a bulk statement.
+    
+    For statements executed with the CALLER_INVALIDATES option, so only the
+    agents the statement returned are invalidated rather than all of them.
+    The principals are invalidated now and again when the session commits.
+    
+    Args:
+        session: Session that executed the statement
+        agent_ids: IDs of the changed agents
+    """
+    for agent_id in agent_ids:
+        _invalidation.invalidate(session, ("agent", str(agent_id)))
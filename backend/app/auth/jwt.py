@@ -12,13 +12,15 @@ import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from ..config import settings
 from ..db.session import get_db
-from ..models.user import User
+from ..models.user import User, Role
 from ..models.agent import Agent
 from ..schemas.token import TokenPayload
+from ..utils.security import api_key_prefix, verify_api_key
+from .cache import get_auth_cache, user_principal, agent_principal
 
 # OAuth2 scheme for token extraction from Authorization header
 oauth2_scheme = OAuth2PasswordBearer(
@@ -180,6 +182,8 @@ async def get_current_user(
     Get the current authenticated user from a JWT token.
     
     This function is used as a dependency to authenticate API requests.
+    Authenticated users are cached by token with their roles and
+    permissions, so cached requests run no queries.
     
     Args:
         db: Database session
@@ -191,6 +195,11 @@ async def get_current_user(
     Raises:
         HTTPException: If token is invalid or user not found
     """
+    cache = get_auth_cache()
+    principal = cache.get("user", token)
+    if principal is not None:
+        return principal.attach(db)
+    
     token_data = verify_token(token)
     
     # Verify token type is access token
@@ -201,7 +210,10 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.user_id == token_data.sub).first()
+    # Load roles and permissions with the user for the permission set
+    user = db.query(User).options(
+        selectinload(User.roles).selectinload(Role.permissions)
+    ).filter(User.user_id == token_data.sub).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -214,6 +226,9 @@ async def get_current_user(
             detail="Inactive user",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    # Cached until the token expires, including the clock skew allowance
+    cache.put(token, user_principal(user), token_data.exp + 60)
         
     return user
 
@@ -281,6 +296,8 @@ async def get_current_agent(
     
     This function is used as a dependency to authenticate agent API requests.
     It supports both agent API keys and JWT tokens with agent claims.
+    Authenticated agents are cached by token, so cached requests run no
+    queries.
     
     Args:
         db: Database session
@@ -298,6 +315,11 @@ async def get_current_agent(
             detail="Authentication required",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    cache = get_auth_cache()
+    principal = cache.get("agent", token)
+    if principal is not None:
+        return principal.attach(db)
         
     # First, try to validate as JWT token
     try:
@@ -308,13 +330,15 @@ async def get_current_agent(
             agent_id = token_data.agent_id
             agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
             if agent:
+                cache.put(token, agent_principal(agent), token_data.exp + 60)
                 return agent
     except (HTTPException, Exception):
         # If token is not a valid JWT, try as an API key
         pass
     
-    # Try as API key - tokens stored in agent table
-    agent = db.query(Agent).filter(Agent.api_key == token).first()
+    # Try as API key - look up the agents by key prefix, then verify the hash
+    candidates = db.query(Agent).filter(Agent.api_key_prefix == api_key_prefix(token)).all()
+    agent = next((candidate for candidate in candidates if verify_api_key(token, candidate.api_key_hash)), None)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -327,5 +351,7 @@ async def get_current_agent(
         # We don't want to be too strict, since agents may be reconnecting
         # Just log, don't prevent authentication
         pass
+    
+    cache.put(token, agent_principal(agent))
         
     return agent
\ No newline at end of file
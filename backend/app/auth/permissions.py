@@ -14,6 +14,7 @@ from sqlalchemy.orm import Session
 from ..db.session import get_db
 from ..models.user import User
 from .jwt import get_current_active_user
+from .cache import get_auth_cache
 
 
 class PermissionChecker:
@@ -52,16 +53,14 @@ class PermissionChecker:
         Raises:
             HTTPException: If user doesn't have required permissions
         """
+        # Precomputed roles and permissions of the user
+        principal = get_auth_cache().user_principal(user)
+        
         # Check if user is admin or superuser - they get all permissions
-        for role in user.roles:
-            if role.name.lower() in ["admin", "superuser"]:
-                return True
+        if principal.is_admin:
+            return True
                 
-        # Get all permissions from user roles
-        user_permissions = set()
-        for role in user.roles:
-            for permission in role.permissions:
-                user_permissions.add(permission.name)
+        user_permissions = principal.permissions
         
         # Check if user has all required permissions
         missing_permissions = set(self.required_permissions) - user_permissions
@@ -144,10 +143,12 @@ def check_resource_permission(
     Raises:
         HTTPException: If user doesn't have permission
     """
+    # Precomputed roles and permissions of the user
+    principal = get_auth_cache().user_principal(user)
+    
     # Admin users bypass permission checks
-    for role in user.roles:  # user.roles gives us Role objects directly
-        if role.name in ["admin", "superuser"]:
-            return True
+    if principal.roles & {"admin", "superuser"}:
+        return True
     
     # If tenant_id provided, check tenant access
     if tenant_id and str(user.tenant_id) != tenant_id:
@@ -159,11 +160,8 @@ def check_resource_permission(
     # Check specific resource permission
     permission_name = f"{resource_type}:{action}"
     
-    # Get all permissions from user roles
-    for role in user.roles:  # user.roles gives us Role objects directly
-        for permission in role.permissions:  # access permissions directly from Role
-            if permission.name == permission_name:
-                return True
+    if permission_name in principal.permissions:
+        return True
     
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
@@ -297,10 +295,11 @@ class ResourcePermission:
         """
         try:
             # Avoid circular import
-            from ..services.subscription_service import SubscriptionService
+            from ..services.entitlement_cache import get_entitlement_cache
             
-            subscription_service = SubscriptionService(db)
-            access = subscription_service.check_feature_access(
+            # Served from the tenant's cached entitlements
+            access = get_entitlement_cache().check_feature_access(
+                db,
                 tenant_id=str(user.tenant_id),
                 feature=feature
             )
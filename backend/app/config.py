@@ -35,6 +35,11 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60  # Extended from 30 to 60 minutes
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30    # Extended from 7 to 30 days
     ALGORITHM: str = "HS256"
+    AUTH_CACHE_TTL_SECONDS: int = 30  # Authenticated users and agents are cached this long, 0 disables
+    AUTH_CACHE_MAX_ENTRIES: int = 10000  # Cached tokens
+    ENCRYPTION_KEYS: Dict[str, str] = {}  # Additional encryption key secrets by key ID
+    ENCRYPTION_PRIMARY_KEY_ID: Optional[str] = None  # Key new values are encrypted with, "default" derives from SECRET_KEY
+    ENTITLEMENT_CACHE_TTL_SECONDS: int = 60  # Subscription entitlements are cached this long per tenant
     CORS_ORIGINS: List[str] = ["*"]
     
     # PostgreSQL connection
@@ -109,6 +114,11 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_SECURE: bool = False
     MINIO_BUCKET: str = "orchestrator"
+    OBJECT_STORAGE_PART_SIZE: int = 16 * 1024 * 1024  # Part size of multipart uploads (5 MiB minimum)
+    OBJECT_STORAGE_CHUNK_SIZE: int = 1024 * 1024  # Chunk size of streamed uploads and downloads
+    MINIO_PUBLIC_URL: Optional[str] = None  # Object storage URL agents download from, e.g. https://storage.example.com
+    MINIO_REGION: str = "us-east-1"
+    PACKAGE_DOWNLOAD_URL_EXPIRE_SECONDS: int = 300  # Lifetime of presigned package download URLs
     
     # Logging configuration
     LOG_LEVEL: str = "INFO"
@@ -117,11 +127,66 @@ class Settings(BaseSettings):
     
     # Agent settings
     AGENT_HEARTBEAT_TIMEOUT: int = 300  # seconds
+    AGENT_SCHEDULING_STRATEGY: str = "least_loaded"  # least_loaded, bin_packing or affinity
+    AGENT_DEFAULT_SLOTS: int = 1  # Concurrent jobs per agent unless set in agent settings
+    AGENT_SCHEDULER_REFRESH_SECONDS: int = 30  # Reload the scheduler index from the database
     
     # Job settings
     DEFAULT_JOB_TIMEOUT: int = 3600  # seconds
     MAX_CONCURRENT_JOBS_PER_TENANT: int = 50
     
+    # Scheduler settings
+    SCHEDULER_SHARD_COUNT: int = 64  # Schedule partitions spread across scheduler instances
+    SCHEDULER_HEARTBEAT_SECONDS: int = 5  # Instance heartbeat and shard rebalance interval
+    SCHEDULER_INSTANCE_TIMEOUT: int = 15  # seconds without heartbeat before an instance's shards move
+    SCHEDULER_SYNC_SECONDS: int = 5  # Pick up created and edited schedules
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 300  # Missed fires older than this are skipped
+    SCHEDULER_MAX_CATCHUP_FIRES: int = 1  # Missed fires within the grace period run at most this often
+    SCHEDULER_FIRE_BATCH_SIZE: int = 1000  # Schedules claimed per statement
+    SCHEDULER_PRECOMPUTED_FIRES: int = 10  # Upcoming fire times kept per schedule in schedule_fire_times
+    SCHEDULER_CRON_CACHE_SIZE: int = 4096  # Compiled (cron expression, timezone) pairs kept in memory
+    
+    # Queue settings
+    QUEUE_ITEM_LEASE_SECONDS: int = 3600  # Lease granted when an item is claimed
+    QUEUE_INGEST_BATCH_SIZE: int = 5000  # Rows per COPY batch in bulk ingestion
+    QUEUE_INGEST_MAX_REJECTIONS: int = 1000  # Rejected rows reported per bulk ingestion
+    MAX_QUEUE_ITEMS_PER_TENANT: int = 0  # Stored queue items per tenant, 0 for no limit
+    
+    # Message producer settings
+    PRODUCER_CHANNEL_POOL_SIZE: int = 4  # Publishing channels with publisher confirms
+    PRODUCER_BATCH_SIZE: int = 500  # Messages published back to back per batch
+    PRODUCER_LINGER_MS: int = 5  # Wait this long for a batch to fill before publishing
+    PRODUCER_MAX_PENDING: int = 10000  # Unpublished messages before send_message waits
+    PRODUCER_CONFIRM_TIMEOUT: int = 30  # seconds to wait for a publisher confirm
+    
+    # Message consumer settings
+    CONSUMER_QUEUE_CONCURRENCY: int = 16  # Messages of one queue handled at once unless set per queue
+    CONSUMER_THREAD_POOL_SIZE: int = 32  # Threads running synchronous handlers and blocking handler work, shared by a consumer's queues
+    CONSUMER_MAX_PREFETCH: int = 256  # Upper bound of the adaptive per-queue prefetch
+    CONSUMER_PREFETCH_BUFFER_MS: int = 50  # Handler work buffered per queue beyond the in-flight messages
+    CONSUMER_ADAPT_SECONDS: int = 5  # Prefetch adjustment and backpressure report interval
+    CONSUMER_MAX_ATTEMPTS: int = 5  # Handler runs of a message before it is dead-lettered
+    CONSUMER_RETRY_DELAYS: List[int] = [1, 5, 30, 120]  # seconds before the 1st, 2nd, ... retry (last one repeats)
+    
+    # Message encoding settings
+    MESSAGING_CONTENT_TYPE: str = "application/json"  # Codec of published messages: application/json or application/msgpack
+    MESSAGING_COMPRESSION_THRESHOLD: int = 8192  # bytes; larger bodies are zstd-compressed (0 disables)
+    MESSAGING_COMPRESSION_LEVEL: int = 3  # zstd compression level
+    
+    # Heartbeat settings
+    HEARTBEAT_FLUSH_SECONDS: int = 5  # Buffered heartbeats are written this often
+    HEARTBEAT_FLUSH_BATCH_SIZE: int = 1000  # Agents updated per statement
+    HEARTBEAT_MAX_BUFFERED: int = 20000  # Agents with buffered beats before an early flush
+    
+    # Agent metrics history settings
+    AGENT_METRICS_ENABLED: bool = True  # Keep the resource metrics of heartbeats
+    AGENT_METRICS_ROLLUP_SECONDS: int = 60  # Rollup, partition and retention interval
+    AGENT_METRICS_PARTITIONS_AHEAD: int = 3  # Daily sample partitions created in advance
+    AGENT_METRICS_RAW_RETENTION_DAYS: int = 2  # Raw samples, dropped by whole days
+    AGENT_METRICS_1M_RETENTION_DAYS: int = 7  # Minute rollups
+    AGENT_METRICS_1H_RETENTION_DAYS: int = 90  # Hour rollups
+    AGENT_METRICS_1D_RETENTION_DAYS: int = 730  # Day rollups
+    
     # Cache settings
     CACHE_TTL: int = 60  # seconds
     
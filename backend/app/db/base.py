@@ -9,11 +9,11 @@ with the Base class before creating tables.
 from .session import Base
 
 # Import all models to ensure they are registered with Base
-from ..models.tenant import Tenant
+from ..models.tenant import Tenant, TenantQuotaCounter
 from ..models.user import User, Role, Permission, RolePermission, UserRole
 from ..models.agent import Agent, AgentLog
 from ..models.asset import Asset, AssetType, AssetFolder, AssetPermission
-from ..models.queue import Queue, QueueItem
+from ..models.queue import Queue, QueueItem, QueueCounter
 from ..models.package import Package, PackagePermission
 from ..models.schedule import Schedule
 from ..models.job import Job, JobExecution, JobDependency
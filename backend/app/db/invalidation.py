@@ -0,0 +1,130 @@
+"""
+Session-driven cache invalidation module.
+
+In-process caches register which of their entries a session's changes
+affect, from the instances of a flush and from the models targeted by bulk
+updates and deletes. The affected entries are invalidated right away and
+again when the session commits, since readers in between still see the
+previous rows; the invalidations of rolled back changes are forgotten.
+
+Bulk statements executed with the CALLER_INVALIDATES execution option are
+skipped, their caller invalidates the affected entries itself, e.g. by the
+rows the statement returns.
+"""
+
+import logging
+from typing import Any, Callable, Hashable, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Execution option of bulk statements whose caller invalidates the affected entries
+CALLER_INVALIDATES = "caller_invalidates"
+
+class SessionInvalidation:
+    """Invalidation of a cache's entries by the changes of sessions"""
+    
+    def __init__(
+        self,
+        name: str,
+        invalidate: Callable[[Hashable], None],
+        flushed_keys: Callable[[Session], Iterable[Hashable]],
+        bulk_keys: Callable[[Set[type]], Iterable[Hashable]]
+    ):
+        """
+        Initialize the invalidation.
+        
+        Args:
+            name: Cache name, prefixes the Session.info key of the pending invalidations
+            invalidate: Invalidate the cache entries of a key
+            flushed_keys: Get the keys affected by the instances of a flush
+            bulk_keys: Get the keys affected by a bulk update or delete of models
+        """
+        self.name = name
+        self.pending_key = f"{name}_invalidations"
+        self._invalidate = invalidate
+        self.flushed_keys = flushed_keys
+        self.bulk_keys = bulk_keys
+    
+    def invalidate(self, session: Session, key: Hashable) -> None:
+        """
+        Invalidate the entries of a key now and again when the session commits.
+        
+        Args:
+            session: Session making the change
+            key: Cache key
+        """
+        self._invalidate(key)
+        session.info.setdefault(self.pending_key, set()).add(key)
+    
+    def invalidate_committed(self, session: Session) -> None:
+        """Repeat the session's invalidations once its changes are committed"""
+        for key in session.info.pop(self.pending_key, None) or ():
+            self._invalidate(key)
+    
+    def discard(self, session: Session) -> None:
+        """Forget the session's invalidations"""
+        session.info.pop(self.pending_key, None)
+
+
+# Registered invalidations
+_invalidations: List[SessionInvalidation] = []
+
+def register_session_invalidation(
+    name: str,
+    invalidate: Callable[[Hashable], None],
+    flushed_keys: Callable[[Session], Iterable[Hashable]],
+    bulk_keys: Callable[[Set[type]], Iterable[Hashable]]
+) -> SessionInvalidation:
+    """
+    Register the invalidation of a cache by session changes.
+    
+    Args:
+        name: Cache name, prefixes the Session.info key of the pending invalidations
+        invalidate: Invalidate the cache entries of a key
+        flushed_keys: Get the keys affected by the instances of a flush
+        bulk_keys: Get the keys affected by a bulk update or delete of models
+    
+    Returns:
+        SessionInvalidation: Registered invalidation
+    """
+    invalidation = SessionInvalidation(name, invalidate, flushed_keys, bulk_keys)
+    _invalidations.append(invalidation)
+    
+    return invalidation
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session: Session, flush_context: Any):
+    """Invalidate the entries affected by a flush"""
+    for invalidation in _invalidations:
+        for key in set(invalidation.flushed_keys(session)):
+            invalidation.invalidate(session, key)
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk(orm_execute_state: Any):
+    """Invalidate the entries possibly affected by a bulk update or delete"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    
+    if orm_execute_state.execution_options.get(CALLER_INVALIDATES):
+        return
+    
+    models = {mapper.class_ for mapper in orm_execute_state.all_mappers}
+    
+    for invalidation in _invalidations:
+        for key in set(invalidation.bulk_keys(models)):
+            invalidation.invalidate(orm_execute_state.session, key)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    """Invalidate the entries again once their changes are committed"""
+    for invalidation in _invalidations:
+        invalidation.invalidate_committed(session)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session):
+    """Forget the invalidations of rolled back changes"""
+    for invalidation in _invalidations:
+        invalidation.discard(session)
@@ -5,6 +5,7 @@ This module initializes the FastAPI application, configures middleware,
 sets up routes, and initializes core services.
 """
 
+import asyncio
 import logging
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -111,6 +112,10 @@ def create_app() -> FastAPI:
         from .workers import stop_workers
         stop_workers()
         
+        # Write buffered heartbeats before the producer closes
+        from .services.heartbeat_aggregator import get_heartbeat_aggregator
+        await asyncio.get_running_loop().run_in_executor(None, get_heartbeat_aggregator().stop)
+        
         # Close message producer
         producer = get_message_producer()
         await producer.close()
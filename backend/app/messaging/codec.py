@@ -0,0 +1,195 @@
+"""
+Message body codecs.
+
+Bodies are encoded by the codec of their content type:
+
+- "application/json": orjson if installed, otherwise the json module; both
+  write the same JSON, so either side can read the other
+- "application/msgpack": msgpack, if installed
+
+Producers encode with MESSAGING_CONTENT_TYPE and consumers pick the codec
+from each message's content type, so the setting can be switched once all
+consumers understand the new type. Bodies larger than
+MESSAGING_COMPRESSION_THRESHOLD bytes are compressed with zstd, if installed,
+and marked with the content encoding "zstd".
+"""
+
+import json
+import logging
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from ..config import settings
+
+# Optional codecs and compression
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+ZSTD_ENCODING = "zstd"
+
+# Content types accepted for the codecs besides their own
+CONTENT_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_CONTENT_TYPE,
+    "text/json": JSON_CONTENT_TYPE
+}
+
+class MessageDecodeError(ValueError):
+    """Raised for message bodies that cannot be decoded"""
+
+def _default(value: Any) -> Any:
+    """Convert values the codecs cannot encode natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type {type(value).__name__} is not serializable")
+
+class JsonCodec:
+    """JSON codec, using orjson if installed"""
+    
+    content_type = JSON_CONTENT_TYPE
+    
+    def encode(self, data: Any) -> bytes:
+        """Encode message data"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(data, default=_default, separators=(",", ":")).encode()
+    
+    def decode(self, body: bytes) -> Any:
+        """Decode a message body"""
+        if ORJSON_AVAILABLE:
+            return orjson.loads(body)
+        return json.loads(body)
+
+class MsgpackCodec:
+    """MessagePack codec"""
+    
+    content_type = MSGPACK_CONTENT_TYPE
+    
+    def encode(self, data: Any) -> bytes:
+        """Encode message data"""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+    
+    def decode(self, body: bytes) -> Any:
+        """Decode a message body"""
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+# Codecs by content type
+CODECS: Dict[str, Any] = {JSON_CONTENT_TYPE: JsonCodec()}
+if MSGPACK_AVAILABLE:
+    CODECS[MSGPACK_CONTENT_TYPE] = MsgpackCodec()
+
+# zstd contexts are not thread-safe, so each thread gets its own
+_zstd = threading.local()
+
+# Configured content types without a codec, warned about once
+_unavailable = set()
+
+def get_codec(content_type: Optional[str] = None):
+    """
+    Get the codec of a content type.
+    
+    Args:
+        content_type: Content type, MESSAGING_CONTENT_TYPE if omitted
+    
+    Returns:
+        Codec for the content type, the JSON codec if it is not available
+    """
+    content_type = content_type or settings.MESSAGING_CONTENT_TYPE
+    codec = CODECS.get(CONTENT_TYPE_ALIASES.get(content_type, content_type))
+    
+    if codec is None:
+        if content_type not in _unavailable:
+            _unavailable.add(content_type)
+            logger.warning(f"No codec for content type '{content_type}', falling back to JSON")
+        codec = CODECS[JSON_CONTENT_TYPE]
+    
+    return codec
+
+def encode_body(data: Any, content_type: Optional[str] = None) -> Tuple[bytes, str, Optional[str]]:
+    """
+    Encode a message body and compress it if it is large.
+    
+    Args:
+        data: Message data
+        content_type: Content type, MESSAGING_CONTENT_TYPE if omitted
+    
+    Returns:
+        Tuple[bytes, str, Optional[str]]: Body, content type and content encoding
+    """
+    codec = get_codec(content_type)
+    body = codec.encode(data)
+    
+    threshold = settings.MESSAGING_COMPRESSION_THRESHOLD
+    if ZSTD_AVAILABLE and threshold and len(body) > threshold:
+        compressor = getattr(_zstd, "compressor", None)
+        if compressor is None:
+            compressor = _zstd.compressor = zstandard.ZstdCompressor(level=settings.MESSAGING_COMPRESSION_LEVEL)
+        return compressor.compress(body), codec.content_type, ZSTD_ENCODING
+    
+    return body, codec.content_type, None
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str] = None) -> Any:
+    """
+    Decompress and decode a message body.
+    
+    Args:
+        body: Message body
+        content_type: Content type of the message, JSON if omitted
+        content_encoding: Content encoding of the message
+    
+    Returns:
+        Any: Message data
+    
+    Raises:
+        MessageDecodeError: If the body cannot be decoded
+    """
+    if content_encoding == ZSTD_ENCODING:
+        if not ZSTD_AVAILABLE:
+            raise MessageDecodeError("Message is zstd-compressed but zstandard is not installed")
+        
+        decompressor = getattr(_zstd, "decompressor", None)
+        if decompressor is None:
+            decompressor = _zstd.decompressor = zstandard.ZstdDecompressor()
+        
+        try:
+            body = decompressor.decompress(body)
+        except zstandard.ZstdError as e:
+            raise MessageDecodeError(f"Failed to decompress message: {e}") from e
+    
+    elif content_encoding not in (None, "", "identity"):
+        raise MessageDecodeError(f"Unsupported content encoding '{content_encoding}'")
+    
+    content_type = content_type or JSON_CONTENT_TYPE
+    codec = CODECS.get(CONTENT_TYPE_ALIASES.get(content_type, content_type))
+    if codec is None:
+        raise MessageDecodeError(f"No codec for content type '{content_type}'")
+    
+    try:
+        return codec.decode(body)
+    except Exception as e:
+        raise MessageDecodeError(f"Failed to decode {content_type} message: {e}") from e
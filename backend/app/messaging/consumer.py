@@ -3,23 +3,189 @@ Message consumer module for asynchronous messaging.
 
 This module provides a message consumer for receiving messages
 from RabbitMQ or other message brokers.
+
+Every queue is consumed on its own channel with its own concurrency limit, so
+a slow queue cannot hold up the others. Coroutine handlers run on the
+consumer's event loop, which owns the messages and channels, and offload
+their blocking work to the consumer's thread pool with run_blocking;
+synchronous handlers run in the pool. Each queue's prefetch follows the
+latency of its handler. Failed messages are retried with a delay and then
+dead-lettered instead of being requeued in place, see retry.py.
+
+Bodies are decoded by the codec of their content type (see codec.py) and
+validated into typed envelopes (see envelopes.py) before a handler sees them.
 """
 
-import json
+import math
+import time
 import logging
 import asyncio
-from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Set
 
 import aio_pika
 from aio_pika import Message, DeliveryMode
 from aio_pika.abc import AbstractRobustConnection
 
 from ..config import settings
+from .codec import MessageDecodeError, decode_body
+from .envelopes import Envelope, SCHEMA_VERSION_HEADER, parse_envelope
+from .retry import (
+    LAST_ERROR_HEADER,
+    MAX_ERROR_LENGTH,
+    declare_retry_topology,
+    retry_or_dead_letter,
+    dead_letter
+)
 
 logger = logging.getLogger(__name__)
 
 # Type alias for message handler functions
-MessageHandler = Callable[[Dict[str, Any], Message], None]
+MessageHandler = Callable[[Envelope, Message], None]
+
+# Weight of the latest handler run in the latency averages
+LATENCY_SMOOTHING = 0.1
+
+# Thread pool of the consumer running the current handler
+_handler_executor: ContextVar[Optional[ThreadPoolExecutor]] = ContextVar("handler_executor", default=None)
+
+async def run_blocking(function: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run blocking work of a coroutine handler in its consumer's thread pool.
+    
+    The work counts against CONSUMER_THREAD_POOL_SIZE and, since it is
+    awaited by the handler, against its queue's concurrency limit. Outside a
+    handler the event loop's default executor is used.
+    
+    Args:
+        function: Blocking function
+        args: Function arguments
+    
+    Returns:
+        Any: Result of the function
+    """
+    return await asyncio.get_running_loop().run_in_executor(_handler_executor.get(), function, *args)
+
+class QueueRuntime:
+    """
+    Consumption state of one queue.
+    
+    Tracks the handler's concurrency limit, the prefetch granted to the
+    channel and the counters reported as backpressure metrics.
+    """
+    
+    def __init__(
+        self,
+        queue_name: str,
+        handler: MessageHandler,
+        concurrency: int,
+        max_attempts: int
+    ):
+        """
+        Initialize the queue runtime.
+        
+        Args:
+            queue_name: Queue name
+            handler: Message handler function
+            concurrency: Maximum messages handled at once
+            max_attempts: Handler runs of a message before it is dead-lettered
+        """
+        self.queue_name = queue_name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.blocking = not asyncio.iscoroutinefunction(handler)
+        self.max_attempts = max_attempts
+        self.slots = asyncio.Semaphore(concurrency)
+        self.prefetch = concurrency
+        
+        # Counters
+        self.in_flight = 0
+        self.waiting = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.saturated_seconds = 0.0
+        self.saturated_since: Optional[float] = None
+        
+        # Moving averages in seconds
+        self.handler_latency: Optional[float] = None
+        self.wait_latency: Optional[float] = None
+    
+    def target_prefetch(self) -> int:
+        """
+        Get the prefetch that keeps the handler busy without hoarding messages.
+        
+        Besides one message per slot, CONSUMER_PREFETCH_BUFFER_MS worth of
+        handler work is buffered, so fast handlers get a deep prefetch and
+        slow handlers leave messages to other consumers.
+        
+        Returns:
+            int: Prefetch count
+        """
+        if not self.handler_latency:
+            return self.prefetch
+        
+        buffered = self.concurrency * settings.CONSUMER_PREFETCH_BUFFER_MS / 1000 / self.handler_latency
+        return max(self.concurrency, min(settings.CONSUMER_MAX_PREFETCH, self.concurrency + math.ceil(buffered)))
+    
+    def start(self, wait: float):
+        """Record a message entering the handler after waiting for a slot"""
+        self.waiting -= 1
+        self.in_flight += 1
+        self.wait_latency = self._average(self.wait_latency, wait)
+        
+        if self.in_flight >= self.concurrency and self.saturated_since is None:
+            self.saturated_since = time.monotonic()
+    
+    def finish(self, latency: float, failed: bool):
+        """Record a message leaving the handler"""
+        if self.saturated_since is not None:
+            self.saturated_seconds += time.monotonic() - self.saturated_since
+            self.saturated_since = None
+        
+        self.in_flight -= 1
+        self.handler_latency = self._average(self.handler_latency, latency)
+        
+        if failed:
+            self.failed += 1
+        else:
+            self.processed += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get the backpressure metrics of the queue.
+        
+        Returns:
+            Dict[str, Any]: Counters, latencies in milliseconds and limits
+        """
+        saturated_seconds = self.saturated_seconds
+        if self.saturated_since is not None:
+            saturated_seconds += time.monotonic() - self.saturated_since
+        
+        return {
+            "queue_name": self.queue_name,
+            "concurrency": self.concurrency,
+            "prefetch": self.prefetch,
+            "blocking": self.blocking,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "saturated_seconds": round(saturated_seconds, 3),
+            "handler_latency_ms": round(self.handler_latency * 1000, 3) if self.handler_latency else None,
+            "wait_latency_ms": round(self.wait_latency * 1000, 3) if self.wait_latency else None
+        }
+    
+    @staticmethod
+    def _average(average: Optional[float], value: float) -> float:
+        """Update an exponential moving average"""
+        if average is None:
+            return value
+        return average + LATENCY_SMOOTHING * (value - average)
 
 class MessageConsumer:
     """Message consumer for receiving messages from message broker"""
@@ -37,9 +203,15 @@ class MessageConsumer:
         self.exchanges: Dict[str, aio_pika.abc.AbstractExchange] = {}
         self.queues: Dict[str, aio_pika.abc.AbstractQueue] = {}
         self.handlers: Dict[str, MessageHandler] = {}
+        self.runtimes: Dict[str, QueueRuntime] = {}
+        self.retry_queues: Set[str] = set()
         self.running = False
-        self.prefetch_count = 10
+        self.consuming = False
+        self.prefetch_count = settings.CONSUMER_QUEUE_CONCURRENCY
         
+        # Thread pool for synchronous handlers and the blocking work of coroutine handlers
+        self.executor: Optional[ThreadPoolExecutor] = None
+    
     async def connect(self):
         """Connect to the message broker"""
         try:
@@ -71,9 +243,9 @@ class MessageConsumer:
                     exchange_type,
                     durable=True
                 )
-                
-            logger.info(f"Message consumer '{self.consumer_name}' connected to RabbitMQ")
             
+            logger.info(f"Message consumer '{self.consumer_name}' connected to RabbitMQ")
+        
         except Exception as e:
             logger.error(f"Failed to connect to RabbitMQ: {e}")
             raise
@@ -83,8 +255,13 @@ class MessageConsumer:
         if self.connection:
             await self.connection.close()
             self.connection = None
+            self.consuming = False
             logger.info(f"Message consumer '{self.consumer_name}' disconnected from RabbitMQ")
-            
+        
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+    
     async def declare_queue(
         self,
         queue_name: str,
@@ -92,11 +269,16 @@ class MessageConsumer:
         routing_keys: List[str],
         durable: bool = True,
         auto_delete: bool = False,
-        arguments: Optional[Dict[str, Any]] = None
+        arguments: Optional[Dict[str, Any]] = None,
+        retries: bool = True
     ):
         """
         Declare a queue and bind it to an exchange.
         
+        The queue is declared on a channel of its own, so its prefetch is
+        independent of the other queues. Unless disabled, its dead-letter
+        exchange and queue and its delay queues are declared with it.
+        
         Args:
             queue_name: Queue name
             exchange_name: Exchange name
@@ -104,18 +286,27 @@ class MessageConsumer:
             durable: Whether the queue survives broker restarts
             auto_delete: Whether to delete the queue when no consumers
             arguments: Additional queue arguments
-            
+            retries: Whether failed messages are retried and dead-lettered;
+                otherwise they are dropped
+        
         Returns:
             aio_pika.abc.AbstractQueue: Declared queue
         """
         if not self.connection or self.connection.is_closed:
             await self.connect()
-            
+        
         if exchange_name not in self.exchanges:
             raise ValueError(f"Exchange '{exchange_name}' not declared")
-            
+        
+        # Reuse the queue's channel if it was declared before
+        if queue_name in self.queues:
+            channel = self.queues[queue_name].channel
+        else:
+            channel = await self.connection.channel()
+            await channel.set_qos(prefetch_count=self.prefetch_count)
+        
         # Declare queue
-        queue = await self.channel.declare_queue(
+        queue = await channel.declare_queue(
             queue_name,
             durable=durable,
             auto_delete=auto_delete,
@@ -124,8 +315,13 @@ class MessageConsumer:
         
         # Bind queue to exchange with routing keys
         for routing_key in routing_keys:
-            await queue.bind(self.exchanges[exchange_name], routing_key)
-            
+            await queue.bind(exchange_name, routing_key)
+        
+        # Declare the retry and dead-letter topology
+        if retries:
+            await declare_retry_topology(channel, queue_name)
+            self.retry_queues.add(queue_name)
+        
         self.queues[queue_name] = queue
         
         logger.info(f"Declared queue '{queue_name}' bound to exchange '{exchange_name}'")
@@ -137,93 +333,225 @@ class MessageConsumer:
         queue_name: str,
         handler: MessageHandler,
         exchange_name: Optional[str] = None,
-        routing_keys: Optional[List[str]] = None
+        routing_keys: Optional[List[str]] = None,
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None
     ):
         """
         Register a message handler for a queue.
         
+        Coroutine handlers run on the event loop and must offload their own
+        blocking work, e.g. database calls. Synchronous handlers run in the
+        thread pool and must not touch the message, which belongs to the
+        event loop.
+        
         Args:
             queue_name: Queue name
             handler: Message handler function
             exchange_name: Optional exchange name (if queue needs to be declared)
             routing_keys: Optional routing keys (if queue needs to be declared)
+            concurrency: Maximum messages of the queue handled at once
+                (CONSUMER_QUEUE_CONCURRENCY if omitted)
+            max_attempts: Handler runs of a message before it is dead-lettered
+                (CONSUMER_MAX_ATTEMPTS if omitted, a message's x-max-attempts
+                header takes precedence)
         """
         if not self.connection or self.connection.is_closed:
             await self.connect()
-            
+        
         # Declare queue if it doesn't exist
         if queue_name not in self.queues and exchange_name and routing_keys:
             await self.declare_queue(queue_name, exchange_name, routing_keys)
         elif queue_name not in self.queues:
             raise ValueError(f"Queue '{queue_name}' not declared")
-            
+        
         # Register handler
         self.handlers[queue_name] = handler
+        self.runtimes[queue_name] = QueueRuntime(
+            queue_name,
+            handler,
+            concurrency or settings.CONSUMER_QUEUE_CONCURRENCY,
+            max_attempts or settings.CONSUMER_MAX_ATTEMPTS
+        )
         
         logger.info(f"Registered handler for queue '{queue_name}'")
     
     async def start_consuming(self):
         """Start consuming messages from all registered queues"""
+        if self.consuming:
+            return
+        
         if not self.connection or self.connection.is_closed:
             await self.connect()
-            
+        
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.CONSUMER_THREAD_POOL_SIZE,
+                thread_name_prefix=f"consumer-{self.consumer_name}"
+            )
+        
         # Start consuming from each queue
-        for queue_name, handler in self.handlers.items():
+        for queue_name, runtime in self.runtimes.items():
             queue = self.queues[queue_name]
-            await queue.consume(self._create_consumer_callback(handler))
-            
+            await self._set_prefetch(runtime, runtime.concurrency)
+            await queue.consume(self._create_consumer_callback(runtime))
+        
         self.running = True
+        self.consuming = True
         logger.info(f"Message consumer '{self.consumer_name}' started consuming")
     
-    def _create_consumer_callback(self, handler: MessageHandler):
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the backpressure metrics of every consumed queue.
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Queue name to its metrics
+        """
+        return {queue_name: runtime.metrics() for queue_name, runtime in self.runtimes.items()}
+    
+    def _create_consumer_callback(self, runtime: QueueRuntime):
         """
         Create a callback function for message consumption.
         
         Args:
-            handler: Message handler function
-            
+            runtime: Runtime of the consumed queue
+        
         Returns:
             Callable: Callback function for message consumption
         """
         async def callback(message: aio_pika.IncomingMessage):
-            async with message.process():
+            try:
+                # Decode message body into its envelope
+                envelope = parse_envelope(
+                    decode_body(message.body, message.content_type, message.content_encoding),
+                    message.type,
+                    (message.headers or {}).get(SCHEMA_VERSION_HEADER)
+                )
+            
+            except MessageDecodeError as e:
+                logger.error(f"Failed to decode message {message.message_id} of '{runtime.queue_name}': {e}")
+                # Undecodable messages never succeed, skip the retries
+                await self._handle_failure(runtime, message, e)
+                return
+            
+            # Wait for a free slot of the queue
+            received = time.monotonic()
+            runtime.waiting += 1
+            async with runtime.slots:
+                started = time.monotonic()
+                runtime.start(started - received)
+                failed = False
+                
                 try:
-                    # Decode message body
-                    body = message.body.decode()
-                    data = json.loads(body)
-                    
                     # Call handler
-                    await handler(data, message)
-                    
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to decode message: {message.body}")
-                    # Reject message
-                    await message.reject(requeue=False)
+                    if runtime.blocking:
+                        await asyncio.get_running_loop().run_in_executor(
+                            self.executor, runtime.handler, envelope, message
+                        )
+                    else:
+                        token = _handler_executor.set(self.executor)
+                        try:
+                            await runtime.handler(envelope, message)
+                        finally:
+                            _handler_executor.reset(token)
                     
+                    await message.ack()
+                
                 except Exception as e:
-                    logger.exception(f"Error processing message: {e}")
-                    # Nack message for requeue
-                    await message.nack(requeue=True)
+                    failed = True
+                    logger.exception(f"Error processing message from '{runtime.queue_name}': {e}")
+                    # Retry later or dead-letter instead of requeueing in place
+                    await self._handle_failure(runtime, message, e)
+                
+                finally:
+                    runtime.finish(time.monotonic() - started, failed)
         
         return callback
     
+    async def _handle_failure(
+        self,
+        runtime: QueueRuntime,
+        message: aio_pika.IncomingMessage,
+        error: Exception
+    ):
+        """
+        Retry or dead-letter a message that could not be processed.
+        
+        Args:
+            runtime: Runtime of the consumed queue
+            message: Failed message
+            error: Handler error, or the MessageDecodeError of a message that
+                could not be decoded
+        """
+        if runtime.queue_name not in self.retry_queues:
+            # No retry topology, drop the message rather than loop on it
+            await message.reject(requeue=False)
+            return
+        
+        channel = self.queues[runtime.queue_name].channel
+        
+        try:
+            if isinstance(error, MessageDecodeError):
+                headers = dict(message.headers or {})
+                headers[LAST_ERROR_HEADER] = f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH]
+                await dead_letter(channel, message, runtime.queue_name, "decode_error", headers)
+                runtime.dead_lettered += 1
+            elif await retry_or_dead_letter(channel, message, runtime.queue_name, error, runtime.max_attempts):
+                runtime.retried += 1
+            else:
+                runtime.dead_lettered += 1
+        
+        except Exception as e:
+            # The broker did not take the copy, let it redeliver the original
+            logger.error(f"Failed to retry message {message.message_id} of '{runtime.queue_name}': {e}")
+            await message.nack(requeue=True)
+    
+    async def _set_prefetch(self, runtime: QueueRuntime, prefetch: int):
+        """
+        Set the prefetch of a queue's channel.
+        
+        Args:
+            runtime: Runtime of the queue
+            prefetch: Prefetch count
+        """
+        await self.queues[runtime.queue_name].channel.set_qos(prefetch_count=prefetch)
+        runtime.prefetch = prefetch
+    
+    async def _adapt(self):
+        """Follow handler latency with each queue's prefetch and report backpressure"""
+        for runtime in self.runtimes.values():
+            prefetch = runtime.target_prefetch()
+            
+            # Skip small changes to avoid a Basic.Qos per tick
+            if abs(prefetch - runtime.prefetch) > runtime.prefetch * 0.25:
+                try:
+                    await self._set_prefetch(runtime, prefetch)
+                    logger.debug(f"Prefetch of '{runtime.queue_name}' set to {prefetch}")
+                except Exception as e:
+                    logger.warning(f"Failed to set prefetch of '{runtime.queue_name}': {e}")
+            
+            if runtime.waiting:
+                logger.info(f"Consumer '{self.consumer_name}' backpressure: {runtime.metrics()}")
+    
     async def run(self):
         """Run the consumer in a loop"""
         try:
-            await self.connect()
+            if not self.connection or self.connection.is_closed:
+                await self.connect()
             await self.start_consuming()
             
             # Keep running until stopped
             while self.running:
-                await asyncio.sleep(1)
-                
+                await asyncio.sleep(settings.CONSUMER_ADAPT_SECONDS)
+                await self._adapt()
+        
         except asyncio.CancelledError:
             logger.info(f"Message consumer '{self.consumer_name}' cancelled")
             self.running = False
-            
+        
         except Exception as e:
             logger.exception(f"Error in message consumer: {e}")
-            
+        
         finally:
             await self.close()
 
@@ -236,7 +564,7 @@ def get_message_consumer(consumer_name: str) -> MessageConsumer:
     
     Args:
         consumer_name: Consumer name
-        
+    
     Returns:
         MessageConsumer: Message consumer instance
     """
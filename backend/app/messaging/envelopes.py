@@ -0,0 +1,310 @@
+"""
+Typed message envelopes.
+
+Every message exchanged over the broker is an Envelope subclass registered
+under a message type name. The producer sends the name in the AMQP type
+property and the class's schema version in the x-schema-version header; the
+consumer validates the decoded body into that class before a handler sees
+it. Messages without a type property, e.g. published before the envelopes,
+are recognized by their "action" or "event_type" field.
+
+A class whose fields change incompatibly raises its schema_version and
+converts older bodies in upgrade().
+"""
+
+from typing import Any, ClassVar, Dict, Literal, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from .codec import MessageDecodeError
+
+SCHEMA_VERSION_HEADER = "x-schema-version"
+
+class Envelope(BaseModel):
+    """Base class of typed broker messages"""
+    
+    # Name sent in the AMQP type property
+    message_type: ClassVar[str]
+    
+    # Version of the fields, raised on incompatible changes
+    schema_version: ClassVar[int] = 1
+    
+    # Field and value identifying untyped messages of the class, a value of
+    # None matches any message with the field
+    legacy_key: ClassVar[Optional[Tuple[str, Optional[str]]]] = None
+    
+    class Config:
+        # Fields added by newer producers pass through
+        extra = "allow"
+    
+    @classmethod
+    def upgrade(cls, data: Dict[str, Any], version: int) -> Dict[str, Any]:
+        """
+        Convert the body of an older schema version to the current one.
+        
+        Args:
+            data: Message body
+            version: Schema version of the body
+        
+        Returns:
+            Dict[str, Any]: Body in the current schema version
+        """
+        return data
+
+# Registered envelope classes by message type and by legacy key
+MESSAGE_TYPES: Dict[str, Type[Envelope]] = {}
+LEGACY_TYPES: Dict[Tuple[str, Optional[str]], Type[Envelope]] = {}
+
+def register_message(name: str, version: int = 1, legacy_key: Optional[Tuple[str, Optional[str]]] = None):
+    """
+    Register an envelope class under a message type.
+    
+    Args:
+        name: Message type name
+        version: Current schema version
+        legacy_key: Field and value identifying untyped messages of the class
+    
+    Returns:
+        Callable: Class decorator
+    """
+    def register(cls: Type[Envelope]) -> Type[Envelope]:
+        if name in MESSAGE_TYPES:
+            raise ValueError(f"Message type '{name}' already registered")
+        
+        cls.message_type = name
+        cls.schema_version = version
+        cls.legacy_key = legacy_key
+        MESSAGE_TYPES[name] = cls
+        if legacy_key:
+            LEGACY_TYPES[legacy_key] = cls
+        return cls
+    
+    return register
+
+def resolve_type(data: Any, type_name: Optional[str] = None) -> Optional[Type[Envelope]]:
+    """
+    Find the envelope class of a message.
+    
+    Args:
+        data: Decoded message body
+        type_name: AMQP type property of the message
+    
+    Returns:
+        Optional[Type[Envelope]]: Envelope class, or None if unknown
+    """
+    if type_name:
+        return MESSAGE_TYPES.get(type_name)
+    
+    if not isinstance(data, dict):
+        return None
+    
+    for field in ("action", "event_type"):
+        value = data.get(field)
+        if isinstance(value, str):
+            return LEGACY_TYPES.get((field, value)) or LEGACY_TYPES.get((field, None))
+    
+    for (field, value), cls in LEGACY_TYPES.items():
+        if value is None and field in data:
+            return cls
+    
+    return None
+
+def parse_envelope(data: Any, type_name: Optional[str] = None, version: Optional[int] = None) -> Envelope:
+    """
+    Validate a decoded message body into its envelope.
+    
+    Args:
+        data: Decoded message body
+        type_name: AMQP type property of the message
+        version: Schema version header of the message
+    
+    Returns:
+        Envelope: Typed message
+    
+    Raises:
+        MessageDecodeError: If the type is unknown or the body does not match it
+    """
+    cls = resolve_type(data, type_name)
+    if cls is None:
+        raise MessageDecodeError(f"Unknown message type '{type_name}'" if type_name else "Untyped message")
+    
+    if not isinstance(data, dict):
+        raise MessageDecodeError(f"Body of '{cls.message_type}' message is not an object")
+    
+    version = int(version or cls.schema_version)
+    if version < cls.schema_version:
+        data = cls.upgrade(data, version)
+    
+    try:
+        return cls.model_validate(data)
+    except ValidationError as e:
+        raise MessageDecodeError(f"Invalid '{cls.message_type}' message (schema version {version}): {e}") from e
+
+def envelope_properties(data: Any) -> Tuple[Dict[str, Any], Optional[str], Optional[int]]:
+    """
+    Get the body, type and schema version to publish for a message.
+    
+    Args:
+        data: Envelope, or a message dict whose type is looked up
+    
+    Returns:
+        Tuple[Dict[str, Any], Optional[str], Optional[int]]: Body, message
+            type and schema version (None for unknown dicts)
+    """
+    if isinstance(data, Envelope):
+        return data.model_dump(exclude_none=True), data.message_type, data.schema_version
+    
+    cls = resolve_type(data)
+    if cls is None:
+        return data, None, None
+    return data, cls.message_type, cls.schema_version
+
+# Job execution messages
+
+class JobExecutionMessage(Envelope):
+    """Base of messages about a job execution"""
+    execution_id: str
+    tenant_id: str
+    job_id: Optional[str] = None
+
+@register_message("job.new_execution", legacy_key=("action", "new_execution"))
+class NewExecution(JobExecutionMessage):
+    """Start processing a new job execution"""
+    action: Literal["new_execution"] = "new_execution"
+
+@register_message("job.cancel_execution", legacy_key=("action", "cancel_execution"))
+class CancelExecution(JobExecutionMessage):
+    """Cancel a job execution"""
+    action: Literal["cancel_execution"] = "cancel_execution"
+
+@register_message("job.update_execution", legacy_key=("action", "update_execution"))
+class UpdateExecution(JobExecutionMessage):
+    """Update the status of a job execution"""
+    action: Literal["update_execution"] = "update_execution"
+    status: str
+    error_message: Optional[str] = None
+    results: Optional[Dict[str, Any]] = None
+
+@register_message("job.schedule_trigger", legacy_key=("action", "schedule_trigger"))
+class ScheduleTrigger(Envelope):
+    """Trigger a job of a schedule"""
+    action: Literal["schedule_trigger"] = "schedule_trigger"
+    job_id: str
+    tenant_id: str
+    schedule_id: str
+    trigger_type: str
+    scheduled_time: Optional[str] = None
+    triggered_by: Optional[str] = None
+    timestamp: Optional[str] = None
+
+# Agent messages
+
+class AgentMessage(Envelope):
+    """Base of messages from and to agents"""
+    agent_id: str
+    tenant_id: str
+
+@register_message("agent.heartbeat", legacy_key=("action", "heartbeat"))
+class AgentHeartbeat(AgentMessage):
+    """Heartbeat of an agent"""
+    action: Literal["heartbeat"] = "heartbeat"
+    metrics: Dict[str, Any] = {}
+
+@register_message("agent.registration", legacy_key=("action", "registration"))
+class AgentRegistration(AgentMessage):
+    """Registration of an agent"""
+    action: Literal["registration"] = "registration"
+    agent_data: Dict[str, Any] = {}
+
+@register_message("agent.status_change", legacy_key=("action", "status_change"))
+class AgentStatusChange(AgentMessage):
+    """Status reported by an agent"""
+    action: Literal["status_change"] = "status_change"
+    status: str
+
+@register_message("agent.command", legacy_key=("command", None))
+class AgentCommand(AgentMessage):
+    """Command sent to an agent"""
+    command: Dict[str, Any]
+
+@register_message("agent.process_queue_item", legacy_key=("action", "process_queue_item"))
+class ProcessQueueItem(AgentMessage):
+    """Queue item assigned to an agent"""
+    action: Literal["process_queue_item"] = "process_queue_item"
+    queue_item_id: str
+    payload: Optional[Any] = None
+    timestamp: Optional[str] = None
+
+# Notification messages
+
+@register_message("notification.created", legacy_key=("notification_id", None))
+class NotificationCreated(Envelope):
+    """Notification to deliver"""
+    notification_id: str
+    tenant_id: str
+
+# Queue item messages
+
+class QueueItemMessage(Envelope):
+    """Base of messages about a tenant's queue items"""
+    tenant_id: str
+    queue_id: Optional[str] = None
+    item_id: Optional[str] = None
+    timestamp: Optional[str] = None
+
+@register_message("queue.new_item", legacy_key=("action", "new_item"))
+class NewQueueItem(QueueItemMessage):
+    """Item added to a queue"""
+    action: Literal["new_item"] = "new_item"
+
+@register_message("queue.items_available", legacy_key=("action", "items_available"))
+class QueueItemsAvailable(QueueItemMessage):
+    """Items of a queue became available for dispatch"""
+    action: Literal["items_available"] = "items_available"
+
+@register_message("queue.item_completed", legacy_key=("action", "item_completed"))
+class QueueItemCompleted(QueueItemMessage):
+    """Item of a queue finished processing"""
+    action: Literal["item_completed"] = "item_completed"
+
+@register_message("queue.agent_available", legacy_key=("action", "agent_available"))
+class AgentAvailable(QueueItemMessage):
+    """Agent became available for queue items"""
+    action: Literal["agent_available"] = "agent_available"
+
+@register_message("queue.update_item", legacy_key=("action", "update_item"))
+class UpdateQueueItem(QueueItemMessage):
+    """Update the status of a queue item"""
+    action: Literal["update_item"] = "update_item"
+    item_id: str
+    status: str
+    error_message: Optional[str] = None
+    processing_time_ms: Optional[int] = None
+    results: Optional[Dict[str, Any]] = None
+
+# Events
+
+@register_message("event", legacy_key=("event_type", None))
+class SystemEvent(Envelope):
+    """System event without a more specific type"""
+    event_type: str
+    tenant_id: Optional[str] = None
+    timestamp: Optional[str] = None
+
+@register_message("event.job_execution_status_change", legacy_key=("event_type", "job_execution_status_change"))
+class JobExecutionStatusChanged(Envelope):
+    """Status change of a job execution"""
+    event_type: Literal["job_execution_status_change"] = "job_execution_status_change"
+    execution_id: str
+    tenant_id: str
+    status: str
+    additional_data: Dict[str, Any] = {}
+
+@register_message("event.agent_status_change", legacy_key=("event_type", "agent_status_change"))
+class AgentStatusChanged(Envelope):
+    """Status change of an agent"""
+    event_type: Literal["agent_status_change"] = "agent_status_change"
+    agent_id: str
+    tenant_id: str
+    status: str
+    additional_data: Dict[str, Any] = {}
@@ -3,11 +3,16 @@ Message handlers for asynchronous message processing.
 
 This module contains handler functions for processing messages
 from different queues.
+
+Handlers are registered per envelope type with @handles, and
+message_handler dispatches each consumed envelope to the handler of its type.
+Handlers run on the consumer's event loop; synchronous database work runs in
+the consumer's thread pool with a session of its own, see run_in_session.
 """
 
+import uuid
 import logging
-import json
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Type
 
 import aio_pika
 from sqlalchemy.orm import Session
@@ -15,252 +20,265 @@ from sqlalchemy.orm import Session
 from ..db.session import SessionLocal
 from ..services.job_service import JobService
 from ..services.agent_service import AgentService
+from ..schemas.agent import AgentCreate
 from ..services.notification_service import NotificationService
 from ..services.queue_service import QueueService
+from ..services.heartbeat_aggregator import get_heartbeat_aggregator
+from .consumer import run_blocking
+from .envelopes import (
+    Envelope,
+    NewExecution,
+    CancelExecution,
+    UpdateExecution,
+    ScheduleTrigger,
+    AgentHeartbeat,
+    AgentRegistration,
+    AgentStatusChange,
+    NotificationCreated,
+    NewQueueItem,
+    QueueItemsAvailable,
+    QueueItemCompleted,
+    AgentAvailable,
+    UpdateQueueItem,
+    SystemEvent,
+    JobExecutionStatusChanged,
+    AgentStatusChanged
+)
 
 logger = logging.getLogger(__name__)
 
-async def job_execution_handler(data: Dict[str, Any], message: aio_pika.IncomingMessage):
+# Handlers by envelope type
+MESSAGE_HANDLERS: Dict[Type[Envelope], Callable[[Envelope], Awaitable[None]]] = {}
+
+def handles(*envelope_types: Type[Envelope]):
     """
-    Handler for job execution messages.
+    Register a handler for envelope types.
     
     Args:
-        data: Message data
-        message: RabbitMQ message object
-    """
-    action = data.get("action")
-    execution_id = data.get("execution_id")
-    job_id = data.get("job_id")
-    tenant_id = data.get("tenant_id")
+        envelope_types: Envelope classes handled by the decorated function
     
-    if not action or not execution_id or not tenant_id:
-        logger.error(f"Missing required fields in job execution message: {data}")
-        return
-        
-    logger.info(f"Processing job execution message: {action} for job {job_id}, execution {execution_id}")
+    Returns:
+        Callable: Function decorator
+    """
+    def register(handler):
+        for envelope_type in envelope_types:
+            MESSAGE_HANDLERS[envelope_type] = handler
+        return handler
     
-    # Create database session
+    return register
+
+def _with_session(work: Callable[[Session], Any]) -> Any:
+    """Run database work with a new session and close it afterwards"""
     db = SessionLocal()
     try:
-        # Create job service
-        job_service = JobService(db)
-        
-        if action == "new_execution":
-            # Process new job execution
-            await job_service.process_execution(execution_id, tenant_id)
-            
-        elif action == "cancel_execution":
-            # Cancel job execution
-            await job_service.cancel_execution(execution_id, tenant_id)
-            
-        elif action == "update_execution":
-            # Update job execution status
-            status = data.get("status")
-            error_message = data.get("error_message")
-            results = data.get("results")
-            
-            if status:
-                await job_service.update_execution_status(
-                    execution_id,
-                    tenant_id,
-                    status,
-                    error_message,
-                    results
-                )
-            
-    except Exception as e:
-        logger.exception(f"Error processing job execution message: {e}")
-        
+        return work(db)
     finally:
         db.close()
 
-async def agent_message_handler(data: Dict[str, Any], message: aio_pika.IncomingMessage):
+async def run_in_session(work: Callable[[Session], Any]) -> Any:
     """
-    Handler for agent messages.
+    Run synchronous database work in the consumer's thread pool.
     
     Args:
-        data: Message data
-        message: RabbitMQ message object
-    """
-    action = data.get("action")
-    agent_id = data.get("agent_id")
-    tenant_id = data.get("tenant_id")
-    
-    if not action or not agent_id or not tenant_id:
-        logger.error(f"Missing required fields in agent message: {data}")
-        return
-        
-    logger.info(f"Processing agent message: {action} for agent {agent_id}")
+        work: Function called with a new database session
     
-    # Create database session
-    db = SessionLocal()
-    try:
-        # Create agent service
-        agent_service = AgentService(db)
-        
-        if action == "heartbeat":
-            # Process agent heartbeat
-            metrics = data.get("metrics", {})
-            await agent_service.update_heartbeat(agent_id, tenant_id, metrics)
-            
-        elif action == "registration":
-            # Process agent registration
-            agent_data = data.get("agent_data", {})
-            if agent_data:
-                await agent_service.register_agent(agent_data, tenant_id)
-            
-        elif action == "status_change":
-            # Update agent status
-            status = data.get("status")
-            if status:
-                await agent_service.update_agent_status(agent_id, tenant_id, status)
-            
-    except Exception as e:
-        logger.exception(f"Error processing agent message: {e}")
-        
-    finally:
-        db.close()
+    Returns:
+        Any: Result of the work
+    """
+    return await run_blocking(_with_session, work)
 
-async def notification_handler(data: Dict[str, Any], message: aio_pika.IncomingMessage):
+async def message_handler(envelope: Envelope, message: aio_pika.IncomingMessage):
     """
-    Handler for notification messages.
+    Handler for all consumed queues, dispatching on the envelope type.
+    
+    Messages of types without a handler are acknowledged and ignored.
     
     Args:
-        data: Message data
+        envelope: Typed message
         message: RabbitMQ message object
     """
-    notification_id = data.get("notification_id")
-    tenant_id = data.get("tenant_id")
+    handler = MESSAGE_HANDLERS.get(type(envelope))
     
-    if not notification_id or not tenant_id:
-        logger.error(f"Missing required fields in notification message: {data}")
+    if handler is None:
+        logger.debug(f"Ignoring message of type '{envelope.message_type}'")
         return
-        
-    logger.info(f"Processing notification message for notification {notification_id}")
     
-    # Create database session
-    db = SessionLocal()
-    try:
-        # Create notification service
-        notification_service = NotificationService(db)
+    await handler(envelope)
+
+# Job execution messages
+
+@handles(NewExecution)
+async def handle_new_execution(envelope: NewExecution):
+    """Dispatch a pending job execution to an agent"""
+    logger.info(f"Processing new execution {envelope.execution_id} of job {envelope.job_id}")
+    
+    await run_in_session(
+        lambda db: JobService(db).dispatch_execution(envelope.execution_id, envelope.tenant_id)
+    )
+
+@handles(CancelExecution)
+async def handle_cancel_execution(envelope: CancelExecution):
+    """Cancel a job execution"""
+    logger.info(f"Cancelling execution {envelope.execution_id} of job {envelope.job_id}")
+    
+    await run_in_session(
+        lambda db: JobService(db).cancel_execution(envelope.execution_id, envelope.tenant_id)
+    )
+
+@handles(UpdateExecution)
+async def handle_update_execution(envelope: UpdateExecution):
+    """Update the status of a job execution"""
+    logger.info(f"Updating execution {envelope.execution_id} of job {envelope.job_id} to {envelope.status}")
+    
+    def update(db: Session):
+        job_service = JobService(db)
         
-        # Send notification
-        await notification_service.send_notification(notification_id, tenant_id)
+        # Updates over the broker are trusted, on behalf of the execution's agent
+        execution = job_service.get_execution(envelope.execution_id, envelope.tenant_id)
+        if not execution:
+            logger.warning(f"Execution {envelope.execution_id} not found")
+            return
         
-    except Exception as e:
-        logger.exception(f"Error processing notification message: {e}")
+        job_service.update_execution_status(
+            envelope.execution_id,
+            execution.agent_id,
+            envelope.tenant_id,
+            envelope.status,
+            results=envelope.results,
+            error=envelope.error_message
+        )
+    
+    await run_in_session(update)
+
+@handles(ScheduleTrigger)
+async def handle_schedule_trigger(envelope: ScheduleTrigger):
+    """Create and dispatch the execution of a job for a schedule fire"""
+    logger.info(f"Triggering job {envelope.job_id} of schedule {envelope.schedule_id}")
+    
+    # Redelivered triggers of a fire map to the same execution
+    fire_key = envelope.scheduled_time or envelope.timestamp or str(uuid.uuid4())
+    
+    def trigger(db: Session):
+        job_service = JobService(db)
         
-    finally:
-        db.close()
+        execution = job_service.create_triggered_execution(
+            envelope.job_id,
+            envelope.tenant_id,
+            envelope.schedule_id,
+            fire_key,
+            envelope.trigger_type
+        )
+        
+        # Raises while no agent is available, so the trigger is retried
+        if execution and execution.status == "pending" and execution.agent_id is None:
+            job_service.dispatch_execution(execution.execution_id, execution.tenant_id)
+    
+    await run_in_session(trigger)
 
-async def queue_item_handler(data: Dict[str, Any], message: aio_pika.IncomingMessage):
-    """
-    Handler for queue item messages.
+# Agent messages
+
+@handles(AgentHeartbeat)
+async def handle_agent_heartbeat(envelope: AgentHeartbeat):
+    """Buffer an agent heartbeat, written in batches by the heartbeat aggregator"""
+    logger.debug(f"Processing heartbeat of agent {envelope.agent_id}")
     
-    Args:
-        data: Message data
-        message: RabbitMQ message object
-    """
-    action = data.get("action")
-    queue_id = data.get("queue_id")
-    item_id = data.get("item_id")
-    tenant_id = data.get("tenant_id")
+    get_heartbeat_aggregator().record(
+        envelope.agent_id,
+        envelope.tenant_id,
+        envelope.metrics.get("status", "online"),
+        metrics=envelope.metrics,
+        capabilities=envelope.metrics.get("capabilities")
+    )
+
+@handles(AgentRegistration)
+async def handle_agent_registration(envelope: AgentRegistration):
+    """Process an agent registration"""
+    logger.info(f"Processing registration of agent {envelope.agent_id}")
     
-    if not action or not queue_id or not tenant_id:
-        logger.error(f"Missing required fields in queue item message: {data}")
+    if not envelope.agent_data:
         return
-        
-    logger.info(f"Processing queue item message: {action} for queue {queue_id}, item {item_id}")
     
-    # Create database session
-    db = SessionLocal()
-    try:
-        # Create queue service
-        queue_service = QueueService(db)
-        
-        if action == "new_item":
-            # Process new queue item
-            await queue_service.process_queue_item(item_id, tenant_id)
-            
-        elif action == "update_item":
-            # Update queue item status
-            status = data.get("status")
-            error_message = data.get("error_message")
-            
-            if status:
-                await queue_service.update_queue_item_status(
-                    item_id,
-                    tenant_id,
-                    status,
-                    error_message
-                )
-            
-    except Exception as e:
-        logger.exception(f"Error processing queue item message: {e}")
-        
-    finally:
-        db.close()
+    agent = AgentCreate(**envelope.agent_data)
+    await run_in_session(lambda db: AgentService(db).register_agent(agent, envelope.tenant_id))
 
-async def event_handler(data: Dict[str, Any], message: aio_pika.IncomingMessage):
-    """
-    Handler for system events.
+@handles(AgentStatusChange)
+async def handle_agent_status_change(envelope: AgentStatusChange):
+    """Update the status reported by an agent"""
+    logger.info(f"Updating status of agent {envelope.agent_id} to {envelope.status}")
     
-    Args:
-        data: Message data
-        message: RabbitMQ message object
+    await run_in_session(
+        lambda db: AgentService(db).update_agent_status(envelope.agent_id, envelope.tenant_id, envelope.status)
+    )
+
+# Notification messages
+
+@handles(NotificationCreated)
+async def handle_notification(envelope: NotificationCreated):
+    """Send a notification"""
+    logger.info(f"Processing notification message for notification {envelope.notification_id}")
+    
+    await run_in_session(
+        lambda db: NotificationService(db).send_notification(envelope.notification_id, envelope.tenant_id)
+    )
+
+# Queue item messages
+
+@handles(NewQueueItem, QueueItemsAvailable, QueueItemCompleted, AgentAvailable)
+async def handle_queue_dispatch(envelope):
+    """
+    Wake the queue worker for an immediate dispatch of the tenant's pending
+    items.
     """
-    event_type = data.get("event_type")
+    from ..workers.queue_worker import get_queue_worker
     
-    if not event_type:
-        logger.error(f"Missing event_type in event message: {data}")
-        return
-        
-    logger.info(f"Processing event: {event_type}")
+    logger.info(f"Processing queue item message: {envelope.action} for queue {envelope.queue_id}, item {envelope.item_id}")
     
-    # Create database session
-    db = SessionLocal()
-    try:
-        # Handle different event types
-        if event_type == "job_execution_status_change":
-            # Process job execution status change event
-            execution_id = data.get("execution_id")
-            tenant_id = data.get("tenant_id")
-            status = data.get("status")
-            
-            if execution_id and tenant_id and status:
-                # Check if this should trigger a notification
-                notification_service = NotificationService(db)
-                await notification_service.check_notification_triggers(
-                    "job_execution_status_change",
-                    {
-                        "execution_id": execution_id,
-                        "tenant_id": tenant_id,
-                        "status": status,
-                        "additional_data": data.get("additional_data", {})
-                    }
-                )
-                
-        elif event_type == "agent_status_change":
-            # Process agent status change event
-            agent_id = data.get("agent_id")
-            tenant_id = data.get("tenant_id")
-            status = data.get("status")
-            
-            if agent_id and tenant_id and status:
-                # Check if this should trigger a notification
-                notification_service = NotificationService(db)
-                await notification_service.check_notification_triggers(
-                    "agent_status_change",
-                    {
-                        "agent_id": agent_id,
-                        "tenant_id": tenant_id,
-                        "status": status,
-                        "additional_data": data.get("additional_data", {})
-                    }
-                )
-            
-    except Exception as e:
-        logger.exception(f"Error processing event message: {e}")
-        
-    finally:
-        db.close()
\ No newline at end of file
+    get_queue_worker().notify(envelope.tenant_id)
+
+@handles(UpdateQueueItem)
+async def handle_update_queue_item(envelope: UpdateQueueItem):
+    """Update the status of a queue item"""
+    from ..workers.queue_worker import get_queue_worker
+    
+    logger.info(f"Updating queue item {envelope.item_id} to {envelope.status}")
+    
+    item = await run_in_session(
+        lambda db: QueueService(db).update_queue_item_status(
+            envelope.item_id,
+            envelope.tenant_id,
+            envelope.status,
+            envelope.error_message,
+            envelope.processing_time_ms,
+            envelope.results
+        )
+    )
+    
+    # The agent is free again and retried items are pending
+    if item:
+        get_queue_worker().notify(envelope.tenant_id)
+
+# Events
+
+@handles(JobExecutionStatusChanged, AgentStatusChanged)
+async def handle_status_change_event(envelope):
+    """Check if a status change event should trigger a notification"""
+    logger.info(f"Processing event: {envelope.event_type}")
+    
+    event_data = {
+        "tenant_id": envelope.tenant_id,
+        "status": envelope.status,
+        "additional_data": envelope.additional_data
+    }
+    if isinstance(envelope, JobExecutionStatusChanged):
+        event_data["execution_id"] = envelope.execution_id
+    else:
+        event_data["agent_id"] = envelope.agent_id
+    
+    await run_in_session(
+        lambda db: NotificationService(db).check_notification_triggers(envelope.event_type, event_data)
+    )
+
+@handles(SystemEvent)
+async def handle_system_event(envelope: SystemEvent):
+    """Log a system event without a more specific handler"""
+    logger.info(f"Processing event: {envelope.event_type}")
\ No newline at end of file
@@ -3,77 +3,157 @@ Message producer module for asynchronous messaging.
 
 This module provides a message producer for sending messages
 to RabbitMQ or other message brokers.
+
+Messages are published over a pool of channels with publisher confirms. Sent
+messages are collected for up to PRODUCER_LINGER_MS (or PRODUCER_BATCH_SIZE
+messages) and published back to back on one channel, so confirms are awaited
+for a whole batch instead of one round trip per message. At most one batch
+per pooled channel is in flight; while they all await their confirms, sent
+messages wait in a queue of PRODUCER_MAX_PENDING, and senders wait once it
+is full. Synchronous callers publish through the same connection.
+
+Bodies are encoded with the codec of MESSAGING_CONTENT_TYPE (see codec.py)
+and carry their message type and schema version (see envelopes.py).
 """
 
-import json
+import asyncio
 import logging
+import threading
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import aio_pika
 from aio_pika import Message, DeliveryMode
-from aio_pika.abc import AbstractRobustConnection
+from aio_pika.abc import AbstractRobustConnection, AbstractChannel
+from aio_pika.pool import Pool
 
 from ..config import settings
+from .codec import encode_body
+from .envelopes import Envelope, SCHEMA_VERSION_HEADER, envelope_properties
 
 logger = logging.getLogger(__name__)
 
+# Exchanges declared by the producer and their types
+EXCHANGES = {
+    "jobs": "direct",
+    "agents": "direct",
+    "notifications": "topic",
+    "events": "topic"
+}
+
+# A message waiting to be published: exchange, routing key, message and the
+# future resolved once the broker confirms it
+PendingMessage = Tuple[str, str, Message, asyncio.Future]
+
 class MessageProducer:
     """Message producer for sending messages to message broker"""
     
     def __init__(self):
         """Initialize the message producer"""
         self.connection: Optional[AbstractRobustConnection] = None
-        self.channel: Optional[aio_pika.abc.AbstractChannel] = None
-        self.exchanges: Dict[str, aio_pika.abc.AbstractExchange] = {}
+        self.channel_pool: Optional[Pool] = None
+        self.exchanges: Dict[str, str] = {}
+        
+        # Event loop owning the connection, used by other threads and loops
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Background event loop for synchronous callers without a running loop
+        self._thread_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_lock = threading.Lock()
         
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._pending: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+    
     async def connect(self):
         """Connect to the message broker"""
-        try:
-            # Create connection
-            self.connection = await aio_pika.connect_robust(
-                settings.RABBITMQ_URI,
-                client_properties={
-                    "connection_name": "orchestrator_producer"
-                }
-            )
-            
-            # Create channel
-            self.channel = await self.connection.channel()
-            
-            # Declare exchanges
-            exchanges = {
-                "jobs": "direct",
-                "agents": "direct",
-                "notifications": "topic",
-                "events": "topic"
-            }
+        if self._owned_by_other_loop():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.connect(), self.loop))
+            return
+        
+        # State of a previous, stopped event loop cannot be reused
+        if self.loop is not asyncio.get_running_loop():
+            self.loop = asyncio.get_running_loop()
+            self.connection = None
+            self._connect_lock = asyncio.Lock()
+            self._flusher = None
+            self._in_flight = set()
+        
+        async with self._connect_lock:
+            if self.connection and not self.connection.is_closed:
+                return
             
-            for exchange_name, exchange_type in exchanges.items():
-                self.exchanges[exchange_name] = await self.channel.declare_exchange(
-                    exchange_name,
-                    exchange_type,
-                    durable=True
+            try:
+                # Create connection
+                self.connection = await aio_pika.connect_robust(
+                    settings.RABBITMQ_URI,
+                    client_properties={
+                        "connection_name": "orchestrator_producer"
+                    }
+                )
+                
+                # Declare exchanges
+                channel = await self.connection.channel()
+                for exchange_name, exchange_type in EXCHANGES.items():
+                    await channel.declare_exchange(
+                        exchange_name,
+                        exchange_type,
+                        durable=True
+                    )
+                    self.exchanges[exchange_name] = exchange_type
+                await channel.close()
+                
+                # Channels with publisher confirms for publishing
+                self.channel_pool = Pool(
+                    self._open_channel,
+                    max_size=settings.PRODUCER_CHANNEL_POOL_SIZE
                 )
                 
-            logger.info("Message producer connected to RabbitMQ")
+                # Start batching published messages
+                if self._flusher is None or self._flusher.done():
+                    self._pending = asyncio.Queue(maxsize=settings.PRODUCER_MAX_PENDING)
+                    self._batch_slots = asyncio.Semaphore(settings.PRODUCER_CHANNEL_POOL_SIZE)
+                    self._flusher = asyncio.create_task(self._flush_pending())
+                
+                logger.info("Message producer connected to RabbitMQ")
             
-        except Exception as e:
-            logger.error(f"Failed to connect to RabbitMQ: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"Failed to connect to RabbitMQ: {e}")
+                raise
     
     async def close(self):
         """Close the connection to the message broker"""
+        if self._owned_by_other_loop():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.close(), self.loop))
+            self._stop_thread_loop()
+            return
+        
+        # Publish what is still pending before closing
+        if self._flusher:
+            if not self._flusher.done():
+                await self._pending.join()
+            self._flusher.cancel()
+            self._flusher = None
+        
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        
+        if self.channel_pool:
+            await self.channel_pool.close()
+            self.channel_pool = None
+        
         if self.connection:
             await self.connection.close()
             self.connection = None
             logger.info("Message producer disconnected from RabbitMQ")
     
     async def send_message(
-        self, 
-        exchange: str, 
-        routing_key: str, 
-        message_data: Dict[str, Any],
+        self,
+        exchange: str,
+        routing_key: str,
+        message_data: Union[Envelope, Dict[str, Any]],
         persistent: bool = True,
         message_id: Optional[str] = None,
         correlation_id: Optional[str] = None,
@@ -82,30 +162,53 @@ class MessageProducer:
         """
         Send a message to the message broker.
         
+        The message is published with the next batch and the call returns
+        once the broker has confirmed it.
+        
         Args:
             exchange: Exchange name
             routing_key: Routing key for the message
-            message_data: Message data (will be converted to JSON)
+            message_data: Message envelope, or message data whose type is
+                looked up from its fields
             persistent: Whether the message should persist in the broker
             message_id: Optional message ID (if not provided, a UUID will be generated)
             correlation_id: Optional correlation ID for message tracking
             headers: Optional message headers
-            
+        
         Returns:
             str: Message ID
         """
-        if not self.connection or self.connection.is_closed:
+        # The connection belongs to another event loop
+        if self._owned_by_other_loop():
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                self.send_message(
+                    exchange,
+                    routing_key,
+                    message_data,
+                    persistent=persistent,
+                    message_id=message_id,
+                    correlation_id=correlation_id,
+                    headers=headers
+                ),
+                self.loop
+            ))
+        
+        if self.loop is not asyncio.get_running_loop() or not self.connection or self.connection.is_closed:
             await self.connect()
-            
+        
         if exchange not in self.exchanges:
             raise ValueError(f"Exchange '{exchange}' not declared")
-            
+        
         # Generate message ID if not provided
         if not message_id:
             message_id = str(uuid.uuid4())
-            
+        
         # Prepare message
-        message_body = json.dumps(message_data).encode()
+        message_data, message_type, schema_version = envelope_properties(message_data)
+        message_body, content_type, content_encoding = encode_body(message_data)
+        
+        if schema_version is not None:
+            headers = {**(headers or {}), SCHEMA_VERSION_HEADER: schema_version}
         
         # Set delivery mode based on persistence
         delivery_mode = DeliveryMode.PERSISTENT if persistent else DeliveryMode.NOT_PERSISTENT
@@ -113,18 +216,21 @@ class MessageProducer:
         # Create message
         message = Message(
             body=message_body,
+            content_type=content_type,
+            content_encoding=content_encoding,
+            type=message_type,
             delivery_mode=delivery_mode,
             message_id=message_id,
             correlation_id=correlation_id,
             headers=headers
         )
         
-        # Send message
+        # Queue the message for the next batch and wait for its confirm
+        confirmed = asyncio.get_running_loop().create_future()
+        await self._pending.put((exchange, routing_key, message, confirmed))
+        
         try:
-            await self.exchanges[exchange].publish(
-                message,
-                routing_key=routing_key
-            )
+            await confirmed
             logger.debug(f"Sent message to {exchange}:{routing_key}, ID: {message_id}")
             return message_id
         except Exception as e:
@@ -132,64 +238,207 @@ class MessageProducer:
             raise
     
     def send_message_sync(
-        self, 
-        exchange: str, 
-        routing_key: str, 
-        message_data: Dict[str, Any]
+        self,
+        exchange: str,
+        routing_key: str,
+        message_data: Union[Envelope, Dict[str, Any]]
     ) -> bool:
         """
         Synchronous version of send_message for use in synchronous code.
         
-        This should only be used when async/await cannot be used.
+        This should only be used when async/await cannot be used. The message
+        is published over the producer's connection; if no running event loop
+        owns it, one is started in a background thread. Called from the thread
+        of the owning event loop, the message is published in the background
+        since blocking would stall the loop.
         
         Args:
             exchange: Exchange name
             routing_key: Routing key for the message
-            message_data: Message data (will be converted to JSON)
-            
+            message_data: Message envelope, or message data whose type is
+                looked up from its fields
+        
         Returns:
             bool: True if message was sent successfully
         """
-        import pika
-        
         try:
-            # Connect to RabbitMQ
-            parameters = pika.URLParameters(settings.RABBITMQ_URI)
-            connection = pika.BlockingConnection(parameters)
-            channel = connection.channel()
+            loop = self._get_loop()
             
-            # Declare exchange
-            channel.exchange_declare(
-                exchange=exchange,
-                exchange_type='direct' if exchange in ['jobs', 'agents'] else 'topic',
-                durable=True
-            )
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
             
-            # Prepare message
-            message_id = str(uuid.uuid4())
-            message_body = json.dumps(message_data).encode()
+            coroutine = self.send_message(exchange, routing_key, message_data)
             
-            # Publish message
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                body=message_body,
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Make message persistent
-                    message_id=message_id,
-                    content_type='application/json'
-                )
-            )
-            
-            # Close connection
-            connection.close()
+            if running_loop is loop:
+                task = loop.create_task(coroutine)
+                task.add_done_callback(self._log_background_failure)
+                return True
             
-            logger.debug(f"Sent sync message to {exchange}:{routing_key}, ID: {message_id}")
+            asyncio.run_coroutine_threadsafe(coroutine, loop).result(
+                timeout=settings.PRODUCER_CONFIRM_TIMEOUT
+            )
             return True
-            
+        
         except Exception as e:
             logger.error(f"Failed to send sync message to {exchange}:{routing_key}: {e}")
             return False
+    
+    def send_messages_sync(
+        self,
+        exchange: str,
+        routing_key: str,
+        messages: List[Union[Envelope, Dict[str, Any]]]
+    ):
+        """
+        Send messages from synchronous code and wait until all are confirmed.
+        
+        Unlike send_message_sync, failures are raised, so the caller can roll
+        back the transaction the messages belong to. The messages go out in
+        the same batches as concurrent sends. Must not be called from the
+        thread of the owning event loop, which it would block.
+        
+        Args:
+            exchange: Exchange name
+            routing_key: Routing key of the messages
+            messages: Message envelopes, or message data whose type is looked
+                up from its fields
+        
+        Raises:
+            RuntimeError: If called from the thread of the owning event loop
+            Exception: If a message was not confirmed
+        """
+        loop = self._get_loop()
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is loop:
+            raise RuntimeError("send_messages_sync would block the producer's event loop")
+        
+        futures = [
+            asyncio.run_coroutine_threadsafe(self.send_message(exchange, routing_key, message_data), loop)
+            for message_data in messages
+        ]
+        
+        for future in futures:
+            future.result(timeout=settings.PRODUCER_CONFIRM_TIMEOUT)
+    
+    async def _open_channel(self) -> AbstractChannel:
+        """Open a pooled channel with publisher confirms"""
+        return await self.connection.channel(publisher_confirms=True)
+    
+    async def _flush_pending(self):
+        """Collect pending messages into batches and publish them"""
+        linger = settings.PRODUCER_LINGER_MS / 1000
+        batch_size = settings.PRODUCER_BATCH_SIZE
+        
+        while True:
+            # Wait for a batch to complete while all channels await confirms
+            await self._batch_slots.acquire()
+            
+            batch = [await self._pending.get()]
+            deadline = self.loop.time() + linger
+            
+            # Wait up to the linger window for the batch to fill
+            while len(batch) < batch_size:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                
+                try:
+                    batch.append(await asyncio.wait_for(self._pending.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Take whatever else is already queued without waiting
+            while len(batch) < batch_size and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            
+            # Publish while the next batch fills, one batch per pooled channel
+            task = asyncio.create_task(self._publish_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: self._batch_slots.release())
+    
+    async def _publish_batch(self, batch: List[PendingMessage]):
+        """
+        Publish a batch of messages on one pooled channel.
+        
+        All messages are written before any confirm is awaited, so the batch
+        costs about one broker round trip.
+        
+        Args:
+            batch: Pending messages
+        """
+        try:
+            async with self.channel_pool.acquire() as channel:
+                exchanges = {
+                    exchange_name: await channel.get_exchange(exchange_name, ensure=False)
+                    for exchange_name in {exchange for exchange, _, _, _ in batch}
+                }
+                
+                results = await asyncio.gather(
+                    *(
+                        exchanges[exchange].publish(
+                            message,
+                            routing_key=routing_key,
+                            timeout=settings.PRODUCER_CONFIRM_TIMEOUT
+                        )
+                        for exchange, routing_key, message, _ in batch
+                    ),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+        
+        for (_, _, _, confirmed), result in zip(batch, results):
+            if not confirmed.done():
+                if isinstance(result, BaseException):
+                    confirmed.set_exception(result)
+                else:
+                    confirmed.set_result(result)
+            self._pending.task_done()
+    
+    def _owned_by_other_loop(self) -> bool:
+        """Check if the connection belongs to an event loop other than the running one"""
+        return (
+            self.loop is not None
+            and self.loop is not asyncio.get_running_loop()
+            and self.loop.is_running()
+        )
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get a running event loop to publish on, starting one if there is none"""
+        with self._thread_lock:
+            if self.loop is not None and self.loop.is_running():
+                return self.loop
+            
+            if self._thread_loop is None:
+                self._thread_loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._thread_loop.run_forever,
+                    name="message-producer",
+                    daemon=True
+                ).start()
+            
+            return self._thread_loop
+    
+    def _stop_thread_loop(self):
+        """Stop the background event loop started for synchronous callers"""
+        with self._thread_lock:
+            if self._thread_loop is not None:
+                self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+                self._thread_loop = None
+    
+    @staticmethod
+    def _log_background_failure(task: asyncio.Task):
+        """Log the failure of a message published in the background"""
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to send background message: {task.exception()}")
 
 
 # Singleton instance of message producer
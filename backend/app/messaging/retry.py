@@ -0,0 +1,351 @@
+"""
+Retry and dead-letter handling for consumed queues.
+
+A message whose handler fails is not requeued in place. It is republished to
+a delay queue whose TTL returns it to the original queue later, with the
+delay growing per attempt. After the last attempt, or at once for messages
+that can never succeed, it goes to the queue's dead-letter exchange and
+waits in the dead-letter queue until it is inspected, replayed or purged.
+
+For a queue "job-executions" the topology is:
+
+- "job-executions.dlx": direct exchange, routes to the dead-letter queue
+- "job-executions.dead-letter": dead-letter queue
+- "job-executions.retry.5s" etc.: delay queues, one per CONSUMER_RETRY_DELAYS
+  entry, that dead-letter expired messages back to "job-executions"
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import aio_pika
+from aio_pika import Message, DeliveryMode
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+
+from ..config import settings
+from .codec import MessageDecodeError, decode_body
+
+logger = logging.getLogger(__name__)
+
+# Message headers
+ATTEMPT_HEADER = "x-attempt"  # Failed attempts so far
+MAX_ATTEMPTS_HEADER = "x-max-attempts"  # Overrides the queue's max attempts
+ORIGINAL_QUEUE_HEADER = "x-original-queue"
+ORIGINAL_EXCHANGE_HEADER = "x-original-exchange"
+ORIGINAL_ROUTING_KEY_HEADER = "x-original-routing-key"
+LAST_ERROR_HEADER = "x-last-error"
+DEAD_LETTER_REASON_HEADER = "x-dead-letter-reason"
+DEAD_LETTERED_AT_HEADER = "x-dead-lettered-at"
+REPLAYED_AT_HEADER = "x-replayed-at"
+
+# Longest error text kept in a header
+MAX_ERROR_LENGTH = 1000
+
+class PoisonMessageError(Exception):
+    """Raised by handlers for messages that can never be processed, so they skip retries"""
+
+def dead_letter_exchange_name(queue_name: str) -> str:
+    """Get the name of a queue's dead-letter exchange"""
+    return f"{queue_name}.dlx"
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    """Get the name of a queue's dead-letter queue"""
+    return f"{queue_name}.dead-letter"
+
+def retry_queue_name(queue_name: str, delay: int) -> str:
+    """Get the name of a queue's delay queue for a retry delay in seconds"""
+    return f"{queue_name}.retry.{delay}s"
+
+def retry_delay(attempt: int) -> int:
+    """
+    Get the delay before retrying a message.
+    
+    Args:
+        attempt: Failed attempts so far, at least 1
+    
+    Returns:
+        int: Delay in seconds, the last configured delay for later attempts
+    """
+    delays = settings.CONSUMER_RETRY_DELAYS
+    return delays[min(attempt, len(delays)) - 1]
+
+async def declare_retry_topology(channel: AbstractChannel, queue_name: str):
+    """
+    Declare the dead-letter exchange and queue and the delay queues of a queue.
+    
+    Args:
+        channel: Channel to declare on
+        queue_name: Name of the consumed queue
+    """
+    exchange = await channel.declare_exchange(
+        dead_letter_exchange_name(queue_name),
+        aio_pika.ExchangeType.DIRECT,
+        durable=True
+    )
+    
+    dead_letter_queue = await channel.declare_queue(dead_letter_queue_name(queue_name), durable=True)
+    await dead_letter_queue.bind(exchange, queue_name)
+    
+    for delay in sorted(set(settings.CONSUMER_RETRY_DELAYS)):
+        await channel.declare_queue(
+            retry_queue_name(queue_name, delay),
+            durable=True,
+            arguments={
+                "x-message-ttl": delay * 1000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": queue_name
+            }
+        )
+
+def _copy_message(message: AbstractIncomingMessage, headers: Dict[str, Any]) -> Message:
+    """Build a persistent copy of a consumed message with new headers"""
+    return Message(
+        body=message.body,
+        headers=headers,
+        content_type=message.content_type,
+        content_encoding=message.content_encoding,
+        message_id=message.message_id,
+        correlation_id=message.correlation_id,
+        timestamp=message.timestamp,
+        type=message.type,
+        delivery_mode=DeliveryMode.PERSISTENT
+    )
+
+async def retry_or_dead_letter(
+    channel: AbstractChannel,
+    message: AbstractIncomingMessage,
+    queue_name: str,
+    error: BaseException,
+    max_attempts: int
+) -> bool:
+    """
+    Move a failed message to its next delay queue or to the dead-letter queue.
+    
+    The copy is published with a publisher confirm before the original is
+    acknowledged, so the message is never lost; if the broker crashes in
+    between it is delivered twice.
+    
+    Args:
+        channel: Channel of the consumed queue (with publisher confirms)
+        message: Failed message
+        queue_name: Name of the consumed queue
+        error: Error raised for the message
+        max_attempts: Attempts of the queue unless the message overrides them
+    
+    Returns:
+        bool: True if the message is retried, False if it was dead-lettered
+    """
+    headers = dict(message.headers or {})
+    attempt = int(headers.get(ATTEMPT_HEADER, 0)) + 1
+    max_attempts = int(headers.get(MAX_ATTEMPTS_HEADER, max_attempts))
+    
+    headers[ATTEMPT_HEADER] = attempt
+    headers[LAST_ERROR_HEADER] = f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH]
+    headers.setdefault(ORIGINAL_QUEUE_HEADER, queue_name)
+    headers.setdefault(ORIGINAL_EXCHANGE_HEADER, message.exchange or "")
+    headers.setdefault(ORIGINAL_ROUTING_KEY_HEADER, message.routing_key or "")
+    
+    if isinstance(error, PoisonMessageError) or attempt >= max_attempts:
+        await dead_letter(
+            channel,
+            message,
+            queue_name,
+            "poison" if isinstance(error, PoisonMessageError) else "max_attempts",
+            headers
+        )
+        return False
+    
+    delay = retry_delay(attempt)
+    await channel.default_exchange.publish(
+        _copy_message(message, headers),
+        routing_key=retry_queue_name(queue_name, delay)
+    )
+    await message.ack()
+    
+    logger.warning(
+        f"Retrying message {message.message_id} of '{queue_name}' in {delay}s "
+        f"(attempt {attempt} of {max_attempts}): {headers[LAST_ERROR_HEADER]}"
+    )
+    return True
+
+async def dead_letter(
+    channel: AbstractChannel,
+    message: AbstractIncomingMessage,
+    queue_name: str,
+    reason: str,
+    headers: Optional[Dict[str, Any]] = None
+):
+    """
+    Move a message to its queue's dead-letter queue.
+    
+    Args:
+        channel: Channel of the consumed queue (with publisher confirms)
+        message: Message to dead-letter
+        queue_name: Name of the consumed queue
+        reason: Why the message is dead-lettered, e.g. "max_attempts"
+        headers: Headers of the dead-lettered copy (the message's own if omitted)
+    """
+    headers = dict(headers if headers is not None else message.headers or {})
+    headers.setdefault(ORIGINAL_QUEUE_HEADER, queue_name)
+    headers.setdefault(ORIGINAL_EXCHANGE_HEADER, message.exchange or "")
+    headers.setdefault(ORIGINAL_ROUTING_KEY_HEADER, message.routing_key or "")
+    headers[DEAD_LETTER_REASON_HEADER] = reason
+    headers[DEAD_LETTERED_AT_HEADER] = datetime.utcnow().isoformat()
+    
+    exchange = await channel.get_exchange(dead_letter_exchange_name(queue_name), ensure=False)
+    await exchange.publish(_copy_message(message, headers), routing_key=queue_name)
+    await message.ack()
+    
+    logger.error(
+        f"Dead-lettered message {message.message_id} of '{queue_name}' ({reason}): "
+        f"{headers.get(LAST_ERROR_HEADER, '')}"
+    )
+
+class DeadLetterManager:
+    """Inspects, replays and purges the dead-letter queues of consumed queues"""
+    
+    def __init__(self, channel: AbstractChannel):
+        """
+        Initialize the dead-letter manager.
+        
+        Args:
+            channel: Channel with publisher confirms
+        """
+        self.channel = channel
+    
+    async def count(self, queue_name: str) -> int:
+        """
+        Count the dead-lettered messages of a queue.
+        
+        Args:
+            queue_name: Name of the consumed queue
+        
+        Returns:
+            int: Number of messages in the dead-letter queue
+        """
+        queue = await self.channel.declare_queue(dead_letter_queue_name(queue_name), passive=True)
+        return queue.declaration_result.message_count
+    
+    async def list_messages(self, queue_name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Peek at the oldest dead-lettered messages of a queue.
+        
+        Messages are fetched unacknowledged and returned to the queue
+        afterwards, so they stay in place.
+        
+        Args:
+            queue_name: Name of the consumed queue
+            limit: Maximum number of messages
+        
+        Returns:
+            List[Dict[str, Any]]: Messages with their dead-letter details
+        """
+        queue = await self.channel.declare_queue(dead_letter_queue_name(queue_name), passive=True)
+        fetched = []
+        
+        try:
+            while len(fetched) < limit:
+                message = await queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                fetched.append(message)
+            
+            return [self._describe(message) for message in fetched]
+        finally:
+            for message in fetched:
+                await message.nack(requeue=True)
+    
+    async def replay(
+        self,
+        queue_name: str,
+        message_ids: Optional[Set[str]] = None,
+        limit: Optional[int] = None
+    ) -> int:
+        """
+        Send dead-lettered messages back to their queue with fresh attempts.
+        
+        Args:
+            queue_name: Name of the consumed queue
+            message_ids: Only replay these messages (all if omitted)
+            limit: Maximum number of messages to replay
+        
+        Returns:
+            int: Number of replayed messages
+        """
+        queue = await self.channel.declare_queue(dead_letter_queue_name(queue_name), passive=True)
+        remaining = queue.declaration_result.message_count
+        skipped = []
+        replayed = 0
+        
+        try:
+            # Look at each message present now once, so replays are not seen again
+            while remaining > 0 and (limit is None or replayed < limit):
+                message = await queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                remaining -= 1
+                
+                if message_ids is not None and message.message_id not in message_ids:
+                    skipped.append(message)
+                    continue
+                
+                headers = {
+                    key: value for key, value in (message.headers or {}).items()
+                    if key not in (ATTEMPT_HEADER, LAST_ERROR_HEADER, DEAD_LETTER_REASON_HEADER, DEAD_LETTERED_AT_HEADER)
+                }
+                headers[REPLAYED_AT_HEADER] = datetime.utcnow().isoformat()
+                
+                await self.channel.default_exchange.publish(
+                    _copy_message(message, headers),
+                    routing_key=(message.headers or {}).get(ORIGINAL_QUEUE_HEADER, queue_name)
+                )
+                await message.ack()
+                replayed += 1
+        finally:
+            for message in skipped:
+                await message.nack(requeue=True)
+        
+        logger.info(f"Replayed {replayed} dead-lettered messages of '{queue_name}'")
+        return replayed
+    
+    async def purge(self, queue_name: str) -> int:
+        """
+        Delete all dead-lettered messages of a queue.
+        
+        Args:
+            queue_name: Name of the consumed queue
+        
+        Returns:
+            int: Number of deleted messages
+        """
+        queue = await self.channel.declare_queue(dead_letter_queue_name(queue_name), passive=True)
+        result = await queue.purge()
+        
+        logger.info(f"Purged {result.message_count} dead-lettered messages of '{queue_name}'")
+        return result.message_count
+    
+    @staticmethod
+    def _describe(message: AbstractIncomingMessage) -> Dict[str, Any]:
+        """Describe a dead-lettered message"""
+        headers = message.headers or {}
+        
+        try:
+            body = decode_body(message.body, message.content_type, message.content_encoding)
+        except MessageDecodeError:
+            body = message.body.decode(errors="replace")
+        
+        return {
+            "message_id": message.message_id,
+            "correlation_id": message.correlation_id,
+            "message_type": message.type,
+            "original_queue": headers.get(ORIGINAL_QUEUE_HEADER),
+            "original_exchange": headers.get(ORIGINAL_EXCHANGE_HEADER),
+            "original_routing_key": headers.get(ORIGINAL_ROUTING_KEY_HEADER),
+            "attempts": int(headers.get(ATTEMPT_HEADER, 0)),
+            "reason": headers.get(DEAD_LETTER_REASON_HEADER),
+            "last_error": headers.get(LAST_ERROR_HEADER),
+            "dead_lettered_at": headers.get(DEAD_LETTERED_AT_HEADER),
+            "headers": {key: str(value) for key, value in headers.items()},
+            "body": body
+        }
@@ -6,13 +6,14 @@ for the orchestration system.
 """
 
 # Import all models to make them available from the package
-from .tenant import Tenant
+from .tenant import Tenant, TenantQuotaCounter
 from .user import User, Role, Permission, RolePermission, UserRole
 from .agent import Agent, AgentLog, ServiceAccount, AgentSession
+from .agent_metrics import AgentMetricSample, AgentMetricRollup
 from .asset import Asset, AssetType, AssetFolder, AssetPermission
-from .queue import Queue, QueueItem
+from .queue import Queue, QueueItem, QueueCounter
 from .package import Package, PackagePermission
-from .schedule import Schedule
+from .schedule import Schedule, SchedulerInstance, ScheduleFireTime
 from .job import Job, JobExecution, JobDependency
 from .notification import NotificationType, NotificationChannel, NotificationRule, Notification
 from .audit import AuditLog
@@ -22,6 +23,7 @@ from .tenant_subscription import TenantSubscription
 # Define all models for easy access
 __all__ = [
     "Tenant",
+    "TenantQuotaCounter",
     "User",
     "Role",
     "Permission",
@@ -31,15 +33,20 @@ __all__ = [
     "AgentLog",
     "ServiceAccount",
     "AgentSession",
+    "AgentMetricSample",
+    "AgentMetricRollup",
     "Asset",
     "AssetType",
     "AssetFolder",
     "AssetPermission",
     "Queue",
     "QueueItem",
+    "QueueCounter",
     "Package",
     "PackagePermission",
     "Schedule",
+    "SchedulerInstance",
+    "ScheduleFireTime",
     "Job",
     "JobExecution",
     "JobDependency",
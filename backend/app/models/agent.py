@@ -7,7 +7,7 @@ automation agents that run on client machines.
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, DateTime, Text, JSON
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, DateTime, Text, JSON, Index
 from sqlalchemy.dialects.postgresql import INET
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -80,13 +80,19 @@ class Agent(Base):
     machine_id = Column(String(255), nullable=False)
     hostname = Column(String(255), nullable=True)  # Add hostname field
     ip_address = Column(INET, nullable=True)
-    api_key = Column(String(255), nullable=True)
+    
+    # API key, stored as a public lookup prefix and a hash of the whole key
+    api_key_prefix = Column(String(16), nullable=True, index=True)
+    api_key_hash = Column(String(255), nullable=True)
     
     # Status and version
     status = Column(String(20), nullable=False, default="offline")
     last_heartbeat = Column(DateTime, nullable=True)
     version = Column(String(50), nullable=True)
     
+    # Metrics of the last heartbeat
+    metrics = Column(JSON, nullable=True)
+    
     # Capabilities and tags
     capabilities = Column(JSON, nullable=True)
     tags = Column(JSON, nullable=True)
@@ -111,6 +117,12 @@ class Agent(Base):
     service_account = relationship("ServiceAccount", back_populates="agents")
     sessions = relationship("AgentSession", back_populates="agent")
     
+    # Indexes for agent selection and stale agent detection
+    __table_args__ = (
+        Index("ix_agents_tenant_status", tenant_id, status),
+        Index("ix_agents_status_heartbeat", status, last_heartbeat),
+    )
+    
     # # Relationships
     # logs = relationship("AgentLog", back_populates="agent", cascade="all, delete-orphan")
     # job_executions = relationship("JobExecution", back_populates="agent")
@@ -150,6 +162,11 @@ class AgentLog(Base):
     # Timestamp
     created_at = Column(DateTime, nullable=False, default=func.now())
     
+    # Index for per-agent log listing
+    __table_args__ = (
+        Index("ix_agent_logs_agent_created", agent_id, created_at),
+    )
+    
     def __repr__(self):
         """String representation of the agent log"""
         return f"<AgentLog {self.log_id} - {self.agent_id}>"
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Agent metric models for resource usage history.
+
+This module defines the AgentMetricSample and AgentMetricRollup models
+storing the resource metrics agents report in their heartbeats.
+"""
+
+from sqlalchemy import Column, String, Integer, Float, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+
+from ..db.session import Base
+
+# Metrics kept from heartbeats
+AGENT_METRICS = ("cpu_percent", "memory_percent", "disk_percent", "active_jobs")
+
+class AgentMetricSample(Base):
+    """
+    Resource metrics of one agent heartbeat.
+    
+    Samples are append-only and partitioned by day on recorded_at, so expired
+    days are dropped as whole partitions. They carry no foreign keys to keep
+    inserts cheap; samples of deleted agents expire with their partition.
+    """
+    
+    __tablename__ = "agent_metric_samples"
+    
+    # Primary key
+    agent_id = Column(UUID(as_uuid=True), primary_key=True)
+    recorded_at = Column(DateTime, primary_key=True)
+    
+    # Tenant of the agent
+    tenant_id = Column(UUID(as_uuid=True), nullable=False)
+    
+    # Metrics
+    cpu_percent = Column(Float, nullable=True)
+    memory_percent = Column(Float, nullable=True)
+    disk_percent = Column(Float, nullable=True)
+    active_jobs = Column(Integer, nullable=True)
+    
+    # Fleet-wide queries of a tenant by time, daily range partitions
+    __table_args__ = (
+        Index("ix_agent_metric_samples_tenant_time", tenant_id, recorded_at),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+    
+    def __repr__(self):
+        """String representation of the agent metric sample"""
+        return f"<AgentMetricSample {self.agent_id} at {self.recorded_at}>"
+
+class AgentMetricRollup(Base):
+    """
+    Downsampled resource metrics of an agent.
+    
+    One row per agent, resolution ("1m", "1h" or "1d") and bucket with the
+    number of samples and the average, minimum and maximum of each metric.
+    Minute buckets are computed from samples, hour buckets from minute
+    buckets and day buckets from hour buckets.
+    """
+    
+    __tablename__ = "agent_metric_rollups"
+    
+    # Primary key
+    agent_id = Column(UUID(as_uuid=True), primary_key=True)
+    resolution = Column(String(4), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    
+    # Tenant of the agent
+    tenant_id = Column(UUID(as_uuid=True), nullable=False)
+    
+    # Number of samples in the bucket
+    samples = Column(Integer, nullable=False)
+    
+    # Aggregated metrics
+    cpu_percent_avg = Column(Float, nullable=True)
+    cpu_percent_min = Column(Float, nullable=True)
+    cpu_percent_max = Column(Float, nullable=True)
+    memory_percent_avg = Column(Float, nullable=True)
+    memory_percent_min = Column(Float, nullable=True)
+    memory_percent_max = Column(Float, nullable=True)
+    disk_percent_avg = Column(Float, nullable=True)
+    disk_percent_min = Column(Float, nullable=True)
+    disk_percent_max = Column(Float, nullable=True)
+    active_jobs_avg = Column(Float, nullable=True)
+    active_jobs_min = Column(Float, nullable=True)
+    active_jobs_max = Column(Float, nullable=True)
+    
+    # Fleet-wide queries of a tenant by time and retention by resolution
+    __table_args__ = (
+        Index("ix_agent_metric_rollups_tenant_time", tenant_id, resolution, bucket_start),
+        Index("ix_agent_metric_rollups_resolution_time", resolution, bucket_start),
+    )
+    
+    def __repr__(self):
+        """String representation of the agent metric rollup"""
+        return f"<AgentMetricRollup {self.agent_id} {self.resolution} at {self.bucket_start}>"
\ No newline at end of file
@@ -8,7 +8,7 @@ for managing automation jobs and their execution.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, ForeignKey, UniqueConstraint, Table, Boolean
+from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, ForeignKey, UniqueConstraint, Table, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -58,6 +58,10 @@ class Job(Base):
     # Job parameters
     parameters = Column(JSON, nullable=True)
     
+    # Agent placement constraints
+    required_capabilities = Column(JSON, nullable=True)
+    required_tags = Column(JSON, nullable=True)
+    
     # Status
     status = Column(String(20), nullable=False, default="active")
     
@@ -82,6 +86,8 @@ class Job(Base):
     # Unique constraint for tenant + name
     __table_args__ = (
         UniqueConstraint("tenant_id", "name", name="uq_job_tenant_name"),
+        # Jobs triggered by a schedule firing
+        Index("ix_jobs_schedule", schedule_id, postgresql_where=(status == "active")),
     )
     
     def __repr__(self):
@@ -142,6 +148,13 @@ class JobExecution(Base):
     created_at = Column(DateTime, nullable=False, default=func.now())
     updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
     
+    # Indexes for analytics, per-agent and per-job execution lookups
+    __table_args__ = (
+        Index("ix_job_executions_tenant_created", tenant_id, created_at),
+        Index("ix_job_executions_agent_status", agent_id, status),
+        Index("ix_job_executions_job_status", job_id, status),
+    )
+    
     def __repr__(self):
         """String representation of the job execution"""
         return f"<JobExecution {self.execution_id} - {self.status}>"
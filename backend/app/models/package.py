@@ -42,6 +42,9 @@ class Package(Base):
     entry_point = Column(String(255), nullable=False)
     md5_hash = Column(String(32), nullable=True)
     
+    # Files of the package as {path, sha256, size} entries, content in the tenant's blob store
+    manifest = Column(JSON, nullable=True)
+    
     # Package metadata
     dependencies = Column(JSON, nullable=True)
     tags = Column(JSON, nullable=True)
@@ -8,7 +8,7 @@ job prioritization, queuing, and execution.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, Text, Integer, SmallInteger, BigInteger, JSON, ForeignKey, UniqueConstraint, Index, DDL, event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -103,6 +103,9 @@ class QueueItem(Base):
     assigned_to = Column(UUID(as_uuid=True), ForeignKey("agents.agent_id"), nullable=True)
     agent = relationship("Agent")
     
+    # Lease expiry for claimed items (expired leases are returned to pending)
+    lease_expires_at = Column(DateTime, nullable=True)
+    
     # Scheduling
     due_date = Column(DateTime, nullable=True)
     
@@ -114,6 +117,149 @@ class QueueItem(Base):
     # Relationships
     job_executions = relationship("JobExecution", back_populates="queue_item")
     
+    # Indexes matching the dispatcher, lease sweep and statistics predicates
+    __table_args__ = (
+        Index(
+            "ix_queue_items_claim",
+            tenant_id, priority.desc(), created_at,
+            postgresql_where=(status == "pending") & assigned_to.is_(None)
+        ),
+        Index(
+            "ix_queue_items_queue_pending",
+            queue_id, created_at,
+            postgresql_where=(status == "pending")
+        ),
+        Index(
+            "ix_queue_items_lease",
+            lease_expires_at,
+            postgresql_where=status.in_(["processing", "assigned"])
+        ),
+        Index("ix_queue_items_queue_status", queue_id, status),
+    )
+    
     def __repr__(self):
         """String representation of the queue item"""
-        return f"<QueueItem {self.item_id} - {self.status}>"
\ No newline at end of file
+        return f"<QueueItem {self.item_id} - {self.status}>"
+
+# Counter rows per queue. Writers pick a stripe by backend, so concurrent
+# transactions on one queue rarely wait on the same counter row.
+QUEUE_COUNTER_STRIPES = 16
+
+class QueueCounter(Base):
+    """
+    Per-queue item counters, striped over several rows.
+    
+    Maintained transactionally by statement-level triggers on queue_items so
+    that queue statistics can be read by summing a few rows instead of
+    scanning the items table. A stripe's counts can be negative; only the sum
+    over a queue's stripes is meaningful.
+    """
+    
+    __tablename__ = "queue_item_counters"
+    
+    # Primary key
+    queue_id = Column(UUID(as_uuid=True), ForeignKey("queues.queue_id", ondelete="CASCADE"), primary_key=True)
+    stripe = Column(SmallInteger, primary_key=True, default=0)
+    
+    # Tenant foreign key
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.tenant_id"), nullable=False)
+    
+    # Item counts by status ("processing" also covers "assigned" items)
+    total_items = Column(Integer, nullable=False, default=0)
+    pending_items = Column(Integer, nullable=False, default=0)
+    processing_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    cancelled_items = Column(Integer, nullable=False, default=0)
+    
+    # Running totals for the average processing time
+    processing_time_total_ms = Column(BigInteger, nullable=False, default=0)
+    processing_time_count = Column(Integer, nullable=False, default=0)
+    
+    # Audit fields
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        """String representation of the queue counter"""
+        return f"<QueueCounter {self.queue_id} - {self.total_items} items>"
+
+# Upsert applying the signed per-status deltas of one statement to the counters
+_COUNTER_UPSERT_SQL = """
+        INSERT INTO queue_item_counters AS c (
+            queue_id, stripe, tenant_id, total_items, pending_items, processing_items,
+            completed_items, failed_items, cancelled_items,
+            processing_time_total_ms, processing_time_count, updated_at
+        )
+        SELECT
+            d.queue_id,
+            pg_backend_pid() % {stripes},
+            d.tenant_id,
+            SUM(d.sign),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.status = 'pending'), 0),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.status IN ('processing', 'assigned')), 0),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.status = 'completed'), 0),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.status = 'failed'), 0),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.status = 'cancelled'), 0),
+            COALESCE(SUM(d.sign * d.processing_time_ms), 0),
+            COALESCE(SUM(d.sign) FILTER (WHERE d.processing_time_ms IS NOT NULL), 0),
+            NOW()
+        FROM ({delta}) AS d
+        GROUP BY d.queue_id, d.tenant_id
+        ON CONFLICT (queue_id, stripe) DO UPDATE SET
+            total_items = c.total_items + EXCLUDED.total_items,
+            pending_items = c.pending_items + EXCLUDED.pending_items,
+            processing_items = c.processing_items + EXCLUDED.processing_items,
+            completed_items = c.completed_items + EXCLUDED.completed_items,
+            failed_items = c.failed_items + EXCLUDED.failed_items,
+            cancelled_items = c.cancelled_items + EXCLUDED.cancelled_items,
+            processing_time_total_ms = c.processing_time_total_ms + EXCLUDED.processing_time_total_ms,
+            processing_time_count = c.processing_time_count + EXCLUDED.processing_time_count,
+            updated_at = EXCLUDED.updated_at;"""
+
+# Net UPDATE delta: unchanged rows cancel out within their group. A join of
+# old_rows and new_rows would be planned once per session and can turn into
+# a nested loop over the transition tables on large set-based updates.
+_UPDATE_DELTA = (
+    "SELECT queue_id, tenant_id, status, processing_time_ms, SUM(sign) AS sign FROM ("
+    "SELECT queue_id, tenant_id, status, processing_time_ms, 1 AS sign FROM new_rows "
+    "UNION ALL "
+    "SELECT queue_id, tenant_id, status, processing_time_ms, -1 AS sign FROM old_rows"
+    ") AS r GROUP BY queue_id, tenant_id, status, processing_time_ms "
+    "HAVING SUM(sign) <> 0"
+)
+
+QUEUE_ITEM_COUNTER_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION apply_queue_item_counter_deltas() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_COUNTER_UPSERT_SQL.format(stripes=QUEUE_COUNTER_STRIPES, delta=
+        "SELECT queue_id, tenant_id, status, processing_time_ms, 1 AS sign FROM new_rows")}
+    ELSIF TG_OP = 'DELETE' THEN{_COUNTER_UPSERT_SQL.format(stripes=QUEUE_COUNTER_STRIPES, delta=
+        "SELECT queue_id, tenant_id, status, processing_time_ms, -1 AS sign FROM old_rows")}
+    ELSE{_COUNTER_UPSERT_SQL.format(stripes=QUEUE_COUNTER_STRIPES, delta=_UPDATE_DELTA)}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS queue_item_counters_insert ON queue_items;
+CREATE TRIGGER queue_item_counters_insert AFTER INSERT ON queue_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_queue_item_counter_deltas();
+
+DROP TRIGGER IF EXISTS queue_item_counters_update ON queue_items;
+CREATE TRIGGER queue_item_counters_update AFTER UPDATE ON queue_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_queue_item_counter_deltas();
+
+DROP TRIGGER IF EXISTS queue_item_counters_delete ON queue_items;
+CREATE TRIGGER queue_item_counters_delete AFTER DELETE ON queue_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_queue_item_counter_deltas();
+"""
+
+# Install (or refresh) the counter triggers whenever tables are created
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(QUEUE_ITEM_COUNTER_TRIGGER_SQL).execute_if(dialect="postgresql")
+)
\ No newline at end of file
@@ -8,7 +8,7 @@ based on time schedules.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -65,8 +65,64 @@ class Schedule(Base):
     # Unique constraint for tenant + name
     __table_args__ = (
         UniqueConstraint("tenant_id", "name", name="uq_schedule_tenant_name"),
+        # Due schedule scan and upcoming schedules on the dashboard
+        Index("ix_schedules_due", next_execution, postgresql_where=(status == "active")),
+        Index("ix_schedules_tenant_next", tenant_id, next_execution, postgresql_where=(status == "active")),
+        # Incremental pick-up of edited schedules by the scheduler worker
+        Index("ix_schedules_updated_at", updated_at),
     )
     
     def __repr__(self):
         """String representation of the schedule"""
-        return f"<Schedule {self.name} ({self.schedule_id})>"
\ No newline at end of file
+        return f"<Schedule {self.name} ({self.schedule_id})>"
+
+class SchedulerInstance(Base):
+    """
+    Scheduler worker instance.
+    
+    Every scheduler worker heartbeats its row. Schedule shards are spread
+    across the instances whose heartbeat is recent.
+    """
+    
+    __tablename__ = "scheduler_instances"
+    
+    # Primary key
+    instance_id = Column(String(255), primary_key=True)
+    
+    # Instance information
+    hostname = Column(String(255), nullable=True)
+    
+    # Liveness
+    started_at = Column(DateTime, nullable=False, default=func.now())
+    heartbeat_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        """String representation of the scheduler instance"""
+        return f"<SchedulerInstance {self.instance_id}>"
+
+class ScheduleFireTime(Base):
+    """
+    Precomputed upcoming fire time of a schedule.
+    
+    Every active schedule keeps its next SCHEDULER_PRECOMPUTED_FIRES fire
+    times here, starting at its next_execution, so the scheduler and the
+    dashboard read fire times instead of evaluating cron expressions.
+    """
+    
+    __tablename__ = "schedule_fire_times"
+    
+    # Primary key
+    schedule_id = Column(UUID(as_uuid=True), ForeignKey("schedules.schedule_id", ondelete="CASCADE"), primary_key=True)
+    fire_time = Column(DateTime, primary_key=True)
+    
+    # Tenant foreign key
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.tenant_id"), nullable=False)
+    
+    # Upcoming fires of a tenant in time order
+    __table_args__ = (
+        Index("ix_schedule_fire_times_tenant_time", tenant_id, fire_time),
+    )
+    
+    def __repr__(self):
+        """String representation of the schedule fire time"""
+        return f"<ScheduleFireTime {self.schedule_id} at {self.fire_time}>"
\ No newline at end of file
@@ -8,7 +8,7 @@ in the orchestration system.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, JSON, UUID, Integer
+from sqlalchemy import Column, String, DateTime, JSON, UUID, Integer, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -53,4 +53,29 @@ class Tenant(Base):
     
     def __repr__(self):
         """String representation of the tenant"""
-        return f"<Tenant {self.name} ({self.tenant_id})>"
\ No newline at end of file
+        return f"<Tenant {self.name} ({self.tenant_id})>"
+
+class TenantQuotaCounter(Base):
+    """
+    Per-tenant resource usage counters.
+    
+    Quota slots are reserved and released with conditional updates of a
+    single row per tenant and resource, so admission checks don't count
+    the resources' tables.
+    """
+    
+    __tablename__ = "tenant_quota_counters"
+    
+    # Primary key
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.tenant_id", ondelete="CASCADE"), primary_key=True)
+    resource = Column(String(50), primary_key=True)
+    
+    # Reserved slots
+    used = Column(Integer, nullable=False, default=0)
+    
+    # Audit fields
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        """String representation of the counter"""
+        return f"<TenantQuotaCounter {self.tenant_id} - {self.resource}: {self.used}>"
\ No newline at end of file
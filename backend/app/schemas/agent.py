@@ -155,4 +155,38 @@ class AgentRegistrationResponse(BaseModel):
     
     class Config:
         """Pydantic config."""
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AgentMetricBucket(BaseModel):
+    """Schema for a bucket of downsampled agent metrics"""
+    bucket_start: datetime
+    samples: int
+    cpu_percent_avg: Optional[float] = None
+    cpu_percent_min: Optional[float] = None
+    cpu_percent_max: Optional[float] = None
+    memory_percent_avg: Optional[float] = None
+    memory_percent_min: Optional[float] = None
+    memory_percent_max: Optional[float] = None
+    disk_percent_avg: Optional[float] = None
+    disk_percent_min: Optional[float] = None
+    disk_percent_max: Optional[float] = None
+    active_jobs_avg: Optional[float] = None
+    active_jobs_min: Optional[float] = None
+    active_jobs_max: Optional[float] = None
+    
+    class Config:
+        """Configuration for Pydantic model"""
+        from_attributes = True
+
+class AgentMetricSeriesResponse(BaseModel):
+    """Schema for the metrics history of an agent"""
+    agent_id: uuid.UUID
+    resolution: str
+    buckets: List[AgentMetricBucket] = []
+
+class AgentMetricPercentilesResponse(BaseModel):
+    """Schema for metric percentiles of an agent or a fleet"""
+    source: str = Field(..., description="raw for exact percentiles over samples, else the resolution of the bucket averages used")
+    points: int = Field(..., description="Samples or buckets the percentiles are computed from")
+    agents: int
+    metrics: Dict[str, Dict[str, Optional[float]]] = Field(..., description="Percentiles by metric and key, e.g. p95")
\ No newline at end of file
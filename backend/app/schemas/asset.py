@@ -111,6 +111,16 @@ class AssetValueResponse(BaseModel):
     value: Optional[str] = None
     version: int
 
+class AssetResolveRequest(BaseModel):
+    """Schema for resolving several assets by ID or name in one request"""
+    asset_ids: List[str] = Field(default_factory=list, max_items=200)
+    names: List[str] = Field(default_factory=list, max_items=200)
+
+class AssetResolveResponse(BaseModel):
+    """Schema for resolved assets"""
+    assets: List[AssetValueResponse] = []
+    missing: List[str] = []  # Requested IDs and names not found
+
 class AssetPermissionBase(BaseModel):
     """Base schema for asset permission data"""
     role_id: UUID
@@ -0,0 +1,41 @@
+"""
+Dead-letter schemas for the orchestrator API.
+
+This module defines Pydantic models for inspecting and replaying
+dead-lettered broker messages.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+class DeadLetterMessage(BaseModel):
+    """Schema for a dead-lettered message"""
+    message_id: Optional[str] = None
+    correlation_id: Optional[str] = None
+    message_type: Optional[str] = None
+    original_queue: Optional[str] = None
+    original_exchange: Optional[str] = None
+    original_routing_key: Optional[str] = None
+    attempts: int = 0
+    reason: Optional[str] = None  # "max_attempts", "poison" or "decode_error"
+    last_error: Optional[str] = None
+    dead_lettered_at: Optional[str] = None
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+class DeadLetterQueueResponse(BaseModel):
+    """Schema for the dead-lettered messages of a queue"""
+    queue_name: str
+    message_count: int
+    messages: List[DeadLetterMessage]
+
+class DeadLetterReplayRequest(BaseModel):
+    """Schema for replaying dead-lettered messages"""
+    message_ids: Optional[List[str]] = Field(None, description="Messages to replay (all if omitted)")
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of messages to replay")
+
+class DeadLetterOperationResponse(BaseModel):
+    """Schema for the result of a dead-letter operation"""
+    queue_name: str
+    message_count: int
@@ -20,6 +20,8 @@ class JobBase(BaseModel):
     retry_count: Optional[int] = 0
     retry_delay_seconds: Optional[int] = 60
     parameters: Optional[Dict[str, Any]] = None
+    required_capabilities: Optional[Dict[str, Any]] = None
+    required_tags: Optional[List[str]] = None
 
 class JobCreate(JobBase):
     """Schema for creating a new job"""
@@ -48,6 +50,8 @@ class JobUpdate(BaseModel):
     retry_count: Optional[int] = None
     retry_delay_seconds: Optional[int] = None
     parameters: Optional[Dict[str, Any]] = None
+    required_capabilities: Optional[Dict[str, Any]] = None
+    required_tags: Optional[List[str]] = None
     status: Optional[str] = None
 
 class JobResponse(BaseModel):
@@ -65,6 +69,8 @@ class JobResponse(BaseModel):
     retry_count: int
     retry_delay_seconds: int
     parameters: Optional[Dict[str, Any]] = None
+    required_capabilities: Optional[Dict[str, Any]] = None
+    required_tags: Optional[List[str]] = None
     status: str
     created_at: datetime
     updated_at: datetime
@@ -69,6 +69,37 @@ class PackageUpload(BaseModel):
     entry_point: str
     overwrite: Optional[bool] = False
 
+class PackageManifestEntry(BaseModel):
+    """Schema for a file of a package manifest"""
+    path: str
+    sha256: str
+    size: int
+
+class PackageManifestResponse(BaseModel):
+    """Schema for package manifest response"""
+    package_id: uuid.UUID
+    name: str
+    version: str
+    entry_point: str
+    files: List[PackageManifestEntry]
+
+class PackageDownloadUrlResponse(BaseModel):
+    """Schema for presigned package download URL response"""
+    package_id: uuid.UUID
+    url: str
+    expires_in: int = Field(..., description="Seconds until the URL expires")
+    size: int
+    md5_hash: Optional[str] = None
+
+class PackageBlobUrlsRequest(BaseModel):
+    """Schema for presigned package file download URLs request"""
+    digests: List[str] = Field(..., max_items=10000, description="SHA-256 of the files")
+
+class PackageBlobUrlsResponse(BaseModel):
+    """Schema for presigned package file download URLs response"""
+    urls: Dict[str, str] = Field(..., description="Download URL by SHA-256")
+    expires_in: int = Field(..., description="Seconds until the URLs expire")
+
 class PackageDeployment(BaseModel):
     """Schema for package deployment"""
     package_id: uuid.UUID
@@ -90,6 +90,7 @@ class QueueItemInDBBase(QueueItemBase):
     next_processing_time: Optional[datetime] = None
     error_message: Optional[str] = None
     assigned_to: Optional[uuid.UUID] = None
+    lease_expires_at: Optional[datetime] = None
     
     class Config:
         """Configuration for Pydantic model"""
@@ -114,6 +115,19 @@ class QueueStats(BaseModel):
     oldest_pending_item: Optional[datetime] = None
     newest_pending_item: Optional[datetime] = None
 
+class QueueItemRejection(BaseModel):
+    """Schema for a row rejected by bulk ingestion"""
+    row: int
+    reference_id: Optional[str] = None
+    error: str
+
+class QueueItemIngestResponse(BaseModel):
+    """Schema for bulk queue item ingestion response"""
+    accepted_count: int
+    rejected_count: int
+    rejections: List[QueueItemRejection] = []
+    rejections_truncated: bool = False
+
 class QueueBulkOperationRequest(BaseModel):
     """Schema for bulk queue operation request"""
     item_ids: List[uuid.UUID] = Field(..., min_items=1)
@@ -127,8 +141,33 @@ class QueueBulkOperationRequest(BaseModel):
             raise ValueError(f"Invalid operation. Must be one of: {', '.join(valid_operations)}")
         return v
 
+class QueueBulkFilterOperationRequest(BaseModel):
+    """Schema for bulk queue operation on the items matching a filter"""
+    operation: str = Field(..., description="Operation to perform (cancel, retry, delete)")
+    status: Optional[str] = None
+    created_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+    
+    @validator("operation")
+    def validate_operation(cls, v):
+        """Validate operation"""
+        valid_operations = ["cancel", "retry", "delete"]
+        if v not in valid_operations:
+            raise ValueError(f"Invalid operation. Must be one of: {', '.join(valid_operations)}")
+        return v
+    
+    @validator("status")
+    def validate_status(cls, v):
+        """Validate status"""
+        valid_statuses = ["pending", "processing", "completed", "failed", "cancelled"]
+        if v and v not in valid_statuses:
+            raise ValueError(f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+        return v
+
 class QueueBulkOperationResponse(BaseModel):
     """Schema for bulk queue operation response"""
     success_count: int
     failure_count: int
-    errors: Optional[Dict[str, str]] = None
\ No newline at end of file
+    errors: Optional[Dict[str, str]] = None
+    failure_reasons: Optional[Dict[str, int]] = None
\ No newline at end of file
@@ -12,10 +12,10 @@ import logging
 import uuid
 import secrets
 import string
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any, Tuple
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, BackgroundTasks, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
 
@@ -27,9 +27,18 @@ from app.schemas.agent import (
     AgentCommandRequest
 )
 from app.messaging.producer import MessageProducer
+from app.utils.security import hash_api_key, api_key_prefix
+from app.services.queue_service import publish_dispatch_event
+from app.services.agent_service import AgentService
+from app.services.agent_scheduler import get_agent_scheduler
+from app.services.quota_service import QuotaService, QuotaExceededError, AGENTS
+from app.services.heartbeat_aggregator import get_heartbeat_aggregator
 
 logger = logging.getLogger(__name__)
 
+# Agent statuses that become offline when heartbeats stop
+STALE_AGENT_STATUSES = ["online", "busy", "starting"]
+
 class AgentManager:
     """Agent manager service for handling agent operations"""
     
@@ -96,14 +105,18 @@ class AgentManager:
         agent_dict["created_at"] = datetime.now(timezone.utc)
         agent_dict["updated_at"] = datetime.now(timezone.utc)
         
+        new_agent = Agent(**agent_dict)
+        
         # Generate API key for agent authentication
-        api_key = self._generate_api_key()
-        agent_dict["api_key"] = api_key
+        api_key = self._set_api_key(new_agent)
+        
+        # Take one of the tenant's agent slots
+        self._reserve_agent_slot(tenant_id)
         
-        new_agent = Agent(**agent_dict)
         self.db.add(new_agent)
         self.db.commit()
         self.db.refresh(new_agent)
+        new_agent.api_key = api_key
         
         # Log agent creation
         self._log_agent_activity(
@@ -229,8 +242,9 @@ class AgentManager:
                 AgentLog.agent_id == agent_id
             ).delete()
             
-            # Delete agent
+            # Delete agent and free its slot
             self.db.delete(agent)
+            QuotaService(self.db).release(tenant_id, AGENTS)
             
             # Create audit log
             self._create_audit_log(
@@ -303,12 +317,13 @@ class AgentManager:
         }
         
         try:
-            # Send command to agent - fix the bug in parameter naming
-            self.message_producer.send_message(
+            # Send command to agent
+            if not self.message_producer.send_message_sync(
                 exchange="agents",
                 routing_key=f"agent.{agent_id}.command",
-                message_data=message  # Changed from 'message' to 'message_data'
-            )
+                message_data=message
+            ):
+                raise RuntimeError("Message broker did not accept the command")
             
             # Update agent status based on command
             if command.command_type == "start":
@@ -354,7 +369,8 @@ class AgentManager:
                 detail=f"Failed to send command: {str(e)}"
             )
     
-    def register_agent(self, registration_data: AgentCreate, tenant_id: str) -> Agent:
+    def register_agent(self, registration_data: AgentCreate, tenant_id: str,
+                       background_tasks: Optional[BackgroundTasks] = None) -> Agent:
         """Register an agent from an agent itself."""
         # Check if agent already exists by machine ID
         existing_agent = self.db.query(Agent).filter(
@@ -363,6 +379,8 @@ class AgentManager:
         ).first()
         
         if existing_agent:
+            old_status = existing_agent.status
+            
             # Update existing agent
             agent_dict = registration_data.dict(exclude_unset=True, exclude={"tenant_id"})
             
@@ -375,8 +393,12 @@ class AgentManager:
             existing_agent.last_heartbeat = datetime.now(timezone.utc)
             existing_agent.updated_at = datetime.now(timezone.utc)
             
+            # Only the key's hash is stored, so the agent gets a new key
+            api_key = self._set_api_key(existing_agent)
+            
             self.db.commit()
             self.db.refresh(existing_agent)
+            existing_agent.api_key = api_key
             
             # Log agent update
             self._log_agent_activity(
@@ -391,6 +413,11 @@ class AgentManager:
                 }
             )
             
+            # Let the scheduler and queue worker pick up the agent
+            get_agent_scheduler().update_agent(existing_agent)
+            if old_status != "online":
+                self._notify_agent_available(existing_agent, background_tasks)
+            
             return existing_agent
         else:
             # Create new agent
@@ -401,14 +428,18 @@ class AgentManager:
             agent_dict["created_at"] = datetime.now(timezone.utc)
             agent_dict["updated_at"] = datetime.now(timezone.utc)
             
+            new_agent = Agent(**agent_dict)
+            
             # Generate API key for agent authentication
-            api_key = self._generate_api_key()
-            agent_dict["api_key"] = api_key
+            api_key = self._set_api_key(new_agent)
+            
+            # Take one of the tenant's agent slots
+            self._reserve_agent_slot(tenant_id)
             
-            new_agent = Agent(**agent_dict)
             self.db.add(new_agent)
             self.db.commit()
             self.db.refresh(new_agent)
+            new_agent.api_key = api_key
             
             # Log agent creation
             self._log_agent_activity(
@@ -424,46 +455,54 @@ class AgentManager:
                 }
             )
             
+            # Let the scheduler and queue worker pick up the agent
+            get_agent_scheduler().update_agent(new_agent)
+            self._notify_agent_available(new_agent, background_tasks)
+            
             return new_agent
     
     def update_heartbeat(self, agent_id: str, tenant_id: str, 
-                        heartbeat: AgentHeartbeatRequest) -> Optional[Agent]:
-        """Update agent heartbeat."""
+                        heartbeat: AgentHeartbeatRequest,
+                        agent: Optional[Agent] = None) -> Optional[Agent]:
+        """
+        Update agent heartbeat.
+        
+        The beat is buffered by the heartbeat aggregator and written with the
+        beats of other agents. A status change is written right away and
+        logged and published once it is.
+        
+        Args:
+            agent_id: Agent ID
+            tenant_id: Tenant ID
+            heartbeat: Heartbeat data
+            agent: The agent, if already loaded
+            
+        Returns:
+            Optional[Agent]: Agent, or None if not found
+        """
         # Get agent
-        agent = self.get_agent(agent_id, tenant_id)
+        if agent is None:
+            agent = self.get_agent(agent_id, tenant_id)
         if not agent:
             logger.warning(f"Agent not found for heartbeat: {agent_id}")
             return None
         
-        # Check if status changed
-        old_status = agent.status
         new_status = heartbeat.status if heartbeat.status else "online"
         
-        # Update agent
-        agent.last_heartbeat = datetime.now(timezone.utc)
-        agent.status = new_status
-        agent.updated_at = datetime.now(timezone.utc)
-        
-        # Update capabilities if provided
-        if heartbeat.capabilities:
-            agent.capabilities = heartbeat.capabilities
-            
-        # Update IP address if provided
-        if heartbeat.ip_address:
-            agent.ip_address = heartbeat.ip_address
-            
-        self.db.commit()
-        self.db.refresh(agent)
+        get_heartbeat_aggregator().record(
+            agent.agent_id,
+            agent.tenant_id,
+            new_status,
+            metrics=heartbeat.metrics,
+            capabilities=heartbeat.capabilities,
+            ip_address=heartbeat.ip_address,
+            current_status=agent.status
+        )
         
-        # Log status change if needed
-        if old_status != new_status:
-            self._log_agent_activity(
-                agent.agent_id,
-                tenant_id,
-                "info",
-                f"Agent status changed from {old_status} to {new_status}",
-                {"old_status": old_status, "new_status": new_status}
-            )
+        # Keep the scheduler's view of the agent's load current, status
+        # changes update it once written
+        if agent.status == new_status:
+            get_agent_scheduler().update_agent(agent, heartbeat.metrics)
             
         return agent
     
@@ -591,49 +630,34 @@ class AgentManager:
         """
         Check for stale agents and mark them as offline.
         
+        Busy and starting agents, and agents that never sent a heartbeat,
+        can become stale too. Their claimed queue items and active job
+        executions are re-queued, see AgentService.check_stale_agents.
+        
         Args:
             max_silence_minutes: Maximum silence time in minutes
-            
+        
         Returns:
             int: Number of agents marked offline
         """
-        cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=max_silence_minutes)
-        
-        # Find stale agents
-        stale_agents = self.db.query(Agent).filter(
-            Agent.status.in_(["online", "busy", "starting"]),
-            or_(
-                Agent.last_heartbeat < cutoff_time,
-                Agent.last_heartbeat.is_(None)
-            )
-        ).all()
-        
-        # Update status to offline
-        count = 0
-        for agent in stale_agents:
-            old_status = agent.status
-            agent.status = "offline"
-            agent.updated_at = datetime.now(timezone.utc)
-            
-            # Log status change
-            self._log_agent_activity(
-                agent.agent_id,
-                agent.tenant_id,
-                "warning",
-                f"Agent marked offline due to inactivity: {agent.name}",
-                {
-                    "last_heartbeat": agent.last_heartbeat.isoformat() if agent.last_heartbeat else None,
-                    "silence_minutes": max_silence_minutes,
-                    "old_status": old_status
-                }
+        return AgentService(self.db).check_stale_agents(
+            max_silence_minutes,
+            statuses=STALE_AGENT_STATUSES,
+            include_never_seen=True
+        )
+    
+    def _notify_agent_available(self, agent: Agent,
+                                background_tasks: Optional[BackgroundTasks] = None) -> None:
+        """Publish an agent availability event to trigger a queue dispatch."""
+        try:
+            publish_dispatch_event(
+                "agent_available",
+                str(agent.tenant_id),
+                {"agent_id": str(agent.agent_id)},
+                background_tasks
             )
-            
-            count += 1
-        
-        if count > 0:
-            self.db.commit()
-            
-        return count
+        except Exception as e:
+            logger.error(f"Failed to publish availability of agent {agent.agent_id}: {str(e)}")
     
     def _generate_api_key(self) -> str:
         """
@@ -647,6 +671,40 @@ class AgentManager:
             for _ in range(40)
         )
     
+    def _set_api_key(self, agent: Agent) -> str:
+        """
+        Generate a new API key for an agent and store its prefix and hash.
+        
+        Args:
+            agent: Agent
+            
+        Returns:
+            str: Generated API key, only available until the response is sent
+        """
+        api_key = self._generate_api_key()
+        agent.api_key_prefix = api_key_prefix(api_key)
+        agent.api_key_hash = hash_api_key(api_key)
+        return api_key
+    
+    def _reserve_agent_slot(self, tenant_id: str) -> None:
+        """
+        Reserve one of the tenant's agent slots. Does not commit.
+        
+        Args:
+            tenant_id: Tenant ID
+            
+        Raises:
+            HTTPException: If the tenant has reached its agent limit
+        """
+        try:
+            QuotaService(self.db).reserve(tenant_id, AGENTS)
+        except QuotaExceededError as e:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Agent limit of {e.limit} reached for this tenant"
+            )
+    
     def _log_agent_activity(self, agent_id: uuid.UUID, tenant_id: str, 
                           log_level: str, message: str, 
                           metadata: Optional[Dict[str, Any]] = None) -> AgentLog:
@@ -0,0 +1,461 @@
+"""
+Agent metrics service for the resource usage history of agents.
+
+Heartbeat metrics are appended to agent_metric_samples, a table partitioned
+by day, and downsampled into agent_metric_rollups at one minute, one hour and
+one day resolution. Each resolution is kept for its own retention period, so
+recent data is detailed and old data stays small. Percentiles are exact over
+raw samples and approximate, over bucket averages, beyond raw retention.
+"""
+
+import math
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import AgentMetricSample, AgentMetricRollup
+from ..models.agent_metrics import AGENT_METRICS
+
+logger = logging.getLogger(__name__)
+
+# Rollup resolutions: date_trunc unit, bucket length and source resolution
+# ("raw" for samples)
+RESOLUTIONS = {
+    "1m": ("minute", timedelta(minutes=1), "raw"),
+    "1h": ("hour", timedelta(hours=1), "1m"),
+    "1d": ("day", timedelta(days=1), "1h"),
+}
+
+# Percentiles returned unless others are requested
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Name of the default partition and prefix of the daily partitions
+SAMPLES_TABLE = AgentMetricSample.__tablename__
+DEFAULT_PARTITION = f"{SAMPLES_TABLE}_default"
+PARTITION_PREFIX = f"{SAMPLES_TABLE}_p"
+
+# Key of the advisory lock held by the instance doing the maintenance
+MAINTENANCE_LOCK_KEY = 0x6167656E746D6574
+
+# Lock wait of partition drops, which would otherwise queue every sample
+# insert behind them while waiting for readers of the samples table
+PARTITION_DROP_LOCK_TIMEOUT = "5s"
+
+_ROLLUP_COLUMNS = ", ".join(f"{metric}_{aggregate}" for metric in AGENT_METRICS for aggregate in ("avg", "min", "max"))
+
+_ROLLUP_UPDATES = ", ".join(
+    ["tenant_id = EXCLUDED.tenant_id", "samples = EXCLUDED.samples"]
+    + [f"{metric}_{aggregate} = EXCLUDED.{metric}_{aggregate}" for metric in AGENT_METRICS for aggregate in ("avg", "min", "max")]
+)
+
+def _rollup_sql(resolution: str) -> Any:
+    """
+    Build the statement computing the buckets of a resolution in a time range.
+    
+    Buckets are recomputed from their source, so the statement is idempotent
+    and late samples are picked up by running it again. Averages of coarser
+    buckets are weighted by the samples of their source buckets.
+    
+    Args:
+        resolution: Target resolution
+    
+    Returns:
+        TextClause: Statement with :start and :end parameters
+    """
+    unit, _, source = RESOLUTIONS[resolution]
+    
+    if source == "raw":
+        bucket = f"date_trunc('{unit}', recorded_at)"
+        aggregates = ", ".join(
+            f"avg({metric}), min({metric}), max({metric})" for metric in AGENT_METRICS
+        )
+        selection = f"""
+            SELECT agent_id, '{resolution}', {bucket}, tenant_id, count(*), {aggregates}
+            FROM {SAMPLES_TABLE}
+            WHERE recorded_at >= :start AND recorded_at < :end
+        """
+    else:
+        bucket = f"date_trunc('{unit}', bucket_start)"
+        aggregates = ", ".join(
+            f"sum({metric}_avg * samples) / nullif(sum(samples) FILTER (WHERE {metric}_avg IS NOT NULL), 0), "
+            f"min({metric}_min), max({metric}_max)"
+            for metric in AGENT_METRICS
+        )
+        selection = f"""
+            SELECT agent_id, '{resolution}', {bucket}, tenant_id, sum(samples), {aggregates}
+            FROM {AgentMetricRollup.__tablename__}
+            WHERE resolution = '{source}' AND bucket_start >= :start AND bucket_start < :end
+        """
+    
+    return text(f"""
+        INSERT INTO {AgentMetricRollup.__tablename__} (agent_id, resolution, bucket_start, tenant_id, samples, {_ROLLUP_COLUMNS})
+        {selection}
+        GROUP BY agent_id, tenant_id, {bucket}
+        ON CONFLICT (agent_id, resolution, bucket_start) DO UPDATE SET {_ROLLUP_UPDATES}
+    """)
+
+ROLLUP_SQL = {resolution: _rollup_sql(resolution) for resolution in RESOLUTIONS}
+
+def truncate(moment: datetime, resolution: str) -> datetime:
+    """
+    Get the start of the bucket of a resolution containing a time.
+    
+    Args:
+        moment: Naive UTC time
+        resolution: Rollup resolution
+    
+    Returns:
+        datetime: Bucket start
+    """
+    if resolution == "1m":
+        return moment.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def retention(resolution: str) -> timedelta:
+    """Get the retention period of a resolution, "raw" for samples"""
+    days = {
+        "raw": settings.AGENT_METRICS_RAW_RETENTION_DAYS,
+        "1m": settings.AGENT_METRICS_1M_RETENTION_DAYS,
+        "1h": settings.AGENT_METRICS_1H_RETENTION_DAYS,
+        "1d": settings.AGENT_METRICS_1D_RETENTION_DAYS,
+    }[resolution]
+    return timedelta(days=days)
+
+def percentile_key(fraction: float) -> str:
+    """Get the result key of a percentile, e.g. p95 for 0.95"""
+    return f"p{fraction * 100:g}"
+
+def _number(value: Any) -> Optional[float]:
+    """Convert a reported metric to a finite number, None if it is not one"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+class AgentMetricsService:
+    """Service for storing and querying agent resource metrics"""
+    
+    def __init__(self, db: Session):
+        """
+        Initialize the agent metrics service.
+        
+        Args:
+            db: Database session
+        """
+        self.db = db
+    
+    def record_samples(self, samples: Iterable[Tuple[Any, Any, datetime, Optional[Dict[str, Any]]]]) -> int:
+        """
+        Append heartbeat metrics as samples, in one statement.
+        
+        Metrics that are missing or not numbers are stored as NULL, and
+        heartbeats without any of the metrics are skipped.
+        
+        Args:
+            samples: Agent ID, tenant ID, heartbeat time and metrics of each heartbeat
+        
+        Returns:
+            int: Number of samples stored
+        """
+        rows = []
+        for agent_id, tenant_id, recorded_at, metrics in samples:
+            if not metrics:
+                continue
+            
+            values = {metric: _number(metrics.get(metric)) for metric in AGENT_METRICS}
+            if all(value is None for value in values.values()):
+                continue
+            
+            if values["active_jobs"] is not None:
+                values["active_jobs"] = int(values["active_jobs"])
+            
+            rows.append({"agent_id": agent_id, "tenant_id": tenant_id, "recorded_at": recorded_at, **values})
+        
+        if rows:
+            # A beat recorded twice at the same time is stored once
+            self.db.execute(pg_insert(AgentMetricSample).on_conflict_do_nothing(), rows)
+            self.db.commit()
+        
+        return len(rows)
+    
+    def try_lock_maintenance(self) -> bool:
+        """
+        Take the maintenance lock for the current transaction.
+        
+        Returns:
+            bool: True if no other instance is doing the maintenance
+        """
+        return bool(self.db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": MAINTENANCE_LOCK_KEY}
+        ).scalar())
+    
+    def ensure_partitions(self, today: datetime) -> List[str]:
+        """
+        Create the default partition and the daily partitions from today on.
+        
+        Samples outside the daily partitions land in the default partition. A
+        day whose samples already landed there cannot get its own partition
+        and is skipped.
+        
+        Args:
+            today: Current naive UTC time
+        
+        Returns:
+            List[str]: Names of the partitions created
+        """
+        existing = set(self._partitions())
+        created = []
+        
+        if DEFAULT_PARTITION not in existing:
+            self.db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {SAMPLES_TABLE} DEFAULT"))
+            created.append(DEFAULT_PARTITION)
+        
+        first_day = truncate(today, "1d")
+        for offset in range(settings.AGENT_METRICS_PARTITIONS_AHEAD + 1):
+            day = first_day + timedelta(days=offset)
+            name = f"{PARTITION_PREFIX}{day:%Y%m%d}"
+            if name in existing:
+                continue
+            
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {SAMPLES_TABLE} "
+                        f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                logger.warning(f"Cannot create metric sample partition {name}: {e}")
+        
+        return created
+    
+    def rollup(self, resolution: str, start: datetime, end: datetime) -> int:
+        """
+        Compute the buckets of a resolution whose source data lies in a time range.
+        
+        Args:
+            resolution: Rollup resolution
+            start: Start of the range, aligned to the resolution
+            end: End of the range (exclusive)
+        
+        Returns:
+            int: Number of buckets written
+        """
+        result = self.db.execute(ROLLUP_SQL[resolution], {"start": start, "end": end})
+        return result.rowcount
+    
+    def latest_bucket(self, resolution: str) -> Optional[datetime]:
+        """
+        Get the start of the latest stored bucket of a resolution.
+        
+        Args:
+            resolution: Rollup resolution
+        
+        Returns:
+            Optional[datetime]: Bucket start or None if there are no buckets
+        """
+        return self.db.query(func.max(AgentMetricRollup.bucket_start)).filter(
+            AgentMetricRollup.resolution == resolution
+        ).scalar()
+    
+    def drop_expired_samples(self, now: datetime) -> int:
+        """
+        Drop expired sample partitions and delete expired samples of the default partition.
+        
+        Dropping a partition locks the samples table exclusively until the
+        transaction ends, so this belongs in a short transaction of its own.
+        
+        Args:
+            now: Current naive UTC time
+        
+        Returns:
+            int: Number of partitions dropped
+        """
+        cutoff = now - retention("raw")
+        dropped = 0
+        
+        self.db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_DROP_LOCK_TIMEOUT}'"))
+        
+        for name in self._partitions():
+            if not name.startswith(PARTITION_PREFIX):
+                continue
+            
+            try:
+                day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d")
+            except ValueError:
+                continue
+            
+            if day + timedelta(days=1) <= cutoff:
+                self.db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped += 1
+        
+        # Samples that landed in the default partition
+        self.db.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE recorded_at < :cutoff"),
+            {"cutoff": cutoff}
+        )
+        
+        return dropped
+    
+    def delete_expired_rollups(self, now: datetime) -> Dict[str, int]:
+        """
+        Delete the rollups past the retention of their resolution.
+        
+        Args:
+            now: Current naive UTC time
+        
+        Returns:
+            Dict[str, int]: Rollups deleted per resolution
+        """
+        removed = {}
+        
+        for resolution in RESOLUTIONS:
+            result = self.db.query(AgentMetricRollup).filter(
+                AgentMetricRollup.resolution == resolution,
+                AgentMetricRollup.bucket_start < now - retention(resolution)
+            ).delete(synchronize_session=False)
+            removed[resolution] = result
+        
+        return removed
+    
+    def choose_resolution(self, start: datetime, now: Optional[datetime] = None) -> str:
+        """
+        Get the finest rollup resolution still retained at a time.
+        
+        Args:
+            start: Start of the queried range
+            now: Current naive UTC time
+        
+        Returns:
+            str: Rollup resolution
+        """
+        now = now or datetime.utcnow()
+        for resolution in RESOLUTIONS:
+            if start >= now - retention(resolution):
+                return resolution
+        return "1d"
+    
+    def get_series(
+        self,
+        tenant_id: str,
+        agent_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: Optional[str] = None
+    ) -> Tuple[str, List[AgentMetricRollup]]:
+        """
+        Get the metric buckets of an agent in a time range.
+        
+        Hour and day buckets are written once complete, so the current hour
+        or day is only available at finer resolutions.
+        
+        Args:
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+            start: Start of the range
+            end: End of the range (exclusive)
+            resolution: Rollup resolution, the finest retained one if omitted
+        
+        Returns:
+            Tuple[str, List[AgentMetricRollup]]: Resolution and buckets in time order
+        """
+        resolution = resolution or self.choose_resolution(start)
+        
+        buckets = self.db.query(AgentMetricRollup).filter(
+            AgentMetricRollup.agent_id == agent_id,
+            AgentMetricRollup.resolution == resolution,
+            AgentMetricRollup.bucket_start >= truncate(start, resolution),
+            AgentMetricRollup.bucket_start < end,
+            AgentMetricRollup.tenant_id == tenant_id
+        ).order_by(AgentMetricRollup.bucket_start).all()
+        
+        return resolution, buckets
+    
+    def get_percentiles(
+        self,
+        tenant_id: str,
+        start: datetime,
+        end: datetime,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        agent_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get metric percentiles of an agent or of a tenant's fleet.
+        
+        Within raw retention the percentiles are exact, computed over the
+        samples. Beyond it they are computed over the bucket averages of the
+        finest retained resolution, which hides peaks shorter than a bucket;
+        the result's source tells which one was used.
+        
+        Args:
+            tenant_id: Tenant ID
+            start: Start of the range
+            end: End of the range (exclusive)
+            percentiles: Fractions between 0 and 1
+            agent_id: Agent ID, all agents of the tenant if omitted
+        
+        Returns:
+            Dict[str, Any]: Source, number of data points and agents, and the
+                percentiles of each metric by key (p50, p95, ...)
+        """
+        fractions = [float(fraction) for fraction in percentiles]
+        now = datetime.utcnow()
+        
+        if start >= now - retention("raw"):
+            source = "raw"
+            model = AgentMetricSample
+            time_column = AgentMetricSample.recorded_at
+            columns = [getattr(AgentMetricSample, metric) for metric in AGENT_METRICS]
+            filters = [AgentMetricSample.recorded_at >= start]
+        else:
+            source = self.choose_resolution(start, now)
+            model = AgentMetricRollup
+            time_column = AgentMetricRollup.bucket_start
+            columns = [getattr(AgentMetricRollup, f"{metric}_avg") for metric in AGENT_METRICS]
+            filters = [
+                AgentMetricRollup.resolution == source,
+                AgentMetricRollup.bucket_start >= truncate(start, source)
+            ]
+        
+        filters += [time_column < end, model.tenant_id == tenant_id]
+        if agent_id:
+            filters.append(model.agent_id == agent_id)
+        
+        row = self.db.query(
+            func.count(),
+            func.count(model.agent_id.distinct()),
+            *[
+                func.percentile_cont(array(fractions, type_=Float)).within_group(column).cast(ARRAY(Float))
+                for column in columns
+            ]
+        ).filter(*filters).one()
+        
+        metrics = {}
+        for metric, values in zip(AGENT_METRICS, row[2:]):
+            metrics[metric] = {
+                percentile_key(fraction): value
+                for fraction, value in zip(fractions, values or [None] * len(fractions))
+            }
+        
+        return {"source": source, "points": row[0], "agents": row[1], "metrics": metrics}
+    
+    def _partitions(self) -> List[str]:
+        """Get the names of the sample table's partitions"""
+        return list(self.db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+        """), {"table": SAMPLES_TABLE}).scalars())
@@ -0,0 +1,752 @@
+"""
+Agent scheduler for placing jobs and queue items on agents.
+
+This module keeps an in-memory index of the online agents of each tenant,
+with their capabilities, tags, slots and current load, and selects agents
+through a pluggable scheduling strategy.
+"""
+
+import abc
+import time
+import logging
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Agent, JobExecution, QueueItem
+
+logger = logging.getLogger(__name__)
+
+# Job execution statuses that occupy an agent slot
+ACTIVE_EXECUTION_STATUSES = ["queued", "sent", "running"]
+
+# Queue item statuses that occupy an agent slot
+ACTIVE_QUEUE_ITEM_STATUSES = ["processing", "assigned"]
+
+# Number of equally loaded agents compared when picking one
+PICK_SAMPLE_SIZE = 32
+
+# Maximum number of affinity keys remembered per scheduler
+MAX_AFFINITY_KEYS = 10000
+
+def capability_tokens(capabilities: Optional[Dict[str, Any]], prefix: str = "") -> Set[Tuple[str, Any]]:
+    """
+    Flatten a capabilities document into hashable (path, value) tokens.
+    
+    Nested dictionaries produce dotted paths and lists produce one token per
+    element, so {"packages": ["ocr"], "system": {"platform": "Windows"}}
+    yields ("packages", "ocr") and ("system.platform", "Windows").
+    
+    Args:
+        capabilities: Capabilities document
+        prefix: Path prefix for nested documents
+    
+    Returns:
+        Set[Tuple[str, Any]]: Capability tokens
+    """
+    tokens = set()
+    
+    for key, value in (capabilities or {}).items():
+        path = f"{prefix}{key}"
+        
+        if isinstance(value, dict):
+            tokens |= capability_tokens(value, f"{path}.")
+        elif isinstance(value, (list, tuple, set)):
+            for element in value:
+                if element is None or isinstance(element, (str, int, float, bool)):
+                    tokens.add((path, element))
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            tokens.add((path, value))
+    
+    return tokens
+
+class AgentState:
+    """Scheduling state of an online agent"""
+    
+    def __init__(
+        self,
+        agent_id: str,
+        tenant_id: str,
+        slots: int,
+        capabilities: Optional[Dict[str, Any]] = None,
+        tags: Optional[List[str]] = None
+    ):
+        """
+        Initialize the agent state.
+        
+        Args:
+            agent_id: Agent ID
+            tenant_id: Tenant ID
+            slots: Number of jobs the agent can run at once
+            capabilities: Agent capabilities document
+            tags: Agent tags
+        """
+        self.agent_id = agent_id
+        self.tenant_id = tenant_id
+        self.slots = max(1, slots)
+        self.running = 0  # Slots in use as tracked by the scheduler
+        self.reservations = 0  # Slots reserved since the agent was indexed
+        self.reported_jobs = 0  # Active jobs from the last heartbeat
+        self.cpu_percent = 0.0
+        self.tokens = capability_tokens(capabilities)
+        self.tags = set(tags or [])
+        self.level = None  # Utilization level the agent is bucketed under
+    
+    @property
+    def load(self) -> int:
+        """Number of occupied slots"""
+        return max(self.running, self.reported_jobs)
+    
+    @property
+    def free_slots(self) -> int:
+        """Number of free slots"""
+        return self.slots - self.load
+    
+    @property
+    def utilization(self) -> float:
+        """Fraction of occupied slots"""
+        return self.load / self.slots
+
+class SchedulingStrategy(abc.ABC):
+    """
+    Base class for agent selection strategies.
+    
+    Agents with free slots are bucketed by utilization level. A strategy
+    orders the levels, and the scheduler picks from the first level that
+    has an agent matching the constraints.
+    """
+    
+    name = None
+    
+    @abc.abstractmethod
+    def order_levels(self, levels: Iterable[float]) -> List[float]:
+        """
+        Order the utilization levels of agents with free slots, preferred first.
+        
+        Args:
+            levels: Utilization levels (0 <= level < 1)
+        
+        Returns:
+            List[float]: Levels in order of preference
+        """
+    
+    def pick(self, candidates: List[AgentState]) -> AgentState:
+        """
+        Pick one of several matching agents on the same utilization level.
+        
+        Args:
+            candidates: Matching agents (non-empty)
+        
+        Returns:
+            AgentState: Selected agent
+        """
+        return candidates[0]
+    
+    def prefer(
+        self,
+        affinity: Optional[List[str]],
+        is_eligible: Callable[[str], bool]
+    ) -> Optional[str]:
+        """
+        Select a preferred agent before falling back to the utilization levels.
+        
+        Args:
+            affinity: Agent IDs that recently ran the same work, most recent first
+            is_eligible: Check whether an agent matches and has a free slot
+        
+        Returns:
+            Optional[str]: Preferred agent ID or None
+        """
+        return None
+
+class LeastLoadedStrategy(SchedulingStrategy):
+    """Spread work by picking the agent with the lowest slot utilization"""
+    
+    name = "least_loaded"
+    
+    def order_levels(self, levels):
+        return sorted(levels)
+    
+    def pick(self, candidates):
+        return min(candidates, key=lambda state: state.cpu_percent)
+
+class BinPackingStrategy(SchedulingStrategy):
+    """Fill the busiest agents first so that the others stay idle"""
+    
+    name = "bin_packing"
+    
+    def order_levels(self, levels):
+        return sorted(levels, reverse=True)
+    
+    def pick(self, candidates):
+        return min(candidates, key=lambda state: state.free_slots)
+
+class AffinityStrategy(LeastLoadedStrategy):
+    """Prefer agents that recently ran the same work, falling back to least loaded"""
+    
+    name = "affinity"
+    
+    def prefer(self, affinity, is_eligible):
+        for agent_id in affinity or []:
+            if is_eligible(agent_id):
+                return agent_id
+        
+        return None
+
+# Available scheduling strategies by name
+SCHEDULING_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (LeastLoadedStrategy, BinPackingStrategy, AffinityStrategy)
+}
+
+def get_scheduling_strategy(name: str) -> SchedulingStrategy:
+    """
+    Create a scheduling strategy by name.
+    
+    Args:
+        name: Strategy name
+    
+    Returns:
+        SchedulingStrategy: Strategy instance
+    
+    Raises:
+        ValueError: If the strategy is unknown
+    """
+    if name not in SCHEDULING_STRATEGIES:
+        raise ValueError(
+            f"Unknown scheduling strategy '{name}'. "
+            f"Must be one of: {', '.join(SCHEDULING_STRATEGIES)}"
+        )
+    
+    return SCHEDULING_STRATEGIES[name]()
+
+class AgentScheduler:
+    """
+    Capacity-aware agent scheduler.
+    
+    Online agents are indexed per tenant by capability token and tag, and the
+    agents with free slots are bucketed by utilization level, so selection
+    intersects a few sets instead of scanning the agents table. Slots are
+    reserved on selection and released when the work finishes; the index is
+    periodically reloaded from the database, and the occupied slots are then
+    reconciled with the agents' active executions and claimed queue items so
+    that missed releases and work placed by other instances don't drift.
+    """
+    
+    def __init__(self, strategy: Optional[str] = None, refresh_seconds: Optional[int] = None):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            strategy: Strategy name (defaults to AGENT_SCHEDULING_STRATEGY)
+            refresh_seconds: Index reload interval (defaults to AGENT_SCHEDULER_REFRESH_SECONDS)
+        """
+        self.strategy = get_scheduling_strategy(strategy or settings.AGENT_SCHEDULING_STRATEGY)
+        self.refresh_seconds = refresh_seconds or settings.AGENT_SCHEDULER_REFRESH_SECONDS
+        self._lock = threading.RLock()
+        self._agents: Dict[str, Dict[str, AgentState]] = {}
+        self._levels: Dict[str, Dict[float, Set[str]]] = {}
+        self._by_capability: Dict[str, Dict[Tuple[str, Any], Set[str]]] = {}
+        self._by_tag: Dict[str, Dict[str, Set[str]]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._affinity: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+    
+    def load_agents(
+        self,
+        tenant_id: str,
+        agents: Iterable[Agent],
+        running_counts: Optional[Dict[str, int]] = None,
+        reservations: Optional[Dict[str, int]] = None
+    ) -> int:
+        """
+        Replace the index of a tenant's online agents.
+        
+        Args:
+            tenant_id: Tenant ID
+            agents: Online agents of the tenant
+            running_counts: Occupied slots by agent ID
+            reservations: Reservation counts of the indexed agents when the
+                running counts were read; slots reserved since then are not
+                in the counts yet and are added to them
+        
+        Returns:
+            int: Number of indexed agents
+        """
+        tenant_id = str(tenant_id)
+        running_counts = running_counts or {}
+        
+        states = {}
+        with_metrics = set()
+        for agent in agents:
+            state = self._create_state(agent)
+            if agent.metrics:
+                with_metrics.add(state.agent_id)
+            state.running = running_counts.get(state.agent_id, 0)
+            states[state.agent_id] = state
+        
+        with self._lock:
+            # Keep the heartbeat metrics of indexed agents without stored metrics
+            previous = self._agents.get(tenant_id, {})
+            for agent_id, state in states.items():
+                if agent_id not in previous:
+                    continue
+                
+                if agent_id not in with_metrics:
+                    state.reported_jobs = previous[agent_id].reported_jobs
+                    state.cpu_percent = previous[agent_id].cpu_percent
+                
+                state.reservations = previous[agent_id].reservations
+                if reservations is not None:
+                    state.running += max(0, state.reservations - reservations.get(agent_id, 0))
+                
+                if state.running != previous[agent_id].running:
+                    logger.debug(
+                        f"Reconciled occupied slots of agent {agent_id}: "
+                        f"{previous[agent_id].running} -> {state.running}"
+                    )
+            
+            self._agents[tenant_id] = {}
+            self._levels[tenant_id] = {}
+            self._by_capability[tenant_id] = {}
+            self._by_tag[tenant_id] = {}
+            
+            for state in states.values():
+                self._index(state)
+            
+            self._loaded_at[tenant_id] = time.monotonic()
+        
+        return len(states)
+    
+    def refresh(self, db: Session, tenant_id: str) -> int:
+        """
+        Reload a tenant's online agents and their occupied slots from the database.
+        
+        The occupied slots are reset to the agents' active job executions and
+        claimed queue items, plus the slots reserved while they were counted.
+        
+        Args:
+            db: Database session
+            tenant_id: Tenant ID
+        
+        Returns:
+            int: Number of indexed agents
+        """
+        # Slots reserved from here on may not be visible to the counts below
+        with self._lock:
+            reservations = {
+                agent_id: state.reservations
+                for agent_id, state in self._agents.get(str(tenant_id), {}).items()
+            }
+        
+        agents = db.scalars(self.online_agents_query(tenant_id)).all()
+        
+        running_counts = {}
+        
+        # Count active job executions per agent
+        executions = db.query(
+            JobExecution.agent_id,
+            func.count()
+        ).filter(
+            JobExecution.tenant_id == tenant_id,
+            JobExecution.status.in_(ACTIVE_EXECUTION_STATUSES),
+            JobExecution.agent_id.isnot(None)
+        ).group_by(JobExecution.agent_id).all()
+        
+        # Count claimed queue items per agent
+        items = db.query(
+            QueueItem.assigned_to,
+            func.count()
+        ).filter(
+            QueueItem.tenant_id == tenant_id,
+            QueueItem.status.in_(ACTIVE_QUEUE_ITEM_STATUSES),
+            QueueItem.assigned_to.isnot(None)
+        ).group_by(QueueItem.assigned_to).all()
+        
+        for agent_id, count in executions + items:
+            running_counts[str(agent_id)] = running_counts.get(str(agent_id), 0) + count
+        
+        return self.load_agents(tenant_id, agents, running_counts, reservations)
+    
+    @staticmethod
+    def online_agents_query(tenant_id: str):
+        """
+        Build the SELECT of a tenant's online agents.
+        
+        Served by the index ix_agents_tenant_status.
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Select: Agent query
+        """
+        return select(Agent).where(
+            Agent.tenant_id == tenant_id,
+            Agent.status == "online"
+        )
+    
+    def update_agent(self, agent: Agent, metrics: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Update an agent's index entry after a heartbeat or registration.
+        
+        Agents that are not online are removed from the index.
+        
+        Args:
+            agent: Agent
+            metrics: Optional heartbeat metrics
+        """
+        tenant_id = str(agent.tenant_id)
+        agent_id = str(agent.agent_id)
+        
+        with self._lock:
+            if tenant_id not in self._agents:
+                # Tenant not indexed yet, loaded on first selection
+                return
+            
+            if agent.status != "online":
+                self.remove_agent(tenant_id, agent_id)
+                return
+            
+            previous = self._agents[tenant_id].get(agent_id)
+            state = self._create_state(agent)
+            
+            if previous:
+                self._unindex(previous)
+                state.running = previous.running
+                state.reservations = previous.reservations
+                state.reported_jobs = previous.reported_jobs
+                state.cpu_percent = previous.cpu_percent
+            
+            if metrics:
+                self._apply_metrics(state, metrics)
+            
+            self._index(state)
+    
+    def remove_agent(self, tenant_id: str, agent_id: str) -> None:
+        """
+        Remove an agent from the index.
+        
+        Args:
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+        """
+        with self._lock:
+            state = self._agents.get(str(tenant_id), {}).get(str(agent_id))
+            if state:
+                self._unindex(state)
+    
+    def find_candidates(
+        self,
+        tenant_id: str,
+        required_capabilities: Optional[Dict[str, Any]] = None,
+        required_tags: Optional[List[str]] = None,
+        free_only: bool = True
+    ) -> List[AgentState]:
+        """
+        Find the indexed agents that satisfy capability and tag constraints.
+        
+        Args:
+            tenant_id: Tenant ID
+            required_capabilities: Required capabilities document
+            required_tags: Required tags
+            free_only: Only return agents with a free slot
+        
+        Returns:
+            List[AgentState]: Matching agents
+        """
+        tenant_id = str(tenant_id)
+        
+        with self._lock:
+            agents = self._agents.get(tenant_id, {})
+            constraints = self._constraint_sets(tenant_id, required_capabilities, required_tags)
+            
+            if constraints:
+                agent_ids = constraints[0].intersection(*constraints[1:])
+            else:
+                agent_ids = agents.keys()
+            
+            return [
+                agents[agent_id] for agent_id in agent_ids
+                if not free_only or agents[agent_id].free_slots > 0
+            ]
+    
+    def select_agent(
+        self,
+        db: Optional[Session],
+        tenant_id: str,
+        required_capabilities: Optional[Dict[str, Any]] = None,
+        required_tags: Optional[List[str]] = None,
+        affinity_key: Optional[str] = None,
+        allow_busy: bool = False
+    ) -> Optional[str]:
+        """
+        Select an agent and reserve one of its slots.
+        
+        Args:
+            db: Database session used to (re)load the tenant's index, or None
+                to use the current index as is
+            tenant_id: Tenant ID
+            required_capabilities: Required capabilities document
+            required_tags: Required tags
+            affinity_key: Optional key of the work (e.g. a package ID) for affinity
+            allow_busy: Fall back to the least utilized matching agent when none
+                has a free slot (the work then waits on the agent)
+        
+        Returns:
+            Optional[str]: Selected agent ID or None if no agent matches
+        """
+        tenant_id = str(tenant_id)
+        
+        # Load the tenant's agents if not indexed or stale
+        if db is not None and self._needs_refresh(tenant_id):
+            self.refresh(db, tenant_id)
+        
+        with self._lock:
+            agents = self._agents.get(tenant_id, {})
+            levels = self._levels.get(tenant_id, {})
+            constraints = self._constraint_sets(tenant_id, required_capabilities, required_tags)
+            
+            def is_eligible(agent_id):
+                state = agents.get(agent_id)
+                return (
+                    state is not None
+                    and state.free_slots > 0
+                    and all(agent_id in agent_ids for agent_ids in constraints)
+                )
+            
+            # Let the strategy name a preferred agent first
+            affinity = self._affinity.get((tenant_id, affinity_key)) if affinity_key else None
+            agent_id = self.strategy.prefer(affinity, is_eligible)
+            state = agents[agent_id] if agent_id else None
+            
+            # Otherwise take the first utilization level with a matching agent
+            if not state:
+                for level in self.strategy.order_levels(levels.keys()):
+                    matching = self._sample_matches(levels[level], constraints)
+                    if matching:
+                        state = self.strategy.pick([agents[agent_id] for agent_id in matching])
+                        break
+            
+            if not state and allow_busy:
+                busy = self.find_candidates(
+                    tenant_id, required_capabilities, required_tags, free_only=False
+                )
+                if busy:
+                    state = min(busy, key=lambda candidate: (candidate.utilization, candidate.cpu_percent))
+            
+            if not state:
+                return None
+            
+            self._reserve(state)
+            
+            if affinity_key:
+                self._remember_affinity(tenant_id, affinity_key, state.agent_id)
+            
+            return state.agent_id
+    
+    def reserve(self, tenant_id: str, agent_id: str) -> None:
+        """
+        Reserve a slot on an agent chosen outside the scheduler.
+        
+        Args:
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+        """
+        with self._lock:
+            state = self._agents.get(str(tenant_id), {}).get(str(agent_id))
+            if state:
+                self._reserve(state)
+    
+    def release(self, tenant_id: str, agent_id: str) -> None:
+        """
+        Release a slot reserved on an agent.
+        
+        Args:
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+        """
+        with self._lock:
+            state = self._agents.get(str(tenant_id), {}).get(str(agent_id))
+            if not state or state.running <= 0:
+                return
+            
+            state.running -= 1
+            self._place(state)
+    
+    def _needs_refresh(self, tenant_id: str) -> bool:
+        """Check whether a tenant's index is missing or stale"""
+        loaded_at = self._loaded_at.get(tenant_id)
+        return loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds
+    
+    def _create_state(self, agent: Agent) -> AgentState:
+        """Create the scheduling state of an agent"""
+        agent_settings = agent.settings or {}
+        
+        state = AgentState(
+            agent_id=str(agent.agent_id),
+            tenant_id=str(agent.tenant_id),
+            slots=int(agent_settings.get("max_concurrent_jobs") or settings.AGENT_DEFAULT_SLOTS),
+            capabilities=agent.capabilities,
+            tags=agent.tags
+        )
+        
+        # Start from the load of the last stored heartbeat
+        if agent.metrics:
+            self._apply_metrics(state, agent.metrics)
+        
+        return state
+    
+    def _apply_metrics(self, state: AgentState, metrics: Dict[str, Any]) -> None:
+        """Set an agent's reported load from heartbeat metrics"""
+        try:
+            state.reported_jobs = int(metrics.get("active_jobs") or 0)
+            state.cpu_percent = float(metrics.get("cpu_percent") or 0.0)
+        except (TypeError, ValueError):
+            logger.debug(f"Ignoring invalid metrics of agent {state.agent_id}")
+    
+    def _constraint_sets(
+        self,
+        tenant_id: str,
+        required_capabilities: Optional[Dict[str, Any]],
+        required_tags: Optional[List[str]]
+    ) -> List[Set[str]]:
+        """Get the agent ID sets for each constraint, smallest first"""
+        constraints = []
+        
+        by_capability = self._by_capability.get(tenant_id, {})
+        for token in capability_tokens(required_capabilities):
+            constraints.append(by_capability.get(token, set()))
+        
+        by_tag = self._by_tag.get(tenant_id, {})
+        for tag in required_tags or []:
+            constraints.append(by_tag.get(tag, set()))
+        
+        constraints.sort(key=len)
+        
+        return constraints
+    
+    def _sample_matches(self, bucket: Set[str], constraints: List[Set[str]]) -> List[str]:
+        """
+        Get up to PICK_SAMPLE_SIZE agent IDs of a bucket that satisfy all constraints.
+        
+        Walks the smallest of the sets and stops as soon as the sample is full,
+        so common constraints cost a few lookups instead of a full intersection.
+        """
+        sets = sorted([bucket] + constraints, key=len)
+        smallest, others = sets[0], sets[1:]
+        
+        matches = (
+            agent_id for agent_id in smallest
+            if all(agent_id in agent_ids for agent_ids in others)
+        )
+        
+        return list(islice(matches, PICK_SAMPLE_SIZE))
+    
+    def _place(self, state: AgentState) -> None:
+        """Move an agent to the bucket of its current utilization level"""
+        level = state.utilization if state.free_slots > 0 else None
+        
+        if level == state.level:
+            return
+        
+        self._unplace(state)
+        
+        if level is not None:
+            self._levels.setdefault(state.tenant_id, {}).setdefault(level, set()).add(state.agent_id)
+        
+        state.level = level
+    
+    def _unplace(self, state: AgentState) -> None:
+        """Remove an agent from its utilization bucket"""
+        if state.level is None:
+            return
+        
+        levels = self._levels.get(state.tenant_id, {})
+        bucket = levels.get(state.level)
+        if bucket is not None:
+            bucket.discard(state.agent_id)
+            if not bucket:
+                del levels[state.level]
+        
+        state.level = None
+    
+    def _index(self, state: AgentState) -> None:
+        """Add an agent state to the tenant's indexes"""
+        tenant_id = state.tenant_id
+        
+        self._agents.setdefault(tenant_id, {})[state.agent_id] = state
+        
+        by_capability = self._by_capability.setdefault(tenant_id, {})
+        for token in state.tokens:
+            by_capability.setdefault(token, set()).add(state.agent_id)
+        
+        by_tag = self._by_tag.setdefault(tenant_id, {})
+        for tag in state.tags:
+            by_tag.setdefault(tag, set()).add(state.agent_id)
+        
+        self._place(state)
+    
+    def _unindex(self, state: AgentState) -> None:
+        """Remove an agent state from the tenant's indexes"""
+        tenant_id = state.tenant_id
+        
+        self._agents.get(tenant_id, {}).pop(state.agent_id, None)
+        
+        by_capability = self._by_capability.get(tenant_id, {})
+        for token in state.tokens:
+            agent_ids = by_capability.get(token)
+            if agent_ids is not None:
+                agent_ids.discard(state.agent_id)
+                if not agent_ids:
+                    del by_capability[token]
+        
+        by_tag = self._by_tag.get(tenant_id, {})
+        for tag in state.tags:
+            agent_ids = by_tag.get(tag)
+            if agent_ids is not None:
+                agent_ids.discard(state.agent_id)
+                if not agent_ids:
+                    del by_tag[tag]
+        
+        self._unplace(state)
+    
+    def _reserve(self, state: AgentState) -> None:
+        """Reserve a slot on an agent"""
+        state.running += 1
+        state.reservations += 1
+        self._place(state)
+    
+    def _remember_affinity(self, tenant_id: str, affinity_key: str, agent_id: str) -> None:
+        """Record the agent that ran the work with the given affinity key"""
+        key = (tenant_id, affinity_key)
+        recent = [agent_id] + [
+            other for other in self._affinity.pop(key, []) if other != agent_id
+        ]
+        self._affinity[key] = recent[:3]
+        
+        # Forget the least recently used keys
+        while len(self._affinity) > MAX_AFFINITY_KEYS:
+            self._affinity.popitem(last=False)
+
+
+# Singleton instance of the agent scheduler
+_agent_scheduler = None
+
+def get_agent_scheduler() -> AgentScheduler:
+    """
+    Get the singleton agent scheduler instance.
+    
+    Returns:
+        AgentScheduler: Agent scheduler instance
+    """
+    global _agent_scheduler
+    
+    if _agent_scheduler is None:
+        _agent_scheduler = AgentScheduler()
+    
+    return _agent_scheduler
@@ -14,7 +14,7 @@ from sqlalchemy import func, case, and_, extract, cast, Integer, Float, String
 from sqlalchemy.sql import text
 from sqlalchemy.orm import Session
 
-from ..models import Job, JobExecution, Agent, User, Queue, QueueItem, Schedule
+from ..models import Job, JobExecution, Agent, User, Queue, QueueItem, Schedule, ScheduleFireTime
 
 logger = logging.getLogger(__name__)
 
@@ -153,16 +153,7 @@ class AnalyticsService:
            agent_status[status] = count
        
        # Get job execution statistics
-       execution_query = self.db.query(JobExecution).filter(JobExecution.tenant_id == tenant_id)
-       
-       if agent_id:
-           execution_query = execution_query.filter(JobExecution.agent_id == agent_id)
-       
-       if start_date:
-           execution_query = execution_query.filter(JobExecution.created_at >= start_date)
-       
-       if end_date:
-           execution_query = execution_query.filter(JobExecution.created_at <= end_date)
+       execution_query = self.executions_query(tenant_id, agent_id, start_date, end_date)
        
        # Total executions
        total_executions = execution_query.count()
@@ -250,6 +241,27 @@ class AnalyticsService:
            "usage_trend": usage_trend
        }
    
+   def executions_query(
+       self,
+       tenant_id: uuid.UUID,
+       agent_id: Optional[uuid.UUID] = None,
+       start_date: Optional[datetime] = None,
+       end_date: Optional[datetime] = None
+   ):
+       """Build the job executions query of agent statistics"""
+       query = self.db.query(JobExecution).filter(JobExecution.tenant_id == tenant_id)
+       
+       if agent_id:
+           query = query.filter(JobExecution.agent_id == agent_id)
+       
+       if start_date:
+           query = query.filter(JobExecution.created_at >= start_date)
+       
+       if end_date:
+           query = query.filter(JobExecution.created_at <= end_date)
+       
+       return query
+   
    def get_job_time_series(
        self,
        tenant_id: uuid.UUID,
@@ -259,40 +271,8 @@ class AnalyticsService:
        interval: str = "day"
    ) -> List[Dict[str, Any]]:
        """Get job execution time series data"""
-       # Determine date grouping based on interval
-       if interval == "day":
-           date_group = func.date_trunc('day', JobExecution.created_at)
-           delta = timedelta(days=1)
-       elif interval == "week":
-           date_group = func.date_trunc('week', JobExecution.created_at)
-           delta = timedelta(weeks=1)
-       elif interval == "month":
-           date_group = func.date_trunc('month', JobExecution.created_at)
-           delta = timedelta(days=30)  # Approximation
-       else:
-           date_group = func.date_trunc('day', JobExecution.created_at)
-           delta = timedelta(days=1)
-       
-       # Build query
-       query = self.db.query(
-           date_group.label('date'),
-           func.count().label('total'),
-           func.count(case([(JobExecution.status == 'completed', 1)])).label('completed'),
-           func.count(case([(JobExecution.status == 'failed', 1)])).label('failed'),
-           func.avg(JobExecution.execution_time_ms).label('avg_time')
-       ).filter(
-           JobExecution.tenant_id == tenant_id,
-           JobExecution.created_at.between(start_date, end_date)
-       )
-       
-       if job_id:
-           query = query.filter(JobExecution.job_id == job_id)
-       
-       # Group and order
-       query = query.group_by('date').order_by('date')
-       
        # Execute query
-       results = query.all()
+       results = self.job_time_series_query(tenant_id, start_date, end_date, job_id, interval).all()
        
        # Fill in missing dates
        data = []
@@ -599,28 +579,43 @@ class AnalyticsService:
            for result in results
        ]
    
+   def job_time_series_query(
+       self,
+       tenant_id: uuid.UUID,
+       start_date: datetime,
+       end_date: datetime,
+       job_id: Optional[uuid.UUID] = None,
+       interval: str = "day"
+   ):
+       """Build the job execution time series query, served by ix_job_executions_tenant_created"""
+       # Determine date grouping based on interval
+       if interval in ("week", "month"):
+           date_group = func.date_trunc(interval, JobExecution.created_at)
+       else:
+           date_group = func.date_trunc('day', JobExecution.created_at)
+       
+       # Build query
+       query = self.db.query(
+           date_group.label('date'),
+           func.count().label('total'),
+           func.count(case((JobExecution.status == 'completed', 1))).label('completed'),
+           func.count(case((JobExecution.status == 'failed', 1))).label('failed'),
+           func.avg(JobExecution.execution_time_ms).label('avg_time')
+       ).filter(
+           JobExecution.tenant_id == tenant_id,
+           JobExecution.created_at.between(start_date, end_date)
+       )
+       
+       if job_id:
+           query = query.filter(JobExecution.job_id == job_id)
+       
+       # Group and order
+       return query.group_by('date').order_by('date')
+   
    def _get_recent_activity(self, tenant_id: uuid.UUID, limit: int = 10) -> List[Dict[str, Any]]:
        """Get recent activity (job executions)"""
        # Get recent job executions
-       executions = self.db.query(
-           JobExecution.execution_id,
-           JobExecution.job_id,
-           Job.name.label("job_name"),
-           JobExecution.status,
-           JobExecution.agent_id,
-           Agent.name.label("agent_name"),
-           JobExecution.created_at,
-           JobExecution.completed_at,
-           JobExecution.execution_time_ms
-       ).join(
-           Job, JobExecution.job_id == Job.job_id
-       ).outerjoin(
-           Agent, JobExecution.agent_id == Agent.agent_id
-       ).filter(
-           JobExecution.tenant_id == tenant_id
-       ).order_by(
-           JobExecution.created_at.desc()
-       ).limit(limit).all()
+       executions = self.recent_activity_query(tenant_id, limit).all()
        
        # Format results
        return [
@@ -639,6 +634,28 @@ class AnalyticsService:
            for execution in executions
        ]
    
+   def recent_activity_query(self, tenant_id: uuid.UUID, limit: int = 10):
+       """Build the recent job executions query, served by ix_job_executions_tenant_created"""
+       return self.db.query(
+           JobExecution.execution_id,
+           JobExecution.job_id,
+           Job.name.label("job_name"),
+           JobExecution.status,
+           JobExecution.agent_id,
+           Agent.name.label("agent_name"),
+           JobExecution.created_at,
+           JobExecution.completed_at,
+           JobExecution.execution_time_ms
+       ).join(
+           Job, JobExecution.job_id == Job.job_id
+       ).outerjoin(
+           Agent, JobExecution.agent_id == Agent.agent_id
+       ).filter(
+           JobExecution.tenant_id == tenant_id
+       ).order_by(
+           JobExecution.created_at.desc()
+       ).limit(limit)
+   
    def _get_pending_items(self, tenant_id: uuid.UUID) -> Dict[str, Any]:
        """Get pending queue items"""
        # Get total pending items
@@ -677,33 +694,38 @@ class AnalyticsService:
        }
    
    def _get_upcoming_scheduled_jobs(self, tenant_id: uuid.UUID, limit: int = 5) -> List[Dict[str, Any]]:
-       """Get upcoming scheduled jobs"""
-       # Get schedules with next execution time
-       schedules = self.db.query(
+       """Get upcoming scheduled jobs from the precomputed schedule fire times"""
+       # Get the next fire times across the tenant's schedules
+       fires = self.upcoming_fires_query(tenant_id, limit).all()
+       
+       # Format results
+       return [
+           {
+               "schedule_id": str(fire.schedule_id),
+               "schedule_name": fire.schedule_name,
+               "next_execution": fire.fire_time.isoformat(),
+               "job_count": fire.job_count
+           }
+           for fire in fires
+       ]
+   
+   def upcoming_fires_query(self, tenant_id: uuid.UUID, limit: int = 5):
+       """Build the next fire times query of a tenant's schedules, served by ix_schedule_fire_times_tenant_time"""
+       return self.db.query(
+           ScheduleFireTime.fire_time,
            Schedule.schedule_id,
            Schedule.name.label("schedule_name"),
-           Schedule.next_execution,
            func.count(Job.job_id).label("job_count")
+       ).join(
+           Schedule, ScheduleFireTime.schedule_id == Schedule.schedule_id
        ).join(
            Job, Schedule.schedule_id == Job.schedule_id
        ).filter(
-           Schedule.tenant_id == tenant_id,
+           ScheduleFireTime.tenant_id == tenant_id,
            Schedule.status == "active",
-           Job.status == "active",
-           Schedule.next_execution.isnot(None)
+           Job.status == "active"
        ).group_by(
-           Schedule.schedule_id, Schedule.name, Schedule.next_execution
+           ScheduleFireTime.fire_time, Schedule.schedule_id, Schedule.name
        ).order_by(
-           Schedule.next_execution
-       ).limit(limit).all()
-       
-       # Format results
-       return [
-           {
-               "schedule_id": str(schedule.schedule_id),
-               "schedule_name": schedule.schedule_name,
-               "next_execution": schedule.next_execution.isoformat(),
-               "job_count": schedule.job_count
-           }
-           for schedule in schedules
-       ]
\ No newline at end of file
+           ScheduleFireTime.fire_time
+       ).limit(limit)
\ No newline at end of file
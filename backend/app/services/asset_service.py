@@ -8,7 +8,7 @@ configuration management, and secure value handling.
 import uuid
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
@@ -16,6 +16,7 @@ from sqlalchemy import func, or_
 from ..models import Asset, AssetType, AssetFolder, AuditLog
 from ..schemas.asset import AssetCreate, AssetUpdate, AssetFolderCreate, AssetFolderUpdate
 from ..utils.security import encrypt_value, decrypt_value
+from ..utils.encryption import decrypt_values
 
 logger = logging.getLogger(__name__)
 
@@ -249,15 +250,7 @@ class AssetService:
             return None
         
         # Create a copy to avoid modifying the database entity
-        result = {
-            "asset_id": asset.asset_id,
-            "name": asset.name,
-            "description": asset.description,
-            "asset_type_id": asset.asset_type_id,
-            "is_encrypted": asset.is_encrypted,
-            "value": asset.value,
-            "version": asset.version
-        }
+        result = self._asset_value(asset, asset.value)
         
         # Decrypt value if encrypted
         if asset.is_encrypted and asset.value:
@@ -269,6 +262,88 @@ class AssetService:
                 
         return result
     
+    def resolve_assets(
+        self,
+        tenant_id: str,
+        asset_ids: Optional[List[str]] = None,
+        names: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Get several assets with their values by ID or name, in one query.
+        
+        Args:
+            tenant_id: Tenant ID
+            asset_ids: Asset IDs
+            names: Asset names
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], List[str]]: Assets with values, and
+                the requested IDs and names not found
+        """
+        asset_ids = list(dict.fromkeys(asset_ids or []))
+        names = list(dict.fromkeys(names or []))
+        
+        # Invalid IDs can't match any asset
+        parsed_ids = {}
+        for asset_id in asset_ids:
+            try:
+                parsed_ids[asset_id] = uuid.UUID(str(asset_id))
+            except ValueError:
+                pass
+        
+        conditions = []
+        if parsed_ids:
+            conditions.append(Asset.asset_id.in_(list(parsed_ids.values())))
+        if names:
+            conditions.append(Asset.name.in_(names))
+        
+        assets = []
+        if conditions:
+            assets = self.db.query(Asset).filter(
+                Asset.tenant_id == tenant_id,
+                or_(*conditions)
+            ).all()
+        
+        # Decrypt all encrypted values at once
+        encrypted = [asset for asset in assets if asset.is_encrypted and asset.value]
+        decrypted = dict(zip(
+            (asset.asset_id for asset in encrypted),
+            decrypt_values(asset.value for asset in encrypted)
+        ))
+        
+        results = [
+            self._asset_value(asset, decrypted.get(asset.asset_id, asset.value) if asset.is_encrypted else asset.value)
+            for asset in assets
+        ]
+        
+        found_ids = {asset.asset_id for asset in assets}
+        found_names = {asset.name for asset in assets}
+        missing = [asset_id for asset_id in asset_ids if parsed_ids.get(asset_id) not in found_ids]
+        missing += [name for name in names if name not in found_names]
+        
+        return results, missing
+    
+    def _asset_value(self, asset: Asset, value: Optional[str]) -> Dict[str, Any]:
+        """
+        Get the value response of an asset.
+        
+        Args:
+            asset: Asset
+            value: Value to return
+            
+        Returns:
+            Dict[str, Any]: Asset with value
+        """
+        return {
+            "asset_id": asset.asset_id,
+            "name": asset.name,
+            "description": asset.description,
+            "asset_type_id": asset.asset_type_id,
+            "is_encrypted": asset.is_encrypted,
+            "value": value,
+            "version": asset.version
+        }
+    
     def get_asset_type(self, asset_type_id: str) -> Optional[AssetType]:
         """
         Get an asset type by ID.
@@ -552,6 +627,33 @@ class AssetService:
         
         return audit_log
     
+    def log_agent_asset_access(self, assets: List[Dict[str, Any]], tenant_id: str, agent_id: str):
+        """
+        Log the access of an agent to encrypted asset values for audit purposes.
+        
+        Args:
+            assets: Resolved assets with values
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+        """
+        now = datetime.utcnow()
+        
+        self.db.add_all([
+            AuditLog(
+                log_id=uuid.uuid4(),
+                tenant_id=uuid.UUID(tenant_id),
+                user_id=None,
+                action="access_asset_value",
+                entity_type="asset",
+                entity_id=asset["asset_id"],
+                created_at=now,
+                details={"name": asset["name"], "agent_id": agent_id}
+            )
+            for asset in assets
+            if asset["is_encrypted"]
+        ])
+        self.db.commit()
+    
     def get_asset_tree(self, tenant_id: str) -> List[Dict[str, Any]]:
         """
         Get hierarchical tree of folders and assets.
@@ -0,0 +1,226 @@
+"""
+Tenant entitlement cache module.
+
+This module caches what each tenant's subscription entitles it to: the
+subscription summary with its feature map and resource limits, and the
+feature access decisions made from it. Subscription-gated requests then
+don't query subscriptions and tiers every time.
+
+Entries carry the tier catalog version and the tenant's subscription version
+they were built from. Changes of subscription tiers bump the catalog version
+and changes of a tenant's subscription bump the tenant's version, so the
+affected entries are rebuilt on next use; entries built concurrently with a
+change are never stored. Versions are bumped when a change is flushed and
+again when it is committed, since builds in between still read the previous
+rows. Invalidation is local to the process, other processes see changes
+after ENTITLEMENT_CACHE_TTL_SECONDS at most.
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db.invalidation import register_session_invalidation
+from ..models import SubscriptionTier, TenantSubscription
+from ..schemas.subscription import FeatureAccess, SubscriptionSummary
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class TenantEntitlements:
+    """Snapshot of a tenant's entitlements"""
+    tenant_id: str
+    version: Tuple[int, int]
+    summary: Optional[SubscriptionSummary]
+    loaded_at: float
+    
+    # Feature access decisions, filled on first check of each feature
+    access: Dict[str, FeatureAccess] = field(default_factory=dict, compare=False)
+    
+    @property
+    def features(self) -> Dict[str, bool]:
+        """Standard features of the subscription, with overrides applied"""
+        return self.summary.features if self.summary else {}
+    
+    @property
+    def limits(self) -> Dict[str, int]:
+        """Resource limits of the subscription, with overrides applied"""
+        if not self.summary:
+            return {}
+        return {
+            "max_agents": self.summary.max_agents,
+            "max_concurrent_jobs": self.summary.max_concurrent_jobs,
+            "max_schedules": self.summary.max_schedules,
+            "max_queues": self.summary.max_queues
+        }
+
+class EntitlementCache:
+    """Cache of tenant entitlements with versioned invalidation"""
+    
+    def __init__(self):
+        """Initialize the entitlement cache"""
+        self._lock = threading.Lock()
+        self._entries: Dict[str, TenantEntitlements] = {}
+        
+        # Versions of the tier catalog and of each tenant's subscription
+        self._tier_version = 0
+        self._tenant_versions: Dict[str, int] = {}
+    
+    def _version(self, tenant_id: str) -> Tuple[int, int]:
+        """Get the current version of a tenant's entitlements"""
+        return (self._tier_version, self._tenant_versions.get(tenant_id, 0))
+    
+    def _is_current(self, entry: TenantEntitlements) -> bool:
+        """Check if an entry is of the current version and not expired"""
+        return (
+            entry.version == self._version(entry.tenant_id)
+            and entry.loaded_at + settings.ENTITLEMENT_CACHE_TTL_SECONDS > time.monotonic()
+        )
+    
+    def get(self, db: Session, tenant_id: Any) -> TenantEntitlements:
+        """
+        Get the entitlements of a tenant, loading them if not cached.
+        
+        Args:
+            db: Database session
+            tenant_id: Tenant ID
+        
+        Returns:
+            TenantEntitlements: Tenant entitlements
+        """
+        tenant_id = str(tenant_id)
+        
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None and self._is_current(entry):
+                return entry
+            version = self._version(tenant_id)
+        
+        # Avoid circular import
+        from .subscription_service import SubscriptionService
+        
+        summary = SubscriptionService(db)._build_subscription_summary(tenant_id)
+        entry = TenantEntitlements(
+            tenant_id=tenant_id,
+            version=version,
+            summary=summary,
+            loaded_at=time.monotonic()
+        )
+        
+        with self._lock:
+            # Don't store entries loaded while the subscription changed
+            if version == self._version(tenant_id):
+                self._entries[tenant_id] = entry
+        
+        return entry
+    
+    def get_subscription_summary(self, db: Session, tenant_id: Any) -> Optional[SubscriptionSummary]:
+        """
+        Get the subscription summary of a tenant.
+        
+        Args:
+            db: Database session
+            tenant_id: Tenant ID
+        
+        Returns:
+            Optional[SubscriptionSummary]: Subscription summary, or None if its
+                tier is not found
+        """
+        return self.get(db, tenant_id).summary
+    
+    def check_feature_access(self, db: Session, tenant_id: Any, feature: str) -> FeatureAccess:
+        """
+        Check if a tenant has access to a feature.
+        
+        Args:
+            db: Database session
+            tenant_id: Tenant ID
+            feature: Feature name
+        
+        Returns:
+            FeatureAccess: Feature access information
+        """
+        entry = self.get(db, tenant_id)
+        
+        access = entry.access.get(feature)
+        if access is not None:
+            return access
+        
+        # Avoid circular import
+        from .subscription_service import SubscriptionService
+        
+        access = SubscriptionService(db)._resolve_feature_access(entry.tenant_id, feature)
+        
+        with self._lock:
+            if entry.version == self._version(entry.tenant_id):
+                entry.access[feature] = access
+        
+        return access
+    
+    def invalidate_tenant(self, tenant_id: Any):
+        """
+        Invalidate the entitlements of a tenant, e.g. after a subscription change.
+        
+        Args:
+            tenant_id: Tenant ID
+        """
+        tenant_id = str(tenant_id)
+        
+        with self._lock:
+            self._tenant_versions[tenant_id] = self._tenant_versions.get(tenant_id, 0) + 1
+            self._entries.pop(tenant_id, None)
+    
+    def invalidate_all(self):
+        """Invalidate the entitlements of all tenants, e.g. after a tier change"""
+        with self._lock:
+            self._tier_version += 1
+            self._entries.clear()
+
+
+# Singleton instance of the entitlement cache
+_entitlement_cache = None
+
+def get_entitlement_cache() -> EntitlementCache:
+    """
+    Get the singleton entitlement cache instance.
+    
+    Returns:
+        EntitlementCache: Entitlement cache instance
+    """
+    global _entitlement_cache
+    
+    if _entitlement_cache is None:
+        _entitlement_cache = EntitlementCache()
+    
+    return _entitlement_cache
+
+def _invalidate_key(tenant_id: Optional[str]):
+    """Invalidate the entitlements of a tenant, or all with None"""
+    cache = get_entitlement_cache()
+    
+    if tenant_id is None:
+        cache.invalidate_all()
+    else:
+        cache.invalidate_tenant(tenant_id)
+
+def _flushed_keys(session: Session) -> Iterator[Optional[str]]:
+    """Get the tenants whose entitlements are affected by a flush"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, SubscriptionTier):
+            yield None
+        elif isinstance(instance, TenantSubscription):
+            yield str(instance.tenant_id)
+
+def _bulk_keys(models: Set[type]) -> Iterator[Optional[str]]:
+    """Get the tenants affected by a bulk update or delete, all of them for subscriptions"""
+    if models & {SubscriptionTier, TenantSubscription}:
+        yield None
+
+# Invalidation of entitlements by session changes, tenant ID keys with None
+# for all tenants
+register_session_invalidation("entitlement", _invalidate_key, _flushed_keys, _bulk_keys)
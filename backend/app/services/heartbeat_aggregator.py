@@ -0,0 +1,394 @@
+"""
+Heartbeat aggregator for coalescing agent heartbeat writes.
+
+Heartbeats are buffered in memory, keeping the latest beat of each agent, and
+written every HEARTBEAT_FLUSH_SECONDS by a background thread with one UPDATE
+per HEARTBEAT_FLUSH_BATCH_SIZE agents instead of one commit per beat. The
+UPDATE returns each agent's previous status, so status changes are detected
+against the database, including agents marked offline in the meantime, and
+logged and published once, in bulk. A beat that changes an agent's status
+triggers an immediate flush. The metrics of the written beats are appended
+to the agent metrics history, see AgentMetricsService, and the leases on
+the queue items claimed by the agents are renewed.
+"""
+
+import json
+import time
+import logging
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db.session import SessionLocal
+from ..models import Agent, AgentLog
+from .agent_metrics_service import AgentMetricsService
+from .queue_service import QueueService
+
+logger = logging.getLogger(__name__)
+
+# Writes the buffered beats and returns the previous status of each agent.
+# Rows are locked in a fixed order so concurrent flushes cannot deadlock.
+FLUSH_HEARTBEATS_SQL = text("""
+    WITH beats AS (
+        SELECT * FROM json_to_recordset(CAST(:beats AS json)) AS b(
+            agent_id uuid,
+            tenant_id uuid,
+            heartbeat timestamp,
+            status varchar,
+            metrics json,
+            capabilities json,
+            ip_address inet
+        )
+    ),
+    previous AS (
+        SELECT agents.agent_id, agents.status
+        FROM agents
+        JOIN beats ON beats.agent_id = agents.agent_id AND beats.tenant_id = agents.tenant_id
+        ORDER BY agents.agent_id
+        FOR UPDATE OF agents
+    )
+    UPDATE agents SET
+        last_heartbeat = GREATEST(agents.last_heartbeat, beats.heartbeat),
+        status = beats.status,
+        metrics = COALESCE(beats.metrics, agents.metrics),
+        capabilities = COALESCE(beats.capabilities, agents.capabilities),
+        ip_address = COALESCE(beats.ip_address, agents.ip_address),
+        updated_at = :now
+    FROM beats
+    JOIN previous ON previous.agent_id = beats.agent_id
+    WHERE agents.agent_id = beats.agent_id
+    RETURNING agents.agent_id, agents.tenant_id, previous.status AS old_status, agents.status AS new_status
+""")
+
+@dataclass
+class BufferedHeartbeat:
+    """Latest unwritten heartbeat of an agent"""
+    agent_id: str
+    tenant_id: str
+    heartbeat: datetime
+    status: str
+    metrics: Optional[Dict[str, Any]] = None
+    capabilities: Optional[Any] = None
+    ip_address: Optional[str] = None
+    
+    def merge(self, older: "BufferedHeartbeat"):
+        """Keep the fields of an older beat that this one does not carry"""
+        if self.capabilities is None:
+            self.capabilities = older.capabilities
+        if self.ip_address is None:
+            self.ip_address = older.ip_address
+        if self.metrics is None:
+            self.metrics = older.metrics
+    
+    def row(self) -> Dict[str, Any]:
+        """Get the beat as a row of the flush statement"""
+        return {
+            "agent_id": self.agent_id,
+            "tenant_id": self.tenant_id,
+            "heartbeat": self.heartbeat.isoformat(),
+            "status": self.status,
+            "metrics": self.metrics or None,
+            "capabilities": self.capabilities,
+            "ip_address": self.ip_address
+        }
+
+class HeartbeatAggregator:
+    """Buffers agent heartbeats and writes them in batches"""
+    
+    def __init__(self):
+        """Initialize the heartbeat aggregator"""
+        self._buffer: Dict[str, BufferedHeartbeat] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        
+        # Counters
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.status_changes = 0
+        self.last_flush_seconds: Optional[float] = None
+    
+    def record(
+        self,
+        agent_id: str,
+        tenant_id: str,
+        status: str = "online",
+        metrics: Optional[Dict[str, Any]] = None,
+        capabilities: Optional[Any] = None,
+        ip_address: Optional[str] = None,
+        current_status: Optional[str] = None
+    ):
+        """
+        Buffer a heartbeat. Safe to call from any thread.
+        
+        Args:
+            agent_id: Agent ID
+            tenant_id: Tenant ID
+            status: Status reported by the agent
+            metrics: Heartbeat metrics
+            capabilities: Capabilities, if reported
+            ip_address: IP address, if reported
+            current_status: Status of the agent as last read, if known; a
+                different reported status is written right away
+        """
+        beat = BufferedHeartbeat(
+            agent_id=str(agent_id),
+            tenant_id=str(tenant_id),
+            heartbeat=datetime.utcnow(),
+            status=status or "online",
+            metrics=metrics,
+            capabilities=capabilities,
+            ip_address=ip_address
+        )
+        
+        with self._lock:
+            previous = self._buffer.get(beat.agent_id)
+            if previous:
+                beat.merge(previous)
+            self._buffer[beat.agent_id] = beat
+            self.recorded += 1
+            buffered = len(self._buffer)
+        
+        self._ensure_started()
+        
+        if (current_status is not None and current_status != beat.status) or buffered >= settings.HEARTBEAT_MAX_BUFFERED:
+            self._wakeup.set()
+    
+    def flush(self) -> int:
+        """
+        Write the buffered heartbeats.
+        
+        Beats that fail to be written are put back into the buffer, unless a
+        newer beat of the agent arrived meanwhile.
+        
+        Returns:
+            int: Number of agents updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                beats = list(self._buffer.values())
+                self._buffer = {}
+            
+            if not beats:
+                return 0
+            
+            started = time.monotonic()
+            batch_size = settings.HEARTBEAT_FLUSH_BATCH_SIZE
+            updated = 0
+            
+            for start in range(0, len(beats), batch_size):
+                batch = beats[start:start + batch_size]
+                
+                try:
+                    updated += self._write(batch)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} heartbeats: {e}")
+                    self._restore(batch)
+            
+            self.flushes += 1
+            self.written += updated
+            self.last_flush_seconds = time.monotonic() - started
+            logger.debug(f"Wrote heartbeats of {updated} agents in {self.last_flush_seconds:.3f}s")
+            
+            return updated
+    
+    def stop(self):
+        """Stop the flush thread and write what is still buffered"""
+        self._running = False
+        self._wakeup.set()
+        
+        if self._thread is not None:
+            self._thread.join(timeout=settings.HEARTBEAT_FLUSH_SECONDS * 2)
+            self._thread = None
+        
+        self.flush()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get the aggregator's counters.
+        
+        Returns:
+            Dict[str, Any]: Buffered beats, counters and last flush duration
+        """
+        with self._lock:
+            buffered = len(self._buffer)
+        
+        return {
+            "buffered": buffered,
+            "recorded": self.recorded,
+            "written": self.written,
+            "flushes": self.flushes,
+            "status_changes": self.status_changes,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 3) if self.last_flush_seconds is not None else None
+        }
+    
+    def _write(self, batch: List[BufferedHeartbeat]) -> int:
+        """
+        Write a batch of heartbeats in one transaction.
+        
+        Args:
+            batch: Heartbeats of distinct agents
+        
+        Returns:
+            int: Number of agents updated
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            rows = db.execute(FLUSH_HEARTBEATS_SQL, {
+                "beats": json.dumps([beat.row() for beat in batch], default=str),
+                "now": now
+            }).all()
+            
+            changed = [row for row in rows if row.old_status != row.new_status]
+            if changed:
+                # One log per status change, inserted in bulk
+                db.execute(insert(AgentLog), [
+                    {
+                        "log_id": uuid.uuid4(),
+                        "agent_id": row.agent_id,
+                        "tenant_id": row.tenant_id,
+                        "log_level": "info",
+                        "message": f"Agent status changed from {row.old_status} to {row.new_status}",
+                        "info": {"old_status": row.old_status, "new_status": row.new_status},
+                        "created_at": now
+                    }
+                    for row in changed
+                ])
+            
+            # Live agents keep the items they are processing
+            QueueService(db).renew_agent_leases(
+                [row.agent_id for row in rows if row.new_status != "offline"]
+            )
+            
+            db.commit()
+            
+            beats = {beat.agent_id: beat for beat in batch}
+            
+            if settings.AGENT_METRICS_ENABLED:
+                try:
+                    AgentMetricsService(db).record_samples(
+                        (row.agent_id, row.tenant_id, beats[str(row.agent_id)].heartbeat, beats[str(row.agent_id)].metrics)
+                        for row in rows
+                    )
+                except Exception as e:
+                    # The beats are written, only their metric history is lost
+                    db.rollback()
+                    logger.error(f"Failed to store metric samples of {len(rows)} agents: {e}")
+            
+            if changed:
+                self.status_changes += len(changed)
+                try:
+                    self._publish_status_changes(db, changed, beats)
+                except Exception as e:
+                    # The beats are written, only the notifications are lost
+                    logger.error(f"Failed to publish {len(changed)} agent status changes: {e}")
+            
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def _publish_status_changes(self, db: Session, changed: List[Any], beats: Dict[str, BufferedHeartbeat]):
+        """
+        Publish the status changes of a written batch.
+        
+        Updates the scheduler's index, publishes an agent status change event
+        per agent and wakes the queue worker for agents that came online.
+        
+        Args:
+            db: Database session
+            changed: Returned rows whose status changed
+            beats: Written heartbeats by agent ID
+        """
+        from ..messaging.envelopes import AgentStatusChanged
+        from ..messaging.producer import get_message_producer
+        from .agent_scheduler import get_agent_scheduler
+        from .queue_service import publish_dispatch_event
+        
+        # Refresh the scheduler's view of the agents
+        agents = db.query(Agent).filter(Agent.agent_id.in_([row.agent_id for row in changed])).all()
+        scheduler = get_agent_scheduler()
+        for agent in agents:
+            scheduler.update_agent(agent, beats[str(agent.agent_id)].metrics)
+        
+        producer = get_message_producer()
+        for row in changed:
+            producer.send_message_sync(
+                "events",
+                "agent.status_change",
+                AgentStatusChanged(
+                    agent_id=str(row.agent_id),
+                    tenant_id=str(row.tenant_id),
+                    status=row.new_status,
+                    additional_data={"old_status": row.old_status}
+                )
+            )
+            
+            # Let the queue worker dispatch pending items to the agent
+            if row.new_status == "online":
+                try:
+                    publish_dispatch_event("agent_available", str(row.tenant_id), {"agent_id": str(row.agent_id)})
+                except Exception as e:
+                    logger.error(f"Failed to publish availability of agent {row.agent_id}: {str(e)}")
+    
+    def _restore(self, batch: List[BufferedHeartbeat]):
+        """Put unwritten beats back unless newer ones arrived"""
+        with self._lock:
+            for beat in batch:
+                newer = self._buffer.get(beat.agent_id)
+                if newer:
+                    newer.merge(beat)
+                else:
+                    self._buffer[beat.agent_id] = beat
+    
+    def _ensure_started(self):
+        """Start the flush thread on the first heartbeat"""
+        if self._thread is not None:
+            return
+        
+        with self._lock:
+            if self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name="heartbeat-aggregator", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """Flush the buffer periodically, or early when woken"""
+        while self._running:
+            self._wakeup.wait(timeout=settings.HEARTBEAT_FLUSH_SECONDS)
+            self._wakeup.clear()
+            
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Error flushing heartbeats: {e}")
+
+
+# Singleton instance of the heartbeat aggregator
+_heartbeat_aggregator = None
+
+def get_heartbeat_aggregator() -> HeartbeatAggregator:
+    """
+    Get the singleton heartbeat aggregator instance.
+    
+    Returns:
+        HeartbeatAggregator: Heartbeat aggregator instance
+    """
+    global _heartbeat_aggregator
+    
+    if _heartbeat_aggregator is None:
+        _heartbeat_aggregator = HeartbeatAggregator()
+    
+    return _heartbeat_aggregator
@@ -10,19 +10,31 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 
-from fastapi import UploadFile
+from fastapi import UploadFile, BackgroundTasks
 from sqlalchemy import func, and_, or_
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from ..db.session import SessionLocal
 from ..models import Job, JobExecution, JobDependency, Package, Agent, User, Queue, QueueItem, Schedule
 from ..schemas.job import JobCreate, JobUpdate, JobStartRequest, JobExecutionFilter
 from ..messaging.producer import get_message_producer
+from .queue_service import publish_dispatch_event
+from .agent_scheduler import get_agent_scheduler, ACTIVE_EXECUTION_STATUSES as SLOT_EXECUTION_STATUSES
+from .quota_service import QuotaService, CONCURRENT_JOBS, ACTIVE_EXECUTION_STATUSES
 from ..utils.object_storage import ObjectStorage
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# Routing keys of job execution messages on the "jobs" exchange. The exchange
+# is direct, so the job-executions queue is bound to each key.
+JOB_EXECUTION_ROUTING_KEYS = {
+    "requeue": "job.execution.requeue",
+    "schedule": "job.execution.schedule",
+    "manual": "job.execution.manual"
+}
+
 class JobService:
     """Service for managing automation jobs"""
     
@@ -379,6 +391,9 @@ class JobService:
             if not package:
                 raise ValueError(f"Package {job.package_id} not found")
         
+        # Hold one of the tenant's concurrent job slots until the execution finishes
+        QuotaService(self.db).reserve(tenant_id, CONCURRENT_JOBS)
+        
         # Get agent if specified
         if agent_id:
             agent = self.db.query(Agent).filter(
@@ -387,11 +402,16 @@ class JobService:
             ).first()
             
             if not agent:
+                self.db.rollback()
                 raise ValueError(f"Agent {agent_id} not found")
+            
+            # Account for the job in the agent's load
+            get_agent_scheduler().reserve(tenant_id, agent_id)
         else:
             # Auto-select agent if not specified
             agent = self._select_agent_for_job(job)
             if not agent:
+                self.db.rollback()
                 raise ValueError("No suitable agent found for job")
             
             agent_id = agent.agent_id
@@ -467,6 +487,9 @@ class JobService:
         
         if not package:
             raise ValueError(f"Package {package_id} not found")
+        
+        # Hold one of the tenant's concurrent job slots until the execution finishes
+        QuotaService(self.db).reserve(tenant_id, CONCURRENT_JOBS)
             
         # Create execution record (without a job)
         execution = JobExecution(
@@ -494,7 +517,8 @@ class JobService:
         status: str,
         progress: Optional[float] = None,
         results: Optional[Dict[str, Any]] = None,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        background_tasks: Optional[BackgroundTasks] = None
     ) -> Optional[JobExecution]:
         """
         Update execution status.
@@ -507,6 +531,7 @@ class JobService:
             progress: Optional progress (0-100)
             results: Optional results data
             error: Optional error message
+            background_tasks: Optional FastAPI background tasks
             
         Returns:
             Optional[JobExecution]: Updated execution or None if not found
@@ -526,6 +551,7 @@ class JobService:
             return None
             
         # Update status
+        old_status = execution.status
         execution.status = status
         
         # Update progress if provided
@@ -545,13 +571,209 @@ class JobService:
             execution.started_at = datetime.utcnow()
         elif status in ["completed", "failed", "cancelled"]:
             execution.ended_at = datetime.utcnow()
+        
+        # A finished execution frees the tenant's concurrent job slot
+        finished = status in ["completed", "failed", "cancelled"]
+        if finished and old_status in ACTIVE_EXECUTION_STATUSES:
+            QuotaService(self.db).release(tenant_id, CONCURRENT_JOBS)
             
         # Save changes
         self.db.commit()
         self.db.refresh(execution)
         
+        # A finished execution frees the agent's slot for queued work
+        if finished and old_status in SLOT_EXECUTION_STATUSES:
+            get_agent_scheduler().release(tenant_id, agent_id)
+        
+        if background_tasks and finished:
+            publish_dispatch_event(
+                "agent_available",
+                str(tenant_id),
+                {"agent_id": str(agent_id)},
+                background_tasks
+            )
+        
+        return execution
+    
+    def dispatch_execution(self, execution_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[JobExecution]:
+        """
+        Dispatch a pending execution to an agent.
+        
+        Pending executions have no agent, e.g. because theirs went offline.
+        The execution is assigned to an agent selected for its job and sent
+        to it. Executions that are no longer pending are left alone, so a
+        redelivered message doesn't dispatch an execution twice.
+        
+        Args:
+            execution_id: Execution ID
+            tenant_id: Tenant ID
+            
+        Returns:
+            Optional[JobExecution]: Dispatched execution or None if not pending
+            
+        Raises:
+            ValueError: If no suitable agent is found
+            RuntimeError: If the execution could not be sent to the agent
+        """
+        execution = self.db.query(JobExecution).filter(
+            JobExecution.execution_id == execution_id,
+            JobExecution.tenant_id == tenant_id,
+            JobExecution.status == "pending",
+            JobExecution.agent_id.is_(None)
+        ).with_for_update(skip_locked=True).first()
+        
+        if not execution:
+            self.db.rollback()
+            return None
+        
+        job = None
+        if execution.job_id:
+            job = self.db.query(Job).filter(Job.job_id == execution.job_id).first()
+        
+        if not job:
+            # Direct package executions belong to the agent that requested them
+            execution.status = "failed"
+            execution.completed_at = datetime.utcnow()
+            QuotaService(self.db).release(tenant_id, CONCURRENT_JOBS)
+            self.db.commit()
+            logger.warning(f"Execution {execution_id} has no job to dispatch it for, marked failed")
+            return execution
+        
+        # Reserves one of the agent's slots
+        agent = self._select_agent_for_job(job)
+        if not agent:
+            self.db.rollback()
+            raise ValueError(f"No suitable agent found for execution {execution_id}")
+        
+        command = self._job_command(execution, job)
+        execution.agent_id = agent.agent_id
+        execution.status = "sent"
+        execution.sent_at = datetime.utcnow()
+        self.db.commit()
+        
+        if not self._send_agent_command_sync(agent.agent_id, tenant_id, command):
+            # Return the execution to pending so the retried message dispatches it
+            execution.agent_id = None
+            execution.status = "pending"
+            execution.sent_at = None
+            self.db.commit()
+            get_agent_scheduler().release(tenant_id, agent.agent_id)
+            raise RuntimeError(f"Failed to send execution {execution_id} to agent {agent.agent_id}")
+        
+        logger.info(f"Dispatched execution {execution_id} to agent {agent.agent_id}")
+        
+        return execution
+    
+    def cancel_execution(self, execution_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[JobExecution]:
+        """
+        Cancel an active execution and tell its agent to stop it.
+        
+        Args:
+            execution_id: Execution ID
+            tenant_id: Tenant ID
+            
+        Returns:
+            Optional[JobExecution]: Cancelled execution or None if not found
+                or not active
+        """
+        execution = self.db.query(JobExecution).filter(
+            JobExecution.execution_id == execution_id,
+            JobExecution.tenant_id == tenant_id,
+            JobExecution.status.in_(ACTIVE_EXECUTION_STATUSES)
+        ).with_for_update().first()
+        
+        if not execution:
+            self.db.rollback()
+            return None
+        
+        old_status = execution.status
+        agent_id = execution.agent_id
+        
+        execution.status = "cancelled"
+        execution.completed_at = datetime.utcnow()
+        
+        # Free the tenant's concurrent job slot
+        QuotaService(self.db).release(tenant_id, CONCURRENT_JOBS)
+        
+        self.db.commit()
+        self.db.refresh(execution)
+        
+        if agent_id:
+            if old_status in SLOT_EXECUTION_STATUSES:
+                get_agent_scheduler().release(tenant_id, agent_id)
+            
+            command = {"type": "stop_job", "execution_id": str(execution_id)}
+            if not self._send_agent_command_sync(agent_id, tenant_id, command):
+                logger.error(f"Failed to send stop command of execution {execution_id} to agent {agent_id}")
+        
         return execution
         
+    def create_triggered_execution(
+        self,
+        job_id: uuid.UUID,
+        tenant_id: uuid.UUID,
+        schedule_id: uuid.UUID,
+        fire_key: str,
+        trigger_type: str = "scheduled"
+    ) -> Optional[JobExecution]:
+        """
+        Create the pending execution of a job for one schedule fire.
+        
+        The execution ID is derived from the schedule, the job and the fire,
+        so a trigger delivered more than once creates a single execution and
+        reserves a single concurrent job slot.
+        
+        Args:
+            job_id: Job ID
+            tenant_id: Tenant ID
+            schedule_id: Schedule ID
+            fire_key: Identifies the fire, e.g. its scheduled time
+            trigger_type: Trigger type of the execution
+            
+        Returns:
+            Optional[JobExecution]: Execution of the fire, or None if the job
+                is gone or inactive
+            
+        Raises:
+            QuotaExceededError: If the tenant has no concurrent job slot left
+        """
+        job = self.db.query(Job).filter(
+            Job.job_id == job_id,
+            Job.tenant_id == tenant_id,
+            Job.status == "active"
+        ).first()
+        
+        if not job:
+            logger.warning(f"Job {job_id} of schedule {schedule_id} not found or inactive, trigger ignored")
+            return None
+        
+        execution_id = uuid.uuid5(uuid.UUID(str(schedule_id)), f"{job_id}:{fire_key}")
+        
+        try:
+            created = self.db.execute(
+                pg_insert(JobExecution).values(
+                    execution_id=execution_id,
+                    job_id=job.job_id,
+                    tenant_id=job.tenant_id,
+                    status="pending",
+                    trigger_type=trigger_type,
+                    input_parameters=job.parameters
+                ).on_conflict_do_nothing(
+                    index_elements=[JobExecution.execution_id]
+                ).returning(JobExecution.execution_id)
+            ).scalar()
+            
+            # Hold one of the tenant's concurrent job slots until the execution finishes
+            if created:
+                QuotaService(self.db).reserve(tenant_id, CONCURRENT_JOBS)
+            
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        return self.db.query(JobExecution).filter(JobExecution.execution_id == execution_id).first()
+    
     def get_execution(self, execution_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[JobExecution]:
         """
         Get a job execution.
@@ -735,14 +957,14 @@ class JobService:
                 JobExecution.execution_id == execution_id,
                 JobExecution.job_id == job_id,
                 JobExecution.tenant_id == tenant_id,
-                JobExecution.status.in_(["queued", "running"])
+                JobExecution.status.in_(ACTIVE_EXECUTION_STATUSES)
             ).all()
         else:
-            # Get all running executions for the job
+            # Get all active executions for the job
             executions = self.db.query(JobExecution).filter(
                 JobExecution.job_id == job_id,
                 JobExecution.tenant_id == tenant_id,
-                JobExecution.status.in_(["queued", "running"])
+                JobExecution.status.in_(ACTIVE_EXECUTION_STATUSES)
             ).all()
         
         if not executions:
@@ -750,12 +972,21 @@ class JobService:
         
         # Stop each execution
         stopped_count = 0
+        released_agents = []
         
         for execution in executions:
+            if execution.agent_id and execution.status in SLOT_EXECUTION_STATUSES:
+                released_agents.append(execution.agent_id)
+            
             # Update status to cancelled
             execution.status = "cancelled"
             execution.ended_at = datetime.utcnow()
             
+            # Pending executions haven't reached an agent
+            if not execution.agent_id:
+                stopped_count += 1
+                continue
+            
             # Send stop command to agent
             if background_tasks:
                 background_tasks.add_task(
@@ -774,9 +1005,17 @@ class JobService:
                 
             stopped_count += 1
         
+        # Free the tenant's concurrent job slots of the cancelled executions
+        QuotaService(self.db).release(tenant_id, CONCURRENT_JOBS, stopped_count)
+        
         # Save changes
         self.db.commit()
         
+        # The cancelled executions free their agents' slots
+        scheduler = get_agent_scheduler()
+        for agent_id in released_agents:
+            scheduler.release(tenant_id, agent_id)
+        
         return {
             "success": True,
             "stopped_count": stopped_count,
@@ -861,39 +1100,21 @@ class JobService:
         Returns:
             Optional[Agent]: Selected agent or None if none available
         """
-        # Get online agents for tenant
-        agents = self.db.query(Agent).filter(
-            Agent.tenant_id == job.tenant_id,
-            Agent.status == "online"
-        ).all()
-        
-        # Filter agents by capabilities if job requires specific capabilities
-        if job.required_capabilities:
-            eligible_agents = []
-            for agent in agents:
-                if not agent.capabilities:
-                    continue
-                    
-                matches = True
-                for cap_name, cap_value in job.required_capabilities.items():
-                    if cap_name not in agent.capabilities:
-                        matches = False
-                        break
-                        
-                    if agent.capabilities[cap_name] != cap_value:
-                        matches = False
-                        break
-                        
-                if matches:
-                    eligible_agents.append(agent)
-                    
-            agents = eligible_agents
-        
-        # Return first suitable agent (or implement more sophisticated selection)
-        if agents:
-            return agents[0]
-        else:
+        # Pick an online agent matching the job's constraints. Jobs are
+        # queued on a busy agent when no matching agent has a free slot.
+        agent_id = get_agent_scheduler().select_agent(
+            self.db,
+            job.tenant_id,
+            required_capabilities=job.required_capabilities,
+            required_tags=job.required_tags,
+            affinity_key=str(job.package_id),
+            allow_busy=True
+        )
+        
+        if not agent_id:
             return None
+        
+        return self.db.query(Agent).filter(Agent.agent_id == agent_id).first()
     
     async def _send_job_to_agent(self, execution_id: uuid.UUID, agent_id: uuid.UUID, tenant_id: uuid.UUID) -> None:
         """
@@ -920,23 +1141,7 @@ class JobService:
                 Job.job_id == execution.job_id
             ).first()
         
-        # Get package details
-        package = None
-        if execution.package_id:
-            package = self.db.query(Package).filter(
-                Package.package_id == execution.package_id
-            ).first()
-        
-        # Create command message
-        command = {
-            "type": "execute_job",
-            "execution_id": str(execution_id),
-            "job_id": str(execution.job_id) if execution.job_id else None,
-            "package_id": str(execution.package_id) if execution.package_id else None,
-            "parameters": execution.parameters,
-            "timeout_seconds": job.timeout_seconds if job else 3600,
-            "priority": execution.priority
-        }
+        command = self._job_command(execution, job)
         
         # Update execution status
         execution.status = "sent"
@@ -955,6 +1160,49 @@ class JobService:
             }
         )
     
+    def _job_command(self, execution: JobExecution, job: Optional[Job]) -> Dict[str, Any]:
+        """
+        Create the command message executing a job.
+        
+        Args:
+            execution: Job execution
+            job: Job of the execution, if any
+            
+        Returns:
+            Dict[str, Any]: Command, the package and priority are the job's
+        """
+        return {
+            "type": "execute_job",
+            "execution_id": str(execution.execution_id),
+            "job_id": str(execution.job_id) if execution.job_id else None,
+            "package_id": str(job.package_id) if job else None,
+            "parameters": execution.input_parameters or (job.parameters if job else None) or {},
+            "timeout_seconds": job.timeout_seconds if job else 3600,
+            "priority": job.priority if job else 1
+        }
+    
+    def _send_agent_command_sync(self, agent_id: uuid.UUID, tenant_id: uuid.UUID, command: Dict[str, Any]) -> bool:
+        """
+        Send a command to an agent from synchronous code.
+        
+        Args:
+            agent_id: Agent ID
+            tenant_id: Tenant ID
+            command: Command message
+            
+        Returns:
+            bool: True if the command was published
+        """
+        return get_message_producer().send_message_sync(
+            exchange="agents",
+            routing_key=f"agent.{agent_id}.command",
+            message_data={
+                "agent_id": str(agent_id),
+                "tenant_id": str(tenant_id),
+                "command": command
+            }
+        )
+    
     async def _send_stop_command(self, execution_id: uuid.UUID, agent_id: uuid.UUID, tenant_id: uuid.UUID) -> None:
         """
         Send a stop command to an agent.
@@ -76,7 +76,7 @@ class NotificationService:
        
        return notification
    
-   async def create_notification(
+   def create_notification(
        self,
        tenant_id: uuid.UUID,
        subject: str,
@@ -106,7 +106,7 @@ class NotificationService:
        
        # Send notification to messaging system
        message_producer = get_message_producer()
-       await message_producer.send_message(
+       message_producer.send_message_sync(
            exchange="notifications",
            routing_key="notification.created",
            message_data={
@@ -117,6 +117,57 @@ class NotificationService:
        
        return notification
    
+   def send_notification(self, notification_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[Notification]:
+       """Send a pending notification through the channel of its rule"""
+       notification = self.db.query(Notification).filter(
+           Notification.notification_id == notification_id,
+           Notification.tenant_id == tenant_id
+       ).options(
+           joinedload(Notification.rule).joinedload(NotificationRule.channel)
+       ).first()
+       
+       # Already sent notifications are left alone, e.g. on redelivery
+       if not notification or notification.status != "pending":
+           return notification
+       
+       channel = notification.rule.channel if notification.rule else None
+       configuration = (channel.configuration or {}) if channel else {}
+       
+       # Send the notification (implementation depends on channel type)
+       sent = True
+       if channel is None or channel.type == "in_app":
+           # In-app notifications are read from the database
+           pass
+       
+       elif channel.type == "email":
+           recipient = configuration.get("recipient_email")
+           sent = bool(recipient)
+           if sent:
+               logger.info(f"Would send email notification {notification_id} to {recipient}")
+           
+       elif channel.type == "slack":
+           sent = bool(configuration.get("webhook_url"))
+           if sent:
+               logger.info(f"Would send Slack notification {notification_id} to webhook")
+           
+       elif channel.type == "webhook":
+           url = configuration.get("url")
+           sent = bool(url)
+           if sent:
+               logger.info(f"Would send webhook notification {notification_id} to {url}")
+       
+       if sent:
+           notification.status = "sent"
+           notification.sent_at = datetime.utcnow()
+       else:
+           logger.warning(f"Notification {notification_id} not sent: channel {channel.channel_id} is not configured")
+           notification.status = "failed"
+       
+       self.db.commit()
+       self.db.refresh(notification)
+       
+       return notification
+   
    # Notification Channel methods
    def create_notification_channel(
        self,
@@ -409,7 +460,7 @@ class NotificationService:
        
        return rules, total
    
-   async def check_notification_triggers(self, event_type: str, event_data: Dict[str, Any]) -> List[Notification]:
+   def check_notification_triggers(self, event_type: str, event_data: Dict[str, Any]) -> List[Notification]:
        """Check and trigger notifications based on an event"""
        # Get notification type ID for event type
        notification_type = self.db.query(NotificationType).filter(
@@ -442,7 +493,7 @@ class NotificationService:
                # Create notification
                subject, message = self._generate_notification_message(notification_type.name, event_data)
                
-               notification = await self.create_notification(
+               notification = self.create_notification(
                    tenant_id=rule.tenant_id,
                    subject=subject,
                    message=message,
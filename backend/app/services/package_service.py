@@ -6,13 +6,15 @@ including uploading, versioning, and deployment.
 """
 
 import os
+import re
 import uuid
 import hashlib
 import logging
 import shutil
 import zipfile
+import posixpath
 from datetime import datetime
-from typing import Dict, List, Optional, Any, BinaryIO
+from typing import Dict, List, Optional, Any, BinaryIO, Tuple
 
 from fastapi import UploadFile
 from sqlalchemy.orm import Session
@@ -25,6 +27,22 @@ from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# Format of blob digests (SHA-256 as hexadecimal string)
+BLOB_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def blob_object_name(tenant_id: Any, digest: str) -> str:
+    """
+    Get the object name of a blob in a tenant's content-addressed store.
+    
+    Args:
+        tenant_id: Tenant ID
+        digest: SHA-256 of the blob content
+        
+    Returns:
+        str: Object name/path in storage
+    """
+    return f"tenants/{tenant_id}/blobs/{digest[:2]}/{digest}"
+
 class PackageService:
     """Service for managing automation packages"""
     
@@ -387,29 +405,17 @@ class PackageService:
         os.makedirs(temp_dir, exist_ok=True)
         
         try:
-            # Save file to temp directory
+            # Save file to temp directory, hashing it while it is received
             zip_path = os.path.join(temp_dir, "package.zip")
-            with open(zip_path, "wb") as f:
-                f.write(file.read())
-            
-            # Validate zip file
-            if not zipfile.is_zipfile(zip_path):
-                raise ValueError("Invalid zip file")
-            
-            # Extract zip file
-            extract_dir = os.path.join(temp_dir, "extracted")
-            os.makedirs(extract_dir, exist_ok=True)
+            md5_hash, _ = self._receive_package_file(file, zip_path)
             
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(extract_dir)
-            
-            # Validate entry point
-            entry_point_path = os.path.join(extract_dir, info.entry_point)
-            if not os.path.exists(entry_point_path):
+            # Validate entry point against the zip index
+            file_names = self._read_package_file_names(zip_path)
+            if self._normalize_package_path(info.entry_point) not in file_names:
                 raise ValueError(f"Entry point not found: {info.entry_point}")
             
-            # Calculate MD5 hash
-            md5_hash = self._calculate_file_md5(zip_path)
+            # Store the files missing from the tenant's blob store
+            manifest = self._store_package_blobs(zip_path, tenant_id)
             
             # Create or update package
             if existing:
@@ -417,6 +423,7 @@ class PackageService:
                 existing.description = info.description or existing.description
                 existing.entry_point = info.entry_point
                 existing.md5_hash = md5_hash
+                existing.manifest = manifest
                 existing.updated_at = datetime.utcnow()
                 existing.updated_by = user_id
                 
@@ -451,6 +458,7 @@ class PackageService:
                     storage_path=storage_path,
                     entry_point=info.entry_point,
                     md5_hash=md5_hash,
+                    manifest=manifest,
                     status="development",
                     created_by=user_id,
                     updated_by=user_id
@@ -477,21 +485,13 @@ class PackageService:
             self.db.refresh(package)
             
             # Upload to object storage
-            object_name = f"{package.storage_path}/package.zip"
-            
-            with open(zip_path, "rb") as f:
-                self.storage.upload_bytes(
-                    f.read(),
-                    object_name,
-                    content_type="application/zip",
-                    metadata={
-                        "tenant_id": str(tenant_id),
-                        "package_id": str(package.package_id),
-                        "name": package.name,
-                        "version": package.version,
-                        "md5_hash": md5_hash
-                    }
-                )
+            self._store_package_file(zip_path, package, {
+                "tenant_id": str(tenant_id),
+                "package_id": str(package.package_id),
+                "name": package.name,
+                "version": package.version,
+                "md5_hash": md5_hash
+            })
             
             return package
             
@@ -618,17 +618,29 @@ class PackageService:
             "failed_count": failed_count
         }
     
-    def download_package(self, package_id: uuid.UUID, tenant_id: uuid.UUID, user_id: Optional[uuid.UUID] = None) -> Optional[bytes]:
+    def download_package(
+        self,
+        package_id: uuid.UUID,
+        tenant_id: uuid.UUID,
+        user_id: Optional[uuid.UUID] = None,
+        byte_range: Optional[Tuple[int, Optional[int]]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Download a package.
+        Download a package, streamed from object storage.
         
         Args:
             package_id: Package ID
             tenant_id: Tenant ID
             user_id: Optional user ID for audit logging
+            byte_range: Optional (first byte, last byte) range, open-ended if
+                the last byte is None, or (-n, None) for the last n bytes
             
         Returns:
-            Optional[bytes]: Package data or None if not found
+            Optional[Dict[str, Any]]: Package, object size, served range and
+                an iterator over the data chunks, or None if not found
+            
+        Raises:
+            ValueError: If the range is not satisfiable
         """
         # Get package
         package = self.db.query(Package).filter(
@@ -639,13 +651,22 @@ class PackageService:
         if not package:
             return None
         
-        # Download from object storage
+        # Check the object, the data is only read while the response is sent
         object_name = f"{package.storage_path}/package.zip"
-        data = self.storage.download_bytes(object_name)
+        stat = self.storage.stat_object(object_name)
         
-        if not data:
+        if not stat:
             return None
         
+        size = stat["size"]
+        start, end = 0, size - 1
+        if byte_range:
+            start = byte_range[0] if byte_range[0] >= 0 else max(size + byte_range[0], 0)
+            if byte_range[1] is not None:
+                end = min(byte_range[1], size - 1)
+            if start >= size or start > end:
+                raise ValueError(f"Range not satisfiable for {size} bytes")
+        
         # Log download if user ID provided
         if user_id:
             # Create audit log
@@ -663,7 +684,53 @@ class PackageService:
             self.db.add(audit_log)
             self.db.commit()
         
-        return data
+        return {
+            "package": package,
+            "size": size,
+            "start": start,
+            "end": end,
+            "content": self.storage.iter_object(object_name, offset=start, length=end - start + 1)
+        }
+    
+    def get_package_download_url(self, package_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get a short-lived presigned URL to download a package from object storage.
+        
+        Args:
+            package_id: Package ID
+            tenant_id: Tenant ID
+            
+        Returns:
+            Optional[Dict[str, Any]]: Download URL, its lifetime, the package
+                size and MD5, or None if not found
+            
+        Raises:
+            ValueError: If the URL can't be generated
+        """
+        package = self.get_package(package_id, tenant_id)
+        
+        if not package:
+            return None
+        
+        object_name = f"{package.storage_path}/package.zip"
+        stat = self.storage.stat_object(object_name)
+        
+        if not stat:
+            return None
+        
+        expires_in = settings.PACKAGE_DOWNLOAD_URL_EXPIRE_SECONDS
+        url = self.storage.get_presigned_url(object_name, expires=expires_in)
+        
+        if not url:
+            raise ValueError(f"Failed to generate download URL for package {package_id}")
+        
+        return {
+            "package_id": package.package_id,
+            "url": url,
+            "expires_in": expires_in,
+            "size": stat["size"],
+            "md5_hash": package.md5_hash
+        }
     
     def get_package_permissions(self, package_id: uuid.UUID, tenant_id: uuid.UUID, user_id: uuid.UUID) -> Dict[str, bool]:
         """
@@ -789,24 +856,221 @@ class PackageService:
         self.db.commit()
         return True
     
-    def _calculate_file_md5(self, file_path: str) -> str:
+    def _receive_package_file(self, stream: BinaryIO, zip_path: str) -> Tuple[str, int]:
         """
-        Calculate MD5 hash of a file.
+        Copy an uploaded package to disk in chunks, hashing it on the way.
         
         Args:
-            file_path: Path to file
+            stream: Uploaded package stream
+            zip_path: Path to write the package to
             
         Returns:
-            str: MD5 hash as hexadecimal string
+            Tuple[str, int]: MD5 hash as hexadecimal string and size in bytes
         """
         md5 = hashlib.md5()
+        size = 0
         
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+        with open(zip_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(settings.OBJECT_STORAGE_CHUNK_SIZE), b""):
                 md5.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        
+        return md5.hexdigest(), size
+    
+    def _read_package_file_names(self, zip_path: str) -> List[str]:
+        """
+        Read the file names of a package from its zip index, without extracting it.
+        
+        Args:
+            zip_path: Path to the package
+            
+        Returns:
+            List[str]: File names in archive order
+            
+        Raises:
+            ValueError: If the file is not a valid zip file
+        """
+        if not zipfile.is_zipfile(zip_path):
+            raise ValueError("Invalid zip file")
+        
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            return [self._normalize_package_path(name) for name in zip_ref.namelist() if not name.endswith("/")]
+    
+    def _normalize_package_path(self, path: str) -> str:
+        """
+        Normalize a path inside a package to the zip index form.
+        
+        Args:
+            path: Path inside the package
+            
+        Returns:
+            str: Relative path with forward slashes
+        """
+        return posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+    
+    def _store_package_blobs(self, zip_path: str, tenant_id: uuid.UUID) -> List[Dict[str, Any]]:
+        """
+        Store the files of a package in the tenant's content-addressed blob store.
+        
+        Each file is hashed while streamed from the archive and only uploaded
+        if no blob with its SHA-256 exists yet, so files unchanged between
+        versions, or shared between packages, are stored once.
+        
+        Args:
+            zip_path: Path to the package
+            tenant_id: Tenant ID
+            
+        Returns:
+            List[Dict[str, Any]]: Manifest entries (path, sha256, size) in archive order
+            
+        Raises:
+            ValueError: If a blob upload fails
+        """
+        manifest = []
+        stored = set()
+        uploaded = 0
+        
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                
+                sha256 = hashlib.sha256()
+                with zip_ref.open(info) as member:
+                    for chunk in iter(lambda: member.read(settings.OBJECT_STORAGE_CHUNK_SIZE), b""):
+                        sha256.update(chunk)
+                digest = sha256.hexdigest()
+                
+                manifest.append({
+                    "path": self._normalize_package_path(info.filename),
+                    "sha256": digest,
+                    "size": info.file_size
+                })
+                
+                if digest in stored:
+                    continue
+                stored.add(digest)
+                
+                object_name = blob_object_name(tenant_id, digest)
+                if self.storage.object_exists(object_name):
+                    continue
                 
-        return md5.hexdigest()
+                with zip_ref.open(info) as member:
+                    if not self.storage.upload_stream(member, object_name, info.file_size):
+                        raise ValueError(f"Failed to store package file: {info.filename}")
+                uploaded += 1
+        
+        logger.info(f"Stored {uploaded} new blobs for {len(manifest)} package files")
+        
+        return manifest
+    
+    def get_package_manifest(self, package_id: uuid.UUID, tenant_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get the manifest of a package version.
+        
+        Args:
+            package_id: Package ID
+            tenant_id: Tenant ID
+            
+        Returns:
+            Optional[Dict[str, Any]]: Package details and manifest entries, or
+                None if the package is not found or was stored without manifest
+        """
+        package = self.get_package(package_id, tenant_id)
+        
+        if not package or package.manifest is None:
+            return None
+        
+        return {
+            "package_id": package.package_id,
+            "name": package.name,
+            "version": package.version,
+            "entry_point": package.entry_point,
+            "files": package.manifest
+        }
+    
+    def download_blob(self, tenant_id: uuid.UUID, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Download a blob of the tenant's blob store, streamed from object storage.
+        
+        Args:
+            tenant_id: Tenant ID
+            digest: SHA-256 of the blob content
+            
+        Returns:
+            Optional[Dict[str, Any]]: Blob size and an iterator over the data
+                chunks, or None if not found
+        """
+        if not BLOB_DIGEST_PATTERN.match(digest):
+            return None
+        
+        object_name = blob_object_name(tenant_id, digest)
+        stat = self.storage.stat_object(object_name)
+        
+        if not stat:
+            return None
+        
+        return {
+            "size": stat["size"],
+            "content": self.storage.iter_object(object_name)
+        }
+    
+    def get_blob_download_urls(self, tenant_id: uuid.UUID, digests: List[str]) -> Dict[str, str]:
+        """
+        Get short-lived presigned URLs to download blobs of the tenant's blob store.
+        
+        URLs are signed locally without checking the blobs exist, a missing
+        blob fails when it is downloaded.
+        
+        Args:
+            tenant_id: Tenant ID
+            digests: SHA-256 of the blobs
+            
+        Returns:
+            Dict[str, str]: Download URL by digest, invalid digests are left out
+            
+        Raises:
+            ValueError: If the URLs can't be generated
+        """
+        urls = {}
+        
+        for digest in set(digests):
+            if not BLOB_DIGEST_PATTERN.match(digest):
+                continue
+            
+            url = self.storage.get_presigned_url(
+                blob_object_name(tenant_id, digest),
+                expires=settings.PACKAGE_DOWNLOAD_URL_EXPIRE_SECONDS
+            )
+            if not url:
+                raise ValueError("Failed to generate blob download URLs")
+            urls[digest] = url
+        
+        return urls
+    
+    def _store_package_file(self, zip_path: str, package: Package, metadata: Dict[str, str]) -> None:
+        """
+        Upload a package file to object storage as a multipart upload.
         
+        Args:
+            zip_path: Path to the package
+            package: Package
+            metadata: Object metadata
+            
+        Raises:
+            ValueError: If the upload fails
+        """
+        object_name = f"{package.storage_path}/package.zip"
+        
+        if not self.storage.upload_file(
+            zip_path,
+            object_name,
+            content_type="application/zip",
+            metadata=metadata
+        ):
+            raise ValueError(f"Failed to store package file: {object_name}")
+    
     def list_packages_for_agent(self, agent_id: uuid.UUID, tenant_id: uuid.UUID) -> List[Dict[str, Any]]:
         """
         List packages available for an agent.
@@ -880,47 +1144,28 @@ class PackageService:
         os.makedirs(temp_dir, exist_ok=True)
         
         try:
-            # Save file to temp directory
+            # Save file to temp directory, hashing it while it is received
             zip_path = os.path.join(temp_dir, "package.zip")
-            with open(zip_path, "wb") as f:
-                f.write(file.file.read())
-                
-            # Validate zip file
-            if not zipfile.is_zipfile(zip_path):
-                raise ValueError("Invalid zip file")
-                
-            # Extract zip file
-            extract_dir = os.path.join(temp_dir, "extracted")
-            os.makedirs(extract_dir, exist_ok=True)
+            md5_hash, _ = self._receive_package_file(file.file, zip_path)
             
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(extract_dir)
-                
-            # Validate entry point if provided
+            # Validate entry point if provided, against the zip index
+            file_names = self._read_package_file_names(zip_path)
             if entry_point:
-                entry_point_path = os.path.join(extract_dir, entry_point)
-                if not os.path.exists(entry_point_path):
+                if self._normalize_package_path(entry_point) not in file_names:
                     raise ValueError(f"Entry point not found: {entry_point}")
             else:
                 # Try to find main.py
-                if os.path.exists(os.path.join(extract_dir, "main.py")):
+                if "main.py" in file_names:
                     entry_point = "main.py"
                 else:
                     # Find first Python file
-                    for root, _, files in os.walk(extract_dir):
-                        for file in files:
-                            if file.endswith(".py"):
-                                rel_path = os.path.relpath(os.path.join(root, file), extract_dir)
-                                entry_point = rel_path
-                                break
-                        if entry_point:
-                            break
+                    entry_point = next((name for name in file_names if name.endswith(".py")), None)
                             
                     if not entry_point:
                         raise ValueError("No Python files found in package")
-                        
-            # Calculate MD5 hash
-            md5_hash = self._calculate_file_md5(zip_path)
+            
+            # Store the files missing from the tenant's blob store
+            manifest = self._store_package_blobs(zip_path, tenant_id)
             
             # Check if package exists
             existing = self.db.query(Package).filter(
@@ -937,6 +1182,7 @@ class PackageService:
                 existing.description = description or existing.description
                 existing.entry_point = entry_point
                 existing.md5_hash = md5_hash
+                existing.manifest = manifest
                 existing.updated_at = datetime.utcnow()
                 
                 package = existing
@@ -967,6 +1213,7 @@ class PackageService:
                     storage_path=storage_path,
                     entry_point=entry_point,
                     md5_hash=md5_hash,
+                    manifest=manifest,
                     status="development"
                 )
                 
@@ -991,22 +1238,14 @@ class PackageService:
             self.db.refresh(package)
             
             # Upload to object storage
-            object_name = f"{package.storage_path}/package.zip"
-            
-            with open(zip_path, "rb") as f:
-                self.storage.upload_bytes(
-                    f.read(),
-                    object_name,
-                    content_type="application/zip",
-                    metadata={
-                        "tenant_id": str(tenant_id),
-                        "package_id": str(package.package_id),
-                        "name": package.name,
-                        "version": package.version,
-                        "md5_hash": md5_hash,
-                        "uploaded_by_agent": str(agent_id)
-                    }
-                )
+            self._store_package_file(zip_path, package, {
+                "tenant_id": str(tenant_id),
+                "package_id": str(package.package_id),
+                "name": package.name,
+                "version": package.version,
+                "md5_hash": md5_hash,
+                "uploaded_by_agent": str(agent_id)
+            })
                 
             return package
             
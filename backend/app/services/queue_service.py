@@ -5,21 +5,99 @@ This module provides services for managing queues, queue items,
 and queue operations.
 """
 
+import io
+import csv
+import json
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import BinaryIO, Dict, Iterator, List, Optional, Any, Tuple
 
 from fastapi import BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, and_, desc
+from pydantic import ValidationError
+from sqlalchemy import func, or_, and_, desc, select, insert, update, delete, text, case, literal
 
-from ..models import Queue, QueueItem, AuditLog
+from ..config import settings
+from ..models import Queue, QueueItem, QueueCounter, AuditLog
 from ..schemas.queue import QueueCreate, QueueUpdate, QueueItemCreate, QueueItemUpdate, QueueStats
 from ..messaging.producer import get_message_producer
+from .agent_scheduler import get_agent_scheduler
+from .quota_service import QuotaService, QuotaExceededError, QUEUE_ITEMS
 
 logger = logging.getLogger(__name__)
 
+# Statuses of items that are currently leased to an agent
+CLAIMED_STATUSES = ["processing", "assigned"]
+
+# Queue counter columns, summed over a queue's counter stripes
+COUNTER_COLUMNS = [
+    "total_items", "pending_items", "processing_items", "completed_items",
+    "failed_items", "cancelled_items", "processing_time_total_ms", "processing_time_count"
+]
+
+# Routing keys (on the "jobs" exchange) of events that trigger a dispatch
+QUEUE_DISPATCH_ROUTING_KEYS = {
+    "new_item": "queue.item.new",
+    "update_item": "queue.item.update",
+    "item_completed": "queue.item.completed",
+    "agent_available": "queue.agent.available",
+    "items_available": "queue.items.available"
+}
+
+# Operations supported by bulk_operation and bulk_operation_by_filter
+BULK_OPERATIONS = ["cancel", "retry", "delete"]
+
+# Supported bulk ingestion formats
+INGEST_FORMATS = ["ndjson", "csv"]
+
+# Columns written by bulk ingestion, in COPY order
+INGEST_COLUMNS = [
+    "item_id", "queue_id", "tenant_id", "status", "priority", "reference_id",
+    "payload", "due_date", "retry_count", "created_at", "updated_at"
+]
+
+# CSV columns that map to queue item fields rather than payload keys
+INGEST_ITEM_FIELDS = ["priority", "reference_id", "due_date", "payload"]
+
+def publish_dispatch_event(
+    action: str,
+    tenant_id: str,
+    data: Optional[Dict[str, Any]] = None,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> None:
+    """
+    Publish an event that makes the queue worker dispatch a tenant's items now.
+    
+    Args:
+        action: Event action (a key of QUEUE_DISPATCH_ROUTING_KEYS)
+        tenant_id: Tenant ID
+        data: Optional additional message fields
+        background_tasks: Optional FastAPI background tasks to publish from
+    """
+    message_producer = get_message_producer()
+    
+    message_data = {
+        "action": action,
+        "tenant_id": str(tenant_id),
+        "timestamp": datetime.utcnow().isoformat(),
+        **(data or {})
+    }
+    
+    if background_tasks:
+        background_tasks.add_task(
+            message_producer.send_message,
+            "jobs",
+            QUEUE_DISPATCH_ROUTING_KEYS[action],
+            message_data
+        )
+    else:
+        message_producer.send_message_sync(
+            "jobs",
+            QUEUE_DISPATCH_ROUTING_KEYS[action],
+            message_data
+        )
+
 class QueueService:
     """Service for managing queues and queue items"""
     
@@ -173,10 +251,11 @@ class QueueService:
         if active_items > 0:
             raise ValueError(f"Cannot delete queue with {active_items} active items")
         
-        # Delete queue items
-        self.db.query(QueueItem).filter(
+        # Delete queue items and free their slots
+        count = self.db.query(QueueItem).filter(
             QueueItem.queue_id == queue_id
         ).delete()
+        QuotaService(self.db).release(tenant_id, QUEUE_ITEMS, count)
         
         # Delete queue
         self.db.delete(queue)
@@ -245,6 +324,9 @@ class QueueService:
         """
         Get queue statistics.
         
+        Counts are read from the queue's counter rows; only the oldest and
+        newest pending timestamps are looked up on the items table.
+        
         Args:
             queue_id: Queue ID
             tenant_id: Tenant ID
@@ -255,79 +337,175 @@ class QueueService:
         Raises:
             ValueError: If queue not found
         """
-        # Get queue
-        queue = self.db.query(Queue).filter(
-            Queue.queue_id == queue_id,
-            Queue.tenant_id == tenant_id
-        ).first()
+        stats = self.list_queue_stats(tenant_id, queue_ids=[queue_id])
         
-        if not queue:
+        if not stats:
             raise ValueError(f"Queue not found: {queue_id}")
         
-        # Count items by status
-        total_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id
-        ).scalar()
-        
-        pending_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "pending"
-        ).scalar()
-        
-        processing_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "processing"
-        ).scalar()
+        return stats[0]
+    
+    def list_queue_stats(
+        self,
+        tenant_id: str,
+        queue_ids: Optional[List[str]] = None
+    ) -> List[QueueStats]:
+        """
+        Get statistics for several queues at once.
         
-        completed_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "completed"
-        ).scalar()
+        Uses one query for the queues and their counter rows and one grouped
+        query for the pending item range, regardless of the number of queues.
+        Queues without a counter row have never had items and report zeros;
+        counters are backfilled by the migration, not on reads.
         
-        failed_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "failed"
-        ).scalar()
+        Args:
+            tenant_id: Tenant ID
+            queue_ids: Optional list of queue IDs (all tenant queues if omitted)
+            
+        Returns:
+            List[QueueStats]: Queue statistics ordered by queue name
+        """
+        # Sum the counter stripes of each queue
+        counters = self.db.query(
+            QueueCounter.queue_id,
+            *(func.sum(getattr(QueueCounter, column)).label(column) for column in COUNTER_COLUMNS)
+        ).filter(QueueCounter.tenant_id == tenant_id)
+        
+        if queue_ids is not None:
+            counters = counters.filter(QueueCounter.queue_id.in_(queue_ids))
+        
+        counters = counters.group_by(QueueCounter.queue_id).subquery()
+        
+        # Get queues with their counters
+        query = self.db.query(Queue, counters).outerjoin(
+            counters, counters.c.queue_id == Queue.queue_id
+        ).filter(Queue.tenant_id == tenant_id)
+        
+        if queue_ids is not None:
+            query = query.filter(Queue.queue_id.in_(queue_ids))
+        
+        rows = [
+            (row.Queue, row if row.queue_id is not None else None)
+            for row in query.order_by(Queue.name).all()
+        ]
+        
+        if not rows:
+            return []
+        
+        # Get oldest and newest pending items per queue
+        pending_range = {
+            row.queue_id: (row.oldest, row.newest)
+            for row in self.db.execute(
+                self.pending_range_query([queue.queue_id for queue, _ in rows])
+            ).all()
+        }
+        
+        stats = []
+        for queue, counter in rows:
+            oldest_pending, newest_pending = pending_range.get(queue.queue_id, (None, None))
+            
+            average_processing_time = None
+            if counter and counter.processing_time_count:
+                average_processing_time = counter.processing_time_total_ms / counter.processing_time_count
+            
+            stats.append(QueueStats(
+                queue_id=queue.queue_id,
+                tenant_id=queue.tenant_id,
+                name=queue.name,
+                total_items=counter.total_items if counter else 0,
+                pending_items=counter.pending_items if counter else 0,
+                processing_items=counter.processing_items if counter else 0,
+                completed_items=counter.completed_items if counter else 0,
+                failed_items=counter.failed_items if counter else 0,
+                cancelled_items=counter.cancelled_items if counter else 0,
+                average_processing_time_ms=average_processing_time,
+                oldest_pending_item=oldest_pending,
+                newest_pending_item=newest_pending
+            ))
         
-        cancelled_items = self.db.query(func.count(QueueItem.item_id)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "cancelled"
-        ).scalar()
+        return stats
+    
+    @staticmethod
+    def pending_range_query(queue_ids: List[Any]):
+        """
+        Build the SELECT of the oldest and newest pending item per queue.
         
-        # Calculate average processing time
-        avg_processing_time = self.db.query(func.avg(QueueItem.processing_time_ms)).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.processing_time_ms.isnot(None)
-        ).scalar()
+        Served by the partial index ix_queue_items_queue_pending.
         
-        # Get oldest and newest pending items
-        oldest_pending = self.db.query(QueueItem.created_at).filter(
-            QueueItem.queue_id == queue_id,
+        Args:
+            queue_ids: Queue IDs
+            
+        Returns:
+            Select: Query of (queue_id, oldest, newest) rows
+        """
+        return select(
+            QueueItem.queue_id,
+            func.min(QueueItem.created_at).label("oldest"),
+            func.max(QueueItem.created_at).label("newest")
+        ).where(
+            QueueItem.queue_id.in_(queue_ids),
             QueueItem.status == "pending"
-        ).order_by(QueueItem.created_at).first()
+        ).group_by(QueueItem.queue_id)
+    
+    def rebuild_queue_counters(self, queue_ids: Optional[List[str]] = None) -> int:
+        """
+        Rebuild queue counter rows from the items table in a single pass.
         
-        newest_pending = self.db.query(QueueItem.created_at).filter(
-            QueueItem.queue_id == queue_id,
-            QueueItem.status == "pending"
-        ).order_by(desc(QueueItem.created_at)).first()
-        
-        # Create stats object
-        stats = QueueStats(
-            queue_id=queue.queue_id,
-            tenant_id=queue.tenant_id,
-            name=queue.name,
-            total_items=total_items or 0,
-            pending_items=pending_items or 0,
-            processing_items=processing_items or 0,
-            completed_items=completed_items or 0,
-            failed_items=failed_items or 0,
-            cancelled_items=cancelled_items or 0,
-            average_processing_time_ms=float(avg_processing_time) if avg_processing_time else None,
-            oldest_pending_item=oldest_pending[0] if oldest_pending else None,
-            newest_pending_item=newest_pending[0] if newest_pending else None
-        )
+        Intended for migrations and maintenance only; never call this from a
+        request path.
         
-        return stats
+        The counter table is locked against trigger updates for the duration
+        of the rebuild so concurrent item changes are neither lost nor counted
+        twice. The stripes of each rebuilt queue are replaced by one row.
+        
+        Args:
+            queue_ids: Optional list of queue IDs (all queues if omitted)
+            
+        Returns:
+            int: Number of counter rows written
+        """
+        self.db.execute(text("LOCK TABLE queue_item_counters IN SHARE ROW EXCLUSIVE MODE"))
+        
+        item_count = func.count(QueueItem.item_id)
+        counts = select(
+            Queue.queue_id,
+            literal(0),
+            Queue.tenant_id,
+            item_count,
+            item_count.filter(QueueItem.status == "pending"),
+            item_count.filter(QueueItem.status.in_(CLAIMED_STATUSES)),
+            item_count.filter(QueueItem.status == "completed"),
+            item_count.filter(QueueItem.status == "failed"),
+            item_count.filter(QueueItem.status == "cancelled"),
+            func.coalesce(func.sum(QueueItem.processing_time_ms), 0),
+            func.count(QueueItem.processing_time_ms),
+            func.now()
+        ).select_from(Queue).outerjoin(
+            QueueItem, QueueItem.queue_id == Queue.queue_id
+        ).group_by(Queue.queue_id, Queue.tenant_id)
+        
+        stale = delete(QueueCounter)
+        
+        if queue_ids is not None:
+            counts = counts.where(Queue.queue_id.in_(queue_ids))
+            stale = stale.where(QueueCounter.queue_id.in_(queue_ids))
+        
+        columns = [
+            "queue_id", "stripe", "tenant_id", "total_items", "pending_items", "processing_items",
+            "completed_items", "failed_items", "cancelled_items",
+            "processing_time_total_ms", "processing_time_count", "updated_at"
+        ]
+        
+        try:
+            self.db.execute(stale)
+            result = self.db.execute(insert(QueueCounter).from_select(columns, counts))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        logger.info(f"Rebuilt counters for {result.rowcount} queues")
+        
+        return result.rowcount
     
     def add_queue_item(
         self,
@@ -360,44 +538,387 @@ class QueueService:
         if not queue:
             raise ValueError(f"Queue not found: {queue_id}")
         
-        # Create queue item
-        db_item = QueueItem(
-            item_id=uuid.uuid4(),
-            queue_id=queue_id,
-            tenant_id=tenant_id,
-            status="pending",
-            priority=item_in.priority or queue.priority,
-            reference_id=item_in.reference_id,
-            payload=item_in.payload,
-            due_date=item_in.due_date,
-            retry_count=0
-        )
+        # Take one of the tenant's queue item slots in a short transaction of
+        # its own, so the tenant's counter row isn't locked until this commit
+        quota_service = QuotaService(self.db)
+        quota_service.reserve_committed(tenant_id, QUEUE_ITEMS)
+        
+        try:
+            # Create queue item
+            db_item = QueueItem(
+                item_id=uuid.uuid4(),
+                queue_id=queue_id,
+                tenant_id=tenant_id,
+                status="pending",
+                priority=item_in.priority or queue.priority,
+                reference_id=item_in.reference_id,
+                payload=item_in.payload,
+                due_date=item_in.due_date,
+                retry_count=0
+            )
+            
+            self.db.add(db_item)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            quota_service.release_committed(tenant_id, QUEUE_ITEMS)
+            raise
         
-        self.db.add(db_item)
-        self.db.commit()
         self.db.refresh(db_item)
         
-        # Send message to broker for processing
+        # Notify the queue worker so the item is dispatched immediately
         if background_tasks:
-            # Get message producer
-            message_producer = get_message_producer()
-            
-            # Add task to send message
-            background_tasks.add_task(
-                message_producer.send_message,
-                "jobs",
-                "queue.item.new",
+            publish_dispatch_event(
+                "new_item",
+                tenant_id,
                 {
-                    "action": "new_item",
                     "queue_id": queue_id,
                     "item_id": str(db_item.item_id),
-                    "tenant_id": tenant_id,
                     "priority": db_item.priority
-                }
+                },
+                background_tasks
             )
         
         return db_item
     
+    def ingest_queue_items(
+        self,
+        queue_id: str,
+        tenant_id: str,
+        stream: BinaryIO,
+        file_format: str,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Dict[str, Any]:
+        """
+        Bulk load items into a queue from an NDJSON or CSV stream.
+        
+        NDJSON lines are objects with queue item fields (payload, priority,
+        reference_id, due_date); a line without a "payload" key is used as the
+        payload itself. CSV files need a header row; the priority, reference_id
+        and due_date columns map to item fields, an optional payload column holds
+        a JSON object, and all other columns become payload keys.
+        
+        Rows are validated and loaded in batches with PostgreSQL COPY. Invalid
+        rows are reported and skipped without aborting the load, and a single
+        "items available" event is published once the load is done.
+        
+        Args:
+            queue_id: Queue ID
+            tenant_id: Tenant ID
+            stream: Binary stream of the file
+            file_format: Stream format (ndjson or csv)
+            background_tasks: Optional FastAPI background tasks
+            
+        Returns:
+            Dict[str, Any]: Accepted and rejected row counts with rejection details
+            
+        Raises:
+            ValueError: If queue not found or format not supported
+        """
+        if file_format not in INGEST_FORMATS:
+            raise ValueError(f"Invalid format. Must be one of: {', '.join(INGEST_FORMATS)}")
+        
+        # Get queue
+        queue = self.db.query(Queue).filter(
+            Queue.queue_id == queue_id,
+            Queue.tenant_id == tenant_id
+        ).first()
+        
+        if not queue:
+            raise ValueError(f"Queue not found: {queue_id}")
+        
+        if file_format == "ndjson":
+            records = self._read_ndjson_records(stream)
+        else:
+            records = self._read_csv_records(stream)
+        
+        accepted_count = 0
+        rejections = []
+        batch = []
+        started_at = datetime.utcnow()
+        
+        for row_number, record, error in records:
+            if error is None:
+                try:
+                    item_in = QueueItemCreate(**record)
+                except ValidationError as e:
+                    error = "; ".join(
+                        f"{'.'.join(str(loc) for loc in detail['loc'])}: {detail['msg']}"
+                        for detail in e.errors()
+                    )
+                else:
+                    # Catch column overflows here rather than failing the whole batch
+                    if item_in.reference_id and len(item_in.reference_id) > QueueItem.reference_id.type.length:
+                        error = f"reference_id: longer than {QueueItem.reference_id.type.length} characters"
+            
+            if error is not None:
+                reference_id = record.get("reference_id") if record else None
+                rejections.append((row_number, str(reference_id) if reference_id is not None else None, error))
+                continue
+            
+            # Spread created_at by row so that equal-priority items keep file order
+            created_at = started_at + timedelta(microseconds=row_number)
+            
+            batch.append((row_number, {
+                "item_id": uuid.uuid4(),
+                "queue_id": queue.queue_id,
+                "tenant_id": queue.tenant_id,
+                "status": "pending",
+                "priority": item_in.priority or queue.priority,
+                "reference_id": item_in.reference_id or None,
+                "payload": item_in.payload,
+                "due_date": item_in.due_date,
+                "retry_count": 0,
+                "created_at": created_at,
+                "updated_at": created_at
+            }))
+            
+            if len(batch) >= settings.QUEUE_INGEST_BATCH_SIZE:
+                accepted_count += self._load_ingest_batch(batch, rejections)
+                batch = []
+        
+        if batch:
+            accepted_count += self._load_ingest_batch(batch, rejections)
+        
+        logger.info(
+            f"Ingested {accepted_count} items into queue {queue_id}, "
+            f"rejected {len(rejections)} rows"
+        )
+        
+        # Notify the queue worker once for the whole load
+        if accepted_count:
+            publish_dispatch_event(
+                "items_available",
+                tenant_id,
+                {"queue_id": str(queue_id), "count": accepted_count},
+                background_tasks
+            )
+        
+        max_rejections = settings.QUEUE_INGEST_MAX_REJECTIONS
+        
+        return {
+            "accepted_count": accepted_count,
+            "rejected_count": len(rejections),
+            "rejections": [
+                {"row": row_number, "reference_id": reference_id, "error": error}
+                for row_number, reference_id, error in sorted(rejections)[:max_rejections]
+            ],
+            "rejections_truncated": len(rejections) > max_rejections
+        }
+    
+    def _read_ndjson_records(self, stream: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Read item records from an NDJSON stream.
+        
+        Args:
+            stream: Binary stream
+            
+        Returns:
+            Iterator of (row number, record, error)
+        """
+        for row_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                yield row_number, None, f"Invalid UTF-8: {e}"
+                continue
+            
+            try:
+                document = json.loads(line)
+            except ValueError as e:
+                yield row_number, None, f"Invalid JSON: {e}"
+                continue
+            
+            if not isinstance(document, dict):
+                yield row_number, None, "Row must be a JSON object"
+                continue
+            
+            # Lines without a payload key are the payload themselves
+            if "payload" not in document:
+                document = {"payload": document}
+            
+            yield row_number, document, None
+    
+    def _read_csv_records(self, stream: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Read item records from a CSV stream with a header row.
+        
+        Lines are decoded strictly; a row with a line that isn't valid UTF-8
+        is rejected rather than loaded with replacement characters.
+        
+        Args:
+            stream: Binary stream
+            
+        Returns:
+            Iterator of (row number, record, error)
+            
+        Raises:
+            ValueError: If the header row is not valid UTF-8
+        """
+        # Decoding errors of the lines read for the current row
+        decode_errors = []
+        
+        def decode_lines():
+            for line in stream:
+                try:
+                    yield line.decode("utf-8")
+                except UnicodeDecodeError as e:
+                    # Keep the line so the CSV structure holds, its row is rejected
+                    decode_errors.append(f"Invalid UTF-8: {e}")
+                    yield line.decode("utf-8", errors="replace")
+        
+        reader = csv.DictReader(decode_lines())
+        
+        if reader.fieldnames and decode_errors:
+            raise ValueError(f"Invalid CSV header: {decode_errors[0]}")
+        
+        for row_number, row in enumerate(reader, start=1):
+            if decode_errors:
+                yield row_number, None, decode_errors[0]
+                decode_errors.clear()
+                continue
+            
+            if None in row:
+                yield row_number, None, "Row has more fields than the header"
+                continue
+            
+            record = {
+                field: row.get(field) or None
+                for field in ["priority", "reference_id", "due_date"]
+            }
+            
+            payload = {}
+            if row.get("payload"):
+                try:
+                    payload = json.loads(row["payload"])
+                except ValueError as e:
+                    yield row_number, record, f"Invalid payload JSON: {e}"
+                    continue
+                
+                if not isinstance(payload, dict):
+                    yield row_number, record, "payload must be a JSON object"
+                    continue
+            
+            # Remaining columns become payload keys
+            for column, value in row.items():
+                if column not in INGEST_ITEM_FIELDS:
+                    payload[column] = value
+            
+            record["payload"] = payload
+            
+            yield row_number, record, None
+    
+    def _load_ingest_batch(self, batch: List[Tuple[int, Dict[str, Any]]], rejections: List[Tuple[int, Optional[str], str]]) -> int:
+        """
+        Insert a batch of validated item rows.
+        
+        The batch is loaded with COPY (multi-row INSERT on drivers without COPY
+        support). If the batch fails, its rows are inserted one by one in
+        savepoints so that only the offending rows are rejected.
+        
+        Queue item slots are reserved in short separate transactions (once
+        for the whole batch) and given back for rows that weren't inserted,
+        so the tenant's counter row isn't locked while the batch loads.
+        
+        Args:
+            batch: (row number, column values) pairs
+            rejections: List to append (row number, reference ID, error) to
+            
+        Returns:
+            int: Number of inserted rows
+        """
+        rows = [values for _, values in batch]
+        tenant_id = rows[0]["tenant_id"]
+        quota_service = QuotaService(self.db)
+        
+        reserved = 0
+        
+        try:
+            # Take the tenant's queue item slots of the whole batch
+            quota_service.reserve_committed(tenant_id, QUEUE_ITEMS, len(rows))
+            reserved = len(rows)
+            
+            connection = self.db.connection()
+            if connection.dialect.driver == "psycopg2":
+                self._copy_ingest_rows(connection, rows)
+            else:
+                self.db.execute(insert(QueueItem), rows)
+            self.db.commit()
+            return len(rows)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Bulk ingestion batch failed, retrying row by row: {e}")
+        
+        if not reserved:
+            # The batch didn't fit into the quota, take what is left row by row
+            # and reject the rest
+            for index, (row_number, values) in enumerate(batch):
+                try:
+                    quota_service.reserve_committed(tenant_id, QUEUE_ITEMS)
+                    reserved += 1
+                except QuotaExceededError as e:
+                    rejections.extend(
+                        (row_number, values["reference_id"], str(e))
+                        for row_number, values in batch[index:]
+                    )
+                    break
+            
+            batch = batch[:reserved]
+        
+        inserted = 0
+        for row_number, values in batch:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(QueueItem), [values])
+                inserted += 1
+            except Exception as e:
+                rejections.append((row_number, values["reference_id"], str(e).splitlines()[0]))
+        
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            quota_service.release_committed(tenant_id, QUEUE_ITEMS, reserved)
+            raise
+        
+        # Give back the slots of the rows that weren't inserted
+        quota_service.release_committed(tenant_id, QUEUE_ITEMS, reserved - inserted)
+        
+        return inserted
+    
+    def _copy_ingest_rows(self, connection, rows: List[Dict[str, Any]]) -> None:
+        """
+        Load item rows into queue_items with COPY FROM STDIN.
+        
+        Args:
+            connection: SQLAlchemy connection of the session (psycopg2)
+            rows: Column values
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        for values in rows:
+            writer.writerow([
+                json.dumps(values[column]) if column == "payload"
+                else values[column].isoformat() if isinstance(values[column], datetime)
+                else values[column]
+                for column in INGEST_COLUMNS
+            ])
+        
+        buffer.seek(0)
+        
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY queue_items ({', '.join(INGEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+    
     def get_queue_item(self, queue_id: str, item_id: str, tenant_id: str) -> Optional[QueueItem]:
         """
         Get a queue item by ID.
@@ -437,30 +958,46 @@ class QueueService:
         Returns:
             List[QueueItem]: List of queue items
         """
-        # Build base query
-        query = self.db.query(QueueItem).filter(
+        query = self.queue_items_query(queue_id, tenant_id, status).offset(skip).limit(limit)
+        
+        return self.db.scalars(query).all()
+    
+    @staticmethod
+    def queue_items_query(queue_id: str, tenant_id: str, status: Optional[str] = None):
+        """
+        Build the SELECT of a queue's items, by priority and creation time.
+        
+        Served by the index ix_queue_items_queue_status.
+        
+        Args:
+            queue_id: Queue ID
+            tenant_id: Tenant ID
+            status: Optional status filter
+            
+        Returns:
+            Select: Queue item query
+        """
+        query = select(QueueItem).where(
             QueueItem.queue_id == queue_id,
             QueueItem.tenant_id == tenant_id
         )
         
         # Apply status filter
         if status:
-            query = query.filter(QueueItem.status == status)
+            query = query.where(QueueItem.status == status)
         
-        # Apply pagination and sort by priority and creation time
-        query = query.order_by(
+        return query.order_by(
             desc(QueueItem.priority),
             QueueItem.created_at
-        ).offset(skip).limit(limit)
-        
-        return query.all()
+        )
     
     def update_queue_item(
         self,
         queue_id: str,
         item_id: str,
         item_in: QueueItemUpdate,
-        tenant_id: str
+        tenant_id: str,
+        background_tasks: Optional[BackgroundTasks] = None
     ) -> Optional[QueueItem]:
         """
         Update a queue item.
@@ -470,6 +1007,7 @@ class QueueService:
             item_id: Item ID
             item_in: Queue item update data
             tenant_id: Tenant ID
+            background_tasks: Optional FastAPI background tasks
             
         Returns:
             Optional[QueueItem]: Updated queue item or None if not found
@@ -487,6 +1025,9 @@ class QueueService:
         if not item:
             return None
         
+        old_status = item.status
+        old_assigned_to = item.assigned_to
+        
         # Check status transition
         if item_in.status and item_in.status != item.status:
             # Validate status transition
@@ -518,6 +1059,27 @@ class QueueService:
         self.db.commit()
         self.db.refresh(item)
         
+        # Free the agent's slot once the item leaves the claimed state
+        if old_assigned_to and old_status in CLAIMED_STATUSES and item.status not in CLAIMED_STATUSES:
+            get_agent_scheduler().release(tenant_id, old_assigned_to)
+        
+        # A finished item frees its agent, a pending one can be dispatched
+        if background_tasks and item.status != old_status:
+            if item.status in ["completed", "failed", "cancelled"]:
+                publish_dispatch_event(
+                    "item_completed",
+                    tenant_id,
+                    {"queue_id": queue_id, "item_id": str(item.item_id)},
+                    background_tasks
+                )
+            elif item.status == "pending":
+                publish_dispatch_event(
+                    "new_item",
+                    tenant_id,
+                    {"queue_id": queue_id, "item_id": str(item.item_id)},
+                    background_tasks
+                )
+        
         return item
     
     def delete_queue_item(self, queue_id: str, item_id: str, tenant_id: str) -> bool:
@@ -549,13 +1111,20 @@ class QueueService:
         if item.status == "processing":
             raise ValueError("Cannot delete queue item in 'processing' state")
         
-        # Delete item
+        # Delete item and free its slot
         self.db.delete(item)
+        QuotaService(self.db).release(tenant_id, QUEUE_ITEMS)
         self.db.commit()
         
         return True
     
-    def retry_queue_item(self, queue_id: str, item_id: str, tenant_id: str) -> Optional[QueueItem]:
+    def retry_queue_item(
+        self,
+        queue_id: str,
+        item_id: str,
+        tenant_id: str,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Optional[QueueItem]:
         """
         Retry a failed queue item.
         
@@ -563,6 +1132,7 @@ class QueueService:
             queue_id: Queue ID
             item_id: Item ID
             tenant_id: Tenant ID
+            background_tasks: Optional FastAPI background tasks
             
         Returns:
             Optional[QueueItem]: Updated queue item or None if not found or cannot be retried
@@ -599,11 +1169,21 @@ class QueueService:
         item.retry_count += 1
         item.error_message = None
         item.assigned_to = None
+        item.lease_expires_at = None
         item.updated_at = datetime.utcnow()
         
         self.db.commit()
         self.db.refresh(item)
         
+        # Notify the queue worker so the item is dispatched immediately
+        if background_tasks:
+            publish_dispatch_event(
+                "new_item",
+                tenant_id,
+                {"queue_id": queue_id, "item_id": str(item.item_id)},
+                background_tasks
+            )
+        
         return item
     
     def clear_queue(self, queue_id: str, tenant_id: str, status: Optional[str] = None) -> int:
@@ -643,8 +1223,9 @@ class QueueService:
             # Never delete processing items
             query = query.filter(QueueItem.status != "processing")
         
-        # Delete items
+        # Delete items and free their slots
         count = query.delete(synchronize_session=False)
+        QuotaService(self.db).release(tenant_id, QUEUE_ITEMS, count)
         self.db.commit()
         
         return count
@@ -690,10 +1271,20 @@ class QueueService:
         if not queue:
             raise ValueError(f"Queue not found: {item.queue_id}")
         
+        # Free the agent's slot once the item leaves the claimed state
+        if item.assigned_to and item.status in CLAIMED_STATUSES and status not in CLAIMED_STATUSES:
+            get_agent_scheduler().release(tenant_id, item.assigned_to)
+        
         # Update status
         item.status = status
         item.updated_at = datetime.utcnow()
         
+        # Progress updates of a claimed item renew its lease
+        if status in CLAIMED_STATUSES:
+            item.lease_expires_at = datetime.utcnow() + timedelta(seconds=settings.QUEUE_ITEM_LEASE_SECONDS)
+        else:
+            item.lease_expires_at = None
+        
         if status == "completed":
             # Mark as processed
             item.processed_at = datetime.utcnow()
@@ -740,30 +1331,86 @@ class QueueService:
         
         return item
     
-    def get_next_queue_items(
+    def claim_queue_items(
         self,
         tenant_id: str,
         agent_id: str,
         max_items: int = 1,
-        capabilities: Optional[List[str]] = None
+        lease_seconds: Optional[int] = None,
+        claim_status: str = "processing"
     ) -> List[QueueItem]:
         """
-        Get next items from queues for processing.
+        Atomically claim pending queue items for an agent.
+        
+        Candidate rows are selected with FOR UPDATE SKIP LOCKED and flipped
+        to the claimed status in the same UPDATE ... RETURNING statement, so
+        concurrent dispatchers never hand the same item to two agents and
+        never block on each other's rows.
         
         Args:
             tenant_id: Tenant ID
-            agent_id: Agent ID
-            max_items: Maximum number of items to return
-            capabilities: Optional list of agent capabilities
+            agent_id: Agent ID the items are leased to
+            max_items: Maximum number of items to claim
+            lease_seconds: Lease duration (defaults to QUEUE_ITEM_LEASE_SECONDS)
+            claim_status: Status to set on claimed items
             
         Returns:
-            List[QueueItem]: List of queue items
+            List[QueueItem]: Claimed queue items ordered by priority and age
         """
-        # Get current time
+        if max_items <= 0:
+            return []
+        
+        # Get current time and lease expiry
         now = datetime.utcnow()
+        lease_seconds = lease_seconds or settings.QUEUE_ITEM_LEASE_SECONDS
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        
+        # Select claimable items, skipping rows locked by other dispatchers
+        candidates = self.claim_candidates_query(tenant_id, max_items, now)
+        
+        # Flip the locked rows to the claimed status in one statement
+        stmt = update(QueueItem).where(
+            QueueItem.item_id.in_(candidates)
+        ).values(
+            status=claim_status,
+            assigned_to=agent_id,
+            lease_expires_at=lease_expires_at,
+            updated_at=now
+        ).returning(QueueItem).execution_options(synchronize_session=False)
+        
+        try:
+            items = self.db.scalars(stmt).all()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        # RETURNING does not preserve the candidate ordering
+        items.sort(key=lambda item: (-item.priority, item.created_at))
+        
+        if items:
+            logger.debug(f"Agent {agent_id} claimed {len(items)} queue items")
         
-        # Build query for pending items
-        query = self.db.query(QueueItem).filter(
+        return items
+    
+    @staticmethod
+    def claim_candidates_query(tenant_id: str, max_items: int, now: datetime):
+        """
+        Build the skip-locked SELECT of claimable queue items.
+        
+        Served by the partial index ix_queue_items_claim.
+        
+        Args:
+            tenant_id: Tenant ID
+            max_items: Maximum number of items to select
+            now: Current time
+            
+        Returns:
+            Select: Candidate item ID query
+        """
+        return select(QueueItem.item_id).join(
+            Queue, QueueItem.queue_id == Queue.queue_id
+        ).where(
             QueueItem.tenant_id == tenant_id,
             QueueItem.status == "pending",
             QueueItem.assigned_to.is_(None),
@@ -774,58 +1421,229 @@ class QueueService:
             or_(
                 QueueItem.due_date.is_(None),
                 QueueItem.due_date >= now
-            )
+            ),
+            Queue.status == "active"
+        ).order_by(
+            desc(QueueItem.priority),
+            QueueItem.created_at
+        ).limit(max_items).with_for_update(skip_locked=True, of=QueueItem)
+    
+    def get_next_queue_items(
+        self,
+        tenant_id: str,
+        agent_id: str,
+        max_items: int = 1,
+        capabilities: Optional[List[str]] = None
+    ) -> List[QueueItem]:
+        """
+        Get next items from queues for processing.
+        
+        Args:
+            tenant_id: Tenant ID
+            agent_id: Agent ID
+            max_items: Maximum number of items to return
+            capabilities: Optional list of agent capabilities
+            
+        Returns:
+            List[QueueItem]: List of queue items
+        """
+        return self.claim_queue_items(
+            tenant_id=tenant_id,
+            agent_id=agent_id,
+            max_items=max_items
         )
+    
+    def renew_queue_item_lease(
+        self,
+        item_id: str,
+        agent_id: str,
+        tenant_id: str,
+        lease_seconds: Optional[int] = None
+    ) -> Optional[datetime]:
+        """
+        Extend the lease on a claimed queue item.
         
-        # Join with queue to get active queues
-        query = query.join(Queue, QueueItem.queue_id == Queue.queue_id).filter(
-            Queue.status == "active"
+        Args:
+            item_id: Item ID
+            agent_id: Agent ID holding the lease
+            tenant_id: Tenant ID
+            lease_seconds: Lease duration (defaults to QUEUE_ITEM_LEASE_SECONDS)
+            
+        Returns:
+            Optional[datetime]: New lease expiry or None if the agent no longer holds the item
+        """
+        lease_seconds = lease_seconds or settings.QUEUE_ITEM_LEASE_SECONDS
+        lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        
+        count = self.db.query(QueueItem).filter(
+            QueueItem.item_id == item_id,
+            QueueItem.tenant_id == tenant_id,
+            QueueItem.assigned_to == agent_id,
+            QueueItem.status.in_(CLAIMED_STATUSES)
+        ).update(
+            {QueueItem.lease_expires_at: lease_expires_at},
+            synchronize_session=False
         )
+        self.db.commit()
         
-        # Order by priority and creation time
-        query = query.order_by(
-            desc(QueueItem.priority),
-            QueueItem.created_at
-        ).limit(max_items)
+        return lease_expires_at if count else None
+    
+    def renew_agent_leases(self, agent_ids: List[Any], lease_seconds: Optional[int] = None) -> int:
+        """
+        Extend the leases on the items claimed by agents, e.g. on their heartbeats.
         
-        # Get items
-        items = query.all()
+        Items are leased for as long as their agent is alive, so items taking
+        longer than a lease aren't released and dispatched a second time.
+        Only leases past half their duration are extended, so items are not
+        rewritten on every heartbeat. Does not commit.
         
-        # Assign items to agent
-        for item in items:
-            item.status = "processing"
-            item.assigned_to = agent_id
-            item.updated_at = now
+        Args:
+            agent_ids: IDs of the live agents
+            lease_seconds: Lease duration (defaults to QUEUE_ITEM_LEASE_SECONDS)
+            
+        Returns:
+            int: Number of leases extended
+        """
+        if not agent_ids:
+            return 0
+        
+        lease_seconds = lease_seconds or settings.QUEUE_ITEM_LEASE_SECONDS
+        now = datetime.utcnow()
+        
+        return self.db.query(QueueItem).filter(
+            QueueItem.assigned_to.in_(agent_ids),
+            QueueItem.status.in_(CLAIMED_STATUSES),
+            or_(
+                QueueItem.lease_expires_at.is_(None),
+                QueueItem.lease_expires_at < now + timedelta(seconds=lease_seconds / 2)
+            )
+        ).update(
+            {QueueItem.lease_expires_at: now + timedelta(seconds=lease_seconds)},
+            synchronize_session=False
+        )
+    
+    def release_claim(self, item_id: Any, agent_id: Any) -> bool:
+        """
+        Return an item claimed for an agent to the pending state.
+        
+        Used when the agent could not be notified of the claim. The item was
+        never delivered, so no attempt is counted and it can be dispatched
+        again right away instead of waiting for its lease to expire.
         
+        Args:
+            item_id: Queue item ID
+            agent_id: ID of the agent the item was claimed for
+            
+        Returns:
+            bool: True if the item was still claimed for the agent and was released
+        """
+        result = self.db.execute(
+            update(QueueItem).where(
+                QueueItem.item_id == item_id,
+                QueueItem.assigned_to == agent_id,
+                QueueItem.status.in_(CLAIMED_STATUSES)
+            ).values(
+                status="pending",
+                assigned_to=None,
+                lease_expires_at=None,
+                updated_at=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
         self.db.commit()
         
-        # Refresh items
-        for i in range(len(items)):
-            self.db.refresh(items[i])
+        return result.rowcount > 0
+    
+    def release_expired_leases(self, tenant_id: Optional[str] = None) -> int:
+        """
+        Return items whose lease has expired to the pending state.
         
-        return items
+        An expired lease counts as a failed attempt: the item's retry count
+        is incremented and items that exhausted their queue's retries are
+        failed instead, so an item that keeps losing its agent can't be
+        dispatched forever.
+        
+        Args:
+            tenant_id: Optional tenant ID to restrict the sweep to
+            
+        Returns:
+            int: Number of items released or failed
+        """
+        rows = self.db.execute(
+            self.expired_leases_update(datetime.utcnow(), tenant_id).execution_options(synchronize_session=False)
+        ).scalars().all()
+        self.db.commit()
+        
+        if rows:
+            failed = rows.count("failed")
+            logger.info(f"Released {len(rows) - failed} queue items with expired leases, failed {failed} out of retries")
+        
+        return len(rows)
+    
+    @staticmethod
+    def expired_leases_update(now: datetime, tenant_id: Optional[str] = None):
+        """
+        Build the UPDATE returning items with expired leases to the pending state.
+        
+        Served by the partial index ix_queue_items_lease.
+        
+        Args:
+            now: Current time
+            tenant_id: Optional tenant ID to restrict the sweep to
+            
+        Returns:
+            Update: Statement returning the new status of each item
+        """
+        retries_exhausted = QueueItem.retry_count >= Queue.max_retries
+        
+        stmt = update(QueueItem).where(
+            QueueItem.queue_id == Queue.queue_id,
+            QueueItem.status.in_(CLAIMED_STATUSES),
+            QueueItem.lease_expires_at.isnot(None),
+            QueueItem.lease_expires_at < now
+        )
+        
+        if tenant_id:
+            stmt = stmt.where(QueueItem.tenant_id == tenant_id)
+        
+        return stmt.values(
+            status=case((retries_exhausted, "failed"), else_="pending"),
+            retry_count=case((retries_exhausted, QueueItem.retry_count), else_=QueueItem.retry_count + 1),
+            assigned_to=None,
+            lease_expires_at=None,
+            error_message=case(
+                (retries_exhausted, "Lease expired before the item was completed, maximum retry count exceeded"),
+                else_="Lease expired before the item was completed"
+            ),
+            updated_at=now
+        ).returning(QueueItem.status)
     
     def bulk_operation(
         self,
         queue_id: str,
         tenant_id: str,
         item_ids: List[str],
-        operation: str
+        operation: str,
+        background_tasks: Optional[BackgroundTasks] = None
     ) -> Dict[str, Any]:
         """
         Perform bulk operation on queue items.
         
+        The operation is applied to all eligible items with set-based
+        UPDATE/DELETE ... RETURNING statements in one transaction. Items
+        that were not returned are looked up once more to report why.
+        
         Args:
             queue_id: Queue ID
             tenant_id: Tenant ID
             item_ids: List of item IDs
             operation: Operation to perform (cancel, retry, delete)
+            background_tasks: Optional FastAPI background tasks
             
         Returns:
             Dict[str, Any]: Operation results
             
         Raises:
-            ValueError: If queue not found
+            ValueError: If queue not found or operation invalid
         """
         # Get queue
         queue = self.db.query(Queue).filter(
@@ -836,71 +1654,353 @@ class QueueService:
         if not queue:
             raise ValueError(f"Queue not found: {queue_id}")
         
-        # Initialize counters and errors
-        success_count = 0
-        failure_count = 0
-        errors = {}
+        if operation not in BULK_OPERATIONS:
+            raise ValueError(f"Invalid operation: {operation}")
         
-        # Process each item
-        for item_id in item_ids:
+        # Normalize IDs, dropping duplicates but keeping the caller's order
+        errors = {}
+        valid_ids = []
+        for item_id in dict.fromkeys(str(item_id) for item_id in item_ids):
             try:
-                if operation == "cancel":
-                    # Cancel item
-                    item = self.db.query(QueueItem).filter(
-                        QueueItem.queue_id == queue_id,
-                        QueueItem.item_id == item_id,
-                        QueueItem.tenant_id == tenant_id,
-                        QueueItem.status.in_(["pending", "processing"])
-                    ).first()
-                    
-                    if item:
-                        item.status = "cancelled"
-                        item.updated_at = datetime.utcnow()
-                        item.assigned_to = None
-                        success_count += 1
-                    else:
-                        errors[item_id] = "Item not found or cannot be cancelled"
-                        failure_count += 1
-                
-                elif operation == "retry":
-                    # Retry item
-                    try:
-                        retried_item = self.retry_queue_item(queue_id, item_id, tenant_id)
-                        if retried_item:
-                            success_count += 1
-                        else:
-                            errors[item_id] = "Item not found or cannot be retried"
-                            failure_count += 1
-                    except ValueError as e:
-                        errors[item_id] = str(e)
-                        failure_count += 1
+                valid_ids.append(str(uuid.UUID(item_id)))
+            except ValueError:
+                errors[item_id] = "Invalid item ID"
+        
+        try:
+            applied_ids = set()
+            released = []
+            
+            if valid_ids:
+                conditions = [
+                    QueueItem.queue_id == queue_id,
+                    QueueItem.tenant_id == tenant_id,
+                    QueueItem.item_id.in_(valid_ids)
+                ]
                 
-                elif operation == "delete":
-                    # Delete item
-                    try:
-                        deleted = self.delete_queue_item(queue_id, item_id, tenant_id)
-                        if deleted:
-                            success_count += 1
-                        else:
-                            errors[item_id] = "Item not found or cannot be deleted"
-                            failure_count += 1
-                    except ValueError as e:
-                        errors[item_id] = str(e)
-                        failure_count += 1
+                # Apply operation to every eligible item at once
+                applied, _, released = self._apply_bulk_operation(
+                    queue, operation, conditions, return_ids=True
+                )
+                applied_ids = set(applied)
+            
+            # Look up the items that were skipped to explain why
+            skipped = [item_id for item_id in valid_ids if item_id not in applied_ids]
+            
+            if skipped:
+                rows = self.db.query(
+                    QueueItem.item_id,
+                    QueueItem.status,
+                    QueueItem.retry_count
+                ).filter(
+                    QueueItem.queue_id == queue_id,
+                    QueueItem.tenant_id == tenant_id,
+                    QueueItem.item_id.in_(skipped)
+                ).all()
+                found = {str(row.item_id): row for row in rows}
                 
-                else:
-                    errors[item_id] = f"Invalid operation: {operation}"
-                    failure_count += 1
+                for item_id in skipped:
+                    row = found.get(item_id)
+                    if row:
+                        errors[item_id] = self._bulk_failure_reason(
+                            queue, operation, row.status, row.retry_count >= queue.max_retries
+                        )
+                    else:
+                        errors[item_id] = "Item not found"
             
-            except Exception as e:
-                errors[item_id] = str(e)
-                failure_count += 1
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
         
-        # Commit changes
-        self.db.commit()
+        self._finish_bulk_operation(queue, tenant_id, operation, len(applied_ids), released, background_tasks)
         
         return {
-            "success_count": success_count,
-            "failure_count": failure_count,
+            "success_count": len(applied_ids),
+            "failure_count": len(errors),
             "errors": errors if errors else None
-        }
\ No newline at end of file
+        }
+    
+    def bulk_operation_by_filter(
+        self,
+        queue_id: str,
+        tenant_id: str,
+        operation: str,
+        status: Optional[str] = None,
+        created_before: Optional[datetime] = None,
+        created_after: Optional[datetime] = None,
+        updated_before: Optional[datetime] = None,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> Dict[str, Any]:
+        """
+        Perform bulk operation on the queue items matching a filter.
+        
+        Neither the request nor the result carries item IDs: matching items
+        the operation does not apply to are counted per failure reason.
+        
+        Args:
+            queue_id: Queue ID
+            tenant_id: Tenant ID
+            operation: Operation to perform (cancel, retry, delete)
+            status: Optional status filter
+            created_before: Optional upper bound on item creation time
+            created_after: Optional lower bound on item creation time
+            updated_before: Optional upper bound on item last update time
+            background_tasks: Optional FastAPI background tasks
+            
+        Returns:
+            Dict[str, Any]: Operation results
+            
+        Raises:
+            ValueError: If queue not found or operation invalid
+        """
+        # Get queue
+        queue = self.db.query(Queue).filter(
+            Queue.queue_id == queue_id,
+            Queue.tenant_id == tenant_id
+        ).first()
+        
+        if not queue:
+            raise ValueError(f"Queue not found: {queue_id}")
+        
+        if operation not in BULK_OPERATIONS:
+            raise ValueError(f"Invalid operation: {operation}")
+        
+        # Build filter
+        conditions = [
+            QueueItem.queue_id == queue_id,
+            QueueItem.tenant_id == tenant_id
+        ]
+        
+        if status:
+            conditions.append(QueueItem.status == status)
+        
+        if created_before:
+            conditions.append(QueueItem.created_at < created_before)
+        
+        if created_after:
+            conditions.append(QueueItem.created_at >= created_after)
+        
+        if updated_before:
+            conditions.append(QueueItem.updated_at < updated_before)
+        
+        try:
+            # Count the matching items the operation does not apply to
+            retries_exhausted = QueueItem.retry_count >= queue.max_retries
+            
+            rows = self.db.query(
+                QueueItem.status,
+                retries_exhausted,
+                func.count()
+            ).filter(
+                *conditions,
+                ~self._bulk_operation_condition(queue, operation)
+            ).group_by(QueueItem.status, retries_exhausted).all()
+            
+            failure_reasons = {}
+            for item_status, exhausted, count in rows:
+                reason = self._bulk_failure_reason(queue, operation, item_status, exhausted)
+                failure_reasons[reason] = failure_reasons.get(reason, 0) + count
+            
+            # Apply operation to every eligible item at once
+            _, success_count, released = self._apply_bulk_operation(
+                queue, operation, conditions, return_ids=False
+            )
+            
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        self._finish_bulk_operation(queue, tenant_id, operation, success_count, released, background_tasks)
+        
+        return {
+            "success_count": success_count,
+            "failure_count": sum(failure_reasons.values()),
+            "errors": None,
+            "failure_reasons": failure_reasons if failure_reasons else None
+        }
+    
+    def _bulk_operation_condition(self, queue: Queue, operation: str):
+        """
+        Build the condition an item must meet for a bulk operation.
+        
+        Args:
+            queue: Queue of the items
+            operation: Bulk operation
+            
+        Returns:
+            Condition on QueueItem columns
+        """
+        if operation == "cancel":
+            return QueueItem.status.in_(["pending"] + CLAIMED_STATUSES)
+        
+        if operation == "retry":
+            return and_(
+                QueueItem.status == "failed",
+                QueueItem.retry_count < queue.max_retries
+            )
+        
+        return QueueItem.status != "processing"
+    
+    def _bulk_failure_reason(self, queue: Queue, operation: str, status: str, retries_exhausted: bool) -> str:
+        """
+        Describe why a bulk operation does not apply to an item.
+        
+        Args:
+            queue: Queue of the item
+            operation: Bulk operation
+            status: Item status
+            retries_exhausted: Whether the item has used up its retries
+            
+        Returns:
+            str: Failure reason
+        """
+        if operation == "cancel":
+            return f"Cannot cancel item with status '{status}'"
+        
+        if operation == "retry":
+            if status != "failed":
+                return f"Cannot retry item with status '{status}'"
+            return f"Maximum retry count ({queue.max_retries}) exceeded"
+        
+        return "Cannot delete queue item in 'processing' state"
+    
+    def _apply_bulk_operation(
+        self,
+        queue: Queue,
+        operation: str,
+        conditions: List[Any],
+        return_ids: bool
+    ) -> Tuple[List[str], int, List[str]]:
+        """
+        Apply a bulk operation to the eligible items matching the conditions.
+        
+        Does not commit.
+        
+        Args:
+            queue: Queue of the items
+            operation: Bulk operation
+            conditions: Conditions selecting the items
+            return_ids: Whether to return the IDs of the affected items
+            
+        Returns:
+            Tuple[List[str], int, List[str]]: Affected item IDs (empty unless
+            return_ids), number of affected items, and the agents whose
+            claimed items were cancelled (one entry per item)
+        """
+        now = datetime.utcnow()
+        item_ids = []
+        count = 0
+        released = []
+        
+        if operation == "cancel":
+            values = {
+                "status": "cancelled",
+                "assigned_to": None,
+                "lease_expires_at": None,
+                "updated_at": now
+            }
+            
+            # Cancel claimed items, returning their previous assignee
+            claimed = select(QueueItem.item_id, QueueItem.assigned_to).where(
+                *conditions,
+                QueueItem.status.in_(CLAIMED_STATUSES)
+            ).with_for_update().subquery()
+            
+            rows = self.db.execute(
+                update(QueueItem).where(
+                    QueueItem.item_id == claimed.c.item_id
+                ).values(**values).returning(
+                    QueueItem.item_id,
+                    claimed.c.assigned_to
+                ).execution_options(synchronize_session=False)
+            ).all()
+            
+            item_ids.extend(str(row.item_id) for row in rows)
+            count += len(rows)
+            released = [str(row.assigned_to) for row in rows if row.assigned_to]
+            
+            stmt = update(QueueItem).where(
+                *conditions,
+                QueueItem.status == "pending"
+            ).values(**values)
+        
+        elif operation == "retry":
+            stmt = update(QueueItem).where(
+                *conditions,
+                self._bulk_operation_condition(queue, operation)
+            ).values(
+                status="pending",
+                retry_count=QueueItem.retry_count + 1,
+                error_message=None,
+                assigned_to=None,
+                lease_expires_at=None,
+                updated_at=now
+            )
+        
+        else:
+            stmt = delete(QueueItem).where(
+                *conditions,
+                self._bulk_operation_condition(queue, operation)
+            )
+        
+        if return_ids:
+            rows = self.db.execute(
+                stmt.returning(QueueItem.item_id).execution_options(synchronize_session=False)
+            ).all()
+            item_ids.extend(str(row.item_id) for row in rows)
+            count += len(rows)
+        else:
+            count += self.db.execute(
+                stmt.execution_options(synchronize_session=False)
+            ).rowcount
+        
+        # Free the slots of deleted items
+        if operation == "delete":
+            QuotaService(self.db).release(queue.tenant_id, QUEUE_ITEMS, count)
+        
+        return item_ids, count, released
+    
+    def _finish_bulk_operation(
+        self,
+        queue: Queue,
+        tenant_id: str,
+        operation: str,
+        count: int,
+        released: List[str],
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> None:
+        """
+        Free agent slots and notify the dispatcher after a bulk operation.
+        
+        Args:
+            queue: Queue of the items
+            tenant_id: Tenant ID
+            operation: Bulk operation
+            count: Number of affected items
+            released: Agents whose claimed items were cancelled
+            background_tasks: Optional FastAPI background tasks
+        """
+        # Free the slots of agents whose items were cancelled
+        scheduler = get_agent_scheduler()
+        for agent_id in released:
+            scheduler.release(tenant_id, agent_id)
+        
+        if count:
+            logger.info(f"Bulk {operation} applied to {count} items of queue {queue.queue_id}")
+        
+        # One event covers all retried items or freed agents
+        if operation == "retry" and count:
+            publish_dispatch_event(
+                "items_available",
+                tenant_id,
+                {"queue_id": str(queue.queue_id), "count": count},
+                background_tasks
+            )
+        elif released:
+            publish_dispatch_event(
+                "agent_available",
+                tenant_id,
+                {"queue_id": str(queue.queue_id)},
+                background_tasks
+            )
\ No newline at end of file
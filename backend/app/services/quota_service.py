@@ -0,0 +1,286 @@
+"""
+Tenant quota service module.
+
+This module enforces the resource quotas of tenants with counter rows in
+tenant_quota_counters: concurrent job executions, agents and stored queue
+items. A slot is reserved with a single conditional upsert that only
+increments the counter while it stays within the limit, and released when
+the resource goes away, so admission checks take constant time and the
+usage of a tenant is read from its counters instead of counting tables.
+
+Reservations and releases don't commit, they are part of the caller's
+transaction and are rolled back with it. Hot paths that would otherwise keep
+the tenant's counter row locked for a whole transaction reserve in a short
+transaction of their own instead (reserve_committed) and give the slots back
+if their own work fails (release_committed).
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, text, update, literal
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..config import settings
+from ..models import Agent, JobExecution, QueueItem, TenantQuotaCounter
+
+logger = logging.getLogger(__name__)
+
+# Quota resources
+CONCURRENT_JOBS = "concurrent_jobs"
+AGENTS = "agents"
+QUEUE_ITEMS = "queue_items"
+
+QUOTA_RESOURCES = [CONCURRENT_JOBS, AGENTS, QUEUE_ITEMS]
+
+# Job execution statuses that hold a concurrent job slot
+ACTIVE_EXECUTION_STATUSES = ["pending", "queued", "sent", "running"]
+
+class QuotaExceededError(ValueError):
+    """Raised when a reservation would exceed a tenant's quota"""
+    
+    def __init__(self, resource: str, limit: int):
+        """
+        Initialize the error.
+        
+        Args:
+            resource: Quota resource
+            limit: Limit of the resource
+        """
+        super().__init__(f"Quota exceeded for {resource}: limit is {limit}")
+        self.resource = resource
+        self.limit = limit
+
+class QuotaService:
+    """Service for reserving and releasing tenant quota slots"""
+    
+    def __init__(self, db: Session):
+        """
+        Initialize the quota service.
+        
+        Args:
+            db: Database session
+        """
+        self.db = db
+    
+    def get_limits(self, tenant_id: Any) -> Dict[str, Optional[int]]:
+        """
+        Get the quota limits of a tenant.
+        
+        The job and agent limits come from the tenant's cached subscription
+        entitlements, the queue item limit from the settings.
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Dict[str, Optional[int]]: Limit by resource, None for no limit
+        """
+        # Avoid circular import
+        from .entitlement_cache import get_entitlement_cache
+        
+        limits = get_entitlement_cache().get(self.db, tenant_id).limits
+        
+        return {
+            CONCURRENT_JOBS: limits.get("max_concurrent_jobs", settings.MAX_CONCURRENT_JOBS_PER_TENANT),
+            AGENTS: limits.get("max_agents"),
+            QUEUE_ITEMS: settings.MAX_QUEUE_ITEMS_PER_TENANT or None
+        }
+    
+    def reserve(self, tenant_id: Any, resource: str, count: int = 1, limit: Optional[int] = None) -> int:
+        """
+        Reserve quota slots of a tenant. Does not commit.
+        
+        The counter row is created or incremented by a single upsert whose
+        update only applies while the new value stays within the limit; the
+        row stays locked until the caller's transaction ends, so concurrent
+        reservations can't overshoot the limit.
+        
+        Args:
+            tenant_id: Tenant ID
+            resource: Quota resource
+            count: Number of slots
+            limit: Limit to enforce (the tenant's limit if omitted)
+        
+        Returns:
+            int: Used slots after the reservation
+        
+        Raises:
+            QuotaExceededError: If the reservation would exceed the limit
+        """
+        if limit is None:
+            limit = self.get_limits(tenant_id)[resource]
+        
+        if limit is not None and limit >= 0 and count > limit:
+            raise QuotaExceededError(resource, limit)
+        
+        stmt = pg_insert(TenantQuotaCounter).values(
+            tenant_id=tenant_id,
+            resource=resource,
+            used=count,
+            updated_at=func.now()
+        )
+        new_used = TenantQuotaCounter.used + stmt.excluded.used
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TenantQuotaCounter.tenant_id, TenantQuotaCounter.resource],
+            set_={"used": new_used, "updated_at": func.now()},
+            where=(new_used <= limit) if limit is not None and limit >= 0 else None
+        ).returning(TenantQuotaCounter.used)
+        
+        used = self.db.execute(stmt).scalar()
+        
+        if used is None:
+            raise QuotaExceededError(resource, limit)
+        
+        return used
+    
+    def release(self, tenant_id: Any, resource: str, count: int = 1) -> None:
+        """
+        Release quota slots of a tenant. Does not commit.
+        
+        Args:
+            tenant_id: Tenant ID
+            resource: Quota resource
+            count: Number of slots
+        """
+        if count <= 0:
+            return
+        
+        self.db.execute(
+            update(TenantQuotaCounter).where(
+                TenantQuotaCounter.tenant_id == tenant_id,
+                TenantQuotaCounter.resource == resource
+            ).values(
+                used=func.greatest(TenantQuotaCounter.used - count, 0),
+                updated_at=func.now()
+            ).execution_options(synchronize_session=False)
+        )
+    
+    def reserve_committed(self, tenant_id: Any, resource: str, count: int = 1, limit: Optional[int] = None) -> int:
+        """
+        Reserve quota slots of a tenant in a separate, immediately committed transaction.
+        
+        The counter row is only locked for the reservation itself rather than
+        until the caller's transaction ends. The caller must give the slots
+        back with release_committed if its own transaction fails.
+        
+        Args:
+            tenant_id: Tenant ID
+            resource: Quota resource
+            count: Number of slots
+            limit: Limit to enforce (the tenant's limit if omitted)
+        
+        Returns:
+            int: Used slots after the reservation
+        
+        Raises:
+            QuotaExceededError: If the reservation would exceed the limit
+        """
+        if limit is None:
+            limit = self.get_limits(tenant_id)[resource]
+        
+        with Session(bind=self.db.get_bind()) as db:
+            with db.begin():
+                return QuotaService(db).reserve(tenant_id, resource, count, limit)
+    
+    def release_committed(self, tenant_id: Any, resource: str, count: int = 1) -> None:
+        """
+        Release quota slots of a tenant in a separate, immediately committed transaction.
+        
+        Args:
+            tenant_id: Tenant ID
+            resource: Quota resource
+            count: Number of slots
+        """
+        if count <= 0:
+            return
+        
+        with Session(bind=self.db.get_bind()) as db:
+            with db.begin():
+                QuotaService(db).release(tenant_id, resource, count)
+    
+    def get_usage(self, tenant_id: Any) -> Dict[str, int]:
+        """
+        Get the used slots of a tenant from its counters.
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Dict[str, int]: Used slots by resource
+        """
+        usage = {resource: 0 for resource in QUOTA_RESOURCES}
+        
+        for resource, used in self.db.query(
+            TenantQuotaCounter.resource,
+            TenantQuotaCounter.used
+        ).filter(TenantQuotaCounter.tenant_id == tenant_id):
+            usage[resource] = used
+        
+        return usage
+    
+    def rebuild_counters(self, tenant_id: Optional[Any] = None) -> int:
+        """
+        Rebuild the quota counters from the resources' tables.
+        
+        The counter table is locked against reservations for the duration of
+        the rebuild so concurrent changes are neither lost nor counted twice.
+        
+        Args:
+            tenant_id: Optional tenant ID (all tenants if omitted)
+        
+        Returns:
+            int: Number of counter rows written
+        """
+        self.db.execute(text("LOCK TABLE tenant_quota_counters IN SHARE ROW EXCLUSIVE MODE"))
+        
+        counts = [
+            select(
+                JobExecution.tenant_id,
+                literal(CONCURRENT_JOBS),
+                func.count(JobExecution.execution_id)
+            ).where(
+                JobExecution.status.in_(ACTIVE_EXECUTION_STATUSES)
+            ).group_by(JobExecution.tenant_id),
+            select(
+                Agent.tenant_id,
+                literal(AGENTS),
+                func.count(Agent.agent_id)
+            ).group_by(Agent.tenant_id),
+            select(
+                QueueItem.tenant_id,
+                literal(QUEUE_ITEMS),
+                func.count(QueueItem.item_id)
+            ).group_by(QueueItem.tenant_id)
+        ]
+        
+        try:
+            # Counters of resources that are gone entirely
+            reset = update(TenantQuotaCounter).values(used=0, updated_at=func.now())
+            if tenant_id is not None:
+                reset = reset.where(TenantQuotaCounter.tenant_id == tenant_id)
+            self.db.execute(reset.execution_options(synchronize_session=False))
+            
+            written = 0
+            for count in counts:
+                if tenant_id is not None:
+                    count = count.where(count.selected_columns[0] == tenant_id)
+                
+                stmt = pg_insert(TenantQuotaCounter).from_select(
+                    ["tenant_id", "resource", "used"], count
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[TenantQuotaCounter.tenant_id, TenantQuotaCounter.resource],
+                    set_={"used": stmt.excluded.used, "updated_at": func.now()}
+                )
+                written += self.db.execute(stmt).rowcount
+            
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        logger.info(f"Rebuilt {written} tenant quota counters")
+        
+        return written
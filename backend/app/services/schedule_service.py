@@ -8,20 +8,176 @@ including cron-based scheduling and manual triggering.
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple, Sequence, Iterator
 
-import pytz
 from fastapi import BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
-from croniter import croniter
+from sqlalchemy import or_, and_, func, select, update, delete, any_, bindparam, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
 
-from ..models import Schedule, Job, JobExecution, AuditLog
+from ..config import settings
+from ..models import Schedule, ScheduleFireTime, Job, JobExecution, AuditLog
 from ..schemas.schedule import ScheduleCreate, ScheduleUpdate
 from ..messaging.producer import get_message_producer
+from ..utils.cron import compile_cron
+from .job_service import JOB_EXECUTION_ROUTING_KEYS
 
 logger = logging.getLogger(__name__)
 
+# Routing key (on the "jobs" exchange) of scheduled job triggers
+SCHEDULE_TRIGGER_ROUTING_KEY = JOB_EXECUTION_ROUTING_KEYS["schedule"]
+
+def next_fire_time(cron_expression: str, timezone: str, after: datetime) -> datetime:
+    """
+    Get the first fire time of a cron expression after a given time.
+    
+    The expression is evaluated in the schedule's timezone, so fire times
+    follow local wall-clock time across DST changes. Compiled expressions
+    are cached, see compile_cron.
+    
+    Args:
+        cron_expression: Cron expression
+        timezone: Timezone name
+        after: Naive UTC time
+        
+    Returns:
+        datetime: Naive UTC fire time
+    """
+    return compile_cron(cron_expression, timezone).next_after(after)
+
+def upcoming_fire_times(
+    cron_expression: str,
+    timezone: str,
+    start: Optional[datetime],
+    end_date: Optional[datetime] = None,
+    known: Sequence[datetime] = ()
+) -> List[datetime]:
+    """
+    Get the fire times to precompute for a schedule.
+    
+    Args:
+        cron_expression: Cron expression
+        timezone: Timezone name
+        start: Next execution time (naive UTC), the first fire time returned
+        end_date: Optional end of the schedule's validity period
+        known: Consecutive fire times following start that are already known
+        
+    Returns:
+        List[datetime]: Up to SCHEDULER_PRECOMPUTED_FIRES fire times from start
+    """
+    if start is None:
+        return []
+    
+    count = settings.SCHEDULER_PRECOMPUTED_FIRES
+    fire_times = [start] + [fire_time for fire_time in known if fire_time > start][:count - 1]
+    fire_times += compile_cron(cron_expression, timezone).fire_times_after(
+        fire_times[-1], count - len(fire_times)
+    )
+    
+    if end_date:
+        fire_times = [fire_time for fire_time in fire_times if fire_time <= end_date]
+    
+    return fire_times
+
+def _iter_fire_times(
+    cron_expression: str,
+    timezone: str,
+    after: datetime,
+    known: Sequence[datetime]
+) -> Iterator[datetime]:
+    """Yield the fire times after a given time, taking known ones first"""
+    for fire_time in known:
+        if fire_time > after:
+            yield fire_time
+            after = fire_time
+    
+    compiled = compile_cron(cron_expression, timezone)
+    while True:
+        after = compiled.next_after(after)
+        yield after
+
+def plan_fires(
+    cron_expression: str,
+    timezone: str,
+    due: datetime,
+    now: datetime,
+    end_date: Optional[datetime] = None,
+    known: Sequence[datetime] = ()
+) -> Tuple[List[datetime], Optional[datetime]]:
+    """
+    Work out which fire times of a due schedule run and when it fires next.
+    
+    Fire times older than SCHEDULER_MISFIRE_GRACE_SECONDS are skipped, and
+    of the remaining missed ones only the latest SCHEDULER_MAX_CATCHUP_FIRES
+    run, so an outage costs at most that many runs per schedule.
+    
+    Args:
+        cron_expression: Cron expression
+        timezone: Timezone name
+        due: Stored next execution time (naive UTC)
+        now: Current time (naive UTC)
+        end_date: Optional end of the schedule's validity period
+        known: Consecutive precomputed fire times following due
+        
+    Returns:
+        Tuple[List[datetime], Optional[datetime]]: Fire times to run and the
+        next execution time (None once past end_date)
+    """
+    if due > now:
+        return [], due
+    
+    window_start = now - timedelta(seconds=settings.SCHEDULER_MISFIRE_GRACE_SECONDS)
+    fire_times = [due] if due >= window_start else []
+    
+    # Only walk the fire times within the grace period
+    upcoming = _iter_fire_times(
+        cron_expression,
+        timezone,
+        max(due, window_start - timedelta(microseconds=1)),
+        known
+    )
+    fire_time = next(upcoming)
+    while fire_time <= now:
+        fire_times.append(fire_time)
+        fire_time = next(upcoming)
+    
+    fire_times = fire_times[-max(1, settings.SCHEDULER_MAX_CATCHUP_FIRES):]
+    
+    if end_date:
+        fire_times = [time for time in fire_times if time <= end_date]
+        if fire_time > end_date:
+            fire_time = None
+    
+    return fire_times, fire_time
+
+def schedule_trigger_messages(fired: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build the job trigger messages for fired schedules.
+    
+    Args:
+        fired: Fired schedules as returned by ScheduleService.claim_due_fires
+        
+    Returns:
+        List[Dict[str, Any]]: One message per job and fire time
+    """
+    timestamp = datetime.utcnow().isoformat()
+    messages = []
+    
+    for fire in fired:
+        for fire_time in fire["fire_times"]:
+            for job_id in fire["job_ids"]:
+                messages.append({
+                    "action": "schedule_trigger",
+                    "job_id": job_id,
+                    "tenant_id": fire["tenant_id"],
+                    "schedule_id": fire["schedule_id"],
+                    "trigger_type": "scheduled",
+                    "scheduled_time": fire_time.isoformat(),
+                    "timestamp": timestamp
+                })
+    
+    return messages
+
 class ScheduleService:
     """Service for managing job schedules"""
     
@@ -49,9 +205,8 @@ class ScheduleService:
         Raises:
             ValueError: If schedule data is invalid
         """
-        # Validate cron expression
-        if not croniter.is_valid(schedule_in.cron_expression):
-            raise ValueError(f"Invalid cron expression: {schedule_in.cron_expression}")
+        # Validate cron expression and timezone
+        compile_cron(schedule_in.cron_expression, schedule_in.timezone)
         
         # Check if schedule with same name exists
         existing = self.db.query(Schedule).filter(
@@ -63,10 +218,11 @@ class ScheduleService:
             raise ValueError(f"Schedule with name '{schedule_in.name}' already exists")
         
         # Calculate next execution time
-        timezone = pytz.timezone(schedule_in.timezone)
-        now = datetime.now(timezone)
-        iter = croniter(schedule_in.cron_expression, now)
-        next_execution = iter.get_next(datetime)
+        next_execution = next_fire_time(
+            schedule_in.cron_expression,
+            schedule_in.timezone,
+            max(datetime.utcnow(), schedule_in.start_date or datetime.min)
+        )
         
         # Create schedule
         db_schedule = Schedule(
@@ -85,6 +241,8 @@ class ScheduleService:
         )
         
         self.db.add(db_schedule)
+        self.db.flush()
+        self._store_fire_times(db_schedule)
         self.db.commit()
         self.db.refresh(db_schedule)
         
@@ -130,9 +288,12 @@ class ScheduleService:
         if not schedule:
             return None
         
-        # Validate cron expression
-        if schedule_in.cron_expression and not croniter.is_valid(schedule_in.cron_expression):
-            raise ValueError(f"Invalid cron expression: {schedule_in.cron_expression}")
+        # Validate cron expression and timezone
+        if schedule_in.cron_expression or schedule_in.timezone:
+            compile_cron(
+                schedule_in.cron_expression or schedule.cron_expression,
+                schedule_in.timezone or schedule.timezone
+            )
         
         # Check name uniqueness if changing
         if schedule_in.name and schedule_in.name != schedule.name:
@@ -153,10 +314,7 @@ class ScheduleService:
             cron_expression = update_data.get("cron_expression", schedule.cron_expression)
             timezone_name = update_data.get("timezone", schedule.timezone)
             
-            timezone = pytz.timezone(timezone_name)
-            now = datetime.now(timezone)
-            iter = croniter(cron_expression, now)
-            update_data["next_execution"] = iter.get_next(datetime)
+            update_data["next_execution"] = next_fire_time(cron_expression, timezone_name, datetime.utcnow())
         
         for key, value in update_data.items():
             setattr(schedule, key, value)
@@ -165,6 +323,10 @@ class ScheduleService:
         schedule.updated_at = datetime.utcnow()
         schedule.updated_by = user_id
         
+        # Recompute precomputed fire times if the timing changes
+        if {"cron_expression", "timezone", "end_date"} & update_data.keys():
+            self._store_fire_times(schedule)
+        
         self.db.commit()
         self.db.refresh(schedule)
         
@@ -352,11 +514,9 @@ class ScheduleService:
         
         # If activating, recalculate next execution
         if status == "active" and not schedule.next_execution:
-            timezone = pytz.timezone(schedule.timezone)
-            now = datetime.now(timezone)
-            iter = croniter(schedule.cron_expression, now)
-            schedule.next_execution = iter.get_next(datetime)
+            schedule.next_execution = next_fire_time(schedule.cron_expression, schedule.timezone, datetime.utcnow())
         
+        self._store_fire_times(schedule)
         self.db.commit()
         self.db.refresh(schedule)
         
@@ -431,7 +591,7 @@ class ScheduleService:
                 background_tasks.add_task(
                     message_producer.send_message,
                     "jobs",
-                    "job.execution.manual",
+                    JOB_EXECUTION_ROUTING_KEYS["manual"],
                     {
                         "action": "schedule_trigger",
                         "job_id": str(job.job_id),
@@ -491,63 +651,383 @@ class ScheduleService:
         now = datetime.utcnow()
         
         # Find schedules that are due
-        due_schedules = self.db.query(Schedule).filter(
-            Schedule.status == "active",
-            Schedule.next_execution <= now,
-            or_(
-                Schedule.end_date.is_(None),
-                Schedule.end_date >= now
-            )
-        ).all()
+        due_schedules = self.db.execute(self.due_schedules_query(now)).all()
         
         if not due_schedules:
             return 0
             
         logger.info(f"Found {len(due_schedules)} due schedules")
         
-        # Process each due schedule
-        for schedule in due_schedules:
-            # Find jobs using this schedule
-            jobs = self.db.query(Job).filter(
-                Job.schedule_id == schedule.schedule_id,
-                Job.status == "active"
+        # Claim and trigger in batches
+        fired_count = 0
+        batch_size = settings.SCHEDULER_FIRE_BATCH_SIZE
+        
+        for start in range(0, len(due_schedules), batch_size):
+            due = {
+                str(schedule_id): next_execution
+                for schedule_id, next_execution in due_schedules[start:start + batch_size]
+            }
+            fired, _ = self.claim_due_fires(due, now)
+            fired_count += len(fired)
+            
+            if background_tasks:
+                # Get message producer
+                message_producer = get_message_producer()
+                
+                for message_data in schedule_trigger_messages(fired):
+                    background_tasks.add_task(
+                        message_producer.send_message,
+                        "jobs",
+                        SCHEDULE_TRIGGER_ROUTING_KEY,
+                        message_data
+                    )
+        
+        return fired_count
+    
+    def claim_due_fires(
+        self,
+        due: Dict[str, datetime],
+        now: Optional[datetime] = None,
+        publish: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[datetime]]]:
+        """
+        Claim due schedule fires and advance the schedules to their next fire time.
+        
+        Each schedule is advanced with a compare-and-set on next_execution in
+        a single UPDATE ... FROM unnest(...) statement, so a fire is claimed
+        by exactly one caller even when several scheduler instances see it.
+        IDs and times are passed as arrays to keep statements small.
+        
+        The trigger messages of the fires are passed to publish before the
+        claim is committed. If publishing raises, the claim is rolled back
+        and the fires stay due, so a failed publish can't lose a fire.
+        
+        Args:
+            due: Schedule ID to the next execution time the caller saw
+            now: Current time (naive UTC)
+            publish: Optional function publishing the trigger messages,
+                raising unless all were confirmed
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, Optional[datetime]]]: Fired
+            schedules with their fire times and active job IDs, and the
+            current next execution time of every requested schedule (None if
+            it is gone, inactive or finished)
+        """
+        now = now or datetime.utcnow()
+        next_times = {schedule_id: None for schedule_id in due}
+        
+        if not due:
+            return [], next_times
+        
+        try:
+            # Load the current definition of the due schedules
+            rows = self.db.query(
+                Schedule.schedule_id,
+                Schedule.tenant_id,
+                Schedule.cron_expression,
+                Schedule.timezone,
+                Schedule.end_date,
+                Schedule.next_execution
+            ).filter(
+                Schedule.schedule_id == any_(self._uuid_array(list(due))),
+                Schedule.status == "active"
             ).all()
             
-            if jobs:
-                logger.info(f"Triggering {len(jobs)} jobs for schedule {schedule.name} ({schedule.schedule_id})")
+            # Load the precomputed fire times of the due schedules
+            known = self._load_fire_times([
+                str(row.schedule_id) for row in rows
+                if row.next_execution == due[str(row.schedule_id)]
+            ])
+            
+            plans = {}
+            for row in rows:
+                schedule_id = str(row.schedule_id)
+                
+                # Edited or fired elsewhere since the caller looked
+                if row.next_execution != due[schedule_id]:
+                    next_times[schedule_id] = row.next_execution
+                    continue
+                
+                try:
+                    fire_times, next_execution = plan_fires(
+                        row.cron_expression,
+                        row.timezone,
+                        row.next_execution,
+                        now,
+                        row.end_date,
+                        known.get(schedule_id, ())
+                    )
+                except Exception as e:
+                    logger.error(f"Cannot evaluate schedule {schedule_id}: {e}")
+                    fire_times, next_execution = [], None
+                
+                plans[schedule_id] = (row, fire_times, next_execution)
+            
+            claimed = set()
+            if plans:
+                fires = func.unnest(
+                    self._uuid_array(list(plans)),
+                    self._datetime_array([row.next_execution for row, _, _ in plans.values()]),
+                    self._datetime_array([next_execution for _, _, next_execution in plans.values()]),
+                    self._datetime_array([
+                        fire_times[-1] if fire_times else None
+                        for _, fire_times, _ in plans.values()
+                    ])
+                ).table_valued(
+                    "schedule_id", "expected", "next_execution", "last_execution"
+                ).render_derived(name="fires")
+                
+                # Advance only rows still at the expected time, keeping updated_at for edits
+                stmt = update(Schedule).where(
+                    Schedule.schedule_id == fires.c.schedule_id,
+                    Schedule.next_execution == fires.c.expected,
+                    Schedule.status == "active"
+                ).values(
+                    next_execution=fires.c.next_execution,
+                    last_execution=func.coalesce(fires.c.last_execution, Schedule.last_execution),
+                    updated_at=Schedule.updated_at
+                ).returning(Schedule.schedule_id).execution_options(synchronize_session=False)
+                
+                claimed = {str(schedule_id) for schedule_id in self.db.scalars(stmt)}
+            
+            if claimed:
+                self._advance_fire_times({
+                    schedule_id: (plans[schedule_id][0], plans[schedule_id][2], known.get(schedule_id, ()))
+                    for schedule_id in claimed
+                })
+            
+            # Re-read schedules changed between the SELECT and the UPDATE
+            lost = [schedule_id for schedule_id in plans if schedule_id not in claimed]
+            if lost:
+                for schedule_id, next_execution in self.db.query(
+                    Schedule.schedule_id,
+                    Schedule.next_execution
+                ).filter(
+                    Schedule.schedule_id == any_(self._uuid_array(lost)),
+                    Schedule.status == "active"
+                ):
+                    next_times[str(schedule_id)] = next_execution
+            
+            # Get the active jobs of the fired schedules
+            fired_ids = [schedule_id for schedule_id in claimed if plans[schedule_id][1]]
+            job_ids = {}
+            if fired_ids:
+                for job_id, schedule_id in self.db.execute(self.active_jobs_query(fired_ids)):
+                    job_ids.setdefault(str(schedule_id), []).append(str(job_id))
+            
+            fired = []
+            for schedule_id in claimed:
+                row, fire_times, next_execution = plans[schedule_id]
                 
-                # Trigger jobs
-                for job in jobs:
-                    # Create job execution message
-                    if background_tasks:
-                        # Get message producer
-                        message_producer = get_message_producer()
-                        
-                        # Add task to send message
-                        background_tasks.add_task(
-                            message_producer.send_message,
-                            "jobs",
-                            "job.execution.schedule",
-                            {
-                                "action": "schedule_trigger",
-                                "job_id": str(job.job_id),
-                                "tenant_id": str(schedule.tenant_id),
-                                "schedule_id": str(schedule.schedule_id),
-                                "trigger_type": "scheduled",
-                                "timestamp": now.isoformat()
-                            }
-                        )
-            
-            # Update schedule execution times
-            schedule.last_execution = now
-            
-            # Calculate next execution time
-            timezone = pytz.timezone(schedule.timezone)
-            now_tz = datetime.now(timezone)
-            iter = croniter(schedule.cron_expression, now_tz)
-            schedule.next_execution = iter.get_next(datetime)
-            
-        # Commit all changes
+                if fire_times:
+                    fired.append({
+                        "schedule_id": schedule_id,
+                        "tenant_id": str(row.tenant_id),
+                        "fire_times": fire_times,
+                        "job_ids": job_ids.get(schedule_id, [])
+                    })
+            
+            # Publish while the claim is held, so a failed publish rolls it back
+            messages = schedule_trigger_messages(fired)
+            if publish and messages:
+                publish(messages)
+            
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        for schedule_id in claimed:
+            next_times[schedule_id] = plans[schedule_id][2]
+        
+        return fired, next_times
+    
+    def rebuild_fire_times(self) -> int:
+        """
+        Rebuild the precomputed fire times of all active schedules.
+        
+        Returns:
+            int: Number of schedules rebuilt
+        """
+        schedules = self.db.query(Schedule).filter(Schedule.status == "active").all()
+        
+        self.db.execute(delete(ScheduleFireTime))
+        
+        count = 0
+        for schedule in schedules:
+            try:
+                self._store_fire_times(schedule)
+            except Exception as e:
+                logger.error(f"Cannot evaluate schedule {schedule.schedule_id}: {e}")
+                continue
+            
+            count += 1
+        
         self.db.commit()
         
-        return len(due_schedules)
\ No newline at end of file
+        return count
+    
+    def _load_fire_times(self, schedule_ids: List[str]) -> Dict[str, List[datetime]]:
+        """
+        Load the precomputed fire times of schedules.
+        
+        Args:
+            schedule_ids: Schedule IDs
+            
+        Returns:
+            Dict[str, List[datetime]]: Schedule ID to its fire times in order
+        """
+        fire_times = {}
+        
+        if not schedule_ids:
+            return fire_times
+        
+        for schedule_id, fire_time in self.db.query(
+            ScheduleFireTime.schedule_id,
+            ScheduleFireTime.fire_time
+        ).filter(
+            ScheduleFireTime.schedule_id == any_(self._uuid_array(schedule_ids))
+        ).order_by(ScheduleFireTime.schedule_id, ScheduleFireTime.fire_time):
+            fire_times.setdefault(str(schedule_id), []).append(fire_time)
+        
+        return fire_times
+    
+    def _store_fire_times(self, schedule: Schedule):
+        """
+        Replace the precomputed fire times of a schedule.
+        
+        The caller commits. Inactive schedules keep no fire times.
+        
+        Args:
+            schedule: Schedule with its new timing
+        """
+        self.db.execute(
+            delete(ScheduleFireTime).where(ScheduleFireTime.schedule_id == schedule.schedule_id)
+        )
+        
+        if schedule.status != "active":
+            return
+        
+        fire_times = upcoming_fire_times(
+            schedule.cron_expression,
+            schedule.timezone,
+            schedule.next_execution,
+            schedule.end_date
+        )
+        
+        if fire_times:
+            self.db.execute(pg_insert(ScheduleFireTime).values([
+                {
+                    "schedule_id": schedule.schedule_id,
+                    "tenant_id": schedule.tenant_id,
+                    "fire_time": fire_time
+                }
+                for fire_time in fire_times
+            ]).on_conflict_do_nothing())
+    
+    def _advance_fire_times(self, advanced: Dict[str, Tuple[Any, Optional[datetime], Sequence[datetime]]]):
+        """
+        Drop the passed fire times of advanced schedules and top them up again.
+        
+        Passed fire times are removed in one DELETE ... USING unnest(...) and
+        the missing ones inserted in one statement, so only the fire times
+        beyond the previously precomputed ones are evaluated.
+        
+        Args:
+            advanced: Schedule ID to its schedule row, new next execution time
+                and previously precomputed fire times
+        """
+        passed = func.unnest(
+            self._uuid_array(list(advanced)),
+            self._datetime_array([next_execution for _, next_execution, _ in advanced.values()])
+        ).table_valued("schedule_id", "next_execution").render_derived(name="advanced")
+        
+        self.db.execute(
+            delete(ScheduleFireTime).where(
+                ScheduleFireTime.schedule_id == passed.c.schedule_id,
+                or_(
+                    passed.c.next_execution.is_(None),
+                    ScheduleFireTime.fire_time < passed.c.next_execution
+                )
+            ).execution_options(synchronize_session=False)
+        )
+        
+        values = []
+        for row, next_execution, known in advanced.values():
+            try:
+                fire_times = upcoming_fire_times(
+                    row.cron_expression,
+                    row.timezone,
+                    next_execution,
+                    row.end_date,
+                    known
+                )
+            except Exception as e:
+                logger.error(f"Cannot evaluate schedule {row.schedule_id}: {e}")
+                continue
+            
+            values.extend(
+                {
+                    "schedule_id": row.schedule_id,
+                    "tenant_id": row.tenant_id,
+                    "fire_time": fire_time
+                }
+                for fire_time in fire_times
+                if fire_time not in known
+            )
+        
+        for start in range(0, len(values), settings.SCHEDULER_FIRE_BATCH_SIZE):
+            self.db.execute(
+                pg_insert(ScheduleFireTime).values(
+                    values[start:start + settings.SCHEDULER_FIRE_BATCH_SIZE]
+                ).on_conflict_do_nothing()
+            )
+    
+    @staticmethod
+    def due_schedules_query(now: datetime):
+        """
+        Build the SELECT of the active schedules due at a time.
+        
+        Served by the partial index ix_schedules_due.
+        
+        Args:
+            now: Current time
+        
+        Returns:
+            Select: Query of (schedule_id, next_execution) rows
+        """
+        return select(Schedule.schedule_id, Schedule.next_execution).where(
+            Schedule.status == "active",
+            Schedule.next_execution <= now,
+            or_(
+                Schedule.end_date.is_(None),
+                Schedule.end_date >= now
+            )
+        )
+    
+    @classmethod
+    def active_jobs_query(cls, schedule_ids: List[str]):
+        """
+        Build the SELECT of the active jobs of schedules.
+        
+        Args:
+            schedule_ids: Schedule IDs
+        
+        Returns:
+            Select: Query of (job_id, schedule_id) rows
+        """
+        return select(Job.job_id, Job.schedule_id).where(
+            Job.schedule_id == any_(cls._uuid_array(schedule_ids)),
+            Job.status == "active"
+        )
+    
+    @staticmethod
+    def _uuid_array(ids: List[str]):
+        """Bind a list of IDs as a single uuid[] parameter"""
+        return bindparam(None, [uuid.UUID(str(id_)) for id_ in ids], type_=ARRAY(UUID(as_uuid=True)))
+    
+    @staticmethod
+    def _datetime_array(times: List[Optional[datetime]]):
+        """Bind a list of times as a single timestamp[] parameter"""
+        return bindparam(None, times, type_=ARRAY(DateTime))
\ No newline at end of file
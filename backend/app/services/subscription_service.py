@@ -23,6 +23,7 @@ from ..schemas.subscription import (
     SubscriptionSummary
 )
 from ..schemas.tenant import TenantCreate, TenantUpdate
+from .entitlement_cache import get_entitlement_cache
 
 logger = logging.getLogger(__name__)
 
@@ -436,6 +437,18 @@ class SubscriptionService:
         """
         Get a summary of a tenant's subscription.
         
+        Args:
+            tenant_id: Tenant ID
+            
+        Returns:
+            SubscriptionSummary: Subscription summary
+        """
+        return get_entitlement_cache().get_subscription_summary(self.db, tenant_id)
+    
+    def _build_subscription_summary(self, tenant_id: str) -> SubscriptionSummary:
+        """
+        Build the summary of a tenant's subscription from the database.
+        
         Args:
             tenant_id: Tenant ID
             
@@ -551,6 +564,19 @@ class SubscriptionService:
         """
         Check if a tenant has access to a specific feature based on their subscription.
         
+        Args:
+            tenant_id: Tenant ID
+            feature: Feature name
+            
+        Returns:
+            FeatureAccess: Feature access information
+        """
+        return get_entitlement_cache().check_feature_access(self.db, tenant_id, feature)
+    
+    def _resolve_feature_access(self, tenant_id: str, feature: str) -> FeatureAccess:
+        """
+        Check a tenant's access to a feature from the database.
+        
         Args:
             tenant_id: Tenant ID
             feature: Feature name
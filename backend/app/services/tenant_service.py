@@ -267,10 +267,6 @@ class TenantService:
         # Get user count
         user_count = self.get_tenant_user_count(tenant_id)
         
-        # Get agent count
-        from ..models import Agent
-        agent_count = self.db.query(func.count(Agent.agent_id)).filter(Agent.tenant_id == tenant_id).scalar()
-        
         # Get active job count
         from ..models import Job
         active_job_count = self.db.query(func.count(Job.job_id)).filter(
@@ -278,12 +274,18 @@ class TenantService:
             Job.status == "active"
         ).scalar()
         
-        # Get running job count
-        from ..models import JobExecution
-        running_job_count = self.db.query(func.count(JobExecution.execution_id)).filter(
-            JobExecution.tenant_id == tenant_id,
-            JobExecution.status == "running"
-        ).scalar()
+        # Agents, unfinished executions and queue items are read from the quota counters
+        from .quota_service import QuotaService, AGENTS, CONCURRENT_JOBS, QUEUE_ITEMS
+        quota_service = QuotaService(self.db)
+        used = quota_service.get_usage(tenant_id)
+        limits = quota_service.get_limits(tenant_id)
+        
+        agent_count = used[AGENTS]
+        agent_limit = limits[AGENTS] if limits[AGENTS] is not None else tenant.max_agents
+        running_job_count = used[CONCURRENT_JOBS]
+        concurrent_limit = limits[CONCURRENT_JOBS] if limits[CONCURRENT_JOBS] is not None else tenant.max_concurrent_jobs
+        queue_item_count = used[QUEUE_ITEMS]
+        queue_item_limit = limits[QUEUE_ITEMS]
         
         # Build usage data
         usage = {
@@ -292,14 +294,19 @@ class TenantService:
             },
             "agents": {
                 "count": agent_count,
-                "limit": tenant.max_agents,
-                "usage_percentage": (agent_count / tenant.max_agents * 100) if tenant.max_agents > 0 else 0
+                "limit": agent_limit,
+                "usage_percentage": (agent_count / agent_limit * 100) if agent_limit > 0 else 0
             },
             "jobs": {
                 "active_count": active_job_count,
                 "running_count": running_job_count,
-                "concurrent_limit": tenant.max_concurrent_jobs,
-                "usage_percentage": (running_job_count / tenant.max_concurrent_jobs * 100) if tenant.max_concurrent_jobs > 0 else 0
+                "concurrent_limit": concurrent_limit,
+                "usage_percentage": (running_job_count / concurrent_limit * 100) if concurrent_limit > 0 else 0
+            },
+            "queue_items": {
+                "count": queue_item_count,
+                "limit": queue_item_limit,
+                "usage_percentage": (queue_item_count / queue_item_limit * 100) if queue_item_limit else 0
             }
         }
         
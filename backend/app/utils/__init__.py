@@ -6,7 +6,7 @@ object storage, and other common functionality.
 """
 
 from .logging import setup_logging, get_logger, log_request, log_response
-from .security import encrypt_value, decrypt_value, generate_api_key, verify_api_key
+from .security import encrypt_value, decrypt_value, generate_api_key, hash_api_key, api_key_prefix, verify_api_key
 from .object_storage import ObjectStorage
 
 # Define exports
@@ -18,6 +18,8 @@ __all__ = [
     "encrypt_value",
     "decrypt_value",
     "generate_api_key",
+    "hash_api_key",
+    "api_key_prefix",
     "verify_api_key",
     "ObjectStorage",
 ]
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Compiled cron expressions.
+
+Parsing a cron expression and loading its timezone is the expensive part of
+computing fire times. This module compiles each (cron expression, timezone)
+pair once and keeps the compiled schedules in an LRU cache, so evaluating a
+schedule is a single croniter step.
+"""
+
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Tuple
+
+import pytz
+from croniter import croniter
+
+from ..config import settings
+
+class CompiledCron:
+    """
+    A parsed cron expression bound to a timezone.
+    
+    Fire times are evaluated in the timezone, so they follow local wall-clock
+    time across DST changes, and are returned as naive UTC. Instances are
+    shared through compile_cron and are safe to use from several threads.
+    """
+    
+    def __init__(self, cron_expression: str, timezone: str):
+        """
+        Compile a cron expression.
+        
+        Args:
+            cron_expression: Cron expression
+            timezone: Timezone name
+        
+        Raises:
+            ValueError: If the expression or the timezone is invalid
+        """
+        if not croniter.is_valid(cron_expression):
+            raise ValueError(f"Invalid cron expression: {cron_expression}")
+        
+        try:
+            self.timezone = pytz.timezone(timezone)
+        except pytz.UnknownTimeZoneError:
+            raise ValueError(f"Invalid timezone: {timezone}")
+        
+        self.cron_expression = cron_expression
+        self._iterator = croniter(cron_expression)
+        self._lock = threading.Lock()
+        
+        # Schedules sharing an expression are usually due at the same times
+        self._fire_times_after = lru_cache(maxsize=256)(self._compute_fire_times)
+    
+    def next_after(self, after: datetime) -> datetime:
+        """
+        Get the first fire time after a given time.
+        
+        Args:
+            after: Naive UTC time
+        
+        Returns:
+            datetime: Naive UTC fire time
+        """
+        return self._fire_times_after(after, 1)[0]
+    
+    def fire_times_after(self, after: datetime, count: int) -> Tuple[datetime, ...]:
+        """
+        Get the next fire times after a given time.
+        
+        Args:
+            after: Naive UTC time
+            count: Number of fire times
+        
+        Returns:
+            Tuple[datetime, ...]: Naive UTC fire times in order
+        """
+        if count <= 0:
+            return ()
+        
+        return self._fire_times_after(after, count)
+    
+    def _compute_fire_times(self, after: datetime, count: int) -> Tuple[datetime, ...]:
+        """Step the shared iterator from a given time"""
+        local_after = pytz.utc.localize(after).astimezone(self.timezone)
+        
+        with self._lock:
+            self._iterator.set_current(local_after, force=True)
+            fire_times = [self._iterator.get_next(datetime) for _ in range(count)]
+        
+        return tuple(
+            fire_time.astimezone(pytz.utc).replace(tzinfo=None)
+            for fire_time in fire_times
+        )
+    
+    def __repr__(self):
+        """String representation of the compiled expression"""
+        return f"<CompiledCron '{self.cron_expression}' {self.timezone}>"
+
+@lru_cache(maxsize=settings.SCHEDULER_CRON_CACHE_SIZE)
+def compile_cron(cron_expression: str, timezone: str = "UTC") -> CompiledCron:
+    """
+    Get the compiled form of a cron expression in a timezone.
+    
+    Args:
+        cron_expression: Cron expression
+        timezone: Timezone name
+    
+    Returns:
+        CompiledCron: Compiled expression, shared by all callers
+    
+    Raises:
+        ValueError: If the expression or the timezone is invalid
+    """
+    return CompiledCron(cron_expression, timezone)
@@ -1,50 +1,249 @@
-# backend/app/utils/encryption.py
+"""
+Encryption key management module.
+
+This module keeps the Fernet keys used to encrypt stored values in a key
+ring. Keys are derived once and cached, values are encrypted with the
+primary key and prefixed with its key ID, and values encrypted with any
+other key of the ring, or before key IDs were used, can still be decrypted,
+so keys can be rotated without downtime.
+"""
 
 import base64
+import logging
 import os
-from cryptography.fernet import Fernet
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from ..config import settings
 
-# Function to generate key from secret key
-def _get_encryption_key():
-    """Generate encryption key from app secret key."""
-    if not settings.SECRET_KEY:
-        raise ValueError("SECRET_KEY not set in configuration")
-        
-    # Use key derivation to get a proper length key for Fernet
-    salt = os.environ.get("ENCRYPTION_SALT", "skipper_default_salt").encode()
+logger = logging.getLogger(__name__)
+
+# Key ID of the key derived from SECRET_KEY
+DEFAULT_KEY_ID = "default"
+
+# Separator between the key ID and the Fernet token of encrypted values
+KEY_ID_SEPARATOR = ":"
+
+# Salt of the keys derived from SECRET_KEY and ENCRYPTION_KEYS
+KEY_SALT = b"orchestrator-salt"
+
+# PBKDF2 iterations of derived keys
+KEY_ITERATIONS = 100000
+
+@lru_cache(maxsize=None)
+def derive_key(secret: str, salt: bytes = KEY_SALT) -> bytes:
+    """
+    Derive a Fernet key from a secret, once per secret and salt.
+    
+    Args:
+        secret: Secret to derive the key from
+        salt: Key derivation salt
+    
+    Returns:
+        bytes: URL-safe base64 encoded 32-byte key
+    """
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
-        iterations=100000,
+        iterations=KEY_ITERATIONS,
     )
-    key = base64.urlsafe_b64encode(kdf.derive(settings.SECRET_KEY.encode()))
-    return key
+    return base64.urlsafe_b64encode(kdf.derive(secret.encode()))
+
+class KeyRing:
+    """Encryption keys by key ID, with the primary key used to encrypt"""
+    
+    def __init__(self, keys: Dict[str, bytes], primary_key_id: str, legacy_keys: Iterable[bytes] = ()):
+        """
+        Initialize the key ring.
+        
+        Args:
+            keys: Fernet keys by key ID
+            primary_key_id: ID of the key new values are encrypted with
+            legacy_keys: Keys without ID, only used to decrypt older values
+        """
+        if primary_key_id not in keys:
+            raise ValueError(f"Primary encryption key not found: {primary_key_id}")
+        
+        self.primary_key_id = primary_key_id
+        self.fernets = {key_id: Fernet(key) for key_id, key in keys.items()}
+        
+        # Values without key ID are tried with every key, the primary key first
+        self.fernet = MultiFernet(
+            [self.fernets[primary_key_id]]
+            + [fernet for key_id, fernet in self.fernets.items() if key_id != primary_key_id]
+            + [Fernet(key) for key in legacy_keys]
+        )
+        self._prefix = f"{primary_key_id}{KEY_ID_SEPARATOR}"
+    
+    def encrypt(self, value: str) -> str:
+        """
+        Encrypt a value with the primary key.
+        
+        Args:
+            value: Value to encrypt
+        
+        Returns:
+            str: Key ID and Fernet token of the encrypted value
+        """
+        token = self.fernets[self.primary_key_id].encrypt(value.encode())
+        return self._prefix + token.decode()
+    
+    def decrypt(self, encrypted_value: str) -> str:
+        """
+        Decrypt a value encrypted with any key of the ring.
+        
+        Args:
+            encrypted_value: Encrypted value, with or without key ID
+        
+        Returns:
+            str: Decrypted value
+        
+        Raises:
+            InvalidToken: If no key of the ring decrypts the value
+        """
+        # Fernet tokens are URL-safe base64, so they never contain the separator
+        key_id, separator, token = encrypted_value.partition(KEY_ID_SEPARATOR)
+        if separator:
+            fernet = self.fernets.get(key_id)
+            if fernet is None:
+                raise InvalidToken(f"Unknown encryption key: {key_id}")
+            return fernet.decrypt(token.encode()).decode()
+        
+        return self.fernet.decrypt(encrypted_value.encode()).decode()
+    
+    def encrypt_many(self, values: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        Encrypt values with the primary key.
+        
+        Args:
+            values: Values to encrypt, None values are kept
+        
+        Returns:
+            List[Optional[str]]: Encrypted values in the same order
+        """
+        return [None if value is None else self.encrypt(value) for value in values]
+    
+    def decrypt_many(self, encrypted_values: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        Decrypt values, e.g. the credentials of a folder.
+        
+        Args:
+            encrypted_values: Encrypted values, None values are kept
+        
+        Returns:
+            List[Optional[str]]: Decrypted values in the same order, None for
+                values that can't be decrypted
+        """
+        decrypted = []
+        for encrypted_value in encrypted_values:
+            try:
+                decrypted.append(None if encrypted_value is None else self.decrypt(encrypted_value))
+            except InvalidToken:
+                logger.error("Failed to decrypt value: no matching encryption key")
+                decrypted.append(None)
+        return decrypted
+    
+    def needs_rotation(self, encrypted_value: str) -> bool:
+        """
+        Check if a value isn't encrypted with the primary key.
+        
+        Args:
+            encrypted_value: Encrypted value
+        
+        Returns:
+            bool: True if the value should be re-encrypted
+        """
+        return not encrypted_value.startswith(self._prefix)
+    
+    def rotate(self, encrypted_value: str) -> str:
+        """
+        Re-encrypt a value with the primary key.
+        
+        Args:
+            encrypted_value: Encrypted value
+        
+        Returns:
+            str: Value encrypted with the primary key
+        """
+        if not self.needs_rotation(encrypted_value):
+            return encrypted_value
+        return self.encrypt(self.decrypt(encrypted_value))
+
+def build_key_ring() -> KeyRing:
+    """
+    Build the key ring from the settings.
+    
+    The default key is derived from SECRET_KEY, ENCRYPTION_KEYS adds keys by
+    ID and ENCRYPTION_PRIMARY_KEY_ID selects the key new values are
+    encrypted with. Values encrypted by earlier versions with the key derived
+    from ENCRYPTION_SALT can still be decrypted.
+    
+    Returns:
+        KeyRing: Key ring
+    """
+    if not settings.SECRET_KEY:
+        raise ValueError("SECRET_KEY not set in configuration")
+    
+    keys = {DEFAULT_KEY_ID: derive_key(settings.SECRET_KEY)}
+    for key_id, secret in settings.ENCRYPTION_KEYS.items():
+        if KEY_ID_SEPARATOR in key_id:
+            raise ValueError(f"Invalid encryption key ID: {key_id}")
+        keys[key_id] = derive_key(secret)
+    
+    legacy_salt = os.environ.get("ENCRYPTION_SALT", "skipper_default_salt").encode()
+    legacy_keys = [derive_key(settings.SECRET_KEY, legacy_salt)]
+    
+    return KeyRing(keys, settings.ENCRYPTION_PRIMARY_KEY_ID or DEFAULT_KEY_ID, legacy_keys)
+
+
+# Singleton instance of the key ring
+_key_ring = None
+_key_ring_lock = threading.Lock()
+
+def get_key_ring() -> KeyRing:
+    """
+    Get the singleton key ring instance.
+    
+    Returns:
+        KeyRing: Key ring instance
+    """
+    global _key_ring
+    
+    if _key_ring is None:
+        with _key_ring_lock:
+            if _key_ring is None:
+                _key_ring = build_key_ring()
+    
+    return _key_ring
 
 # Encryption functions
 def encrypt_value(value):
     """Encrypt a string value."""
     if value is None:
         return None
-        
+    
     if not isinstance(value, str):
         value = str(value)
-        
-    key = _get_encryption_key()
-    cipher = Fernet(key)
-    encrypted_value = cipher.encrypt(value.encode())
-    return encrypted_value.decode()
     
+    return get_key_ring().encrypt(value)
+
 def decrypt_value(encrypted_value):
     """Decrypt an encrypted value."""
     if encrypted_value is None:
         return None
     
-    key = _get_encryption_key()
-    cipher = Fernet(key)
-    decrypted_value = cipher.decrypt(encrypted_value.encode())
-    return decrypted_value.decode()
\ No newline at end of file
+    return get_key_ring().decrypt(encrypted_value)
+
+def encrypt_values(values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Encrypt string values."""
+    return get_key_ring().encrypt_many(values)
+
+def decrypt_values(encrypted_values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Decrypt encrypted values, None for values that can't be decrypted."""
+    return get_key_ring().decrypt_many(encrypted_values)
@@ -7,7 +7,9 @@ for storing logs, screenshots, packages, and other binary assets.
 
 import io
 import logging
-from typing import Optional, Union, List, Dict, Any
+from datetime import timedelta
+from urllib.parse import urlparse
+from typing import Optional, Union, List, Dict, Any, Iterator
 
 import minio
 from minio.error import S3Error
@@ -45,6 +47,43 @@ def get_minio_client():
             
     return _minio_client
 
+# Global MinIO client instance for presigned URLs
+_presign_client = None
+
+def get_presign_client():
+    """
+    Get the MinIO client instance used to presign URLs.
+    
+    Presigned URLs are signed for the host they are generated for, so if
+    agents reach object storage at MINIO_PUBLIC_URL they are signed by a
+    client of that endpoint. Signing is done locally, the region is
+    configured so no request is made to find it.
+    
+    Returns:
+        minio.Minio: MinIO client instance
+    """
+    global _presign_client
+    if _presign_client is None:
+        if settings.MINIO_PUBLIC_URL:
+            public_url = urlparse(settings.MINIO_PUBLIC_URL)
+            _presign_client = minio.Minio(
+                public_url.netloc,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=public_url.scheme == "https",
+                region=settings.MINIO_REGION
+            )
+        else:
+            _presign_client = minio.Minio(
+                f"{settings.MINIO_HOST}:{settings.MINIO_PORT}",
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_SECURE,
+                region=settings.MINIO_REGION
+            )
+            
+    return _presign_client
+
 class ObjectStorage:
     """
     Object storage utility for interacting with MinIO.
@@ -109,21 +148,70 @@ class ObjectStorage:
             logger.error(f"Error uploading object {object_name}: {e}")
             return False
             
+    def upload_stream(
+        self,
+        stream: Any,
+        object_name: str,
+        length: int,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        part_size: Optional[int] = None
+    ) -> bool:
+        """
+        Upload a readable stream to object storage.
+        
+        Streams larger than one part are sent as a multipart upload, one part
+        in memory at a time.
+        
+        Args:
+            stream: Readable binary stream
+            object_name: Object name/path in storage
+            length: Stream length in bytes
+            content_type: Optional content type
+            metadata: Optional object metadata
+            part_size: Optional multipart part size (defaults to settings.OBJECT_STORAGE_PART_SIZE)
+            
+        Returns:
+            bool: True if upload successful, False otherwise
+        """
+        try:
+            self.client.put_object(
+                bucket_name=self.bucket,
+                object_name=object_name,
+                data=stream,
+                length=length,
+                content_type=content_type or "application/octet-stream",
+                metadata=metadata,
+                part_size=part_size or settings.OBJECT_STORAGE_PART_SIZE
+            )
+            
+            logger.debug(f"Uploaded stream to {object_name}")
+            return True
+            
+        except S3Error as e:
+            logger.error(f"Error uploading stream to {object_name}: {e}")
+            return False
+            
     def upload_file(
         self, 
         file_path: str, 
         object_name: Optional[str] = None,
         content_type: Optional[str] = None,
-        metadata: Optional[Dict[str, str]] = None
+        metadata: Optional[Dict[str, str]] = None,
+        part_size: Optional[int] = None
     ) -> bool:
         """
         Upload a file to object storage.
         
+        Files larger than one part are sent as a multipart upload, one part
+        in memory at a time.
+        
         Args:
             file_path: Path to file to upload
             object_name: Optional object name/path in storage (defaults to file name)
             content_type: Optional content type
             metadata: Optional object metadata
+            part_size: Optional multipart part size (defaults to settings.OBJECT_STORAGE_PART_SIZE)
             
         Returns:
             bool: True if upload successful, False otherwise
@@ -139,8 +227,9 @@ class ObjectStorage:
                 bucket_name=self.bucket,
                 object_name=object_name,
                 file_path=file_path,
-                content_type=content_type,
-                metadata=metadata
+                content_type=content_type or "application/octet-stream",
+                metadata=metadata,
+                part_size=part_size or settings.OBJECT_STORAGE_PART_SIZE
             )
             
             logger.debug(f"Uploaded file {file_path} to {object_name}")
@@ -181,6 +270,94 @@ class ObjectStorage:
             logger.error(f"Error downloading object {object_name}: {e}")
             return None
             
+    def object_exists(self, object_name: str) -> bool:
+        """
+        Check if an object exists.
+        
+        Args:
+            object_name: Object name/path in storage
+            
+        Returns:
+            bool: True if the object exists
+        """
+        try:
+            self.client.stat_object(
+                bucket_name=self.bucket,
+                object_name=object_name
+            )
+            return True
+            
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchObject"):
+                logger.error(f"Error checking object {object_name}: {e}")
+            return False
+    
+    def stat_object(self, object_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get object information without downloading it.
+        
+        Args:
+            object_name: Object name/path in storage
+            
+        Returns:
+            Optional[Dict[str, Any]]: Object size, ETag, content type and
+                metadata, or None if the object is not found
+        """
+        try:
+            stat = self.client.stat_object(
+                bucket_name=self.bucket,
+                object_name=object_name
+            )
+            
+            return {
+                "name": stat.object_name,
+                "size": stat.size,
+                "etag": stat.etag,
+                "content_type": stat.content_type,
+                "last_modified": stat.last_modified,
+                "metadata": stat.metadata
+            }
+            
+        except S3Error as e:
+            logger.error(f"Error getting object info {object_name}: {e}")
+            return None
+    
+    def iter_object(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Stream an object, or a byte range of it, in chunks.
+        
+        The object is requested when iteration starts and the connection is
+        released when it ends, so only one chunk is held in memory.
+        
+        Args:
+            object_name: Object name/path in storage
+            offset: Offset of the first byte
+            length: Optional number of bytes (to the end of the object if omitted)
+            chunk_size: Optional chunk size (defaults to settings.OBJECT_STORAGE_CHUNK_SIZE)
+            
+        Yields:
+            bytes: Object data chunks
+        """
+        response = self.client.get_object(
+            bucket_name=self.bucket,
+            object_name=object_name,
+            offset=offset,
+            length=length or 0
+        )
+        
+        try:
+            for chunk in response.stream(chunk_size or settings.OBJECT_STORAGE_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+            
     def download_file(self, object_name: str, file_path: str) -> bool:
         """
         Download object to a file.
@@ -316,14 +493,14 @@ class ObjectStorage:
         """
         try:
             # Generate URL
-            url = self.client.presigned_get_object(
+            url = get_presign_client().presigned_get_object(
                 bucket_name=self.bucket,
                 object_name=object_name,
-                expires=expires
+                expires=timedelta(seconds=expires)
             )
             
             return url
             
-        except S3Error as e:
+        except (S3Error, ValueError) as e:
             logger.error(f"Error generating presigned URL for {object_name}: {e}")
             return None
\ No newline at end of file
@@ -6,39 +6,29 @@ and other security-related functions.
 """
 
 import os
+import hmac
 import base64
 import secrets
 import uuid
 from typing import Optional, Dict, Any
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import MultiFernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
-from ..config import settings
+from .encryption import get_key_ring
 
-# Global Fernet instance for encryption/decryption
-_fernet = None
+# Length of the public API key prefix stored in clear for lookups
+API_KEY_PREFIX_LENGTH = 8
 
-def get_fernet():
+def get_fernet() -> MultiFernet:
     """
     Get the Fernet instance for encryption/decryption.
     
     Returns:
-        Fernet: Fernet instance
-    """
-    global _fernet
-    if _fernet is None:
-        # Use SECRET_KEY from settings to derive encryption key
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b"orchestrator-salt",  # In production, use a secure random salt
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(settings.SECRET_KEY.encode()))
-        _fernet = Fernet(key)
-    return _fernet
+        MultiFernet: Fernet instance of the key ring, encrypting with the
+            primary key and decrypting with any key
+    """
+    return get_key_ring().fernet
 
 def encrypt_value(value: str) -> str:
     """
@@ -53,9 +43,7 @@ def encrypt_value(value: str) -> str:
     if not value:
         return None
         
-    fernet = get_fernet()
-    encrypted = fernet.encrypt(value.encode())
-    return encrypted.decode()
+    return get_key_ring().encrypt(value)
 
 def decrypt_value(encrypted_value: str) -> Optional[str]:
     """
@@ -71,9 +59,7 @@ def decrypt_value(encrypted_value: str) -> Optional[str]:
         return None
         
     try:
-        fernet = get_fernet()
-        decrypted = fernet.decrypt(encrypted_value.encode())
-        return decrypted.decode()
+        return get_key_ring().decrypt(encrypted_value)
     except Exception as e:
         return None
 
@@ -102,10 +88,25 @@ def hash_api_key(api_key: str) -> str:
     digest.update(api_key.encode())
     return base64.b64encode(digest.finalize()).decode()
 
+def api_key_prefix(api_key: str) -> str:
+    """
+    Get the public prefix of an API key, used to look up its hash.
+    
+    Args:
+        api_key: API key
+        
+    Returns:
+        str: API key prefix
+    """
+    return api_key[:API_KEY_PREFIX_LENGTH]
+
 def verify_api_key(api_key: str, hashed_key: str) -> bool:
     """
     Verify an API key against a hashed key.
     
+    The hashes are compared in constant time, so the comparison doesn't
+    reveal how much of a guessed key is right.
+    
     Args:
         api_key: API key to verify
         hashed_key: Hashed API key to compare against
@@ -113,7 +114,9 @@ def verify_api_key(api_key: str, hashed_key: str) -> bool:
     Returns:
         bool: True if API key is valid, False otherwise
     """
-    return hash_api_key(api_key) == hashed_key
+    if not hashed_key:
+        return False
+    return hmac.compare_digest(hash_api_key(api_key), hashed_key)
 
 def generate_random_password(length: int = 12) -> str:
     """
@@ -8,14 +8,11 @@ import asyncio
 import logging
 from typing import Dict, List
 
+from ..config import settings
 from ..messaging.consumer import get_message_consumer, close_all_consumers
-from ..messaging.handlers import (
-    job_execution_handler,
-    agent_message_handler,
-    notification_handler,
-    queue_item_handler,
-    event_handler
-)
+from ..services.queue_service import QUEUE_DISPATCH_ROUTING_KEYS
+from ..services.job_service import JOB_EXECUTION_ROUTING_KEYS
+from ..messaging.handlers import message_handler
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +26,13 @@ async def run_agent_monitor_worker():
     worker = AgentMonitorWorker()
     await worker.run()
 
+async def run_agent_metrics_worker():
+    """Run the agent metrics worker"""
+    from .agent_metrics_worker import AgentMetricsWorker
+    
+    worker = AgentMetricsWorker()
+    await worker.run()
+
 async def run_scheduler_worker():
     """Run the scheduler worker"""
     from .scheduler_worker import SchedulerWorker
@@ -38,9 +42,9 @@ async def run_scheduler_worker():
 
 async def run_queue_worker():
     """Run the queue worker"""
-    from .queue_worker import QueueWorker
+    from .queue_worker import get_queue_worker
     
-    worker = QueueWorker()
+    worker = get_queue_worker()
     await worker.run()
 
 async def run_notification_worker():
@@ -58,16 +62,19 @@ async def run_messaging_consumer():
     # Register handlers
     await consumer.connect()
     
+    # Handlers run on the event loop and offload their synchronous database
+    # work. Every queue dispatches on the message type, see handlers.py
+    
     # Job execution messages
     await consumer.declare_queue(
         queue_name="job-executions",
         exchange_name="jobs",
-        routing_keys=["job.execution.*"],
+        routing_keys=list(JOB_EXECUTION_ROUTING_KEYS.values()),  # Direct exchange, no wildcards
         durable=True
     )
     await consumer.register_handler(
         queue_name="job-executions",
-        handler=job_execution_handler
+        handler=message_handler
     )
     
     # Agent messages
@@ -79,7 +86,7 @@ async def run_messaging_consumer():
     )
     await consumer.register_handler(
         queue_name="agent-messages",
-        handler=agent_message_handler
+        handler=message_handler
     )
     
     # Notification messages
@@ -91,19 +98,19 @@ async def run_messaging_consumer():
     )
     await consumer.register_handler(
         queue_name="notifications",
-        handler=notification_handler
+        handler=message_handler
     )
     
     # Queue item messages
     await consumer.declare_queue(
         queue_name="queue-items",
         exchange_name="jobs",
-        routing_keys=["queue.item.*"],
+        routing_keys=list(QUEUE_DISPATCH_ROUTING_KEYS.values()),  # Direct exchange, no wildcards
         durable=True
     )
     await consumer.register_handler(
         queue_name="queue-items",
-        handler=queue_item_handler
+        handler=message_handler
     )
     
     # Event messages
@@ -115,7 +122,7 @@ async def run_messaging_consumer():
     )
     await consumer.register_handler(
         queue_name="events",
-        handler=event_handler
+        handler=message_handler
     )
     
     # Start consuming
@@ -132,6 +139,11 @@ def start_workers():
     agent_monitor_task = asyncio.create_task(run_agent_monitor_worker())
     _background_tasks.append(agent_monitor_task)
     
+    # Start agent metrics worker
+    if settings.AGENT_METRICS_ENABLED:
+        agent_metrics_task = asyncio.create_task(run_agent_metrics_worker())
+        _background_tasks.append(agent_metrics_task)
+    
     # Start scheduler worker
     scheduler_task = asyncio.create_task(run_scheduler_worker())
     _background_tasks.append(scheduler_task)
@@ -165,4 +177,8 @@ async def stop_workers():
     # Close message consumers
     await close_all_consumers()
     
+    # Write the heartbeats buffered from agent messages
+    from ..services.heartbeat_aggregator import get_heartbeat_aggregator
+    await asyncio.get_running_loop().run_in_executor(None, get_heartbeat_aggregator().stop)
+    
     logger.info("All background workers stopped")
\ No newline at end of file
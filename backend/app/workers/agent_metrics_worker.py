@@ -0,0 +1,156 @@
+"""
+Agent metrics worker for maintaining the agent metrics history.
+
+This worker periodically creates the daily sample partitions ahead of time,
+downsamples new samples into minute, hour and day rollups and removes data
+past its retention. One instance at a time does the work, the others skip
+the run. Hour and day rollups continue from the latest stored bucket, so no
+progress is lost on restarts or when another instance took over.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+from ..config import settings
+from ..db.session import SessionLocal
+from ..services.agent_metrics_service import AgentMetricsService, RESOLUTIONS, retention, truncate
+
+logger = logging.getLogger(__name__)
+
+# Time after the end of an hour or day before it is rolled up, so the finer
+# buckets it is computed from are complete
+ROLLUP_SETTLE_TIME = timedelta(minutes=2)
+
+class AgentMetricsWorker:
+    """Worker for maintaining the agent metrics history"""
+    
+    def __init__(self):
+        """Initialize the worker"""
+        self.interval = settings.AGENT_METRICS_ROLLUP_SECONDS
+        self.running = False
+    
+    async def run(self):
+        """Run the worker in a loop"""
+        logger.info("Starting agent metrics worker")
+        self.running = True
+        
+        try:
+            while self.running:
+                try:
+                    # Statements may take a while on large fleets
+                    await asyncio.get_running_loop().run_in_executor(None, self.maintain)
+                except Exception as e:
+                    logger.error(f"Error maintaining agent metrics: {e}")
+                
+                # Wait for next run
+                await asyncio.sleep(self.interval)
+        
+        except asyncio.CancelledError:
+            logger.info("Agent metrics worker cancelled")
+            self.running = False
+        
+        finally:
+            logger.info("Agent metrics worker stopped")
+    
+    def maintain(self):
+        """
+        Create partitions, roll up new samples and apply retention.
+        
+        Each step runs in a transaction of its own, so the exclusive locks
+        of partition changes on the samples table are held briefly instead
+        of for the whole rollup.
+        """
+        now = datetime.utcnow()
+        
+        self._run_locked(self._create_partitions, now)
+        self._run_locked(self._roll_up, now)
+        self._run_locked(self._drop_partitions, now)
+    
+    def _run_locked(self, step: Callable[[AgentMetricsService, datetime], None], now: datetime):
+        """
+        Run a maintenance step in a transaction holding the maintenance lock.
+        
+        Args:
+            step: Maintenance step
+            now: Current naive UTC time
+        """
+        db = SessionLocal()
+        try:
+            service = AgentMetricsService(db)
+            
+            if not service.try_lock_maintenance():
+                logger.debug("Agent metrics maintained by another instance")
+                db.rollback()
+                return
+            
+            step(service, now)
+            
+            db.commit()
+        
+        except Exception:
+            db.rollback()
+            raise
+        
+        finally:
+            db.close()
+    
+    def _create_partitions(self, service: AgentMetricsService, now: datetime):
+        """Create the sample partitions of the next days"""
+        created = service.ensure_partitions(now)
+        if created:
+            logger.info(f"Created agent metric sample partitions: {', '.join(created)}")
+    
+    def _roll_up(self, service: AgentMetricsService, now: datetime):
+        """Roll up new samples and delete expired rollups"""
+        for resolution, (start, end) in self._rollup_windows(service, now).items():
+            buckets = service.rollup(resolution, start, end)
+            logger.debug(f"Rolled up {buckets} {resolution} agent metric buckets from {start} to {end}")
+        
+        removed = service.delete_expired_rollups(now)
+        if any(removed.values()):
+            logger.info(f"Removed expired agent metric rollups: {removed}")
+    
+    def _drop_partitions(self, service: AgentMetricsService, now: datetime):
+        """Drop the expired sample partitions"""
+        dropped = service.drop_expired_samples(now)
+        if dropped:
+            logger.info(f"Dropped {dropped} expired agent metric sample partitions")
+    
+    def _rollup_windows(self, service: AgentMetricsService, now: datetime) -> Dict[str, tuple]:
+        """
+        Get the time ranges to roll up per resolution.
+        
+        Minute buckets are recomputed over the last interval plus the
+        heartbeat flush delay, so late samples are included. Hour and day
+        buckets are computed once complete, from the bucket after the latest
+        stored one on, but not from before their source's retention.
+        
+        Args:
+            service: Agent metrics service
+            now: Current naive UTC time
+        
+        Returns:
+            Dict[str, tuple]: Start and end of the range by resolution, in
+                rollup order
+        """
+        lag = timedelta(seconds=self.interval + settings.HEARTBEAT_FLUSH_SECONDS * 2) + timedelta(minutes=1)
+        windows = {"1m": (truncate(now - lag, "1m"), now)}
+        
+        for resolution, (_, length, source) in RESOLUTIONS.items():
+            if resolution == "1m":
+                continue
+            
+            end = truncate(now - ROLLUP_SETTLE_TIME, resolution)
+            latest = service.latest_bucket(resolution)
+            
+            if latest is None:
+                start = end - length
+            else:
+                start = max(latest + length, truncate(now - retention(source), resolution))
+            
+            if start < end:
+                windows[resolution] = (start, end)
+        
+        return windows
\ No newline at end of file
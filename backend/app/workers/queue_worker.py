@@ -1,21 +1,26 @@
 """
 Queue worker for processing items in job queues.
 
-This worker periodically checks for pending queue items and processes them.
+This worker claims pending queue items and dispatches them to agents. Dispatch is
+push-based: item arrival, item completion and agent availability events wake the
+worker for an immediate dispatch of the affected tenant, and a slow full sweep
+runs as a safety net for missed events, delayed retries and expired leases.
 """
 
 import asyncio
 import logging
 from datetime import datetime, timedelta
 import json
+from typing import Optional, Set
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
 
 from ..config import settings
 from ..db.session import SessionLocal
-from ..models import Queue, QueueItem, Agent
+from ..models import Agent
 from ..messaging.producer import get_message_producer
+from ..services.queue_service import QueueService
+from ..services.agent_scheduler import get_agent_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -24,33 +29,71 @@ class QueueWorker:
     
     def __init__(self):
         """Initialize the worker"""
-        self.check_interval = 10  # Check every 10 seconds
+        self.sweep_interval = 60  # Full safety-net sweep every 60 seconds
         self.running = False
         self.db = None
         self.batch_size = 20  # Process up to 20 items at a time
+        self.loop = None
+        self.wakeup = None
+        self.pending_tenants: Set[str] = set()
+        self.full_sweep = True  # Sweep everything on startup
+    
+    def notify(self, tenant_id: Optional[str] = None):
+        """
+        Request an immediate dispatch. Safe to call from any thread.
+        
+        Args:
+            tenant_id: Tenant whose items should be dispatched, or None for all tenants
+        """
+        if not self.loop:
+            # Not running yet, the startup sweep picks the items up
+            return
+        
+        self.loop.call_soon_threadsafe(self._wake, tenant_id)
+    
+    def _wake(self, tenant_id: Optional[str]):
+        """Record a dispatch request and wake the worker (event loop thread only)"""
+        if tenant_id:
+            self.pending_tenants.add(str(tenant_id))
+        else:
+            self.full_sweep = True
+        
+        self.wakeup.set()
     
     async def run(self):
-        """Run the worker in a loop"""
+        """Run the worker, dispatching on notifications and sweeping periodically"""
         logger.info("Starting queue worker")
         self.running = True
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
         
         try:
             while self.running:
-                try:
-                    # Create a new database session for each check
-                    self.db = SessionLocal()
-                    
-                    # Process pending queue items
-                    await self._process_queue_items()
-                    
-                finally:
-                    # Close database session
-                    if self.db:
-                        self.db.close()
-                        self.db = None
+                # Take the pending requests. Notifications arriving while we
+                # dispatch set the event again and are handled next round.
+                full_sweep = self.full_sweep
+                tenant_ids = None if full_sweep else self.pending_tenants
+                self.full_sweep = False
+                self.pending_tenants = set()
+                self.wakeup.clear()
                 
-                # Wait for next check
-                await asyncio.sleep(self.check_interval)
+                # Claim and notify in a thread so the event loop keeps serving
+                # the consumers and the other workers
+                exhausted = await self.loop.run_in_executor(None, self._dispatch, tenant_ids)
+                
+                if exhausted:
+                    # Batch limit reached, continue right away
+                    if full_sweep:
+                        self.full_sweep = True
+                    else:
+                        self.pending_tenants.update(tenant_ids)
+                    self.wakeup.set()
+                
+                # Wait for the next notification or the safety-net sweep
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.sweep_interval)
+                except asyncio.TimeoutError:
+                    self.full_sweep = True
                 
         except asyncio.CancelledError:
             logger.info("Queue worker cancelled")
@@ -61,111 +104,164 @@ class QueueWorker:
             self.running = False
             
         finally:
-            # Clean up
+            self.loop = None
+            logger.info("Queue worker stopped")
+    
+    def _dispatch(self, tenant_ids: Optional[Set[str]] = None) -> bool:
+        """
+        Run a dispatch round in a new database session (executor thread).
+        
+        Args:
+            tenant_ids: Tenants to dispatch for, or None for a full sweep
+            
+        Returns:
+            bool: True if the batch limit was reached and items may remain
+        """
+        try:
+            # Create a new database session for each dispatch
+            self.db = SessionLocal()
+            
+            # Process pending queue items
+            return self._process_queue_items(tenant_ids)
+            
+        finally:
+            # Close database session
             if self.db:
                 self.db.close()
-                
-            logger.info("Queue worker stopped")
+                self.db = None
     
-    async def _process_queue_items(self):
-        """Process pending queue items"""
+    def _process_queue_items(self, tenant_ids: Optional[Set[str]] = None) -> bool:
+        """
+        Claim pending queue items and dispatch them to online agents.
+        
+        Args:
+            tenant_ids: Tenants to dispatch for, or None for a full sweep
+            
+        Returns:
+            bool: True if the batch limit was reached and items may remain
+        """
         if not self.db:
             logger.error("No database session available")
-            return
+            return False
+        
+        remaining = self.batch_size
         
         try:
-            # Get current time
-            now = datetime.utcnow()
+            # Create queue service and agent scheduler
+            queue_service = QueueService(self.db)
+            scheduler = get_agent_scheduler()
             
-            # Find pending queue items that are ready for processing
-            pending_items = self.db.query(QueueItem).filter(
-                QueueItem.status == "pending",
-                QueueItem.assigned_to.is_(None),
-                or_(
-                    QueueItem.next_processing_time.is_(None),
-                    QueueItem.next_processing_time <= now
-                )
-            ).order_by(
-                QueueItem.priority.desc(),  # Higher priority first
-                QueueItem.created_at        # Older items first
-            ).limit(self.batch_size).all()
-            
-            if not pending_items:
-                return
+            if tenant_ids is None:
+                # Return items whose lease expired to the pending state
+                queue_service.release_expired_leases()
                 
-            logger.info(f"Found {len(pending_items)} pending queue items")
-            
-            # Find available agents
-            available_agents = self.db.query(Agent).filter(
-                Agent.status == "online"
-            ).all()
-            
-            # Group agents by tenant
-            tenant_agents = {}
-            for agent in available_agents:
-                tenant_id = str(agent.tenant_id)
-                if tenant_id not in tenant_agents:
-                    tenant_agents[tenant_id] = []
-                tenant_agents[tenant_id].append(agent)
-            
-            # Process each pending item
-            for item in pending_items:
-                tenant_id = str(item.tenant_id)
+                # Sweep every tenant with online agents and resync their load
+                tenant_ids = {
+                    str(tenant_id) for (tenant_id,) in self.db.query(Agent.tenant_id).filter(
+                        Agent.status == "online"
+                    ).distinct()
+                }
                 
-                # Check if there are available agents for this tenant
-                if tenant_id not in tenant_agents or not tenant_agents[tenant_id]:
-                    # No available agents for this tenant
-                    continue
+                for tenant_id in tenant_ids:
+                    scheduler.refresh(self.db, tenant_id)
+            
+            # Claim items per tenant for the agents picked by the scheduler.
+            # Each claim is an atomic skip-locked lease, so several workers
+            # can run at once.
+            for tenant_id in tenant_ids:
+                while remaining > 0:
+                    agent_id = scheduler.select_agent(self.db, tenant_id)
                     
-                # Assign to first available agent
-                agent = tenant_agents[tenant_id][0]
-                
-                # Remove agent from available list (simple round-robin)
-                tenant_agents[tenant_id] = tenant_agents[tenant_id][1:] + [agent]
+                    if not agent_id:
+                        # No agent with a free slot for this tenant
+                        break
+                    
+                    items = queue_service.claim_queue_items(
+                        tenant_id=tenant_id,
+                        agent_id=agent_id,
+                        max_items=1,
+                        claim_status="assigned"
+                    )
+                    
+                    if not items:
+                        # No more claimable items for this tenant
+                        scheduler.release(tenant_id, agent_id)
+                        break
+                    
+                    remaining -= 1
+                    
+                    # Notify agent of the claimed item. If that fails, hand the
+                    # item and the agent's slot back right away instead of
+                    # leaving them held until the lease expires.
+                    if not self._assign_item_to_agent(items[0], agent_id):
+                        queue_service.release_claim(items[0].item_id, agent_id)
+                        scheduler.release(tenant_id, agent_id)
+                        break
                 
-                # Assign item to agent
-                await self._assign_item_to_agent(item, agent)
+                if remaining <= 0:
+                    break
                 
         except Exception as e:
             logger.error(f"Error processing queue items: {e}")
             # Roll back transaction
             self.db.rollback()
+            return False
+        
+        return remaining <= 0
     
-    async def _assign_item_to_agent(self, item, agent):
+    def _assign_item_to_agent(self, item, agent_id) -> bool:
         """
-        Assign a queue item to an agent.
+        Notify an agent of a queue item claimed on its behalf (executor thread).
         
         Args:
-            item: Queue item to assign
-            agent: Agent to assign the item to
+            item: Claimed queue item
+            agent_id: ID of the agent the item is leased to
+            
+        Returns:
+            bool: True if the message was sent
         """
         try:
-            # Update item
-            item.status = "assigned"
-            item.assigned_to = agent.agent_id
-            item.updated_at = datetime.utcnow()
-            
-            self.db.commit()
-            
-            # Send message to agent
+            # Send message to agent, waiting for the broker's confirmation
             message_producer = get_message_producer()
             
-            await message_producer.send_message(
+            sent = message_producer.send_message_sync(
                 exchange="agents",
-                routing_key=f"agent.{agent.agent_id}.job",
+                routing_key=f"agent.{agent_id}.job",
                 message_data={
                     "action": "process_queue_item",
                     "queue_item_id": str(item.item_id),
-                    "agent_id": str(agent.agent_id),
+                    "agent_id": str(agent_id),
                     "tenant_id": str(item.tenant_id),
                     "payload": item.payload,
                     "timestamp": datetime.utcnow().isoformat()
                 }
             )
             
-            logger.info(f"Assigned queue item {item.item_id} to agent {agent.name} ({agent.agent_id})")
+            if not sent:
+                logger.error(f"Error assigning queue item {item.item_id} to agent {agent_id}: message not sent")
+                return False
+            
+            logger.info(f"Assigned queue item {item.item_id} to agent {agent_id}")
+            return True
             
         except Exception as e:
-            logger.error(f"Error assigning queue item {item.item_id} to agent {agent.agent_id}: {e}")
-            # Roll back transaction
-            self.db.rollback()
\ No newline at end of file
+            logger.error(f"Error assigning queue item {item.item_id} to agent {agent_id}: {e}")
+            return False
+
+
+# Singleton instance of the queue worker
+_queue_worker = None
+
+def get_queue_worker() -> QueueWorker:
+    """
+    Get the singleton queue worker instance.
+    
+    Returns:
+        QueueWorker: Queue worker instance
+    """
+    global _queue_worker
+    
+    if _queue_worker is None:
+        _queue_worker = QueueWorker()
+        
+    return _queue_worker
\ No newline at end of file
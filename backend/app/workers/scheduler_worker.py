@@ -1,147 +1,342 @@
 """
 Scheduler worker for executing scheduled jobs.
 
-This worker periodically checks for scheduled jobs that need to be executed.
+This worker keeps a min-heap of the upcoming fire times of its schedules and
+sleeps until the next one is due. Schedules are partitioned into shards that
+are spread across the live scheduler instances, and every fire is claimed with
+a compare-and-set on the schedule row, so running several instances neither
+fires a schedule twice nor leaves one unowned for longer than the instance
+timeout.
 """
 
+import os
+import heapq
+import socket
+import uuid
 import asyncio
+import hashlib
 import logging
+from functools import partial
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from ..config import settings
 from ..db.session import SessionLocal
-from ..models import Schedule, Job
+from ..models import Schedule, SchedulerInstance
 from ..messaging.producer import get_message_producer
+from ..services.schedule_service import (
+    ScheduleService,
+    SCHEDULE_TRIGGER_ROUTING_KEY
+)
 
 logger = logging.getLogger(__name__)
 
+def schedule_shard_expression(shard_count: int):
+    """
+    Build the SQL expression of a schedule's shard.
+    
+    Uses the last two bytes of the schedule ID, which are random for UUID4.
+    
+    Args:
+        shard_count: Number of shards
+    
+    Returns:
+        SQL expression evaluating to the shard number
+    """
+    schedule_id_bytes = func.uuid_send(Schedule.schedule_id)
+    
+    return (func.get_byte(schedule_id_bytes, 14) * 256 + func.get_byte(schedule_id_bytes, 15)) % shard_count
+
+def shard_owner(shard: int, instance_ids: List[str]) -> str:
+    """
+    Get the instance owning a shard by rendezvous hashing.
+    
+    When an instance joins or leaves, only the shards it gains or loses move.
+    
+    Args:
+        shard: Shard number
+        instance_ids: Live instance IDs
+    
+    Returns:
+        str: Owning instance ID
+    """
+    return max(
+        instance_ids,
+        key=lambda instance_id: hashlib.md5(f"{shard}:{instance_id}".encode()).digest()
+    )
+
 class SchedulerWorker:
     """Worker for executing scheduled jobs"""
     
     def __init__(self):
         """Initialize the worker"""
-        self.check_interval = 30  # Check every 30 seconds
+        self.full_sync_interval = 300  # Reload all owned schedules every 5 minutes
+        self.sync_slack = 60  # Overlap of incremental syncs, covers in-flight edits
+        self.error_backoff = 1  # seconds
         self.running = False
         self.db = None
+        
+        # Membership
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.shard_count = settings.SCHEDULER_SHARD_COUNT
+        self.owned_shards: Set[int] = set()
+        
+        # Upcoming fire times; heap entries not matching next_fire are stale
+        self.heap: List[Tuple[datetime, str]] = []
+        self.next_fire: Dict[str, datetime] = {}
+        
+        # Next housekeeping times
+        self.next_heartbeat = datetime.min
+        self.next_sync = datetime.min
+        self.next_full_sync = datetime.min
+        self.last_sync: Optional[datetime] = None
     
     async def run(self):
         """Run the worker in a loop"""
-        logger.info("Starting scheduler worker")
+        logger.info(f"Starting scheduler worker {self.instance_id}")
         self.running = True
         
         try:
             while self.running:
                 try:
-                    # Create a new database session for each check
+                    # Create a new database session for each cycle
                     self.db = SessionLocal()
                     
-                    # Check for due schedules
-                    await self._check_schedules()
+                    now = datetime.utcnow()
+                    
+                    # Renew membership and pick up schedule changes
+                    if now >= self.next_heartbeat:
+                        self._heartbeat(now)
                     
+                    if now >= self.next_sync:
+                        self._sync(now)
+                    
+                    # Fire everything that is due
+                    await self._fire_due_schedules()
+                
+                except Exception as e:
+                    logger.error(f"Error in scheduler cycle: {e}")
+                    await asyncio.sleep(self.error_backoff)
+                
                 finally:
                     # Close database session
                     if self.db:
                         self.db.close()
                         self.db = None
                 
-                # Wait for next check
-                await asyncio.sleep(self.check_interval)
+                # Sleep until the next fire time or housekeeping task
+                wake_at = min(self.next_heartbeat, self.next_sync)
+                if self.heap:
+                    wake_at = min(wake_at, self.heap[0][0])
                 
+                delay = (wake_at - datetime.utcnow()).total_seconds()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        
         except asyncio.CancelledError:
             logger.info("Scheduler worker cancelled")
             self.running = False
-            
+        
         except Exception as e:
             logger.exception(f"Unexpected error in scheduler worker: {e}")
             self.running = False
-            
+        
         finally:
             # Clean up
             if self.db:
                 self.db.close()
-                
+            
+            self._leave()
+            
             logger.info("Scheduler worker stopped")
     
-    async def _check_schedules(self):
-        """Check for due schedules and queue jobs for execution"""
-        if not self.db:
-            logger.error("No database session available")
-            return
+    def _heartbeat(self, now: datetime):
+        """
+        Renew this instance's heartbeat and rebalance shards.
+        
+        Args:
+            now: Current time
+        """
+        timeout = timedelta(seconds=settings.SCHEDULER_INSTANCE_TIMEOUT)
         
+        # Renew heartbeat
+        self.db.execute(
+            pg_insert(SchedulerInstance).values(
+                instance_id=self.instance_id,
+                hostname=socket.gethostname(),
+                started_at=func.now(),
+                heartbeat_at=func.now()
+            ).on_conflict_do_update(
+                index_elements=[SchedulerInstance.instance_id],
+                set_={"heartbeat_at": func.now()}
+            )
+        )
+        
+        # Forget instances that have been gone for a while
+        self.db.execute(
+            delete(SchedulerInstance).where(
+                SchedulerInstance.heartbeat_at < func.now() - timeout * 10
+            )
+        )
+        
+        # Get live instances
+        instance_ids = self.db.scalars(
+            select(SchedulerInstance.instance_id).where(
+                SchedulerInstance.heartbeat_at >= func.now() - timeout
+            )
+        ).all()
+        self.db.commit()
+        
+        if self.instance_id not in instance_ids:
+            instance_ids.append(self.instance_id)
+        
+        owned_shards = {
+            shard for shard in range(self.shard_count)
+            if shard_owner(shard, instance_ids) == self.instance_id
+        }
+        
+        if owned_shards != self.owned_shards:
+            logger.info(
+                f"Scheduler instance {self.instance_id} owns {len(owned_shards)} of "
+                f"{self.shard_count} shards ({len(instance_ids)} live instances)"
+            )
+            self.owned_shards = owned_shards
+            self.next_sync = self.next_full_sync = now
+        
+        self.next_heartbeat = now + timedelta(seconds=settings.SCHEDULER_HEARTBEAT_SECONDS)
+    
+    def _leave(self):
+        """Remove this instance's heartbeat so its shards move right away"""
+        db = SessionLocal()
         try:
-            # Get current time
-            now = datetime.utcnow()
-            
-            # Find schedules that are due
-            due_schedules = self.db.query(Schedule).filter(
-                Schedule.status == "active",
-                Schedule.next_execution <= now,
-                (Schedule.end_date.is_(None)) | (Schedule.end_date >= now)
-            ).all()
-            
-            if not due_schedules:
-                return
-                
-            logger.info(f"Found {len(due_schedules)} due schedules")
-            
-            # Process each due schedule
-            for schedule in due_schedules:
-                await self._process_schedule(schedule, now)
-                
+            db.execute(
+                delete(SchedulerInstance).where(
+                    SchedulerInstance.instance_id == self.instance_id
+                )
+            )
+            db.commit()
         except Exception as e:
-            logger.error(f"Error checking schedules: {e}")
+            logger.error(f"Error removing scheduler instance {self.instance_id}: {e}")
+        finally:
+            db.close()
     
-    async def _process_schedule(self, schedule, now):
+    def _sync(self, now: datetime):
         """
-        Process a due schedule.
+        Load the owned schedules into the heap.
+        
+        A full sync rebuilds the heap; otherwise only schedules edited since
+        the previous sync are read.
         
         Args:
-            schedule: Schedule to process
             now: Current time
         """
-        try:
-            # Get jobs using this schedule
-            jobs = self.db.query(Job).filter(
-                Job.schedule_id == schedule.schedule_id,
-                Job.status == "active"
-            ).all()
+        full = now >= self.next_full_sync or self.last_sync is None
+        
+        if full:
+            query = self.sync_query()
+            self.heap = []
+            self.next_fire = {}
+        else:
+            query = self.sync_query(self.last_sync - timedelta(seconds=self.sync_slack))
+        
+        rows = self.db.execute(query).all()
+        self.db.commit()
+        
+        for schedule_id, status, next_execution in rows:
+            self._set_next_fire(str(schedule_id), next_execution if status == "active" else None)
+        
+        if full:
+            self.next_full_sync = now + timedelta(seconds=self.full_sync_interval)
+            logger.debug(f"Loaded {len(self.next_fire)} schedules")
+        
+        self.last_sync = now
+        self.next_sync = now + timedelta(seconds=settings.SCHEDULER_SYNC_SECONDS)
+    
+    def sync_query(self, edited_since: Optional[datetime] = None):
+        """
+        Build the SELECT of the owned schedules loaded by a sync.
+        
+        Args:
+            edited_since: Only schedules edited since this time, or None for
+                all active schedules with a next execution (full sync)
+        
+        Returns:
+            Select: Query of (schedule_id, status, next_execution) rows
+        """
+        query = select(
+            Schedule.schedule_id,
+            Schedule.status,
+            Schedule.next_execution
+        ).where(
+            schedule_shard_expression(self.shard_count).in_(sorted(self.owned_shards) or [-1])
+        )
+        
+        if edited_since is None:
+            return query.where(
+                Schedule.status == "active",
+                Schedule.next_execution.isnot(None)
+            )
+        
+        return query.where(Schedule.updated_at >= edited_since)
+    
+    def _set_next_fire(self, schedule_id: str, next_execution: Optional[datetime]):
+        """
+        Set or clear the next fire time of a schedule.
+        
+        Args:
+            schedule_id: Schedule ID
+            next_execution: Next fire time or None to stop tracking the schedule
+        """
+        if next_execution is None:
+            self.next_fire.pop(schedule_id, None)
+            return
+        
+        if self.next_fire.get(schedule_id) == next_execution:
+            return
+        
+        self.next_fire[schedule_id] = next_execution
+        heapq.heappush(self.heap, (next_execution, schedule_id))
+    
+    async def _fire_due_schedules(self):
+        """Claim and trigger every schedule whose fire time has come"""
+        schedule_service = ScheduleService(self.db)
+        message_producer = get_message_producer()
+        publish = partial(message_producer.send_messages_sync, "jobs", SCHEDULE_TRIGGER_ROUTING_KEY)
+        batch_size = settings.SCHEDULER_FIRE_BATCH_SIZE
+        
+        while self.heap and self.heap[0][0] <= datetime.utcnow():
+            now = datetime.utcnow()
             
-            if not jobs:
-                logger.info(f"No active jobs found for schedule {schedule.name} ({schedule.schedule_id})")
-            else:
-                logger.info(f"Queuing {len(jobs)} jobs for schedule {schedule.name} ({schedule.schedule_id})")
-                
-                # Queue each job
-                message_producer = get_message_producer()
-                
-                for job in jobs:
-                    # Create job execution message
-                    await message_producer.send_message(
-                        exchange="jobs",
-                        routing_key="job.execution.schedule",
-                        message_data={
-                            "action": "schedule_job",
-                            "job_id": str(job.job_id),
-                            "tenant_id": str(job.tenant_id),
-                            "schedule_id": str(schedule.schedule_id),
-                            "timestamp": now.isoformat()
-                        }
-                    )
-                    
-                    logger.debug(f"Queued job {job.name} ({job.job_id}) for execution")
+            # Pop a batch of due schedules, skipping stale heap entries
+            due = {}
+            while self.heap and self.heap[0][0] <= now and len(due) < batch_size:
+                fire_time, schedule_id = heapq.heappop(self.heap)
+                if self.next_fire.get(schedule_id) == fire_time:
+                    due[schedule_id] = fire_time
             
-            # Update schedule
-            # This is a simplified version - in a real system we would calculate the next execution
-            # time based on the cron expression
-            schedule.last_execution = now
-            schedule.next_execution = now + timedelta(minutes=60)  # Just use 1 hour for simplicity
+            if not due:
+                continue
             
-            self.db.commit()
+            try:
+                # Claim in a thread so the event loop keeps serving other workers.
+                # The triggers are published before the claim commits.
+                fired, next_times = await asyncio.get_running_loop().run_in_executor(
+                    None, partial(schedule_service.claim_due_fires, due, now, publish=publish)
+                )
+            except Exception:
+                # Put the batch back so it is retried after the backoff
+                for schedule_id, fire_time in due.items():
+                    heapq.heappush(self.heap, (fire_time, schedule_id))
+                raise
             
-        except Exception as e:
-            logger.error(f"Error processing schedule {schedule.name} ({schedule.schedule_id}): {e}")
-            # Roll back transaction
-            self.db.rollback()
\ No newline at end of file
+            for schedule_id, next_execution in next_times.items():
+                self.next_fire.pop(schedule_id, None)
+                self._set_next_fire(schedule_id, next_execution)
+            
+            if fired:
+                jobs = sum(len(fire["fire_times"]) * len(fire["job_ids"]) for fire in fired)
+                lag = (datetime.utcnow() - min(due.values())).total_seconds()
+                logger.info(f"Fired {len(fired)} schedules ({jobs} jobs), max lag {lag:.3f}s")
\ No newline at end of file
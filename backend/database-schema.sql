@@ -14,6 +14,14 @@ CREATE TABLE tenants (
     settings JSONB
 );
 
+CREATE TABLE tenant_quota_counters (
+    tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+    resource VARCHAR(50) NOT NULL,
+    used INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (tenant_id, resource)
+);
+
 -- User and Authentication Tables
 CREATE TABLE users (
     user_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -85,9 +93,12 @@ CREATE TABLE agents (
     name VARCHAR(255) NOT NULL,
     machine_id VARCHAR(255) NOT NULL,
     ip_address VARCHAR(45),
+    api_key_prefix VARCHAR(16),
+    api_key_hash VARCHAR(255),
     status VARCHAR(20) NOT NULL DEFAULT 'offline',
     last_heartbeat TIMESTAMP,
     version VARCHAR(50),
+    metrics JSONB,
     created_at TIMESTAMP NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
     capabilities JSONB,
@@ -123,6 +134,41 @@ CREATE TABLE agent_sessions (
     metadata JSONB
 );
 
+-- Agent metrics history, samples partitioned by day
+CREATE TABLE agent_metric_samples (
+    agent_id UUID NOT NULL,
+    recorded_at TIMESTAMP NOT NULL,
+    tenant_id UUID NOT NULL,
+    cpu_percent DOUBLE PRECISION,
+    memory_percent DOUBLE PRECISION,
+    disk_percent DOUBLE PRECISION,
+    active_jobs INTEGER,
+    PRIMARY KEY (agent_id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE agent_metric_samples_default PARTITION OF agent_metric_samples DEFAULT;
+
+CREATE TABLE agent_metric_rollups (
+    agent_id UUID NOT NULL,
+    resolution VARCHAR(4) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    tenant_id UUID NOT NULL,
+    samples INTEGER NOT NULL,
+    cpu_percent_avg DOUBLE PRECISION,
+    cpu_percent_min DOUBLE PRECISION,
+    cpu_percent_max DOUBLE PRECISION,
+    memory_percent_avg DOUBLE PRECISION,
+    memory_percent_min DOUBLE PRECISION,
+    memory_percent_max DOUBLE PRECISION,
+    disk_percent_avg DOUBLE PRECISION,
+    disk_percent_min DOUBLE PRECISION,
+    disk_percent_max DOUBLE PRECISION,
+    active_jobs_avg DOUBLE PRECISION,
+    active_jobs_min DOUBLE PRECISION,
+    active_jobs_max DOUBLE PRECISION,
+    PRIMARY KEY (agent_id, resolution, bucket_start)
+);
+
 -- Asset Management Tables
 CREATE TABLE asset_types (
     asset_type_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -203,9 +249,26 @@ CREATE TABLE queue_items (
     processed_at TIMESTAMP,
     error_message TEXT,
     assigned_to UUID REFERENCES agents(agent_id),
+    lease_expires_at TIMESTAMP,
     due_date TIMESTAMP
 );
 
+CREATE TABLE queue_item_counters (
+    queue_id UUID NOT NULL REFERENCES queues(queue_id) ON DELETE CASCADE,
+    stripe SMALLINT NOT NULL DEFAULT 0,
+    tenant_id UUID NOT NULL REFERENCES tenants(tenant_id),
+    total_items INT NOT NULL DEFAULT 0,
+    pending_items INT NOT NULL DEFAULT 0,
+    processing_items INT NOT NULL DEFAULT 0,
+    completed_items INT NOT NULL DEFAULT 0,
+    failed_items INT NOT NULL DEFAULT 0,
+    cancelled_items INT NOT NULL DEFAULT 0,
+    processing_time_total_ms BIGINT NOT NULL DEFAULT 0,
+    processing_time_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (queue_id, stripe)
+);
+
 -- Process/Package Management Tables
 CREATE TABLE packages (
     package_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -222,6 +285,7 @@ CREATE TABLE packages (
     storage_path VARCHAR(255) NOT NULL,
     entry_point VARCHAR(255) NOT NULL,
     md5_hash VARCHAR(32),
+    manifest JSONB,
     dependencies JSONB,
     tags JSONB,
     UNIQUE (tenant_id, name, version)
@@ -258,6 +322,20 @@ CREATE TABLE schedules (
     UNIQUE (tenant_id, name)
 );
 
+CREATE TABLE scheduler_instances (
+    instance_id VARCHAR(255) PRIMARY KEY,
+    hostname VARCHAR(255),
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    heartbeat_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE schedule_fire_times (
+    schedule_id UUID NOT NULL REFERENCES schedules(schedule_id) ON DELETE CASCADE,
+    fire_time TIMESTAMP NOT NULL,
+    tenant_id UUID NOT NULL REFERENCES tenants(tenant_id),
+    PRIMARY KEY (schedule_id, fire_time)
+);
+
 -- Job Management Tables
 CREATE TABLE jobs (
     job_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -276,6 +354,8 @@ CREATE TABLE jobs (
     retry_count INT NOT NULL DEFAULT 0,
     retry_delay_seconds INT NOT NULL DEFAULT 60,
     parameters JSONB,
+    required_capabilities JSONB,
+    required_tags JSONB,
     status VARCHAR(20) NOT NULL DEFAULT 'active',
     UNIQUE (tenant_id, name)
 );
@@ -399,6 +479,7 @@ CREATE INDEX idx_assets_tenant ON assets(tenant_id);
 CREATE INDEX idx_users_tenant ON users(tenant_id);
 CREATE INDEX idx_agents_tenant ON agents(tenant_id);
 CREATE INDEX idx_agents_status ON agents(status);
+CREATE INDEX ix_agents_api_key_prefix ON agents(api_key_prefix);
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_service_accounts_tenant ON service_accounts(tenant_id);
 CREATE INDEX idx_agents_service_account ON agents(service_account_id);
@@ -407,6 +488,30 @@ CREATE INDEX idx_agent_sessions_agent ON agent_sessions(agent_id);
 CREATE INDEX idx_agent_sessions_tenant ON agent_sessions(tenant_id);
 CREATE INDEX idx_agent_sessions_status ON agent_sessions(status);
 
+-- Hot path composite and partial indexes
+CREATE INDEX ix_queue_items_claim ON queue_items(tenant_id, priority DESC, created_at) WHERE status = 'pending' AND assigned_to IS NULL;
+CREATE INDEX ix_queue_items_queue_pending ON queue_items(queue_id, created_at) WHERE status = 'pending';
+CREATE INDEX ix_queue_items_lease ON queue_items(lease_expires_at) WHERE status IN ('processing', 'assigned');
+CREATE INDEX ix_queue_items_queue_status ON queue_items(queue_id, status);
+CREATE INDEX ix_job_executions_tenant_created ON job_executions(tenant_id, created_at);
+CREATE INDEX ix_job_executions_agent_status ON job_executions(agent_id, status);
+CREATE INDEX ix_job_executions_job_status ON job_executions(job_id, status);
+CREATE INDEX ix_agents_tenant_status ON agents(tenant_id, status);
+CREATE INDEX ix_agents_status_heartbeat ON agents(status, last_heartbeat);
+CREATE INDEX ix_agent_logs_agent_created ON agent_logs(agent_id, created_at);
+CREATE INDEX ix_agent_metric_samples_tenant_time ON agent_metric_samples(tenant_id, recorded_at);
+CREATE INDEX ix_agent_metric_rollups_tenant_time ON agent_metric_rollups(tenant_id, resolution, bucket_start);
+CREATE INDEX ix_agent_metric_rollups_resolution_time ON agent_metric_rollups(resolution, bucket_start);
+CREATE INDEX ix_schedules_due ON schedules(next_execution) WHERE status = 'active';
+CREATE INDEX ix_schedules_tenant_next ON schedules(tenant_id, next_execution) WHERE status = 'active';
+CREATE INDEX ix_schedules_updated_at ON schedules(updated_at);
+CREATE INDEX ix_schedule_fire_times_tenant_time ON schedule_fire_times(tenant_id, fire_time);
+CREATE INDEX ix_jobs_schedule ON jobs(schedule_id) WHERE status = 'active';
+
+-- Queue item counters are maintained by statement-level triggers on queue_items.
+-- Their DDL is QUEUE_ITEM_COUNTER_TRIGGER_SQL in app/models/queue.py, installed
+-- with the tables and by migrations/add_queue_counter_stripes.py.
+
 
 
 -- Drop tables in reverse order of their dependencies
@@ -418,15 +523,20 @@ DROP TABLE IF EXISTS notification_types;
 DROP TABLE IF EXISTS job_dependencies;
 DROP TABLE IF EXISTS job_executions;
 DROP TABLE IF EXISTS jobs;
+DROP TABLE IF EXISTS schedule_fire_times;
+DROP TABLE IF EXISTS scheduler_instances;
 DROP TABLE IF EXISTS schedules;
 DROP TABLE IF EXISTS package_permissions;
 DROP TABLE IF EXISTS packages;
+DROP TABLE IF EXISTS queue_item_counters;
 DROP TABLE IF EXISTS queue_items;
 DROP TABLE IF EXISTS queues;
 DROP TABLE IF EXISTS asset_permissions;
 DROP TABLE IF EXISTS assets;
 DROP TABLE IF EXISTS asset_folders;
 DROP TABLE IF EXISTS asset_types;
+DROP TABLE IF EXISTS agent_metric_rollups;
+DROP TABLE IF EXISTS agent_metric_samples;
 DROP TABLE IF EXISTS agent_sessions;
 DROP TABLE IF EXISTS agent_logs;
 DROP TABLE IF EXISTS agents;
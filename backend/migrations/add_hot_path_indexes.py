@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Migration script to add composite and partial indexes for the hot
+dispatcher, scheduler, agent monitor and analytics query paths.
+
+The index definitions are spelled out here rather than read from the models,
+so the migration keeps creating the same indexes when the models change. They
+are created with CREATE INDEX CONCURRENTLY so it can run against a live
+database.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+
+# Indexes created by this migration: name, table and definition
+HOT_PATH_INDEXES = [
+    (
+        "ix_queue_items_claim", "queue_items",
+        "(tenant_id, priority DESC, created_at) WHERE status = 'pending' AND assigned_to IS NULL"
+    ),
+    ("ix_queue_items_queue_pending", "queue_items", "(queue_id, created_at) WHERE status = 'pending'"),
+    ("ix_queue_items_lease", "queue_items", "(lease_expires_at) WHERE status IN ('processing', 'assigned')"),
+    ("ix_queue_items_queue_status", "queue_items", "(queue_id, status)"),
+    ("ix_job_executions_tenant_created", "job_executions", "(tenant_id, created_at)"),
+    ("ix_job_executions_agent_status", "job_executions", "(agent_id, status)"),
+    ("ix_job_executions_job_status", "job_executions", "(job_id, status)"),
+    ("ix_agents_tenant_status", "agents", "(tenant_id, status)"),
+    ("ix_agents_status_heartbeat", "agents", "(status, last_heartbeat)"),
+    ("ix_agent_logs_agent_created", "agent_logs", "(agent_id, created_at)"),
+    ("ix_schedules_due", "schedules", "(next_execution) WHERE status = 'active'"),
+    ("ix_schedules_tenant_next", "schedules", "(tenant_id, next_execution) WHERE status = 'active'"),
+]
+
+def run_migration():
+    """Run the migration to add the hot path indexes."""
+    print("Starting migration to add hot path indexes...")
+    
+    # Create engine (CREATE INDEX CONCURRENTLY cannot run inside a transaction)
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        isolation_level="AUTOCOMMIT"
+    )
+    
+    with engine.connect() as connection:
+        for name, table, definition in HOT_PATH_INDEXES:
+            print(f"Creating index {name} on {table} if needed...")
+            connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"))
+        
+        # Refresh planner statistics for the indexed tables
+        for table in sorted({table for _, table, _ in HOT_PATH_INDEXES}):
+            connection.execute(text(f"ANALYZE {table}"))
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Migration script to add required_capabilities and required_tags columns to jobs table.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+
+def run_migration():
+    """Run the migration to add agent placement columns to jobs table."""
+    print("Starting migration to add agent placement columns to jobs table...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Add columns if they don't exist
+    with engine.connect() as connection:
+        for column_name in ["required_capabilities", "required_tags"]:
+            print(f"Checking if {column_name} column exists...")
+            result = connection.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'jobs' AND column_name = :column_name)"
+            ), {"column_name": column_name})
+            column_exists = result.scalar()
+            
+            if not column_exists:
+                print(f"Adding {column_name} column to jobs table...")
+                connection.execute(text(
+                    f"ALTER TABLE jobs ADD COLUMN {column_name} JSONB"
+                ))
+                connection.commit()
+                print("Column added successfully!")
+            else:
+                print(f"Column {column_name} already exists. No migration needed.")
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Migration script to add the manifest column to the packages table and to
+store the files of existing packages in the tenants' blob stores.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import Package
+from app.services.package_service import PackageService
+
+def run_migration():
+    """Run the migration to add and backfill package manifests."""
+    print("Starting migration to add package manifests...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Add column if it doesn't exist
+    with engine.connect() as connection:
+        print("Adding manifest column to packages table if needed...")
+        connection.execute(text(
+            "ALTER TABLE packages ADD COLUMN IF NOT EXISTS manifest JSONB"
+        ))
+        connection.commit()
+    
+    # Store the files of packages without manifest
+    db = sessionmaker(bind=engine)()
+    package_service = PackageService(db)
+    temp_dir = tempfile.mkdtemp()
+    
+    try:
+        packages = db.query(Package).filter(Package.manifest.is_(None)).all()
+        print(f"Building manifests for {len(packages)} packages...")
+        
+        failed = 0
+        for package in packages:
+            zip_path = os.path.join(temp_dir, f"{package.package_id}.zip")
+            
+            if not package_service.storage.download_file(f"{package.storage_path}/package.zip", zip_path):
+                print(f"Package file of {package.name} v{package.version} not found, skipped")
+                failed += 1
+                continue
+            
+            try:
+                package.manifest = package_service._store_package_blobs(zip_path, package.tenant_id)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Failed to build manifest of {package.name} v{package.version}: {e}")
+                failed += 1
+            finally:
+                os.remove(zip_path)
+        
+        print(f"Built {len(packages) - failed} manifests, {failed} failed")
+    finally:
+        db.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
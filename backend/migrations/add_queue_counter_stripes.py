@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Migration script to stripe queue_item_counters over several rows per queue
+and reinstall the counter maintenance triggers that write the stripes.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.queue import QUEUE_ITEM_COUNTER_TRIGGER_SQL
+
+def run_migration():
+    """Run the migration to add the stripe column to queue_item_counters."""
+    print("Starting migration to stripe queue_item_counters...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Change the key and the triggers in one transaction, so no trigger
+    # runs against a key it doesn't match
+    with engine.connect() as connection:
+        print("Checking if stripe column exists...")
+        result = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'queue_item_counters' AND column_name = 'stripe')"
+        ))
+        column_exists = result.scalar()
+        
+        if not column_exists:
+            print("Adding stripe column to queue_item_counters table...")
+            connection.execute(text(
+                "ALTER TABLE queue_item_counters "
+                "ADD COLUMN stripe SMALLINT NOT NULL DEFAULT 0"
+            ))
+            connection.execute(text(
+                "ALTER TABLE queue_item_counters "
+                "DROP CONSTRAINT queue_item_counters_pkey, "
+                "ADD PRIMARY KEY (queue_id, stripe)"
+            ))
+        else:
+            print("Column stripe already exists.")
+        
+        print("Installing queue item counter triggers...")
+        connection.execute(text(QUEUE_ITEM_COUNTER_TRIGGER_SQL))
+        connection.commit()
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
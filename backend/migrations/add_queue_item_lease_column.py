@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Migration script to add lease_expires_at column to queue_items table.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+
+def run_migration():
+    """Run the migration to add lease_expires_at column to queue_items table."""
+    print("Starting migration to add lease_expires_at column to queue_items table...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Add column if it doesn't exist
+    with engine.connect() as connection:
+        print("Checking if lease_expires_at column exists...")
+        result = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'queue_items' AND column_name = 'lease_expires_at')"
+        ))
+        column_exists = result.scalar()
+        
+        if not column_exists:
+            print("Adding lease_expires_at column to queue_items table...")
+            connection.execute(text(
+                "ALTER TABLE queue_items "
+                "ADD COLUMN lease_expires_at TIMESTAMP"
+            ))
+            connection.commit()
+            print("Column added successfully!")
+        else:
+            print("Column lease_expires_at already exists. No migration needed.")
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
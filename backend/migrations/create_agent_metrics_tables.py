@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Migration script to create the agent_metric_samples and agent_metric_rollups
+tables and the first daily sample partitions.
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import AgentMetricSample, AgentMetricRollup
+from app.services.agent_metrics_service import AgentMetricsService
+
+def run_migration():
+    """Run the migration to create the agent metrics tables."""
+    print("Starting migration for agent metrics tables...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Create tables and their indexes if they don't exist
+    print("Creating agent_metric_samples and agent_metric_rollups tables if needed...")
+    AgentMetricSample.__table__.create(bind=engine, checkfirst=True)
+    AgentMetricRollup.__table__.create(bind=engine, checkfirst=True)
+    
+    # Create the default partition and the upcoming daily partitions
+    print("Creating sample partitions...")
+    db = sessionmaker(bind=engine)()
+    try:
+        created = AgentMetricsService(db).ensure_partitions(datetime.utcnow())
+        db.commit()
+        print(f"Created {len(created)} partitions")
+    finally:
+        db.close()
+    
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Migration script to create the queue_item_counters table, install the
+counter maintenance triggers on queue_items and backfill the counters.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.queue import QueueCounter, QUEUE_ITEM_COUNTER_TRIGGER_SQL
+from app.services.queue_service import QueueService
+
+def run_migration():
+    """Run the migration to create and backfill queue_item_counters."""
+    print("Starting migration for queue_item_counters table...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Create table if it doesn't exist
+    print("Creating queue_item_counters table if needed...")
+    QueueCounter.__table__.create(bind=engine, checkfirst=True)
+    
+    # Install or refresh triggers
+    with engine.connect() as connection:
+        print("Installing queue item counter triggers...")
+        connection.execute(text(QUEUE_ITEM_COUNTER_TRIGGER_SQL))
+        connection.commit()
+    
+    # Backfill counters from existing queue items
+    print("Rebuilding queue counters...")
+    db = sessionmaker(bind=engine)()
+    try:
+        count = QueueService(db).rebuild_queue_counters()
+        print(f"Rebuilt counters for {count} queues")
+    finally:
+        db.close()
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
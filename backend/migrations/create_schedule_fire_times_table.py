@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Migration script to create the schedule_fire_times table and precompute the
+upcoming fire times of active schedules.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import ScheduleFireTime
+from app.services.schedule_service import ScheduleService
+
+def run_migration():
+    """Run the migration to create and fill schedule_fire_times."""
+    print("Starting migration for schedule_fire_times table...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Create table and its index if they don't exist
+    print("Creating schedule_fire_times table if needed...")
+    ScheduleFireTime.__table__.create(bind=engine, checkfirst=True)
+    
+    # Precompute fire times of active schedules
+    print("Precomputing schedule fire times...")
+    db = sessionmaker(bind=engine)()
+    try:
+        count = ScheduleService(db).rebuild_fire_times()
+        print(f"Precomputed fire times for {count} schedules")
+    finally:
+        db.close()
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Migration script to create the scheduler_instances table used for scheduler
+shard assignment, and the indexes the sharded scheduler worker relies on.
+
+It also recomputes next_execution of active schedules in their timezone, since
+earlier versions stored it as local time and the worker advanced it by a fixed
+hour instead of following the cron expression.
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models import Schedule, Job, SchedulerInstance
+from app.services.schedule_service import next_fire_time
+
+# Indexes created by this migration
+INDEX_NAMES = ["ix_schedules_updated_at", "ix_jobs_schedule"]
+
+def run_migration():
+    """Run the migration to create scheduler_instances and the scheduler indexes."""
+    print("Starting migration for the sharded scheduler...")
+    
+    # Create engine (CREATE INDEX CONCURRENTLY cannot run inside a transaction)
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        isolation_level="AUTOCOMMIT"
+    )
+    dialect = postgresql.dialect()
+    
+    # Create table if it doesn't exist
+    print("Creating scheduler_instances table if needed...")
+    SchedulerInstance.__table__.create(bind=engine, checkfirst=True)
+    
+    with engine.connect() as connection:
+        # Create indexes if they don't exist
+        for model in [Schedule, Job]:
+            for index in model.__table__.indexes:
+                if index.name not in INDEX_NAMES:
+                    continue
+                
+                print(f"Creating index {index.name} on {model.__tablename__} if needed...")
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+                ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                connection.execute(text(ddl))
+        
+        # Recompute next execution times in UTC from the cron expressions
+        print("Recomputing next execution times of active schedules...")
+        now = datetime.utcnow()
+        rows = connection.execute(text(
+            "SELECT schedule_id, cron_expression, timezone FROM schedules WHERE status = 'active'"
+        )).all()
+        
+        for schedule_id, cron_expression, timezone in rows:
+            try:
+                next_execution = next_fire_time(cron_expression, timezone, now)
+            except Exception as e:
+                print(f"Skipping schedule {schedule_id}: {e}")
+                continue
+            
+            connection.execute(text(
+                "UPDATE schedules SET next_execution = :next_execution WHERE schedule_id = :schedule_id"
+            ), {"next_execution": next_execution, "schedule_id": schedule_id})
+        
+        print(f"Updated {len(rows)} schedules")
+            
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Migration script to create the tenant_quota_counters table and backfill the
+counters from the existing agents, job executions and queue items.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.tenant import TenantQuotaCounter
+from app.services.quota_service import QuotaService
+
+def run_migration():
+    """Run the migration to create and backfill tenant_quota_counters."""
+    print("Starting migration for tenant_quota_counters table...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    # Create table if it doesn't exist
+    print("Creating tenant_quota_counters table if needed...")
+    TenantQuotaCounter.__table__.create(bind=engine, checkfirst=True)
+    
+    # Backfill counters from existing resources
+    print("Rebuilding tenant quota counters...")
+    db = sessionmaker(bind=engine)()
+    try:
+        count = QuotaService(db).rebuild_counters()
+        print(f"Rebuilt {count} tenant quota counters")
+    finally:
+        db.close()
+    
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
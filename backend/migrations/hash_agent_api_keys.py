@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Migration script to replace the plaintext agent API keys with an indexed
+key prefix and a hash of the key.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.utils.security import hash_api_key, api_key_prefix
+
+def run_migration():
+    """Run the migration to hash the agent API keys."""
+    print("Starting migration to hash agent API keys...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    
+    with engine.connect() as connection:
+        # Add columns and index if they don't exist
+        print("Adding api_key_prefix and api_key_hash columns if needed...")
+        connection.execute(text(
+            "ALTER TABLE agents "
+            "ADD COLUMN IF NOT EXISTS api_key_prefix VARCHAR(16), "
+            "ADD COLUMN IF NOT EXISTS api_key_hash VARCHAR(255)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_agents_api_key_prefix ON agents (api_key_prefix)"
+        ))
+        
+        result = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'agents' AND column_name = 'api_key')"
+        ))
+        column_exists = result.scalar()
+        
+        if column_exists:
+            # Hash the existing keys, agents keep using them
+            rows = connection.execute(text(
+                "SELECT agent_id, api_key FROM agents "
+                "WHERE api_key IS NOT NULL AND api_key_hash IS NULL"
+            )).all()
+            
+            print(f"Hashing {len(rows)} agent API keys...")
+            if rows:
+                connection.execute(
+                    text(
+                        "UPDATE agents SET api_key_prefix = :prefix, api_key_hash = :hash "
+                        "WHERE agent_id = :agent_id"
+                    ),
+                    [
+                        {
+                            "agent_id": agent_id,
+                            "prefix": api_key_prefix(api_key),
+                            "hash": hash_api_key(api_key)
+                        }
+                        for agent_id, api_key in rows
+                    ]
+                )
+            
+            # Stop storing the keys in clear
+            print("Dropping plaintext api_key column...")
+            connection.execute(text("ALTER TABLE agents DROP COLUMN api_key"))
+        else:
+            print("Column api_key already dropped. No keys to hash.")
+        
+        connection.commit()
+    
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
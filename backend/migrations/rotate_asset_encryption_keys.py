@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Migration script to re-encrypt the encrypted asset values with the primary
+encryption key, e.g. after ENCRYPTION_PRIMARY_KEY_ID changed. Once it has
+run, the previous keys can be removed from ENCRYPTION_KEYS.
+"""
+
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path to access app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.utils.encryption import get_key_ring
+
+# Assets re-encrypted per transaction
+BATCH_SIZE = 500
+
+def run_migration():
+    """Run the migration to re-encrypt the asset values."""
+    print("Starting migration to re-encrypt asset values...")
+    
+    # Create engine
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    key_ring = get_key_ring()
+    print(f"Primary encryption key: {key_ring.primary_key_id}")
+    
+    rotated = 0
+    failed = 0
+    last_id = None
+    
+    with engine.connect() as connection:
+        while True:
+            rows = connection.execute(text(
+                "SELECT asset_id, value FROM assets "
+                "WHERE is_encrypted AND value IS NOT NULL "
+                + ("AND asset_id > :last_id " if last_id else "")
+                + "ORDER BY asset_id LIMIT :limit"
+            ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+            
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            updates = []
+            for asset_id, value in rows:
+                if not key_ring.needs_rotation(value):
+                    continue
+                try:
+                    updates.append({"asset_id": asset_id, "value": key_ring.rotate(value)})
+                except Exception as e:
+                    print(f"Failed to re-encrypt asset {asset_id}: {e}")
+                    failed += 1
+            
+            if updates:
+                connection.execute(
+                    text("UPDATE assets SET value = :value WHERE asset_id = :asset_id"),
+                    updates
+                )
+            connection.commit()
+            rotated += len(updates)
+    
+    print(f"Re-encrypted {rotated} asset values, {failed} failed")
+    print("Migration completed successfully!")
+
+if __name__ == "__main__":
+    run_migration()
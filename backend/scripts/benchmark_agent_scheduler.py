@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Benchmark for the agent scheduler.
+
+Builds an in-memory index of synthetic agents (10,000 by default) and measures
+selection latency for each scheduling strategy, with and without capability
+and tag constraints, against the previous approach of scanning every online
+agent of the tenant. No database is needed.
+"""
+
+import sys
+import time
+import uuid
+import random
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import Agent
+from app.services.agent_scheduler import AgentScheduler, SCHEDULING_STRATEGIES
+
+PACKAGES = ["python", "ui_automation", "web_automation", "data_processing",
+            "excel_automation", "ocr", "computer_vision"]
+PLATFORMS = ["Windows", "Linux", "Darwin"]
+TAGS = ["default", "auto_login", "finance", "hr", "gpu", "eu", "us"]
+
+def build_agents(tenant_id, count, seed):
+    """
+    Build synthetic agents.
+    
+    Args:
+        tenant_id: Tenant ID
+        count: Number of agents
+        seed: Random seed
+    
+    Returns:
+        List[Agent]: Transient agent instances
+    """
+    rng = random.Random(seed)
+    agents = []
+    
+    for index in range(count):
+        agents.append(Agent(
+            agent_id=uuid.uuid4(),
+            tenant_id=tenant_id,
+            name=f"agent-{index}",
+            machine_id=f"machine-{index}",
+            status="online",
+            capabilities={
+                "packages": rng.sample(PACKAGES, rng.randint(1, len(PACKAGES))),
+                "system": {
+                    "platform": rng.choice(PLATFORMS),
+                    "cores": rng.choice([2, 4, 8, 16])
+                }
+            },
+            tags=rng.sample(TAGS, rng.randint(1, 3)),
+            settings={"max_concurrent_jobs": rng.choice([1, 2, 4])}
+        ))
+    
+    return agents
+
+def naive_select(agents, required_capabilities):
+    """
+    Previous selection: scan every online agent and return the first match.
+    
+    Args:
+        agents: Online agents of the tenant
+        required_capabilities: Required capabilities (top-level equality)
+    
+    Returns:
+        Optional[Agent]: First matching agent
+    """
+    eligible = []
+    for agent in agents:
+        if all(agent.capabilities.get(name) == value
+               for name, value in (required_capabilities or {}).items()):
+            eligible.append(agent)
+    
+    return eligible[0] if eligible else None
+
+def percentile(samples, fraction):
+    """Get a percentile from sorted samples"""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def report(name, samples):
+    """Print latency statistics in microseconds"""
+    samples.sort()
+    total = sum(samples)
+    print(
+        f"{name:<44} p50 {percentile(samples, 0.5) * 1e6:9.1f} us"
+        f"   p99 {percentile(samples, 0.99) * 1e6:9.1f} us"
+        f"   {len(samples) / total:10.0f} ops/s"
+    )
+
+def run_benchmark(agent_count, selections, seed):
+    """
+    Run the benchmark.
+    
+    Args:
+        agent_count: Number of agents
+        selections: Number of selections per scenario
+        seed: Random seed
+    """
+    tenant_id = uuid.uuid4()
+    agents = build_agents(tenant_id, agent_count, seed)
+    
+    scenarios = [
+        ("no constraints", None, None),
+        ("capability packages=ocr", {"packages": ["ocr"]}, None),
+        ("capability + platform + tag", {"packages": ["ocr"], "system": {"platform": "Windows"}}, ["finance"]),
+    ]
+    
+    print(f"Agents: {agent_count}, selections per scenario: {selections}")
+    
+    # Previous approach, rows already loaded (the real cost adds the query)
+    samples = []
+    for _ in range(selections):
+        started = time.perf_counter()
+        naive_select(agents, {"system": agents[0].capabilities["system"]})
+        samples.append(time.perf_counter() - started)
+    report("full scan (previous _select_agent_for_job)", samples)
+    
+    for strategy in SCHEDULING_STRATEGIES:
+        scheduler = AgentScheduler(strategy=strategy)
+        
+        started = time.perf_counter()
+        scheduler.load_agents(tenant_id, agents)
+        print(f"\n[{strategy}] index built in {(time.perf_counter() - started) * 1000:.1f} ms")
+        
+        for name, capabilities, tags in scenarios:
+            samples = []
+            for index in range(selections):
+                started = time.perf_counter()
+                agent_id = scheduler.select_agent(
+                    None,
+                    tenant_id,
+                    required_capabilities=capabilities,
+                    required_tags=tags,
+                    affinity_key=f"package-{index % 50}"
+                )
+                samples.append(time.perf_counter() - started)
+                
+                # Keep the load steady by finishing the work right away
+                if agent_id:
+                    scheduler.release(tenant_id, agent_id)
+            
+            report(name, samples)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent scheduler")
+    parser.add_argument("--agents", type=int, default=10000, help="Number of agents")
+    parser.add_argument("--selections", type=int, default=2000, help="Selections per scenario")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    
+    run_benchmark(args.agents, args.selections, args.seed)
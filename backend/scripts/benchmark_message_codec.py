@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Benchmark for the message codecs.
+
+Encodes and decodes a typical message of each message class with the
+previous json.dumps/json.loads, the JSON codec (orjson if installed) and the
+msgpack codec, each with and without zstd compression, and prints the cost
+per message and the body size. Decoding with the codecs includes validating
+the body into its envelope, as the consumer does; the previous approach
+decoded to a plain dict. Codecs or compression whose packages are
+not installed are skipped.
+"""
+
+import sys
+import json
+import time
+import uuid
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.messaging import codec
+from app.messaging.envelopes import (
+    NewExecution,
+    UpdateExecution,
+    ScheduleTrigger,
+    AgentHeartbeat,
+    ProcessQueueItem,
+    NotificationCreated,
+    NewQueueItem,
+    JobExecutionStatusChanged,
+    envelope_properties,
+    parse_envelope
+)
+
+def ids():
+    """Get common message IDs"""
+    return {"tenant_id": str(uuid.uuid4()), "job_id": str(uuid.uuid4())}
+
+def sample_messages(payload_items):
+    """
+    Build a typical message of each message class.
+    
+    Args:
+        payload_items: Records in the large queue item payload
+    
+    Returns:
+        Dict[str, Envelope]: Message class name to message
+    """
+    now = datetime.utcnow().isoformat()
+    return {
+        "NewExecution": NewExecution(execution_id=str(uuid.uuid4()), **ids()),
+        "UpdateExecution": UpdateExecution(
+            execution_id=str(uuid.uuid4()),
+            status="completed",
+            results={"rows": 1250, "output": "s3://results/" + str(uuid.uuid4()), "warnings": ["slow step"] * 3},
+            **ids()
+        ),
+        "ScheduleTrigger": ScheduleTrigger(
+            schedule_id=str(uuid.uuid4()),
+            trigger_type="scheduled",
+            scheduled_time=now,
+            timestamp=now,
+            **ids()
+        ),
+        "AgentHeartbeat": AgentHeartbeat(
+            agent_id=str(uuid.uuid4()),
+            tenant_id=str(uuid.uuid4()),
+            metrics={"cpu_percent": 37.5, "memory_percent": 61.2, "disk_percent": 48.0, "running_jobs": 2}
+        ),
+        "NotificationCreated": NotificationCreated(notification_id=str(uuid.uuid4()), tenant_id=str(uuid.uuid4())),
+        "NewQueueItem": NewQueueItem(
+            tenant_id=str(uuid.uuid4()),
+            queue_id=str(uuid.uuid4()),
+            item_id=str(uuid.uuid4()),
+            timestamp=now
+        ),
+        "JobExecutionStatusChanged": JobExecutionStatusChanged(
+            execution_id=str(uuid.uuid4()),
+            tenant_id=str(uuid.uuid4()),
+            status="failed",
+            additional_data={"error_message": "Step 3 timed out after 300 seconds"}
+        ),
+        "ProcessQueueItem (large payload)": ProcessQueueItem(
+            agent_id=str(uuid.uuid4()),
+            tenant_id=str(uuid.uuid4()),
+            queue_item_id=str(uuid.uuid4()),
+            payload={
+                "invoices": [
+                    {
+                        "invoice_id": f"INV-{index:06d}",
+                        "customer": f"Customer {index % 97}",
+                        "amount": round(index * 13.37, 2),
+                        "currency": "EUR",
+                        "lines": [{"sku": f"SKU-{line}", "quantity": line + 1} for line in range(3)]
+                    }
+                    for index in range(payload_items)
+                ]
+            },
+            timestamp=now
+        )
+    }
+
+def measure(function, iterations):
+    """Get the average cost of a call in microseconds"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def variants():
+    """
+    Get the encodings to compare.
+    
+    Returns:
+        List[Tuple[str, Optional[str], bool]]: Name, content type (None for
+            the previous json module round trip) and whether to compress
+    """
+    result = [("json module (previous)", None, False), ("json codec", codec.JSON_CONTENT_TYPE, False)]
+    if codec.ZSTD_AVAILABLE:
+        result.append(("json codec + zstd", codec.JSON_CONTENT_TYPE, True))
+    if codec.MSGPACK_AVAILABLE:
+        result.append(("msgpack codec", codec.MSGPACK_CONTENT_TYPE, False))
+        if codec.ZSTD_AVAILABLE:
+            result.append(("msgpack codec + zstd", codec.MSGPACK_CONTENT_TYPE, True))
+    return result
+
+def run_benchmark(iterations, payload_items):
+    """
+    Run the benchmark.
+    
+    Args:
+        iterations: Encodes and decodes per message class and encoding
+        payload_items: Records in the large queue item payload
+    """
+    print(
+        f"orjson: {codec.ORJSON_AVAILABLE}, msgpack: {codec.MSGPACK_AVAILABLE}, zstd: {codec.ZSTD_AVAILABLE}, "
+        f"compression threshold: {settings.MESSAGING_COMPRESSION_THRESHOLD} bytes"
+    )
+    
+    for name, envelope in sample_messages(payload_items).items():
+        data, message_type, schema_version = envelope_properties(envelope)
+        message_iterations = max(1, iterations // 100) if "large" in name else iterations
+        
+        print(f"\n{name}")
+        print(f"  {'encoding':<24} {'encode':>10} {'decode':>10} {'size':>10}")
+        
+        for variant, content_type, compress in variants():
+            if content_type is None:
+                # Previous approach: json module, untyped dicts
+                body = json.dumps(data).encode()
+                encode = lambda: json.dumps(data).encode()
+                decode = lambda: json.loads(body.decode())
+            else:
+                # Compress everything or nothing, regardless of the threshold
+                settings.MESSAGING_COMPRESSION_THRESHOLD = 1 if compress else 0
+                body, body_type, encoding = codec.encode_body(data, content_type)
+                encode = lambda: codec.encode_body(data, content_type)
+                decode = lambda: parse_envelope(
+                    codec.decode_body(body, body_type, encoding),
+                    message_type,
+                    schema_version
+                )
+            
+            encode_cost = measure(encode, message_iterations)
+            decode_cost = measure(decode, message_iterations)
+            print(f"  {variant:<24} {encode_cost:8.2f}us {decode_cost:8.2f}us {len(body):>8} B")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the message codecs")
+    parser.add_argument("--iterations", type=int, default=20000, help="Encodes and decodes per message class")
+    parser.add_argument("--payload-items", type=int, default=500, help="Records in the large queue item payload")
+    args = parser.parse_args()
+    
+    run_benchmark(args.iterations, args.payload_items)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Benchmark for the message consumer runtime.
+
+Feeds in-memory messages (10,000 by default) through the consumer callbacks
+of two queues: one whose handler blocks for a simulated database call and
+one with a fast handler. It reports each queue's drain rate and backpressure
+metrics, and compares the blocking queue with running its handler inline
+on the event loop, as before. No message broker is needed.
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.messaging.consumer import MessageConsumer, QueueRuntime
+
+class BenchmarkMessage:
+    """In-memory stand-in for an incoming broker message"""
+    
+    body = b'{"action": "items_available", "tenant_id": "00000000-0000-0000-0000-000000000000"}'
+    content_type = "application/json"
+    content_encoding = None
+    type = "queue.items_available"
+    headers = None
+    message_id = None
+    
+    async def ack(self):
+        """Acknowledge the message"""
+    
+    async def nack(self, requeue=True):
+        """Negatively acknowledge the message"""
+    
+    async def reject(self, requeue=False):
+        """Reject the message"""
+
+async def drain(callback, count):
+    """
+    Deliver messages to a consumer callback and wait until all are handled.
+    
+    Args:
+        callback: Consumer callback
+        count: Number of messages
+    
+    Returns:
+        float: Elapsed seconds
+    """
+    started = time.perf_counter()
+    await asyncio.gather(*(callback(BenchmarkMessage()) for _ in range(count)))
+    return time.perf_counter() - started
+
+def report(name, count, elapsed):
+    """Print the drain rate of a run"""
+    print(f"{name:<40} {count:>7} messages   {elapsed:7.2f} s   {count / elapsed:9.0f} msg/s")
+
+async def run(count, blocking_ms, concurrency):
+    """
+    Run the benchmark.
+    
+    Args:
+        count: Messages per queue
+        blocking_ms: Simulated database time of the blocking handler
+        concurrency: Concurrency of the blocking queue
+    """
+    async def blocking_handler(envelope, message):
+        time.sleep(blocking_ms / 1000)
+    
+    async def fast_handler(envelope, message):
+        await asyncio.sleep(0)
+    
+    consumer = MessageConsumer("benchmark")
+    consumer.executor = ThreadPoolExecutor(max_workers=max(concurrency, settings.CONSUMER_THREAD_POOL_SIZE))
+    
+    blocking_runtime = QueueRuntime("blocking", blocking_handler, concurrency, True, 1)
+    fast_runtime = QueueRuntime("fast", fast_handler, settings.CONSUMER_QUEUE_CONCURRENCY, False, 1)
+    consumer.runtimes = {"blocking": blocking_runtime, "fast": fast_runtime}
+    
+    # Both queues at once: the fast queue must not wait for the blocking one
+    blocking_elapsed, fast_elapsed = await asyncio.gather(
+        drain(consumer._create_consumer_callback(blocking_runtime), count),
+        drain(consumer._create_consumer_callback(fast_runtime), count)
+    )
+    report(f"blocking handler x{concurrency} threads", count, blocking_elapsed)
+    report("fast handler, concurrently", count, fast_elapsed)
+    
+    for metrics in consumer.get_metrics().values():
+        print(f"  {metrics}")
+    print(
+        f"  target prefetch: blocking {blocking_runtime.target_prefetch()}, "
+        f"fast {fast_runtime.target_prefetch()}"
+    )
+    
+    # Previous behaviour: the blocking handler runs on the event loop
+    inline_count = min(count, 200)
+    inline_runtime = QueueRuntime("inline", blocking_handler, 1, False, 1)
+    report("blocking handler inline (previous)", inline_count, await drain(
+        consumer._create_consumer_callback(inline_runtime), inline_count
+    ))
+    
+    consumer.executor.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the message consumer runtime")
+    parser.add_argument("--messages", type=int, default=10000, help="Messages per queue")
+    parser.add_argument("--blocking-ms", type=float, default=5, help="Simulated database time per message")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrency of the blocking queue")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.messages, args.blocking_ms, args.concurrency))
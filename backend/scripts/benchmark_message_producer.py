@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark for the message producer.
+
+Publishes messages (20,000 by default) to the configured RabbitMQ broker with
+the pooled, batching producer, from concurrent coroutines and from threads
+through send_message_sync, and compares them with the previous approach of
+opening a connection per synchronous message. Messages are published to the
+jobs exchange with a routing key no queue is bound to, so the broker drops
+them after confirming.
+"""
+
+import sys
+import time
+import json
+import uuid
+import asyncio
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.messaging.producer import MessageProducer
+
+ROUTING_KEY = "benchmark.producer"
+
+def message(index):
+    """Build a message of typical size"""
+    return {
+        "action": "benchmark",
+        "index": index,
+        "job_id": str(uuid.uuid4()),
+        "tenant_id": str(uuid.uuid4()),
+        "timestamp": time.time()
+    }
+
+def report(name, count, elapsed):
+    """Print the throughput of a run"""
+    print(f"{name:<36} {count:>7} messages   {elapsed:7.2f} s   {count / elapsed:9.0f} msg/s")
+
+async def benchmark_async(producer, count, concurrency):
+    """
+    Publish from concurrent coroutines.
+    
+    Args:
+        producer: Connected message producer
+        count: Number of messages
+        concurrency: Number of publishing coroutines
+    """
+    async def publish(start):
+        for index in range(start, count, concurrency):
+            await producer.send_message("jobs", ROUTING_KEY, message(index))
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(publish(start) for start in range(concurrency)))
+    report(f"send_message x{concurrency} coroutines", count, time.perf_counter() - started)
+
+def benchmark_sync(producer, count, threads):
+    """
+    Publish from threads through the synchronous facade.
+    
+    Args:
+        producer: Message producer
+        count: Number of messages
+        threads: Number of publishing threads
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(
+            lambda index: producer.send_message_sync("jobs", ROUTING_KEY, message(index)),
+            range(count)
+        ))
+    report(f"send_message_sync x{threads} threads", count, time.perf_counter() - started)
+    
+    if not all(results):
+        print(f"  {results.count(False)} messages failed")
+
+def benchmark_connection_per_message(count):
+    """
+    Publish with a new blocking connection per message, as before.
+    
+    Args:
+        count: Number of messages
+    """
+    started = time.perf_counter()
+    for index in range(count):
+        connection = pika.BlockingConnection(pika.URLParameters(settings.RABBITMQ_URI))
+        channel = connection.channel()
+        channel.exchange_declare(exchange="jobs", exchange_type="direct", durable=True)
+        channel.basic_publish(
+            exchange="jobs",
+            routing_key=ROUTING_KEY,
+            body=json.dumps(message(index)).encode(),
+            properties=pika.BasicProperties(delivery_mode=2, content_type="application/json")
+        )
+        connection.close()
+    report("connection per message (previous)", count, time.perf_counter() - started)
+
+def run_benchmark(count, concurrency, threads, baseline_count):
+    """
+    Run the benchmark.
+    
+    Args:
+        count: Number of messages per run
+        concurrency: Publishing coroutines
+        threads: Publishing threads for the synchronous facade
+        baseline_count: Number of messages for the previous approach
+    """
+    print(
+        f"Channel pool: {settings.PRODUCER_CHANNEL_POOL_SIZE}, batch size: {settings.PRODUCER_BATCH_SIZE}, "
+        f"linger: {settings.PRODUCER_LINGER_MS} ms"
+    )
+    
+    async def run_async():
+        producer = MessageProducer()
+        await producer.connect()
+        try:
+            await benchmark_async(producer, count, concurrency)
+        finally:
+            await producer.close()
+    
+    asyncio.run(run_async())
+    
+    # Without a running loop the producer publishes from a background loop
+    producer = MessageProducer()
+    benchmark_sync(producer, count, threads)
+    
+    if baseline_count:
+        benchmark_connection_per_message(baseline_count)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the message producer")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages per run")
+    parser.add_argument("--concurrency", type=int, default=500, help="Publishing coroutines")
+    parser.add_argument("--threads", type=int, default=32, help="Publishing threads for send_message_sync")
+    parser.add_argument("--baseline", type=int, default=200, help="Messages for the connection-per-message run (0 to skip)")
+    args = parser.parse_args()
+    
+    run_benchmark(args.messages, args.concurrency, args.threads, args.baseline)
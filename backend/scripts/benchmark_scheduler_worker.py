@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Benchmark for the scheduler worker.
+
+Creates synthetic schedules (100,000 by default) with one job each, spread
+evenly over the seconds of a minute, and runs one or more scheduler worker
+instances against them for a while. Trigger messages are recorded instead of
+being sent to the message broker, so the script measures how late each fire
+is published relative to its scheduled time, and checks that no fire is
+published twice. The benchmark rows are deleted afterwards.
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import delete
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import SessionLocal
+from app.models import Tenant, Package, Schedule, Job, SchedulerInstance
+from app.services.schedule_service import next_fire_time
+from app.workers import scheduler_worker
+from app.workers.scheduler_worker import SchedulerWorker
+
+class RecordingProducer:
+    """Records trigger messages instead of sending them"""
+    
+    def __init__(self):
+        """Initialize the producer"""
+        self.sent = []
+    
+    async def send_message(self, exchange, routing_key, message_data, **kwargs):
+        """Record the time a trigger message is published"""
+        self.sent.append((datetime.utcnow(), message_data["schedule_id"], message_data["scheduled_time"]))
+
+def create_schedules(db, count):
+    """
+    Create a tenant, a package, and count schedules with one job each.
+    
+    Args:
+        db: Database session
+        count: Number of schedules
+    
+    Returns:
+        uuid.UUID: Tenant ID of the benchmark rows
+    """
+    tenant_id = uuid.uuid4()
+    package_id = uuid.uuid4()
+    now = datetime.utcnow()
+    
+    db.add(Tenant(tenant_id=tenant_id, name=f"scheduler-benchmark-{tenant_id.hex[:8]}"))
+    db.flush()
+    db.add(Package(
+        package_id=package_id,
+        tenant_id=tenant_id,
+        name="scheduler-benchmark",
+        version="1.0.0",
+        main_file_path="main.py",
+        storage_path="benchmark",
+        entry_point="main"
+    ))
+    db.flush()
+    
+    schedules = []
+    jobs = []
+    for index in range(count):
+        schedule_id = uuid.uuid4()
+        
+        # Every minute, at a different second per schedule
+        cron_expression = f"* * * * * {index % 60}"
+        schedules.append({
+            "schedule_id": schedule_id,
+            "tenant_id": tenant_id,
+            "name": f"schedule-{index}",
+            "cron_expression": cron_expression,
+            "timezone": "UTC",
+            "status": "active",
+            "next_execution": next_fire_time(cron_expression, "UTC", now),
+            "created_at": now,
+            "updated_at": now
+        })
+        jobs.append({
+            "job_id": uuid.uuid4(),
+            "tenant_id": tenant_id,
+            "package_id": package_id,
+            "schedule_id": schedule_id,
+            "name": f"job-{index}",
+            "status": "active",
+            "priority": 1,
+            "max_concurrent_runs": 1,
+            "timeout_seconds": 3600,
+            "created_at": now,
+            "updated_at": now
+        })
+    
+    for start in range(0, count, 10000):
+        db.execute(Schedule.__table__.insert(), schedules[start:start + 10000])
+        db.execute(Job.__table__.insert(), jobs[start:start + 10000])
+    
+    db.commit()
+    
+    return tenant_id
+
+def delete_schedules(db, tenant_id):
+    """
+    Delete the benchmark rows.
+    
+    Args:
+        db: Database session
+        tenant_id: Tenant ID of the benchmark rows
+    """
+    db.execute(delete(Job).where(Job.tenant_id == tenant_id))
+    db.execute(delete(Schedule).where(Schedule.tenant_id == tenant_id))
+    db.execute(delete(Package).where(Package.tenant_id == tenant_id))
+    db.execute(delete(Tenant).where(Tenant.tenant_id == tenant_id))
+    db.commit()
+
+def percentile(samples, fraction):
+    """Get a percentile from sorted samples"""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+async def run_workers(instances, duration):
+    """
+    Run scheduler worker instances for a while.
+    
+    Args:
+        instances: Number of worker instances
+        duration: Run time in seconds
+    
+    Returns:
+        List of worker instances
+    """
+    workers = [SchedulerWorker() for _ in range(instances)]
+    tasks = [asyncio.create_task(worker.run()) for worker in workers]
+    
+    await asyncio.sleep(duration)
+    
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return workers
+
+def run_benchmark(schedule_count, instances, duration, warmup):
+    """
+    Run the benchmark.
+    
+    Args:
+        schedule_count: Number of schedules
+        instances: Number of worker instances
+        duration: Run time in seconds
+        warmup: Seconds at the start whose fires are not measured
+    """
+    db = SessionLocal()
+    producer = RecordingProducer()
+    scheduler_worker.get_message_producer = lambda: producer
+    
+    started = time.perf_counter()
+    tenant_id = create_schedules(db, schedule_count)
+    print(f"Created {schedule_count} schedules in {time.perf_counter() - started:.1f} s")
+    
+    try:
+        run_started = datetime.utcnow()
+        asyncio.run(run_workers(instances, duration))
+        
+        # Group fires, excluding the warm-up and other schedules in the database
+        benchmark_ids = {
+            str(schedule_id) for (schedule_id,) in
+            db.query(Schedule.schedule_id).filter(Schedule.tenant_id == tenant_id)
+        }
+        fires = {}
+        lags = []
+        for sent_at, schedule_id, scheduled_time in producer.sent:
+            if schedule_id not in benchmark_ids:
+                continue
+            
+            fire_time = datetime.fromisoformat(scheduled_time)
+            fires[(schedule_id, scheduled_time)] = fires.get((schedule_id, scheduled_time), 0) + 1
+            
+            if (fire_time - run_started).total_seconds() >= warmup:
+                lags.append((sent_at - fire_time).total_seconds())
+        
+        duplicates = sum(count - 1 for count in fires.values())
+        lags.sort()
+        
+        print(f"Instances: {instances}, run time: {duration} s, warm-up: {warmup} s")
+        print(f"Fires published: {len(fires)}, duplicates: {duplicates}")
+        if lags:
+            print(
+                f"Lag after scheduled time: p50 {percentile(lags, 0.5) * 1000:.1f} ms"
+                f"   p99 {percentile(lags, 0.99) * 1000:.1f} ms"
+                f"   max {lags[-1] * 1000:.1f} ms"
+            )
+    
+    finally:
+        delete_schedules(db, tenant_id)
+        db.execute(delete(SchedulerInstance))
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler worker")
+    parser.add_argument("--schedules", type=int, default=100000, help="Number of schedules")
+    parser.add_argument("--instances", type=int, default=1, help="Scheduler worker instances")
+    parser.add_argument("--duration", type=int, default=150, help="Run time in seconds")
+    parser.add_argument("--warmup", type=int, default=30, help="Seconds of fires not measured")
+    args = parser.parse_args()
+    
+    run_benchmark(args.schedules, args.instances, args.duration, args.warmup)
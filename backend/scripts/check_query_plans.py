@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""
+Regression check for the query plans of the hot dispatcher, scheduler,
+agent monitor and analytics queries.
+
+The queries are built by the same service methods that run them and are
+executed with an EXPLAIN prefix, so the checked SQL can't drift from the
+service code. Sequential scans are disabled, so the planner only falls back
+to a Seq Scan (or a full scan of an unrelated index) when no index can serve
+the predicate. The script exits with a non-zero status if any checked table
+is scanned sequentially or through an index whose leading column is not
+constrained by the query.
+"""
+
+import sys
+import json
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event
+
+# Add parent directory to path so we can import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.session import SessionLocal
+from app.services.agent_manager import STALE_AGENT_STATUSES
+from app.services.agent_scheduler import AgentScheduler
+from app.services.agent_service import AgentService
+from app.services.analytics_service import AnalyticsService
+from app.services.queue_service import QueueService
+from app.services.schedule_service import ScheduleService
+from app.workers.scheduler_worker import SchedulerWorker
+
+def build_checks(db, now: datetime):
+    """
+    Build the queries to check with the services' own query builders.
+
+    Args:
+        db: Database session (for the services building ORM queries)
+        now: Reference time used for time-based predicates
+
+    Returns:
+        List of (name, statement, tables that must not be scanned sequentially)
+    """
+    tenant_id = uuid.uuid4()
+    queue_id = uuid.uuid4()
+    agent_id = uuid.uuid4()
+    cutoff = now - timedelta(minutes=5)
+
+    analytics = AnalyticsService(db)
+
+    # A scheduler worker owning every shard
+    scheduler_worker = SchedulerWorker()
+    scheduler_worker.owned_shards = set(range(scheduler_worker.shard_count))
+
+    return [
+        (
+            "queue claim (QueueService.claim_queue_items)",
+            QueueService.claim_candidates_query(tenant_id, 20, now),
+            ["queue_items"]
+        ),
+        (
+            "queue lease sweep (QueueService.release_expired_leases)",
+            QueueService.expired_leases_update(now),
+            ["queue_items"]
+        ),
+        (
+            "queue pending range (QueueService.list_queue_stats)",
+            QueueService.pending_range_query([queue_id]),
+            ["queue_items"]
+        ),
+        (
+            "queue items listing (QueueService.list_queue_items)",
+            QueueService.queue_items_query(queue_id, tenant_id, "failed").limit(100),
+            ["queue_items"]
+        ),
+        (
+            "due schedules (ScheduleService.process_due_schedules)",
+            ScheduleService.due_schedules_query(now),
+            ["schedules"]
+        ),
+        (
+            "edited schedules (SchedulerWorker._sync)",
+            scheduler_worker.sync_query(now - timedelta(seconds=scheduler_worker.sync_slack)),
+            ["schedules"]
+        ),
+        (
+            "scheduled jobs (ScheduleService.claim_due_fires)",
+            ScheduleService.active_jobs_query([str(uuid.uuid4())]),
+            ["jobs"]
+        ),
+        (
+            "upcoming schedules (AnalyticsService._get_upcoming_scheduled_jobs)",
+            analytics.upcoming_fires_query(tenant_id).statement,
+            ["schedule_fire_times"]
+        ),
+        (
+            "stale agents (AgentService.check_stale_agents)",
+            AgentService.stale_agents_query(cutoff),
+            ["agents"]
+        ),
+        (
+            "stale agents (AgentManager.check_stale_agents)",
+            AgentService.stale_agents_query(cutoff, STALE_AGENT_STATUSES, include_never_seen=True),
+            ["agents"]
+        ),
+        (
+            "online agents (AgentScheduler.refresh)",
+            AgentScheduler.online_agents_query(tenant_id),
+            ["agents"]
+        ),
+        (
+            "execution time series (AnalyticsService.get_job_time_series)",
+            analytics.job_time_series_query(tenant_id, now - timedelta(days=30), now).statement,
+            ["job_executions"]
+        ),
+        (
+            "recent activity (AnalyticsService._get_recent_activity)",
+            analytics.recent_activity_query(tenant_id).statement,
+            ["job_executions"]
+        ),
+        (
+            "agent executions (AnalyticsService.get_agent_statistics)",
+            analytics.executions_query(tenant_id, agent_id).statement,
+            ["job_executions"]
+        ),
+        (
+            "agent logs (AgentService.get_agent_logs)",
+            AgentService.agent_logs_query(agent_id, tenant_id).limit(100),
+            ["agent_logs"]
+        ),
+    ]
+
+@contextmanager
+def explaining(connection):
+    """
+    Run the statements executed on a connection through EXPLAIN instead.
+
+    The statements are compiled and their parameters bound exactly as when
+    the services execute them; only the SQL sent to the database is prefixed.
+
+    Args:
+        connection: Database connection
+    """
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        return f"EXPLAIN (FORMAT JSON) {statement}", parameters
+
+    event.listen(connection, "before_cursor_execute", explain, retval=True)
+    try:
+        yield
+    finally:
+        event.remove(connection, "before_cursor_execute", explain)
+
+def get_index_leading_columns(connection):
+    """
+    Get the table and leading key column of every index.
+
+    Args:
+        connection: Database connection
+
+    Returns:
+        Dict[str, Tuple[str, str]]: Index name to (table name, leading column)
+    """
+    rows = connection.exec_driver_sql(
+        "SELECT ic.relname, tc.relname, a.attname "
+        "FROM pg_index i "
+        "JOIN pg_class ic ON ic.oid = i.indexrelid "
+        "JOIN pg_class tc ON tc.oid = i.indrelid "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]"
+    ).all()
+
+    return {index_name: (table_name, column) for index_name, table_name, column in rows}
+
+def find_seq_scans(plan, tables, indexes):
+    """
+    Find sequential scans of the given tables in an EXPLAIN plan tree.
+
+    Index scans whose condition does not constrain the leading index column
+    walk the whole index and are reported as well.
+
+    Args:
+        plan: Plan node from EXPLAIN (FORMAT JSON)
+        tables: Table names that must not be scanned sequentially
+        indexes: Index name to (table name, leading column)
+
+    Returns:
+        List[str]: Descriptions of the offending scans
+    """
+    found = []
+    node_type = plan.get("Node Type")
+
+    if node_type == "Seq Scan" and plan.get("Relation Name") in tables:
+        found.append(f"Seq Scan on {plan['Relation Name']}")
+
+    elif node_type in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+        table, leading_column = indexes.get(plan.get("Index Name"), (None, None))
+        if table in tables and leading_column not in plan.get("Index Cond", ""):
+            found.append(f"full scan of {plan['Index Name']} on {table}")
+
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child, tables, indexes))
+
+    return found
+
+def check_query_plans() -> bool:
+    """
+    Run EXPLAIN for every checked query.
+
+    Returns:
+        bool: True if no checked query falls back to a sequential scan
+    """
+    db = SessionLocal()
+    failures = 0
+
+    try:
+        connection = db.connection()
+        indexes = get_index_leading_columns(connection)
+
+        # Make the planner pick a seq scan only when no index is usable
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+        for name, statement, tables in build_checks(db, datetime.utcnow()):
+            with explaining(connection):
+                result = connection.execute(statement).scalar()
+
+            plan = (result if isinstance(result, list) else json.loads(result))[0]["Plan"]
+            seq_scans = find_seq_scans(plan, tables, indexes)
+
+            if seq_scans:
+                failures += 1
+                print(f"FAIL  {name}: {', '.join(sorted(set(seq_scans)))}")
+            else:
+                print(f"OK    {name}")
+
+    finally:
+        db.rollback()
+        db.close()
+
+    if failures:
+        print(f"{failures} queries fall back to sequential scans")
+
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)